@@ -0,0 +1,87 @@
+"""
+build_cache.py — Cache de build endereçado por conteúdo: o pipeline só gera e reinicia o
+bot quando algo que entra nele mudou.
+
+O config.json de cada cliente guarda o que está em disco: `build_fingerprint` (template,
+perfil, credenciais — ver generator.build_fingerprint) e `prompt_hash` (prompt + skills). Antes da
+geração, decide() compara com o build pedido:
+
+  "skip"    → nada mudou: não gera; se o bot estiver no ar, também não reinicia
+  "reload"  → só prompt/skills mudaram: publica o prompt.json novo (generator.publish_prompt);
+              o bot no ar aplica sozinho na próxima mensagem, sem restart
+  "rebuild" → primeiro build, código/credenciais/template diferentes, ou build em
+              disco incompleto (bot.py gravado depois do config.json, sem prompt.json)
+
+Contadores de builds, rebuilds e reinícios evitados em stats().
+"""
+import os
+import json
+import logging
+import threading
+from typing import Optional
+
+from bot_factory import generator
+from bot_factory.prompt_artifact import artifact_path
+
+logger = logging.getLogger(__name__)
+
+SKIP, RELOAD, REBUILD = "skip", "reload", "rebuild"
+
+_lock = threading.Lock()
+_stats = {"builds": 0, "rebuilds_evitados": 0, "reloads": 0, "reinicios_evitados": 0, "reinicios": 0}
+
+
+def _client_dir(user_id: str) -> str:
+    return os.path.join(generator.CLIENTS_DIR, user_id)  # lido na chamada: benchmarks trocam o diretório
+
+
+def _read_config(user_id: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(_client_dir(user_id), "config.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def decide(user_id: str, fingerprint: str, prompt_hash: str) -> str:
+    """SKIP, RELOAD ou REBUILD para o build pedido, comparado ao build em disco."""
+    config = _read_config(user_id)
+    bot_path = os.path.join(_client_dir(user_id), "bot.py")
+    config_path = os.path.join(_client_dir(user_id), "config.json")
+    try:
+        complete = (os.path.getmtime(bot_path) <= os.path.getmtime(config_path)
+                    and os.path.exists(artifact_path(_client_dir(user_id))))
+    except OSError:
+        complete = False
+    if not config or not complete or config.get("build_fingerprint") != fingerprint:
+        return REBUILD
+    if config.get("prompt_hash") != prompt_hash:
+        return RELOAD
+    return SKIP
+
+
+def cached_build(user_id: str) -> dict:
+    """Mesmo formato do retorno de generator.generate_bot, a partir do build em disco."""
+    config = _read_config(user_id) or {}
+    client_dir = _client_dir(user_id)
+    return {
+        "bot_path":    os.path.join(client_dir, "bot.py"),
+        "config_path": os.path.join(client_dir, "config.json"),
+        "prompt_hash": config.get("prompt_hash"),
+        "build_fingerprint": config.get("build_fingerprint"),
+        "user_id":     user_id,
+        "client_dir":  client_dir,
+    }
+
+
+def record(event: str):
+    """Conta um desfecho: build, rebuild_evitado, reload, reinicio_evitado ou reinicio."""
+    key = {"build": "builds", "rebuild_evitado": "rebuilds_evitados", "reload": "reloads",
+           "reinicio_evitado": "reinicios_evitados", "reinicio": "reinicios"}[event]
+    with _lock:
+        _stats[key] += 1
+
+
+def stats() -> dict:
+    with _lock:
+        return dict(_stats)
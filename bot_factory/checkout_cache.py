@@ -0,0 +1,142 @@
+"""
+checkout_cache.py — Cache de links de checkout (Stripe) por (usuário, plano, e-mail).
+
+Um cliente que diz "ok", "sim" e "manda o link" em três mensagens seguidas gerava três
+sessões de checkout e três round trips ao Stripe. Com o cache:
+
+- Uma sessão por (user_id, plano, e-mail) enquanto ela for válida — a expiração segue o
+  `expires_at` devolvido pelo Stripe (24h por padrão), com margem de segurança.
+- A criação roda num pool de threads próprio: quem pede recebe um Future na hora e decide
+  quanto esperar; pedidos repetidos durante a criação reaproveitam o mesmo Future.
+- Idempotency key gerada uma vez por tentativa de criação (nonce guardado na entrada): as
+  retentativas de rede do cliente Stripe dentro dessa chamada reaproveitam a mesma sessão.
+  Uma tentativa nova (depois de falha ou de a sessão expirar) usa chave nova — o Stripe
+  repetiria a resposta antiga (sessão vencida, erro) para a mesma chave.
+- Falhas não ficam em cache — o próximo sinal de fechamento tenta de novo.
+
+`create_fn(plan, email, name, idempotency_key)` → (url, expires_at_epoch) ou None.
+"""
+import os
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SESSION_TTL    = int(os.getenv("CHECKOUT_CACHE_TTL", str(24 * 3600)))   # vida padrão da sessão Stripe
+SAFETY_MARGIN  = int(os.getenv("CHECKOUT_CACHE_MARGIN", "600"))         # não reenviar link prestes a expirar
+MAX_ENTRIES    = int(os.getenv("CHECKOUT_CACHE_MAX", "10000"))
+WORKERS        = int(os.getenv("CHECKOUT_WORKERS", "4"))
+
+Key = Tuple[str, str, str]
+
+
+class _Entry:
+    __slots__ = ("future", "expires_at", "idempotency_key")
+
+    def __init__(self, future: Future, expires_at: float, idempotency_key: str):
+        self.future = future
+        self.expires_at = expires_at
+        self.idempotency_key = idempotency_key
+
+
+class CheckoutCache:
+    """Sessões de checkout reaproveitadas por TTL, criadas em segundo plano."""
+
+    def __init__(self, create_fn: Callable[[str, str, str, str], Optional[Tuple[str, Optional[float]]]],
+                 ttl: int = SESSION_TTL, margin: int = SAFETY_MARGIN,
+                 max_entries: int = MAX_ENTRIES, workers: int = WORKERS):
+        self.create_fn = create_fn
+        self.ttl = ttl
+        self.margin = margin
+        self.max_entries = max_entries
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="checkout")
+        self._data: "OrderedDict[Key, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "criacoes": 0, "aguardando_criacao": 0, "falhas": 0}
+
+    @staticmethod
+    def key(user_id: str, plan: str, email: str) -> Key:
+        return (str(user_id), plan, (email or "").strip().lower())
+
+    @staticmethod
+    def new_idempotency_key() -> str:
+        """Chave de uma tentativa de criação — nunca reaproveitada por outra tentativa."""
+        return f"checkout-{uuid.uuid4().hex}"
+
+    def get(self, user_id: str, plan: str, email: str, name: str = "") -> Future:
+        """Future com a URL (ou None em falha). Já resolvido quando há sessão válida em cache."""
+        key = self.key(user_id, plan, email)
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                if not entry.future.done():
+                    self._stats["aguardando_criacao"] += 1
+                    return entry.future
+                if entry.expires_at > now:
+                    self._stats["hits"] += 1
+                    self._data.move_to_end(key)
+                    return entry.future
+                del self._data[key]
+            idempotency_key = self.new_idempotency_key()
+            future = self._executor.submit(self._create, key, name, idempotency_key)
+            self._data[key] = _Entry(future, now + self.ttl - self.margin, idempotency_key)
+            self._stats["criacoes"] += 1
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+        return future
+
+    def url(self, user_id: str, plan: str, email: str, name: str = "", wait: float = 0.0) -> Optional[str]:
+        """URL se ficar pronta em até `wait` segundos; senão None (a criação continua em fundo)."""
+        return self.result(self.get(user_id, plan, email, name), wait)
+
+    @staticmethod
+    def result(future: Future, wait: float = 0.0) -> Optional[str]:
+        """Resultado do Future se sair em até `wait` segundos; senão None."""
+        try:
+            return future.result(timeout=wait)
+        except FutureTimeout:
+            return None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "sessoes": len(self._data),
+                    "em_criacao": sum(1 for e in self._data.values() if not e.future.done())}
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+    # ── Internos ─────────────────────────────────────────────────
+    def _create(self, key: Key, name: str, idempotency_key: str) -> Optional[str]:
+        _, plan, email = key
+        try:
+            created = self.create_fn(plan, email, name, idempotency_key)
+        except Exception as e:
+            logger.error(f"[Checkout] Erro ao criar sessão ({plan}): {e}")
+            created = None
+        if not created:
+            self._drop(key, idempotency_key)
+            return None
+        url, expires_at = created
+        if expires_at:
+            with self._lock:
+                entry = self._data.get(key)
+                if entry is not None and entry.idempotency_key == idempotency_key:
+                    entry.expires_at = min(entry.expires_at, expires_at - self.margin)
+        return url
+
+    def _drop(self, key: Key, idempotency_key: str):
+        with self._lock:
+            self._stats["falhas"] += 1
+            entry = self._data.get(key)
+            if entry is not None and entry.idempotency_key == idempotency_key:
+                del self._data[key]  # só a entrada desta tentativa (clear() pode ter criado outra)
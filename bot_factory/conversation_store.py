@@ -0,0 +1,204 @@
+"""
+conversation_store.py — Memória de conversa limitada por usuário, com despejo LRU/TTL
+e reidratação preguiçosa a partir do `historico`.
+
+- Cada usuário tem um ring buffer (deque com maxlen) com as últimas N mensagens.
+- Usuários ociosos são despejados por TTL; se o total passar de MAX_USERS ou do orçamento
+  de memória (MAX_BYTES), os menos usados recentemente saem primeiro.
+- Quando um usuário despejado volta a falar, as últimas mensagens são recarregadas do DB.
+- No event loop use aget() / aappend(): o hit sai da memória na hora; no miss roda o
+  `aloader` assíncrono (load_recent sobre bot_factory/storage.py) ou, sem ele, o loader
+  síncrono numa thread.
+
+Contadores de hit/miss/despejo ficam em `stats()` (expostos no health check do main.py).
+"""
+import os
+import time
+import asyncio
+import threading
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, List, Optional
+
+from bot_factory import db_pool
+from bot_factory.storage import Storage
+
+MAX_USERS   = int(os.getenv("CONV_MAX_USERS", "5000"))
+TTL_SECONDS = int(os.getenv("CONV_TTL_SECONDS", str(6 * 3600)))
+MAX_BYTES   = int(os.getenv("CONV_MAX_BYTES", str(64 * 1024 * 1024)))
+
+_MSG_OVERHEAD = 120  # bytes aproximados por dict/entrada além do texto
+
+
+def _msg_size(msg: dict) -> int:
+    return len(msg.get("content") or "") + _MSG_OVERHEAD
+
+
+def load_recent_from_db(user_id: str, limit: int, db_path: Optional[str] = None) -> List[dict]:
+    """Últimas `limit` mensagens do usuário no historico (usa idx_historico_user_ts)."""
+    rows = db_pool.fetchall(
+        "SELECT role, content FROM historico WHERE user_id=? ORDER BY timestamp DESC, id DESC LIMIT ?",
+        (user_id, limit), path=db_path,
+    )
+    return [{"role": r[0], "content": r[1]} for r in reversed(rows)]
+
+
+async def load_recent(storage: Storage, user_id: str, limit: int) -> List[dict]:
+    """load_recent_from_db pelo Storage (o mesmo banco em que o HistoryWriter grava)."""
+    rows = await storage.fetchall(
+        "SELECT role, content FROM historico WHERE user_id=? ORDER BY timestamp DESC, id DESC LIMIT ?",
+        (user_id, limit),
+    )
+    return [{"role": r[0], "content": r[1]} for r in reversed(rows)]
+
+
+class _Entry:
+    __slots__ = ("messages", "last_access", "size")
+
+    def __init__(self, maxlen: int):
+        self.messages = deque(maxlen=maxlen)
+        self.last_access = time.monotonic()
+        self.size = 0
+
+
+class ConversationStore:
+    """Cache LRU+TTL de históricos de conversa com orçamento total de memória."""
+
+    def __init__(self, max_turns: int, loader: Optional[Callable[[str, int], List[dict]]] = None,
+                 max_users: int = MAX_USERS, ttl_seconds: int = TTL_SECONDS, max_bytes: int = MAX_BYTES,
+                 aloader: Optional[Callable[[str, int], Awaitable[List[dict]]]] = None):
+        self.max_turns = max_turns
+        self.loader = loader
+        self.aloader = aloader
+        self.max_users = max_users
+        self.ttl = ttl_seconds
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "rehydrated_msgs": 0}
+
+    # ── API pública ──────────────────────────────────────────────
+    def get(self, user_id: str) -> List[dict]:
+        """Retorna (cópia de) as mensagens recentes do usuário, recarregando do DB se necessário."""
+        with self._lock:
+            entry = self._touch(user_id)
+            if entry is not None:
+                self._counters["hits"] += 1
+                return list(entry.messages)
+            self._counters["misses"] += 1
+
+        loaded = []
+        if self.loader:
+            try:
+                loaded = self.loader(user_id, self.max_turns) or []
+            except Exception:
+                loaded = []
+        return self._fill(user_id, loaded)
+
+    def _fill(self, user_id: str, loaded: List[dict]) -> List[dict]:
+        with self._lock:
+            entry = self._data.get(user_id)
+            if entry is None:  # outra chamada pode ter criado a entrada enquanto líamos o DB
+                entry = self._new_entry(user_id)
+                for msg in loaded:
+                    self._push(entry, msg)
+                self._counters["rehydrated_msgs"] += len(loaded)
+                self._evict()
+            return list(entry.messages)
+
+    async def aget(self, user_id: str) -> List[dict]:
+        """get() para o event loop: hit direto da memória; no miss reidrata pelo aloader (ou pelo loader numa thread)."""
+        with self._lock:
+            entry = self._touch(user_id)
+            if entry is not None:
+                self._counters["hits"] += 1
+                return list(entry.messages)
+            if self.aloader is not None:
+                self._counters["misses"] += 1
+        if self.aloader is None:
+            return await asyncio.to_thread(self.get, user_id)
+        try:
+            loaded = await self.aloader(user_id, self.max_turns) or []
+        except Exception:
+            loaded = []
+        return self._fill(user_id, loaded)
+
+    async def aappend(self, user_id: str, role: str, content: str):
+        if user_id not in self._data:
+            await self.aget(user_id)
+        self.append(user_id, role, content)
+
+    def append(self, user_id: str, role: str, content: str):
+        if user_id not in self._data:
+            self.get(user_id)  # reidrata antes de acrescentar, para não perder o contexto anterior
+        with self._lock:
+            entry = self._touch(user_id) or self._new_entry(user_id)
+            self._push(entry, {"role": role, "content": content})
+            self._evict()
+
+    def clear(self, user_id: str):
+        """Zera a conversa do usuário (mantém a entrada vazia para não reidratar do DB)."""
+        with self._lock:
+            entry = self._touch(user_id) or self._new_entry(user_id)
+            self._bytes -= entry.size
+            entry.size = 0
+            entry.messages.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._expire()
+            total = self._counters["hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "hit_rate": round(self._counters["hits"] / total, 3) if total else 0.0,
+                "users": len(self._data),
+                "bytes": self._bytes,
+                "max_users": self.max_users,
+                "max_bytes": self.max_bytes,
+            }
+
+    def __len__(self):
+        return len(self._data)
+
+    # ── Internos (chamar com o lock) ─────────────────────────────
+    def _touch(self, user_id: str) -> Optional[_Entry]:
+        self._expire()
+        entry = self._data.get(user_id)
+        if entry is not None:
+            entry.last_access = time.monotonic()
+            self._data.move_to_end(user_id)
+        return entry
+
+    def _new_entry(self, user_id: str) -> _Entry:
+        entry = _Entry(self.max_turns)
+        self._data[user_id] = entry
+        return entry
+
+    def _push(self, entry: _Entry, msg: dict):
+        if len(entry.messages) == entry.messages.maxlen:
+            dropped = entry.messages[0]
+            entry.size -= _msg_size(dropped)
+            self._bytes -= _msg_size(dropped)
+        entry.messages.append(msg)
+        entry.size += _msg_size(msg)
+        self._bytes += _msg_size(msg)
+
+    def _drop_lru(self):
+        _, entry = self._data.popitem(last=False)
+        self._bytes -= entry.size
+        self._counters["evictions"] += 1
+
+    def _expire(self):
+        # Ordem do OrderedDict = ordem de acesso → os expirados estão no início
+        if not self.ttl:
+            return
+        limit = time.monotonic() - self.ttl
+        while self._data:
+            entry = next(iter(self._data.values()))
+            if entry.last_access >= limit:
+                break
+            self._drop_lru()
+
+    def _evict(self):
+        while len(self._data) > self.max_users or (self._bytes > self.max_bytes and len(self._data) > 1):
+            self._drop_lru()
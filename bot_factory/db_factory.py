@@ -3,25 +3,25 @@ db_factory.py — Setup e acesso ao banco de dados da fábrica de bots.
 Cria as tabelas exclusivas do factory (bots_gerados, skills_performance, feedback_bots)
 no mesmo DB principal do projeto.
 """
-import sqlite3
 import os
 import json
 from datetime import datetime
 
+from bot_factory import db_pool
+from bot_factory.migrations import run_migrations
+
 DB_PATH = os.getenv("DB_NAME", "agencia_autovenda.db")
 
 
 def get_conn():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Conexão pooled da thread atual (WAL) — não deve ser fechada pelo chamador."""
+    return db_pool.get_conn(DB_PATH)
 
 
 def setup_factory_tables():
     """Garante que as tabelas do factory existem no DB principal."""
     conn = get_conn()
-    cur = conn.cursor()
-    cur.executescript("""
+    conn.executescript("""
         -- Registro de cada bot gerado
         CREATE TABLE IF NOT EXISTS bots_gerados (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -64,95 +64,100 @@ def setup_factory_tables():
         );
     """)
     conn.commit()
-    conn.close()
+    run_migrations(DB_PATH)
 
 
-def get_pending_clients():
+def get_pending_clients(user_id: str = None):
     """
     Retorna clientes ativos que ainda não têm bot gerado ou cujo bot está em erro genérico.
     Exclui status 'aguardando_token' para não repetir tentativas sem o token.
+    Com `user_id`, verifica só esse cliente (watcher acordado por evento).
     """
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("""
+    rows = db_pool.fetchall(f"""
         SELECT a.* FROM assinaturas a
         LEFT JOIN bots_gerados b ON a.user_id = b.user_id
         WHERE a.status = 'ativo'
           AND (b.user_id IS NULL OR b.status = 'error')
           AND (b.status IS NULL OR b.status != 'aguardando_token')
-    """)
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
-    return rows
+          {"AND a.user_id = ?" if user_id else ""}
+    """, (user_id,) if user_id else (), path=DB_PATH)
+    return [dict(r) for r in rows]
 
 
 def get_bot_record(user_id: str):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM bots_gerados WHERE user_id = ?", (user_id,))
-    row = cur.fetchone()
-    conn.close()
+    row = db_pool.fetchone("SELECT * FROM bots_gerados WHERE user_id = ?", (user_id,), path=DB_PATH)
     return dict(row) if row else None
 
 
 def upsert_bot_record(user_id: str, **kwargs):
-    conn = get_conn()
-    cur = conn.cursor()
     existing = get_bot_record(user_id)
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     kwargs["user_id"] = user_id
-    if not existing:
-        kwargs.setdefault("data_deploy", now)
-        cols = ", ".join(kwargs.keys())
-        placeholders = ", ".join(["?"] * len(kwargs))
-        cur.execute(f"INSERT INTO bots_gerados ({cols}) VALUES ({placeholders})", list(kwargs.values()))
-    else:
-        set_clause = ", ".join([f"{k}=?" for k in kwargs if k != "user_id"])
-        values = [v for k, v in kwargs.items() if k != "user_id"] + [user_id]
-        cur.execute(f"UPDATE bots_gerados SET {set_clause} WHERE user_id=?", values)
-    conn.commit()
-    conn.close()
+    with db_pool.transaction(DB_PATH) as cur:
+        if not existing:
+            kwargs.setdefault("data_deploy", now)
+            cols = ", ".join(kwargs.keys())
+            placeholders = ", ".join(["?"] * len(kwargs))
+            cur.execute(f"INSERT INTO bots_gerados ({cols}) VALUES ({placeholders})", list(kwargs.values()))
+        else:
+            set_clause = ", ".join([f"{k}=?" for k in kwargs if k != "user_id"])
+            values = [v for k, v in kwargs.items() if k != "user_id"] + [user_id]
+            cur.execute(f"UPDATE bots_gerados SET {set_clause} WHERE user_id=?", values)
 
 
 def log_feedback(bot_user_id: str, tipo: str, conteudo: str):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
+    db_pool.execute(
         "INSERT INTO feedback_bots (bot_user_id, tipo, conteudo, data) VALUES (?,?,?,?)",
-        (bot_user_id, tipo, conteudo, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        (bot_user_id, tipo, conteudo, datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+        path=DB_PATH,
     )
-    conn.commit()
-    conn.close()
+
+
+NEUTRAL_SKILL_SCORE = 5.0  # skill sem histórico no nicho
+
+
+def skill_score(media_satisfacao, taxa_retencao, taxa_escalacao) -> float:
+    """Score composto (0-10) a partir das métricas de skills_performance."""
+    satisf = media_satisfacao or 5.0
+    retencao = (taxa_retencao or 0.5) * 10
+    escalacao_penalty = (taxa_escalacao or 0.2) * 5
+    return round((satisf * 0.5 + retencao * 0.4) - escalacao_penalty * 0.1, 2)
 
 
 def get_skill_score(nicho: str, skill_name: str) -> float:
     """Retorna o score composto de uma skill para um nicho (0-10)."""
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
+    row = db_pool.fetchone(
         "SELECT media_satisfacao, taxa_retencao, taxa_escalacao FROM skills_performance "
-        "WHERE nicho=? AND skill_name=?", (nicho, skill_name)
+        "WHERE nicho=? AND skill_name=?", (nicho, skill_name), path=DB_PATH
     )
-    row = cur.fetchone()
-    conn.close()
     if not row:
-        return 5.0  # score neutro para skill nova
-    satisf = row[0] or 5.0
-    retencao = (row[1] or 0.5) * 10
-    escalacao_penalty = (row[2] or 0.2) * 5
-    return round((satisf * 0.5 + retencao * 0.4) - escalacao_penalty * 0.1, 2)
+        return NEUTRAL_SKILL_SCORE  # score neutro para skill nova
+    return skill_score(row[0], row[1], row[2])
+
+
+def get_skill_scores(nicho: str) -> dict:
+    """Scores de todas as skills com histórico no nicho, numa única consulta (prefixo da PK)."""
+    rows = db_pool.fetchall(
+        "SELECT skill_name, media_satisfacao, taxa_retencao, taxa_escalacao FROM skills_performance "
+        "WHERE nicho=?", (nicho,), path=DB_PATH
+    )
+    return {r[0]: skill_score(r[1], r[2], r[3]) for r in rows}
 
 
 def record_skill_usage(nicho: str, skill_name: str):
-    conn = get_conn()
-    cur = conn.cursor()
+    record_skills_usage(nicho, [skill_name])
+
+
+def record_skills_usage(nicho: str, skill_names):
+    """Conta um uso para cada skill, todas na mesma transação."""
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    cur.execute("""
+    rows = [(nicho, skill, now) for skill in skill_names]
+    if not rows:
+        return
+    db_pool.executemany("""
         INSERT INTO skills_performance (nicho, skill_name, total_usos, ultima_atualizacao)
         VALUES (?, ?, 1, ?)
         ON CONFLICT(nicho, skill_name) DO UPDATE SET
             total_usos = total_usos + 1,
             ultima_atualizacao = excluded.ultima_atualizacao
-    """, (nicho, skill_name, now))
-    conn.commit()
-    conn.close()
+    """, rows, path=DB_PATH)
@@ -0,0 +1,155 @@
+"""
+db_pool.py — Camada única de acesso ao SQLite compartilhada por main.py, bot_factory e skills.
+
+Em vez de abrir/fechar uma conexão a cada statement, cada thread mantém UMA conexão
+por arquivo de banco, já configurada com:
+- journal_mode=WAL      → leitores (dashboard) não bloqueiam escritores e vice-versa
+- synchronous=NORMAL    → fsync só no checkpoint do WAL (seguro contra crash do processo)
+- cache_size / mmap     → páginas quentes ficam em memória
+- cached_statements     → statements preparados reaproveitados pelo driver
+
+Uso:
+    from bot_factory.db_pool import transaction, fetchone
+
+    with transaction() as cur:
+        cur.execute("INSERT ...", params)
+
+    row = fetchone("SELECT ... WHERE user_id=?", (uid,))
+"""
+import os
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = os.getenv("DB_NAME", "agencia_autovenda.db")
+
+# Ajustes de performance (podem ser sobrescritos via .env)
+CACHE_SIZE_KB     = int(os.getenv("DB_CACHE_SIZE_KB", "20000"))           # ~20 MB de page cache
+MMAP_SIZE         = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))  # 256 MB mapeados
+BUSY_TIMEOUT_MS   = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+CACHED_STATEMENTS = 256
+
+_local = threading.local()
+_registry_lock = threading.Lock()
+_all_conns: list = []   # todas as conexões abertas (para close_all no shutdown)
+_generation = 0         # incrementado em close_all() — invalida os caches por thread
+
+
+def _resolve(path: Optional[str]) -> str:
+    return os.path.abspath(path or DB_PATH)
+
+
+def _open(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(
+        path,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        cached_statements=CACHED_STATEMENTS,
+        check_same_thread=False,  # só usada pela thread dona; liberado para close_all()
+    )
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    with _registry_lock:
+        _all_conns.append(conn)
+    return conn
+
+
+def get_conn(path: Optional[str] = None) -> sqlite3.Connection:
+    """
+    Retorna a conexão da thread atual para o banco informado (DB_PATH por padrão).
+    NÃO feche a conexão retornada — ela é reaproveitada pelas próximas chamadas.
+    """
+    key = _resolve(path)
+    conns = getattr(_local, "conns", None)
+    if conns is None or getattr(_local, "generation", None) != _generation:
+        conns = _local.conns = {}
+        _local.generation = _generation
+    conn = conns.get(key)
+    if conn is None:
+        conn = conns[key] = _open(key)
+    return conn
+
+
+@contextmanager
+def transaction(path: Optional[str] = None):
+    """Abre um cursor na conexão da thread; commit ao sair, rollback em caso de erro."""
+    conn = get_conn(path)
+    cur = conn.cursor()
+    try:
+        yield cur
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def execute(sql: str, params: Iterable = (), path: Optional[str] = None) -> int:
+    """Executa um statement de escrita em transação própria. Retorna rowcount."""
+    with transaction(path) as cur:
+        cur.execute(sql, tuple(params))
+        return cur.rowcount
+
+
+def executemany(sql: str, seq_params: Iterable, path: Optional[str] = None) -> int:
+    """Executa o mesmo statement para várias linhas numa única transação."""
+    with transaction(path) as cur:
+        cur.executemany(sql, seq_params)
+        return cur.rowcount
+
+
+def fetchone(sql: str, params: Iterable = (), path: Optional[str] = None) -> Optional[sqlite3.Row]:
+    cur = get_conn(path).execute(sql, tuple(params))
+    try:
+        return cur.fetchone()
+    finally:
+        cur.close()
+
+
+def fetchall(sql: str, params: Iterable = (), path: Optional[str] = None) -> list:
+    cur = get_conn(path).execute(sql, tuple(params))
+    try:
+        return cur.fetchall()
+    finally:
+        cur.close()
+
+
+def close_thread_conns():
+    """Fecha as conexões da thread atual (ex.: fim de um worker)."""
+    conns = getattr(_local, "conns", None) or {}
+    for conn in conns.values():
+        _close(conn)
+    conns.clear()
+
+
+def close_all():
+    """Fecha todas as conexões abertas por qualquer thread (shutdown do processo)."""
+    global _generation
+    with _registry_lock:
+        conns = list(_all_conns)
+        _all_conns.clear()
+        _generation += 1
+    for conn in conns:
+        try:
+            conn.close()
+        except Exception as e:
+            logger.debug(f"[DB] Erro ao fechar conexão: {e}")
+
+
+def _close(conn: sqlite3.Connection):
+    with _registry_lock:
+        if conn in _all_conns:
+            _all_conns.remove(conn)
+    try:
+        conn.close()
+    except Exception:
+        pass
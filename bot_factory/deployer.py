@@ -4,6 +4,9 @@ Arquitetura local primeiro, preparada para Docker no futuro.
 
 Para cada bot, guarda o PID em clients/{user_id}/bot.pid.
 Para migrar para Docker: substituir _start_local() por _start_docker().
+
+Com BOT_RUNTIME=multitenant os bots não ganham processo próprio: deploy/stop apenas
+habilitam/desabilitam o tenant no runtime compartilhado (bot_factory/tenant_runtime.py).
 """
 import os
 import sys
@@ -13,6 +16,8 @@ import subprocess
 import logging
 from typing import Optional
 
+from bot_factory import tenant_runtime
+
 logger = logging.getLogger(__name__)
 
 FACTORY_DIR  = os.path.dirname(os.path.abspath(__file__))
@@ -20,10 +25,16 @@ CLIENTS_DIR  = os.path.join(os.path.dirname(FACTORY_DIR), "clients")
 PYTHON_BIN   = sys.executable  # mesmo Python do venv ativo
 
 
+def _multitenant() -> bool:
+    # Lido a cada chamada: o .env pode ser carregado depois do import deste módulo
+    return os.getenv("BOT_RUNTIME", "subprocess").strip().lower() == "multitenant"
+
+
 def deploy_bot(bot_path: str, user_id: str) -> Optional[int]:
     """
     Inicia o bot do cliente como subprocesso independente.
     Retorna o PID do processo, ou None em caso de erro.
+    No modo multi-tenant, retorna o PID do worker do runtime que hospeda o bot.
     """
     client_dir = os.path.join(CLIENTS_DIR, user_id)
     pid_file   = os.path.join(client_dir, "bot.pid")
@@ -36,6 +47,9 @@ def deploy_bot(bot_path: str, user_id: str) -> Optional[int]:
         logger.error(f"[Deployer] bot.py não encontrado: {bot_path}")
         return None
 
+    if _multitenant():
+        return tenant_runtime.enable_tenant(user_id, bot_path)
+
     try:
         # Carrega variáveis de ambiente do .env do projeto raiz
         env = os.environ.copy()
@@ -72,8 +86,37 @@ def deploy_bot(bot_path: str, user_id: str) -> Optional[int]:
         return None
 
 
+def reload_bot(user_id: str, bot_path: str) -> bool:
+    """
+    Aplica um prompt novo sem restart: o prompt.json já foi publicado e o bot em execução
+    (processo próprio ou tenant do runtime) o troca na próxima mensagem — ver
+    bot_factory/prompt_artifact.py. Retorna False se o bot não estiver no ar (o chamador
+    faz deploy_bot()).
+    """
+    return is_running(user_id)
+
+
+def running_pid(user_id: str) -> Optional[int]:
+    """PID que atende o bot (processo próprio ou worker do runtime), se estiver no ar."""
+    if _multitenant():
+        return tenant_runtime.worker_pid(user_id)
+    if not is_running(user_id):
+        return None
+    try:
+        with open(os.path.join(CLIENTS_DIR, user_id, "bot.pid"), "r") as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
 def stop_bot(user_id: str) -> bool:
-    """Para o bot do cliente pelo PID salvo."""
+    """Para o bot do cliente (subprocesso pelo PID salvo e/ou tenant do runtime)."""
+    stopped = tenant_runtime.disable_tenant(user_id) if _multitenant() else False
+    return _stop_process(user_id) or stopped
+
+
+def _stop_process(user_id: str) -> bool:
+    """Para o subprocesso do bot pelo PID salvo."""
     client_dir = os.path.join(CLIENTS_DIR, user_id)
     pid_file   = os.path.join(client_dir, "bot.pid")
 
@@ -101,6 +144,8 @@ def stop_bot(user_id: str) -> bool:
 
 def is_running(user_id: str) -> bool:
     """Verifica se o processo do bot ainda está rodando."""
+    if _multitenant():
+        return tenant_runtime.is_tenant_running(user_id)
     client_dir = os.path.join(CLIENTS_DIR, user_id)
     pid_file   = os.path.join(client_dir, "bot.pid")
 
@@ -0,0 +1,137 @@
+"""
+events.py — Eventos do factory: outbox no banco + canal local que acorda o watcher.
+
+Antes o watcher dormia FACTORY_POLL_INTERVAL (60s) entre varreduras: quem acabava de pagar
+esperava até um minuto pelo build, e todo ciclo ocioso rodava o LEFT JOIN de pendentes.
+
+- Outbox: `factory_events` (migração v7) é preenchida por triggers em `assinaturas` sempre que
+  o status muda — vale para qualquer processo que escreva no banco. A v8 acrescenta
+  'onboarding_atualizado' quando os dados do onboarding mudam (prompt a atualizar).
+- notify(): quem acabou de mudar um status manda um datagrama UDP para
+  127.0.0.1:FACTORY_EVENTS_PORT — hoje main._upsert_lead (após o commit) e
+  scripts/check_event_latency.py. Sem watcher ouvindo, não acontece nada.
+- EventListener (watcher): acorda com o datagrama (imediato) ou quando `PRAGMA data_version`
+  muda — commits de quem não chama notify() (dashboard, SQL manual, um futuro webhook do
+  Stripe) — verificado a cada FACTORY_EVENTS_CHECK_MS. Em seguida o watcher lê só os
+  eventos pendentes do outbox.
+"""
+import os
+import time
+import socket
+import select
+import sqlite3
+import logging
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+
+from bot_factory import db_pool
+
+logger = logging.getLogger(__name__)
+
+EVENTS_HOST = "127.0.0.1"
+EVENTS_PORT = int(os.getenv("FACTORY_EVENTS_PORT", "47613"))
+CHECK_MS    = int(os.getenv("FACTORY_EVENTS_CHECK_MS", "250"))
+RETENTION_DAYS = int(os.getenv("FACTORY_EVENTS_RETENTION_DAYS", "7"))
+
+_sender: Optional[socket.socket] = None
+
+
+def notify(user_id: str = "") -> bool:
+    """Acorda o watcher agora. Nunca levanta exceção — o outbox garante a entrega."""
+    global _sender
+    try:
+        if _sender is None:
+            _sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        _sender.sendto(str(user_id).encode()[:256], (EVENTS_HOST, EVENTS_PORT))
+        return True
+    except OSError:
+        return False
+
+
+def pending_events(path: Optional[str] = None, limit: int = 500) -> List[dict]:
+    try:
+        rows = db_pool.fetchall(
+            "SELECT id, user_id, tipo, status_anterior, status_novo, criado_em FROM factory_events "
+            "WHERE processado_em IS NULL ORDER BY id LIMIT ?", (limit,), path=path)
+    except sqlite3.OperationalError:
+        return []  # migração v7 ainda adiada (assinaturas não existe) — a varredura cobre
+    return [dict(r) for r in rows]
+
+
+def mark_processed(ids: Iterable[int], path: Optional[str] = None):
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    db_pool.executemany("UPDATE factory_events SET processado_em=? WHERE id=?",
+                        [(now, i) for i in ids], path=path)
+
+
+def purge_processed(path: Optional[str] = None, days: int = RETENTION_DAYS) -> int:
+    cutoff = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+    return db_pool.execute("DELETE FROM factory_events WHERE processado_em IS NOT NULL AND processado_em < ?",
+                           (cutoff,), path=path)
+
+
+class EventListener:
+    """Espera por notify() ou por commits de outros processos no banco."""
+
+    def __init__(self, path: Optional[str] = None, port: int = EVENTS_PORT, check_ms: int = CHECK_MS):
+        self.path = path
+        self.port = port
+        self.check = check_ms / 1000
+        self._sock: Optional[socket.socket] = None
+        self._data_version: Optional[int] = None
+        self.stats = {"notificacoes": 0, "commits_externos": 0, "timeouts": 0}
+
+    def open(self):
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.bind((EVENTS_HOST, self.port))
+            sock.setblocking(False)
+            self._sock = sock
+            logger.info(f"[Events] Ouvindo notificações em {EVENTS_HOST}:{self.port}")
+        except OSError as e:
+            logger.warning(f"[Events] Porta {self.port} indisponível ({e}) — só data_version "
+                           f"(até {int(self.check * 1000)} ms de atraso).")
+        self._data_version = self._read_data_version()
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def wait(self, timeout: float) -> bool:
+        """True assim que algo pode ter mudado; False se `timeout` passar sem novidade."""
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.stats["timeouts"] += 1
+                return False
+            step = min(self.check, remaining)
+            if self._sock is not None:
+                readable, _, _ = select.select([self._sock], [], [], step)
+                if readable:
+                    self._drain()
+                    self.stats["notificacoes"] += 1
+                    return True
+            else:
+                time.sleep(step)
+            version = self._read_data_version()
+            if version != self._data_version:
+                self._data_version = version
+                self.stats["commits_externos"] += 1
+                return True
+
+    def _drain(self):
+        try:
+            while True:
+                self._sock.recvfrom(512)
+        except (BlockingIOError, OSError):
+            pass
+        self._data_version = self._read_data_version()
+
+    def _read_data_version(self) -> Optional[int]:
+        # Conexão da própria thread: os commits do watcher não alteram o valor
+        try:
+            return db_pool.get_conn(self.path).execute("PRAGMA data_version").fetchone()[0]
+        except Exception:
+            return None
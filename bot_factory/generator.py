@@ -1,16 +1,38 @@
 """
 generator.py — Gera o código Python completo do bot do cliente e o salva em disco.
 Usa Jinja2 para renderizar templates específicos por plano.
+
+build_fingerprint() + prompt_hash() identificam o que foi gerado (gravados no config.json);
+o pipeline compara com o build em disco (bot_factory/build_cache.py) antes de gerar de novo.
+
+O system prompt não entra no bot.py: vai para prompt.json (bot_factory/prompt_artifact.py),
+que o bot relê sozinho — publish_prompt() troca só o prompt, sem gerar nem reiniciar.
+
+Templates compilados uma vez por processo (Environment compartilhado, recompila quando o
+arquivo muda) com bytecode em JINJA_CACHE_DIR. regenerate_bots() renderiza centenas de
+clientes numa passada — para espalhar uma correção de template para todos:
+
+Uso: python -m bot_factory.generator --all [--restart]
 """
 import os
+import sys
 import json
+import time
 import hashlib
-from jinja2 import Environment, FileSystemLoader
-from typing import List
+import logging
+import argparse
+import threading
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+from typing import Dict, List, Optional, Tuple
+
+from bot_factory.prompt_artifact import write_artifact
+
+logger = logging.getLogger(__name__)
 
 FACTORY_DIR    = os.path.dirname(os.path.abspath(__file__))
 TEMPLATES_DIR  = os.path.join(FACTORY_DIR, "templates")
 CLIENTS_DIR    = os.path.join(os.path.dirname(FACTORY_DIR), "clients")
+JINJA_CACHE_DIR = os.getenv("JINJA_CACHE_DIR", os.path.join(FACTORY_DIR, "__pycache__", "jinja"))
 
 
 def _get_template_name(plano: str) -> str:
@@ -25,39 +47,67 @@ def _get_template_name(plano: str) -> str:
     return mapping.get(plano_key, "bot_flash.py.jinja")
 
 
-def generate_bot(profile: dict, skills: List[str], system_prompt: str) -> dict:
+_template_hashes: Dict[str, Tuple[float, str]] = {}  # caminho → (mtime, sha256)
+_envs: Dict[str, Environment] = {}                   # TEMPLATES_DIR → Environment
+_env_lock = threading.Lock()
+
+
+def template_hash(template_name: str) -> str:
+    """Versão do template = hash do conteúdo (recalculado só quando o arquivo muda)."""
+    path = os.path.join(TEMPLATES_DIR, template_name)
+    mtime = os.path.getmtime(path)
+    cached = _template_hashes.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    _template_hashes[path] = (mtime, digest)
+    return digest
+
+
+def _environment() -> Environment:
     """
-    Gera o bot.py e config.json do cliente e salva em clients/{user_id}/.
-    Retorna dict com: bot_path, config_path, prompt_hash, user_id.
+    Environment compartilhado: cada template é parseado e compilado uma vez. auto_reload
+    confere o mtime a cada get_template e recompila se o arquivo mudou; o bytecode em disco
+    (validado pelo checksum do fonte) poupa o parse num processo novo.
     """
-    user_id = profile["user_id"]
-    plano   = profile.get("plano", "flash")
+    env = _envs.get(TEMPLATES_DIR)
+    if env is not None:
+        return env
+    with _env_lock:
+        env = _envs.get(TEMPLATES_DIR)
+        if env is None:
+            bytecode_cache = None
+            try:
+                os.makedirs(JINJA_CACHE_DIR, exist_ok=True)
+                bytecode_cache = FileSystemBytecodeCache(JINJA_CACHE_DIR)
+            except OSError as e:
+                logger.warning(f"[Generator] Sem cache de bytecode em {JINJA_CACHE_DIR}: {e}")
+            env = Environment(
+                loader=FileSystemLoader(TEMPLATES_DIR),
+                autoescape=False,
+                keep_trailing_newline=True,
+                auto_reload=True,
+                bytecode_cache=bytecode_cache,
+            )
+            _envs[TEMPLATES_DIR] = env
+    return env
 
-    # Cria pasta do cliente
-    client_dir = os.path.join(CLIENTS_DIR, user_id)
-    os.makedirs(client_dir, exist_ok=True)
 
-    # Carrega template Jinja2
-    env = Environment(
-        loader=FileSystemLoader(TEMPLATES_DIR),
-        autoescape=False,
-        keep_trailing_newline=True,
-    )
-    template_name = _get_template_name(plano)
-    template = env.get_template(template_name)
-
-    # Variáveis para o template
-    groq_model = os.getenv("GROQ_MODEL_CLIENTS", "llama-3.3-70b-versatile")
-    db_path    = os.path.abspath(os.getenv("DB_NAME", "agencia_autovenda.db"))
-
-    context = {
-        "user_id":        user_id,
+def prompt_hash(system_prompt: str, skills: List[str] = ()) -> str:
+    """Versão do prompt.json: muda com o prompt ou com a lista de skills."""
+    return hashlib.md5(f"{system_prompt}\n{json.dumps(list(skills))}".encode()).hexdigest()
+
+
+def _render_context(profile: dict) -> dict:
+    """Variáveis do template."""
+    db_path = os.path.abspath(os.getenv("DB_NAME", "agencia_autovenda.db"))
+    return {
+        "user_id":        profile["user_id"],
         "empresa_nome":   profile.get("empresa_nome", "Empresa"),
-        "plano":          plano,
+        "plano":          profile.get("plano", "flash"),
         "plataforma":     profile.get("plataforma", "telegram"),
-        "system_prompt":  system_prompt,
-        "skills":         skills,
-        "groq_model":     groq_model,
+        "groq_model":     os.getenv("GROQ_MODEL_CLIENTS", "llama-3.3-70b-versatile"),
         "db_path":        db_path,
         # Credenciais de plataforma
         "telegram_token": profile.get("telegram_bot_token", ""),
@@ -73,15 +123,57 @@ def generate_bot(profile: dict, skills: List[str], system_prompt: str) -> dict:
         "factory_db_path":     db_path,
     }
 
-    # Renderiza o bot
-    bot_code = template.render(**context)
+
+def build_fingerprint(profile: dict) -> str:
+    """
+    Impressão digital de tudo que entra no bot.py: versão do template, perfil/credenciais,
+    modelo e caminhos. Prompt e skills ficam no prompt.json e são comparados à parte
+    (prompt_hash) porque podem ser trocados sem gerar o código de novo.
+    """
+    context = _render_context(profile)
+    template_name = _get_template_name(context["plano"])
+    payload = json.dumps({"template": template_name, "template_hash": template_hash(template_name),
+                          "context": context}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def render_bot(profile: dict) -> str:
+    """Código do bot.py do cliente (template do plano, já compilado)."""
+    context = _render_context(profile)
+    return _environment().get_template(_get_template_name(context["plano"])).render(**context)
+
+
+def generate_bot(profile: dict, skills: List[str], system_prompt: str) -> dict:
+    """
+    Gera o bot.py e config.json do cliente e salva em clients/{user_id}/.
+    Retorna dict com: bot_path, config_path, prompt_hash, user_id.
+    """
+    user_id = profile["user_id"]
+    plano   = profile.get("plano", "flash")
+
+    # Cria pasta do cliente
+    client_dir = os.path.join(CLIENTS_DIR, user_id)
+    os.makedirs(client_dir, exist_ok=True)
+
+    # Renderiza o bot (template em cache)
+    context    = _render_context(profile)
+    groq_model = context["groq_model"]
+    db_path    = context["db_path"]
+    bot_code   = render_bot(profile)
 
     # Salva bot.py
     bot_path = os.path.join(client_dir, "bot.py")
     with open(bot_path, "w", encoding="utf-8") as f:
         f.write(bot_code)
 
-    # Salva config.json (metadados do bot)
+    # Hashes para detectar mudanças futuras (build_cache)
+    fingerprint = build_fingerprint(profile)
+    p_hash      = prompt_hash(system_prompt, skills)
+
+    # Prompt + skills num artefato à parte (trocado a quente depois por publish_prompt)
+    write_artifact(client_dir, p_hash, system_prompt, skills)
+
+    # Salva config.json (metadados do bot — lido também pelo runtime multi-tenant)
     config = {
         "user_id":    user_id,
         "plano":      plano,
@@ -92,18 +184,128 @@ def generate_bot(profile: dict, skills: List[str], system_prompt: str) -> dict:
         "groq_model": groq_model,
         "db_path":    db_path,
         "telegram_bot_username": profile.get("telegram_bot_username", ""),
+        "bot_path":    bot_path,
+        "prompt_hash": p_hash,
+        "build_fingerprint": fingerprint,
     }
     config_path = os.path.join(client_dir, "config.json")
     with open(config_path, "w", encoding="utf-8") as f:
         json.dump(config, f, ensure_ascii=False, indent=2)
 
-    # Hash do prompt para detectar mudanças futuras
-    prompt_hash = hashlib.md5(system_prompt.encode()).hexdigest()
-
     return {
         "bot_path":    bot_path,
         "config_path": config_path,
-        "prompt_hash": prompt_hash,
+        "prompt_hash": p_hash,
+        "build_fingerprint": fingerprint,
         "user_id":     user_id,
         "client_dir":  client_dir,
     }
+
+
+def publish_prompt(user_id: str, skills: List[str], system_prompt: str) -> dict:
+    """
+    Troca só prompt e skills de um bot já gerado: grava prompt.json (o bot em execução
+    aplica na próxima mensagem) e atualiza o config.json. Mesmo retorno de generate_bot.
+    """
+    client_dir  = os.path.join(CLIENTS_DIR, user_id)
+    config_path = os.path.join(client_dir, "config.json")
+    p_hash      = prompt_hash(system_prompt, skills)
+    write_artifact(client_dir, p_hash, system_prompt, skills)
+
+    with open(config_path, encoding="utf-8") as f:
+        config = json.load(f)
+    config["prompt_hash"] = p_hash
+    config["skills"] = skills
+    with open(config_path, "w", encoding="utf-8") as f:
+        json.dump(config, f, ensure_ascii=False, indent=2)
+
+    return {
+        "bot_path":    os.path.join(client_dir, "bot.py"),
+        "config_path": config_path,
+        "prompt_hash": p_hash,
+        "build_fingerprint": config.get("build_fingerprint"),
+        "user_id":     user_id,
+        "client_dir":  client_dir,
+    }
+
+
+def regenerate_bots(profiles: List[dict]) -> dict:
+    """
+    Modo em lote: renderiza o bot.py de cada perfil (template compilado uma vez para todos),
+    grava só os que mudaram e atualiza o build_fingerprint do config.json. prompt.json não é
+    tocado. Retorna contagens, tempo e os user_ids cujo bot.py mudou.
+    """
+    t0 = time.perf_counter()
+    changed, unchanged, failed = [], 0, {}
+    for profile in profiles:
+        user_id = profile["user_id"]
+        client_dir  = os.path.join(CLIENTS_DIR, user_id)
+        bot_path    = os.path.join(client_dir, "bot.py")
+        config_path = os.path.join(client_dir, "config.json")
+        try:
+            with open(config_path, encoding="utf-8") as f:
+                config = json.load(f)
+            bot_code = render_bot(profile)
+            try:
+                with open(bot_path, encoding="utf-8") as f:
+                    current = f.read()
+            except OSError:
+                current = None
+            if bot_code != current:
+                with open(bot_path, "w", encoding="utf-8") as f:
+                    f.write(bot_code)
+                changed.append(user_id)
+            else:
+                unchanged += 1
+            # config.json depois do bot.py (build_cache trata bot.py mais novo como incompleto)
+            config["build_fingerprint"] = build_fingerprint(profile)
+            with open(config_path, "w", encoding="utf-8") as f:
+                json.dump(config, f, ensure_ascii=False, indent=2)
+        except (OSError, ValueError, KeyError) as e:
+            failed[user_id] = str(e)
+    return {"renderizados": len(profiles) - len(failed), "alterados": changed, "inalterados": unchanged,
+            "falhas": failed, "segundos": round(time.perf_counter() - t0, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regenera o bot.py dos clientes (correção de template).")
+    parser.add_argument("--all", action="store_true", help="todos os bots com status 'active'")
+    parser.add_argument("--user", action="append", default=[], help="user_id específico (repetível)")
+    parser.add_argument("--restart", action="store_true",
+                        help="reinicia os bots alterados (no modo multi-tenant o runtime já recarrega)")
+    args = parser.parse_args()
+    logging.basicConfig(format="%(asctime)s | %(levelname)s | %(name)s | %(message)s", level=logging.INFO)
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    from bot_factory import db_pool
+    from bot_factory.db_factory import DB_PATH, upsert_bot_record
+    from bot_factory.profile_loader import load_client_profile
+    from bot_factory.deployer import deploy_bot, is_running, _multitenant
+
+    user_ids = list(args.user)
+    if args.all:
+        user_ids += [r["user_id"] for r in db_pool.fetchall(
+            "SELECT user_id FROM bots_gerados WHERE status = 'active'", path=DB_PATH)]
+    if not user_ids:
+        parser.error("informe --all ou --user")
+
+    summary = regenerate_bots([load_client_profile(uid) for uid in dict.fromkeys(user_ids)])
+    logger.info(f"[Generator] {summary['renderizados']} renderizados em {summary['segundos']}s — "
+                f"{len(summary['alterados'])} alterados, {summary['inalterados']} inalterados, "
+                f"{len(summary['falhas'])} falhas")
+    for uid, err in summary["falhas"].items():
+        logger.error(f"[Generator] {uid}: {err}")
+
+    if args.restart and not _multitenant():
+        for uid in summary["alterados"]:
+            if is_running(uid):
+                pid = deploy_bot(os.path.join(CLIENTS_DIR, uid, "bot.py"), uid)
+                if pid:
+                    upsert_bot_record(uid, pid=pid, data_ultimo_start=time.strftime("%Y-%m-%d %H:%M:%S"))
+                logger.info(f"[Generator] {uid} reiniciado — PID {pid}")
+    return 1 if summary["falhas"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""
+history_browser.py — Navegação paginada e busca no `historico` para a aba Conversas do dashboard.
+
+A aba carregava o historico inteiro (ou a conversa inteira de cada cliente) e desenhava todas
+as mensagens; um cliente com 50k mensagens travava a página. Aqui tudo é por página:
+
+- page(user_id, cursor) — paginação keyset por (timestamp, id) no índice idx_historico_user_ts:
+  cada página é um SEARCH de PAGE_SIZE linhas, custo constante em qualquer profundidade (sem
+  OFFSET, que relê tudo o que pula). O cursor é (timestamp, id) da mensagem mais antiga exibida.
+- search(texto, user_id, cursor) — busca por palavras no conteúdo. Com o índice FTS5
+  (historico_fts, opcional: HISTORICO_FTS=1 ou ensure_search_index) é um MATCH paginado por
+  rowid; sem ele, cai para LIKE restrito à conversa de um cliente.
+
+O índice FTS é externo ao historico (content='historico'): guarda só os tokens, mantido por
+triggers no INSERT/DELETE/UPDATE. Fica fora das migrações porque custa espaço e um pouco em
+cada gravação do history_writer — liga-se por ambiente.
+"""
+import os
+import logging
+import sqlite3
+from typing import List, Optional, Tuple
+
+from bot_factory import db_pool
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 50
+SEARCH_ENABLED = os.getenv("HISTORICO_FTS", "0") == "1"
+
+Cursor = Tuple[str, int]  # (timestamp, id) da mensagem mais antiga já exibida
+_MAX_ID = 2 ** 63 - 1
+
+_FTS_SQL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS historico_fts USING fts5(
+           content, content='historico', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+       )""",
+    """CREATE TRIGGER IF NOT EXISTS trg_historico_fts_insert AFTER INSERT ON historico BEGIN
+           INSERT INTO historico_fts (rowid, content) VALUES (NEW.id, NEW.content);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_historico_fts_delete AFTER DELETE ON historico BEGIN
+           INSERT INTO historico_fts (historico_fts, rowid, content) VALUES ('delete', OLD.id, OLD.content);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_historico_fts_update AFTER UPDATE OF content ON historico BEGIN
+           INSERT INTO historico_fts (historico_fts, rowid, content) VALUES ('delete', OLD.id, OLD.content);
+           INSERT INTO historico_fts (rowid, content) VALUES (NEW.id, NEW.content);
+       END""",
+    "INSERT INTO historico_fts (historico_fts) VALUES ('rebuild')",
+]
+
+
+def _row(r) -> dict:
+    return {"id": r[0], "user_id": r[1], "role": r[2], "content": r[3], "timestamp": r[4]}
+
+
+def page(user_id: str, cursor: Optional[Cursor] = None, limit: int = PAGE_SIZE,
+         path: Optional[str] = None) -> Tuple[List[dict], Optional[Cursor]]:
+    """
+    Uma página da conversa, da mais recente para trás. Retorna (mensagens em ordem
+    cronológica, cursor da página anterior ou None se esta é a primeira da conversa).
+    """
+    if cursor is None:
+        rows = db_pool.fetchall(
+            "SELECT id, user_id, role, content, timestamp FROM historico WHERE user_id = ? "
+            "ORDER BY timestamp DESC, id DESC LIMIT ?", (user_id, limit + 1), path=path)
+    else:
+        rows = db_pool.fetchall(
+            "SELECT id, user_id, role, content, timestamp FROM historico "
+            "WHERE user_id = ? AND (timestamp, id) < (?, ?) "
+            "ORDER BY timestamp DESC, id DESC LIMIT ?", (user_id, cursor[0], cursor[1], limit + 1), path=path)
+    older = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        older = (rows[-1][4], rows[-1][0])
+    return [_row(r) for r in reversed(rows)], older
+
+
+def search_available(path: Optional[str] = None) -> bool:
+    row = db_pool.fetchone("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'historico_fts'", path=path)
+    return row is not None
+
+
+def ensure_search_index(path: Optional[str] = None) -> bool:
+    """Cria historico_fts + triggers e indexa o que já existe (uma vez). False se o SQLite não tem FTS5."""
+    if search_available(path):
+        return True
+    try:
+        with db_pool.transaction(path) as cur:
+            cur.execute("BEGIN")  # DDL + rebuild juntos: sem índice pela metade se algo falhar
+            for stmt in _FTS_SQL:
+                cur.execute(stmt)
+    except sqlite3.OperationalError as e:
+        logger.warning(f"[Historico] Busca por texto indisponível: {e}")
+        return False
+    logger.info("[Historico] Índice de busca (historico_fts) criado")
+    return True
+
+
+def _fts_query(text: str) -> str:
+    """Cada palavra vira um termo entre aspas (sem operadores FTS vindos do usuário); a última casa prefixo."""
+    terms = ['"%s"' % t.replace('"', '""') for t in text.split()]
+    if terms:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search(text: str, user_id: Optional[str] = None, cursor: Optional[int] = None, limit: int = PAGE_SIZE,
+           path: Optional[str] = None) -> Tuple[List[dict], Optional[int]]:
+    """
+    Mensagens que contêm as palavras de `text`, mais recentes primeiro (por id). Retorna
+    (mensagens, cursor para a próxima página ou None). Sem o índice FTS exige `user_id`.
+    """
+    if not text.strip():
+        return [], None
+    before = cursor if cursor is not None else _MAX_ID
+    if search_available(path):
+        rows = db_pool.fetchall(
+            "SELECT h.id, h.user_id, h.role, h.content, h.timestamp FROM historico_fts f "
+            "JOIN historico h ON h.id = f.rowid "
+            "WHERE historico_fts MATCH ? AND f.rowid < ? AND (? IS NULL OR h.user_id = ?) "
+            "ORDER BY f.rowid DESC LIMIT ?",
+            (_fts_query(text), before, user_id, user_id, limit + 1), path=path)
+    elif user_id is not None:
+        like = "%" + text.strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        rows = db_pool.fetchall(
+            "SELECT id, user_id, role, content, timestamp FROM historico "
+            "WHERE user_id = ? AND content LIKE ? ESCAPE '\\' AND id < ? "
+            "ORDER BY id DESC LIMIT ?", (user_id, like, before, limit + 1), path=path)
+    else:
+        return [], None
+    more = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        more = rows[-1][0]
+    return [_row(r) for r in rows], more
@@ -0,0 +1,138 @@
+"""
+history_writer.py — Fila assíncrona write-behind para persistir o `historico`.
+
+Em vez de um INSERT + commit bloqueante por mensagem no event loop, as linhas entram
+numa asyncio.Queue limitada e uma task de fundo grava em lote (executemany numa única
+transação) a cada FLUSH_INTERVAL_MS ou quando MAX_BATCH linhas se acumulam.
+
+- Memória limitada: a fila tem no máximo MAX_PENDING linhas.
+- Backpressure: com a fila cheia, `await writer.write(...)` espera o próximo flush.
+- Shutdown: `await writer.stop()` drena e grava tudo o que estiver pendente.
+- Com um `storage` (bot_factory/storage.py) o lote vai em carga em lote (INSERT multi-VALUES
+  no SQLite, COPY no PostgreSQL); sem ele, executemany no db_pool numa thread.
+
+Usado por main.py (Sofia) e pelos bots gerados em bot_factory/templates/*.jinja.
+"""
+import os
+import asyncio
+import logging
+from datetime import datetime
+from typing import Optional
+
+from bot_factory import db_pool
+from bot_factory.storage import Storage
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL_MS = int(os.getenv("HISTORY_FLUSH_MS", "250"))
+MAX_BATCH         = int(os.getenv("HISTORY_MAX_BATCH", "200"))
+MAX_PENDING       = int(os.getenv("HISTORY_MAX_PENDING", "10000"))
+
+INSERT_SQL = "INSERT INTO historico (user_id, role, content, timestamp) VALUES (?, ?, ?, ?)"
+COLUMNS    = ("user_id", "role", "content", "timestamp")
+
+
+class HistoryWriter:
+    """Write-behind de mensagens do histórico com flush por tempo ou tamanho do lote."""
+
+    def __init__(self, db_path: Optional[str] = None,
+                 flush_interval_ms: int = FLUSH_INTERVAL_MS,
+                 max_batch: int = MAX_BATCH,
+                 max_pending: int = MAX_PENDING,
+                 storage: Optional[Storage] = None):
+        self.db_path = db_path
+        self.storage = storage
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"enfileiradas": 0, "gravadas": 0, "lotes": 0, "falhas": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._task = asyncio.create_task(self._run(), name="history-writer")
+        logger.info(f"[HistoryWriter] Iniciado (flush={int(self.flush_interval * 1000)}ms, "
+                    f"lote={self.max_batch}, fila={self.max_pending}).")
+
+    async def write(self, user_id: str, role: str, content: str, timestamp: Optional[str] = None):
+        """Enfileira uma mensagem. Se a fila estiver cheia, aguarda (backpressure)."""
+        row = (user_id, role, content, timestamp or datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        if not self.running:
+            # Sem task de fundo (ex.: antes do start) — grava direto para não perder a linha
+            await self._write_batch([row])
+            return
+        await self._queue.put(row)
+        self.stats["enfileiradas"] += 1
+
+    async def stop(self):
+        """Encerra a task de fundo garantindo o flush de todas as linhas pendentes."""
+        if not self._task:
+            return
+        await self._queue.put(None)  # sentinela
+        try:
+            await self._task
+        finally:
+            self._task = None
+        logger.info(f"[HistoryWriter] Encerrado — {self.stats['gravadas']} mensagens gravadas "
+                    f"em {self.stats['lotes']} lotes.")
+
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    # ── Internos ─────────────────────────────────────────────────
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+        # Drena o que sobrou na fila após a sentinela
+        rest = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not None:
+                rest.append(item)
+        for i in range(0, len(rest), self.max_batch):
+            await self._flush(rest[i:i + self.max_batch])
+
+    async def _flush(self, batch: list):
+        try:
+            await self._write_batch(batch)
+            self.stats["gravadas"] += len(batch)
+            self.stats["lotes"] += 1
+        except Exception as e:
+            self.stats["falhas"] += len(batch)
+            logger.error(f"[HistoryWriter] Erro ao gravar lote de {len(batch)} mensagens: {e}")
+
+    async def _write_batch(self, batch: list):
+        if self.storage is not None:
+            await self.storage.insert_many("historico", COLUMNS, batch)
+        else:
+            await asyncio.to_thread(self._flush_sync, batch)
+
+    def _flush_sync(self, batch: list):
+        db_pool.executemany(INSERT_SQL, batch, path=self.db_path)
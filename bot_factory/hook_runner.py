@@ -0,0 +1,172 @@
+"""
+hook_runner.py — Execução concorrente dos hooks de skill com dependências e orçamento de tempo.
+
+Cada hook declara de quais outros depende (ex.: proposals precisa do `qualified_plan`
+do lead_qualify). Hooks independentes rodam em paralelo, cada um numa thread
+(`asyncio.to_thread`) — chamadas bloqueantes (Stripe, DB) não travam o event loop.
+
+- Timeout por hook: se estourar, o resultado é descartado (None) e o turno segue. O timeout
+  efetivo nunca passa do que resta do teto do turno.
+- Teto do turno (budget): nenhum hook atrasa a resposta além dele. Cadeias de dependência
+  cuja soma de timeouts passa do teto geram um aviso na criação do runner.
+- Se uma dependência falhar, o dependente roda mesmo assim com None. Se ela estourar o
+  tempo, o dependente é pulado: a thread dela ainda está rodando e pode estar mexendo no
+  mesmo estado (ex.: o LeadState que proposals lê).
+- Latência por hook (média/máx/última), timeouts, erros e pulos ficam em `stats()`.
+
+Obs.: uma thread não pode ser interrompida — o trabalho de um hook que estourou o tempo
+termina em segundo plano, apenas o seu resultado é ignorado neste turno.
+"""
+import os
+import time
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT_MS = int(os.getenv("SKILL_HOOK_TIMEOUT_MS", "2000"))
+TURN_BUDGET_MS     = int(os.getenv("SKILL_HOOK_BUDGET_MS", "4000"))
+
+
+@dataclass
+class Hook:
+    """`fn(ctx, deps)` → resultado; `deps` traz os resultados dos hooks em `requires`."""
+    name: str
+    fn: Callable[[dict, Dict[str, Any]], Any]
+    requires: Tuple[str, ...] = ()
+    timeout_ms: int = DEFAULT_TIMEOUT_MS
+
+
+@dataclass
+class _HookStats:
+    chamadas: int = 0
+    timeouts: int = 0
+    erros: int = 0
+    pulados: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    ultimo_ms: Optional[float] = None
+
+    def record(self, ms: float):
+        self.chamadas += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.ultimo_ms = ms
+
+
+class HookRunner:
+    """Executa um conjunto fixo de hooks respeitando dependências, timeouts e o teto do turno."""
+
+    def __init__(self, hooks: List[Hook], budget_ms: int = TURN_BUDGET_MS):
+        names = {h.name for h in hooks}
+        for h in hooks:
+            unknown = [r for r in h.requires if r not in names]
+            if unknown:
+                raise ValueError(f"Hook '{h.name}' depende de hooks inexistentes: {unknown}")
+        self.hooks = {h.name: h for h in hooks}
+        self._order = self._toposort(hooks)
+        self.budget = budget_ms / 1000
+        chain: Dict[str, int] = {}
+        for name in self._order:
+            hook = self.hooks[name]
+            chain[name] = hook.timeout_ms + max((chain[r] for r in hook.requires), default=0)
+            if chain[name] > budget_ms:
+                logger.warning(f"[HookRunner] Timeouts da cadeia até '{name}' somam {chain[name]}ms, "
+                               f"acima do teto de {budget_ms}ms — o teto corta o fim da cadeia")
+        self._stats: Dict[str, _HookStats] = {h.name: _HookStats() for h in hooks}
+        self._turnos = 0
+        self._turnos_no_teto = 0
+
+    async def run(self, ctx: dict) -> Dict[str, Any]:
+        """Roda todos os hooks para o turno; retorna {nome: resultado ou None}."""
+        self._turnos += 1
+        results: Dict[str, Any] = {}
+        timed_out: set = set()
+        deadline = asyncio.get_running_loop().time() + self.budget
+        tasks: Dict[str, asyncio.Task] = {}
+        for name in self._order:
+            hook = self.hooks[name]
+            deps = [tasks[r] for r in hook.requires]
+            tasks[name] = asyncio.create_task(self._run_one(hook, ctx, deps, results, timed_out, deadline),
+                                              name=f"hook-{name}")
+
+        done, pending = await asyncio.wait(tasks.values(), timeout=self.budget)
+        if pending:
+            self._turnos_no_teto += 1
+            for t in pending:
+                t.cancel()
+            late = [n for n, t in tasks.items() if t in pending]
+            for n in late:
+                self._stats[n].timeouts += 1
+            logger.warning(f"[HookRunner] Teto de {int(self.budget * 1000)}ms atingido — sem resultado de {late}")
+        return {name: results.get(name) for name in self.hooks}
+
+    def stats(self) -> dict:
+        out = {"turnos": self._turnos, "turnos_no_teto": self._turnos_no_teto,
+               "teto_ms": int(self.budget * 1000), "hooks": {}}
+        for name, s in self._stats.items():
+            out["hooks"][name] = {
+                "chamadas": s.chamadas,
+                "timeouts": s.timeouts,
+                "erros": s.erros,
+                "pulados": s.pulados,
+                "medio_ms": round(s.total_ms / s.chamadas, 1) if s.chamadas else None,
+                "max_ms": round(s.max_ms, 1),
+                "ultimo_ms": round(s.ultimo_ms, 1) if s.ultimo_ms is not None else None,
+                "timeout_ms": self.hooks[name].timeout_ms,
+            }
+        return out
+
+    # ── Internos ─────────────────────────────────────────────────
+    async def _run_one(self, hook: Hook, ctx: dict, deps: List[asyncio.Task], results: Dict[str, Any],
+                       timed_out: set, deadline: float):
+        if deps:
+            await asyncio.wait(deps)
+        stats = self._stats[hook.name]
+        late = [r for r in hook.requires if r in timed_out]
+        if late:
+            # A dependência segue rodando na thread dela — não roda em cima do mesmo estado
+            timed_out.add(hook.name)
+            stats.pulados += 1
+            logger.warning(f"[HookRunner] Hook '{hook.name}' pulado — dependência estourou o tempo: {late}")
+            return
+        dep_results = {r: results.get(r) for r in hook.requires}
+        timeout = min(hook.timeout_ms / 1000, deadline - asyncio.get_running_loop().time())
+        t0 = time.perf_counter()
+        try:
+            results[hook.name] = await asyncio.wait_for(
+                asyncio.to_thread(hook.fn, ctx, dep_results), max(timeout, 0)
+            )
+        except asyncio.TimeoutError:
+            timed_out.add(hook.name)
+            stats.timeouts += 1
+            logger.warning(f"[HookRunner] Hook '{hook.name}' excedeu {int(timeout * 1000)}ms — ignorado neste turno")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            stats.erros += 1
+            logger.error(f"[HookRunner] Erro no hook '{hook.name}': {e}")
+        finally:
+            stats.record((time.perf_counter() - t0) * 1000)
+
+    @staticmethod
+    def _toposort(hooks: List[Hook]) -> List[str]:
+        by_name = {h.name: h for h in hooks}
+        order, state = [], {}
+
+        def visit(name: str):
+            if state.get(name) == "ok":
+                return
+            if state.get(name) == "visitando":
+                raise ValueError(f"Dependência circular entre hooks envolvendo '{name}'")
+            state[name] = "visitando"
+            for dep in by_name[name].requires:
+                visit(dep)
+            state[name] = "ok"
+            order.append(name)
+
+        for h in hooks:
+            visit(h.name)
+        return order
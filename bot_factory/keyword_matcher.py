@@ -0,0 +1,98 @@
+"""
+keyword_matcher.py — Detecção de palavras-chave das skills em uma única passada.
+
+Substitui o padrão repetido nas skills (5 `re.sub` aninhados para tirar acentos + laços
+de `kw in texto` por lista, refeitos a cada turno sobre o histórico re-concatenado):
+
+- `normalize()` faz lower + remoção de acentos com uma tabela de tradução (str.translate).
+- `KeywordMatcher` compila TODOS os grupos de palavras-chave de uma skill numa única regex.
+  Cada posição do texto é testada com lookahead `(?=(kw1|kw2|...))`, alternativas da maior
+  para a menor — a regex devolve a maior palavra que começa ali, e as menores que também
+  casam nessa posição são prefixos dela, então são pré-computadas. Resultado: todas as
+  ocorrências (inclusive sobrepostas) de todos os grupos, como o `in` fazia.
+- `scan()` guarda o resultado por texto (LRU): mensagens do histórico, que se repetem
+  turno após turno, não são reprocessadas.
+
+Semântica de "substring" preservada (sem fronteira de palavra), igual ao `kw in texto` original.
+"""
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Optional, Tuple
+
+_ACCENTS = str.maketrans(
+    "áàãâäéèêëíìîïóòõôöúùûüç",
+    "aaaaaeeeeiiiiooooouuuuc",
+)
+
+SCAN_CACHE_SIZE = 8192
+
+Hit = Tuple[str, str]  # (grupo, categoria)
+
+
+def normalize(text: str) -> str:
+    """lower + sem acentos (á→a, ç→c ...)."""
+    return text.lower().translate(_ACCENTS)
+
+
+class KeywordMatcher:
+    """
+    Matcher multi-padrão para grupos de palavras-chave:
+
+        KeywordMatcher({"niche": {"restaurante": ["restaur", "bar"], ...},
+                        "objection": {"preco": ["caro", ...], ...}})
+
+    `scan(texto)` → frozenset de (grupo, categoria) encontrados;
+    `first(hits, grupo)` → primeira categoria do grupo (na ordem declarada) presente em hits.
+    """
+
+    def __init__(self, groups: Mapping[str, Mapping[str, Iterable[str]]], cache_size: int = SCAN_CACHE_SIZE):
+        self._order: Dict[str, List[str]] = {}
+        owners: Dict[str, set] = {}
+        for group, categories in groups.items():
+            self._order[group] = list(categories)
+            for category, keywords in categories.items():
+                for kw in keywords:
+                    owners.setdefault(normalize(kw), set()).add((group, category))
+
+        # Cada palavra também "carrega" as categorias das palavras que são seu prefixo
+        self._hits_for: Dict[str, FrozenSet[Hit]] = {}
+        for kw in owners:
+            hits = set()
+            for other, cats in owners.items():
+                if kw.startswith(other):
+                    hits |= cats
+            self._hits_for[kw] = frozenset(hits)
+
+        alternatives = sorted(owners, key=len, reverse=True)
+        self._regex = re.compile("(?=(" + "|".join(map(re.escape, alternatives)) + "))") if alternatives else None
+        self.scan = lru_cache(maxsize=cache_size)(self._scan)
+
+    def _scan(self, text: str) -> FrozenSet[Hit]:
+        if not text or self._regex is None:
+            return frozenset()
+        hits_for = self._hits_for
+        found = set()
+        for kw in set(self._regex.findall(normalize(text))):
+            found |= hits_for[kw]
+        return frozenset(found)
+
+    def scan_many(self, texts: Iterable[str]) -> FrozenSet[Hit]:
+        """União dos hits de vários textos (cada um vem do cache quando já visto)."""
+        out: FrozenSet[Hit] = frozenset()
+        for t in texts:
+            out = out | self.scan(t)
+        return out
+
+    def first(self, hits: FrozenSet[Hit], group: str) -> Optional[str]:
+        for category in self._order[group]:
+            if (group, category) in hits:
+                return category
+        return None
+
+    def has(self, hits: FrozenSet[Hit], group: str, category: Optional[str] = None) -> bool:
+        if category is not None:
+            return (group, category) in hits
+        return any(g == group for g, _ in hits)
+
+    def cache_info(self):
+        return self.scan.cache_info()
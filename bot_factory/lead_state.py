@@ -0,0 +1,159 @@
+"""
+lead_state.py — Estado incremental de qualificação por lead (nicho, volume, dor, plataforma,
+plano, e-mail, nome), atualizado só com o texto novo de cada turno.
+
+Antes, lead_qualify e proposals re-extraíam tudo a cada mensagem concatenando as últimas
+6–10 mensagens do histórico — trabalho repetido e fatos que "sumiam" ao sair da janela.
+Agora cada skill observa apenas a mensagem nova e grava o que encontrou neste objeto:
+
+- Memória: LRU por usuário (MAX_USERS), com lock para os hooks que rodam em threads.
+- Checkpoint: quando algum campo muda, o estado vai em JSON para a tabela `lead_states`
+  (migração v6), fora de `assinaturas` — conversar não cria linha de lead no funil; ao
+  voltar à memória, é recarregado de lá. clear() apaga os dois (/start).
+- Lead sem estado salvo (ex.: conversa anterior ao deploy): cada skill faz uma única
+  varredura do histórico recebido (`needs_seed` / `mark_seeded`) e segue incremental.
+
+A lógica de extração continua nas skills; este módulo só guarda e persiste o estado.
+"""
+import os
+import json
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field, fields
+from datetime import datetime
+from typing import List, Optional
+
+from bot_factory import db_pool
+
+logger = logging.getLogger(__name__)
+
+MAX_USERS = int(os.getenv("LEAD_STATE_MAX_USERS", "20000"))
+
+
+@dataclass
+class LeadState:
+    user_id: str
+    niche: Optional[str] = None
+    volume: Optional[int] = None            # número informado pelo cliente
+    volume_estimado: Optional[int] = None   # estimativa por palavras ("poucos", "dezenas"...)
+    pain: Optional[str] = None
+    platform: Optional[str] = None
+    plan: Optional[str] = None              # plano citado na conversa (proposals)
+    email: Optional[str] = None
+    name: Optional[str] = None
+    mensagens: int = 0
+    seeded: List[str] = field(default_factory=list)  # skills que já varreram o histórico antigo
+    dirty: bool = field(default=False, repr=False, compare=False)
+
+    def set(self, **values):
+        """Atualiza os campos não-None; marca o estado para checkpoint se algo mudou."""
+        for key, value in values.items():
+            if value is not None and getattr(self, key) != value:
+                setattr(self, key, value)
+                self.dirty = True
+
+    @property
+    def volume_atual(self) -> Optional[int]:
+        return self.volume if self.volume is not None else self.volume_estimado
+
+    def needs_seed(self, skill: str) -> bool:
+        return skill not in self.seeded
+
+    def mark_seeded(self, skill: str):
+        if skill not in self.seeded:
+            self.seeded.append(skill)
+            self.dirty = True
+
+    def to_json(self) -> str:
+        data = asdict(self)
+        data.pop("dirty")
+        data.pop("user_id")
+        return json.dumps(data, ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, user_id: str, raw: str) -> "LeadState":
+        data = json.loads(raw or "{}")
+        known = {f.name for f in fields(cls)} - {"user_id", "dirty"}
+        return cls(user_id=user_id, **{k: v for k, v in data.items() if k in known})
+
+
+class LeadStateStore:
+    """Cache LRU de LeadState com checkpoint em `lead_states`."""
+
+    def __init__(self, db_path: Optional[str] = None, max_users: int = MAX_USERS):
+        self.db_path = db_path
+        self.max_users = max_users
+        self._data: "OrderedDict[str, LeadState]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._stats = {"hits": 0, "carregados_db": 0, "novos": 0, "checkpoints": 0}
+
+    def get(self, user_id: str) -> LeadState:
+        with self._lock:
+            state = self._data.get(user_id)
+            if state is not None:
+                self._data.move_to_end(user_id)
+                self._stats["hits"] += 1
+                return state
+            state = self._load(user_id)
+            self._data[user_id] = state
+            while len(self._data) > self.max_users:
+                self._data.popitem(last=False)
+            return state
+
+    def checkpoint(self, state: LeadState):
+        """Persiste o estado se houve mudança desde o último checkpoint."""
+        with self._lock:
+            if not state.dirty:
+                return
+            payload = state.to_json()
+            state.dirty = False
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        try:
+            db_pool.execute("""
+                INSERT INTO lead_states (user_id, estado, atualizado_em) VALUES (?, ?, ?)
+                ON CONFLICT(user_id) DO UPDATE SET estado = excluded.estado, atualizado_em = excluded.atualizado_em
+            """, (state.user_id, payload, now), path=self._path())
+            self._stats["checkpoints"] += 1
+        except Exception as e:
+            state.dirty = True  # tenta de novo no próximo turno
+            logger.debug(f"[LeadState] Checkpoint de {state.user_id} falhou: {e}")
+
+    def forget(self, user_id: str):
+        with self._lock:
+            self._data.pop(user_id, None)
+
+    def clear(self, user_id: str):
+        """Recomeça a qualificação: tira da memória e apaga o estado salvo (síncrono — use em thread)."""
+        self.forget(user_id)
+        try:
+            db_pool.execute("DELETE FROM lead_states WHERE user_id=?", (user_id,), path=self._path())
+        except Exception as e:
+            logger.debug(f"[LeadState] Falha ao apagar estado de {user_id}: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "usuarios": len(self._data), "max_usuarios": self.max_users}
+
+    def _path(self) -> Optional[str]:
+        # Resolvido a cada uso: o .env pode ser carregado depois do import deste módulo
+        return self.db_path or os.getenv("DB_NAME")
+
+    def _load(self, user_id: str) -> LeadState:
+        try:
+            row = db_pool.fetchone("SELECT estado FROM lead_states WHERE user_id=?",
+                                   (user_id,), path=self._path())
+        except Exception:
+            row = None  # tabela/coluna ainda não existe — estado só em memória
+        if row and row[0]:
+            try:
+                self._stats["carregados_db"] += 1
+                return LeadState.from_json(user_id, row[0])
+            except Exception as e:
+                logger.warning(f"[LeadState] Estado inválido para {user_id}, recomeçando: {e}")
+        self._stats["novos"] += 1
+        return LeadState(user_id=user_id)
+
+
+# Instância compartilhada pelas skills do processo (lead_qualify, proposals)
+lead_states = LeadStateStore()
@@ -2,132 +2,206 @@
 learning.py — Engine de aprendizado: analisa performance dos bots gerados e
 atualiza o score das skills por nicho para builds futuros mais inteligentes.
 
-Executa como tarefa periódica (chamada pelo watcher a cada 24h).
+Executa como tarefa periódica (o watcher dispara a cada 24h com start_learning_cycle(),
+numa thread própria — o loop de eventos não espera o ciclo).
+
+O ciclo é feito em SQL por conjunto, em transações curtas:
+  1. Feedback novo: só as linhas de feedback_bots acima da marca (último id processado,
+     em marcas_processamento) são somadas em feedback_bots_diario (bot × dia), em lotes
+     de FEEDBACK_BATCH ids por transação. O resumo guarda só a janela de 30 dias.
+  2. Uma consulta agrega retenção e escalação por (nicho, skill) sobre os bots ativos
+     antigos (skills_usadas expandido com json_each).
+  3. Um executemany aplica as médias em skills_performance — mesma média acumulada do
+     laço antigo (um uso por bot × skill), combinada de uma vez.
 """
-import sqlite3
 import os
+import time
 import logging
-from datetime import datetime, timedelta
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Optional
+
+from bot_factory import db_pool
 
 logger = logging.getLogger(__name__)
 DB_PATH = os.getenv("DB_NAME", "agencia_autovenda.db")
 
+WINDOW_DAYS    = 30
+FEEDBACK_MARK  = "learning_feedback"
+FEEDBACK_BATCH = int(os.getenv("LEARNING_FEEDBACK_BATCH", "20000"))  # ids por transação
+BATCH_PAUSE    = 0.1  # s entre lotes: o busy handler de outros escritores dorme até 100ms
+
+_AGGREGATE_SQL = """
+    WITH escalacao AS (
+        SELECT bot_user_id, SUM(escalacoes) * 1.0 / MAX(SUM(total), 1) AS taxa
+        FROM feedback_bots_diario
+        WHERE dia >= date('now', ?)
+        GROUP BY bot_user_id
+    ),
+    ativos AS (
+        SELECT DISTINCT user_id FROM assinaturas WHERE status = 'ativo'
+    )
+    SELECT COALESCE(NULLIF(b.nicho, ''), 'servicos') AS nicho,
+           s.value                                   AS skill_name,
+           COUNT(*)                                  AS usos,
+           AVG(CASE WHEN a.user_id IS NULL THEN 0.0 ELSE 1.0 END) AS retencao,
+           AVG(COALESCE(e.taxa, 0.2))                AS escalacao
+    FROM bots_gerados b
+    JOIN json_each(CASE WHEN json_valid(b.skills_usadas) THEN b.skills_usadas ELSE '[]' END) s
+    LEFT JOIN escalacao e ON e.bot_user_id = b.user_id
+    LEFT JOIN ativos a    ON a.user_id = b.user_id
+    WHERE b.status = 'active'
+      AND b.data_deploy <= date('now', ?)
+    GROUP BY 1, 2
+"""
+
+_APPLY_SQL = """
+    INSERT INTO skills_performance
+        (nicho, skill_name, total_usos, taxa_retencao, taxa_escalacao, ultima_atualizacao)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(nicho, skill_name) DO UPDATE SET
+        taxa_retencao = (taxa_retencao * total_usos + excluded.taxa_retencao * excluded.total_usos)
+                        / (total_usos + excluded.total_usos),
+        taxa_escalacao = (taxa_escalacao * total_usos + excluded.taxa_escalacao * excluded.total_usos)
+                         / (total_usos + excluded.total_usos),
+        total_usos = total_usos + excluded.total_usos,
+        ultima_atualizacao = excluded.ultima_atualizacao
+"""
+
 
-def _conn():
-    c = sqlite3.connect(DB_PATH)
-    c.row_factory = sqlite3.Row
-    return c
+def _roll_feedback() -> int:
+    """Soma em feedback_bots_diario o feedback acima da marca. Retorna quantos ids avançou."""
+    window = f"-{WINDOW_DAYS} days"
+    row = db_pool.fetchone("SELECT ultimo_id FROM marcas_processamento WHERE nome = ?",
+                           (FEEDBACK_MARK,), path=DB_PATH)
+    high = db_pool.fetchone("SELECT COALESCE(MAX(id), 0) FROM feedback_bots", path=DB_PATH)[0]
+    if row:
+        start = low = row[0]
+    else:  # primeira vez: tudo abaixo do primeiro id da janela está fora dela
+        first = db_pool.fetchone("SELECT MIN(id) FROM feedback_bots WHERE data >= date('now', ?)",
+                                 (window,), path=DB_PATH)[0]
+        start = 0
+        low = first - 1 if first is not None else high
+    while low < high:
+        upper = min(low + FEEDBACK_BATCH, high)
+        with db_pool.transaction(DB_PATH) as cur:
+            cur.execute("""
+                INSERT INTO feedback_bots_diario (bot_user_id, dia, total, escalacoes)
+                SELECT bot_user_id, substr(data, 1, 10), COUNT(*), SUM(tipo = 'escalacao')
+                FROM feedback_bots
+                WHERE id > ? AND id <= ? AND bot_user_id IS NOT NULL AND data IS NOT NULL
+                  AND data >= date('now', ?)
+                GROUP BY 1, 2
+                ON CONFLICT(bot_user_id, dia) DO UPDATE SET
+                    total = total + excluded.total,
+                    escalacoes = escalacoes + excluded.escalacoes
+            """, (low, upper, window))
+            cur.execute("""
+                INSERT INTO marcas_processamento (nome, ultimo_id, atualizado_em) VALUES (?, ?, ?)
+                ON CONFLICT(nome) DO UPDATE SET ultimo_id = excluded.ultimo_id,
+                                                atualizado_em = excluded.atualizado_em
+            """, (FEEDBACK_MARK, upper, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+        low = upper
+        if low < high:
+            time.sleep(BATCH_PAUSE)
+    db_pool.execute("DELETE FROM feedback_bots_diario WHERE dia < date('now', ?)", (window,), path=DB_PATH)
+    return high - start
 
 
 def run_learning_cycle():
     """
     Ciclo completo de aprendizado:
-    1. Coleta métricas de usage e feedback
-    2. Atualiza scores de skills por nicho
+    1. Soma o feedback novo (acima da marca) no resumo diário
+    2. Agrega retenção/escalação por (nicho, skill) e atualiza os scores de uma vez
     3. Detecta novos nichos e cria templates base
     4. Loga resumo do ciclo
     """
     logger.info("[Learning] Iniciando ciclo de aprendizado...")
-    conn = _conn()
-    cur = conn.cursor()
-
-    # ── 1. Calcula taxa de escalação por bot ─────────────────────
-    cur.execute("""
-        SELECT bot_user_id,
-               COUNT(*) as total,
-               SUM(CASE WHEN tipo = 'escalacao' THEN 1 ELSE 0 END) as escalacoes
-        FROM feedback_bots
-        WHERE data >= date('now', '-30 days')
-        GROUP BY bot_user_id
-    """)
-    escal_data = {r["bot_user_id"]: (r["escalacoes"] / max(r["total"], 1))
-                  for r in cur.fetchall()}
-
-    # ── 2. Calcula taxa de retenção (bots ativos após 30 dias) ────
-    cur.execute("""
-        SELECT user_id, nicho, skills_usadas
-        FROM bots_gerados
-        WHERE status = 'active'
-          AND data_deploy <= date('now', '-30 days')
-    """)
-    active_old = cur.fetchall()
-
-    cur.execute("""
-        SELECT user_id FROM assinaturas WHERE status = 'ativo'
-    """)
-    active_clients = {r["user_id"] for r in cur.fetchall()}
-
-    # ── 3. Atualiza scores por skill/nicho ────────────────────────
-    updated = 0
-    for bot in active_old:
-        uid      = bot["user_id"]
-        nicho    = bot["nicho"] or "servicos"
-        skills   = []
-        try:
-            import json
-            skills = json.loads(bot["skills_usadas"] or "[]")
-        except Exception:
-            pass
-
-        retencao  = 1.0 if uid in active_clients else 0.0
-        escalacao = escal_data.get(uid, 0.2)
-
-        for skill in skills:
-            cur.execute("""
-                INSERT INTO skills_performance
-                    (nicho, skill_name, total_usos, taxa_retencao, taxa_escalacao, ultima_atualizacao)
-                VALUES (?, ?, 1, ?, ?, ?)
-                ON CONFLICT(nicho, skill_name) DO UPDATE SET
-                    taxa_retencao = (taxa_retencao * total_usos + excluded.taxa_retencao) / (total_usos + 1),
-                    taxa_escalacao = (taxa_escalacao * total_usos + excluded.taxa_escalacao) / (total_usos + 1),
-                    total_usos = total_usos + 1,
-                    ultima_atualizacao = excluded.ultima_atualizacao
-            """, (nicho, skill, retencao, escalacao, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
-            updated += 1
-
-    # ── 4. Detecta novos nichos não mapeados ─────────────────────
-    cur.execute("""
-        SELECT DISTINCT nicho FROM bots_gerados
-        WHERE nicho NOT IN (
-            SELECT DISTINCT nicho FROM skills_performance
-        ) AND nicho IS NOT NULL
-    """)
-    new_niches = [r["nicho"] for r in cur.fetchall()]
-    for nicho in new_niches:
-        logger.info(f"[Learning] Novo nicho detectado: '{nicho}' — inicializando com skills genéricas.")
-        _seed_new_niche(nicho, cur)
-
-    conn.commit()
-    conn.close()
-
-    summary = f"Ciclo concluído: {updated} skills atualizadas, {len(new_niches)} novos nichos detectados."
+    t0 = time.perf_counter()
+
+    # ── 1. Feedback novo → resumo por bot/dia ─────────────────────
+    new_feedback = _roll_feedback()
+
+    # ── 2. Retenção e escalação por (nicho, skill) — leitura, sem lock de escrita ──
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    window = f"-{WINDOW_DAYS} days"
+    rows = [(r["nicho"], r["skill_name"], r["usos"], r["retencao"], r["escalacao"], now)
+            for r in db_pool.fetchall(_AGGREGATE_SQL, (window, window), path=DB_PATH)]
+    updated = sum(r[2] for r in rows)
+
+    # ── 3. Aplica os scores e detecta novos nichos não mapeados ───
+    with db_pool.transaction(DB_PATH) as cur:
+        cur.executemany(_APPLY_SQL, rows)
+        cur.execute("""
+            SELECT DISTINCT nicho FROM bots_gerados
+            WHERE nicho NOT IN (
+                SELECT DISTINCT nicho FROM skills_performance
+            ) AND nicho IS NOT NULL
+        """)
+        new_niches = [r["nicho"] for r in cur.fetchall()]
+        for nicho in new_niches:
+            logger.info(f"[Learning] Novo nicho detectado: '{nicho}' — inicializando com skills genéricas.")
+            _seed_new_niche(nicho, cur)
+
+    # Scores mudaram: o skill_selector volta a consultar o banco no próximo build
+    from bot_factory.skill_ranking import invalidate
+    invalidate()
+
+    summary = (f"Ciclo concluído: {updated} skills atualizadas, {len(new_niches)} novos nichos detectados "
+               f"({new_feedback} feedbacks novos, {time.perf_counter() - t0:.1f}s).")
     logger.info(f"[Learning] {summary}")
     return summary
 
 
+_worker: Optional[ThreadPoolExecutor] = None
+_current: Optional[Future] = None
+_worker_lock = threading.Lock()
+
+
+def start_learning_cycle() -> Optional[Future]:
+    """
+    Dispara run_learning_cycle numa thread própria e devolve o Future (resultado = resumo).
+    None se o ciclo anterior ainda estiver rodando.
+    """
+    global _worker, _current
+    with _worker_lock:
+        if _current is not None and not _current.done():
+            return None
+        if _worker is None:
+            _worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="learning")
+        _current = _worker.submit(run_learning_cycle)
+        return _current
+
+
+def shutdown(wait: bool = True):
+    """Encerra a thread do aprendizado (espera o ciclo em andamento com wait=True)."""
+    global _worker
+    with _worker_lock:
+        worker, _worker = _worker, None
+    if worker is not None:
+        worker.shutdown(wait=wait)
+
+
 def _seed_new_niche(nicho: str, cur):
     """Insere scores neutros para um nicho novo com as skills base."""
     base_skills = ["faq_responder", "horario_funcionamento", "captura_lead", "transbordo_humano"]
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    for skill in base_skills:
-        cur.execute("""
-            INSERT OR IGNORE INTO skills_performance
-                (nicho, skill_name, total_usos, media_satisfacao, taxa_retencao, taxa_escalacao, ultima_atualizacao)
-            VALUES (?, ?, 0, 5.0, 0.5, 0.2, ?)
-        """, (nicho, skill, now))
+    cur.executemany("""
+        INSERT OR IGNORE INTO skills_performance
+            (nicho, skill_name, total_usos, media_satisfacao, taxa_retencao, taxa_escalacao, ultima_atualizacao)
+        VALUES (?, ?, 0, 5.0, 0.5, 0.2, ?)
+    """, [(nicho, skill, now) for skill in base_skills])
 
 
 def register_message_count(user_id: str, count: int = 1):
     """Atualiza o total de mensagens de um bot gerado."""
-    conn = _conn()
-    conn.execute("""
+    db_pool.execute("""
         UPDATE bots_gerados
         SET total_mensagens = total_mensagens + ?,
             data_ultima_mensagem = ?
         WHERE user_id = ?
-    """, (count, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), user_id))
-    conn.commit()
-    conn.close()
+    """, (count, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), user_id), path=DB_PATH)
 
 
 def register_escalation(user_id: str, message: str = ""):
@@ -138,12 +212,9 @@ def register_escalation(user_id: str, message: str = ""):
 
 def register_satisfaction(user_id: str, score: float, comment: str = ""):
     """Registra feedback de satisfação (0-10) para o bot do cliente."""
-    conn = _conn()
-    conn.execute("""
+    db_pool.execute("""
         UPDATE bots_gerados SET score = ? WHERE user_id = ?
-    """, (score, user_id))
-    conn.commit()
-    conn.close()
+    """, (score, user_id), path=DB_PATH)
 
     from bot_factory.db_factory import log_feedback
     log_feedback(user_id, "satisfacao", f"score={score} | {comment}")
@@ -0,0 +1,179 @@
+"""
+llm_gateway.py — Gateway assíncrono para o Groq com pool HTTP compartilhado e streaming.
+
+Substitui o padrão `asyncio.to_thread(Groq(...).chat.completions.create)`:
+- AsyncGroq sobre um único httpx.AsyncClient (HTTP/2 quando o pacote `h2` está instalado),
+  reaproveitando conexões entre todos os chats do processo — sem limite do thread pool.
+- `stream()` entrega os tokens à medida que chegam.
+- `stream_reply()` envia a primeira parte assim que o primeiro token chega e vai editando
+  a mensagem do Telegram, com throttle para respeitar o limite de edições por chat.
+
+Usado por main.py (Sofia) e pelos bots gerados em bot_factory/templates/*.jinja.
+"""
+import os
+import time
+import logging
+from typing import AsyncIterator, Optional
+
+import httpx
+from groq import AsyncGroq
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401 — habilita HTTP/2 no httpx
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+MAX_CONNECTIONS    = int(os.getenv("LLM_MAX_CONNECTIONS", "200"))
+MAX_KEEPALIVE      = int(os.getenv("LLM_MAX_KEEPALIVE", "50"))
+REQUEST_TIMEOUT    = float(os.getenv("LLM_TIMEOUT", "60"))
+EDIT_INTERVAL      = float(os.getenv("LLM_STREAM_EDIT_INTERVAL", "1.0"))  # segundos entre edições
+EDIT_MIN_CHARS     = int(os.getenv("LLM_STREAM_EDIT_MIN_CHARS", "40"))    # texto novo mínimo por edição
+TELEGRAM_MAX_CHARS = 4096
+
+
+class LLMGateway:
+    """Cliente Groq assíncrono com modelo padrão; o AsyncGroq (pool HTTP) pode ser compartilhado."""
+
+    def __init__(self, api_key: str, model: str, timeout: float = REQUEST_TIMEOUT,
+                 max_connections: int = MAX_CONNECTIONS, client: Optional[AsyncGroq] = None):
+        self.model = model
+        if client is None:
+            http = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                timeout=timeout,
+                limits=httpx.Limits(max_connections=max_connections,
+                                    max_keepalive_connections=MAX_KEEPALIVE),
+            )
+            client = AsyncGroq(api_key=api_key, http_client=http)
+        self._client = client
+        self._stats = {"requisicoes": 0, "em_andamento": 0, "erros": 0, "ttft_ms_total": 0.0, "ttft_n": 0}
+
+    async def complete(self, messages: list, model: Optional[str] = None, **kwargs) -> str:
+        """Chamada sem streaming — retorna o texto completo."""
+        self._stats["requisicoes"] += 1
+        self._stats["em_andamento"] += 1
+        try:
+            resp = await self._client.chat.completions.create(
+                model=model or self.model, messages=messages, **kwargs
+            )
+            return (resp.choices[0].message.content or "").strip()
+        except Exception:
+            self._stats["erros"] += 1
+            raise
+        finally:
+            self._stats["em_andamento"] -= 1
+
+    async def stream(self, messages: list, model: Optional[str] = None, **kwargs) -> AsyncIterator[str]:
+        """Gera os pedaços de texto conforme o modelo responde."""
+        self._stats["requisicoes"] += 1
+        self._stats["em_andamento"] += 1
+        t0 = time.perf_counter()
+        first = True
+        try:
+            stream = await self._client.chat.completions.create(
+                model=model or self.model, messages=messages, stream=True, **kwargs
+            )
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                if first:
+                    self._stats["ttft_ms_total"] += (time.perf_counter() - t0) * 1000
+                    self._stats["ttft_n"] += 1
+                    first = False
+                yield delta
+        except Exception:
+            self._stats["erros"] += 1
+            raise
+        finally:
+            self._stats["em_andamento"] -= 1
+
+    def stats(self) -> dict:
+        s = dict(self._stats)
+        n = s.pop("ttft_n")
+        total = s.pop("ttft_ms_total")
+        s["ttft_medio_ms"] = round(total / n, 1) if n else None
+        s["http2"] = HTTP2_AVAILABLE
+        return s
+
+    async def aclose(self):
+        """Fecha o pool HTTP — e com ele os gateways da mesma chave (saem do cache de get_gateway)."""
+        for key, gw in list(_gateways.items()):
+            if gw._client is self._client:
+                del _gateways[key]
+        for key, client in list(_clients.items()):
+            if client is self._client:
+                del _clients[key]
+        await self._client.close()
+
+
+_clients: dict = {}   # api_key → AsyncGroq (um pool HTTP por chave)
+_gateways: dict = {}  # (api_key, model) → LLMGateway
+
+
+def get_gateway(api_key: str, model: str) -> LLMGateway:
+    """
+    Gateway compartilhado por (chave de API, modelo), criado na primeira chamada. No runtime
+    multi-tenant cada bot tem seu GROQ_MODEL; gateways da mesma chave dividem o pool HTTP.
+    """
+    gw = _gateways.get((api_key, model))
+    if gw is None:
+        gw = _gateways[(api_key, model)] = LLMGateway(api_key, model, client=_clients.get(api_key))
+        _clients.setdefault(api_key, gw._client)
+    return gw
+
+
+async def stream_reply(message, chunks: AsyncIterator[str], prefix: str = "",
+                       edit_interval: float = EDIT_INTERVAL, min_chars: int = EDIT_MIN_CHARS) -> str:
+    """
+    Responde `message` (telegram.Message) progressivamente com os pedaços de `chunks`.
+    A primeira parte é enviada assim que chega; as seguintes atualizam a mesma mensagem
+    no máximo a cada `edit_interval` segundos. Retorna o texto final (sem espaços nas bordas).
+    Se o modelo não gerar texto, envia só o prefixo (se houver) e o retorna; senão retorna "".
+    """
+    head = f"{prefix}\n\n" if prefix else ""
+    text = ""
+    sent = None
+    shown = ""
+    last_edit = 0.0
+
+    async for piece in chunks:
+        text += piece
+        visible = (head + text.lstrip())[:TELEGRAM_MAX_CHARS]
+        if not visible.strip():
+            continue
+        now = time.monotonic()
+        if sent is None:
+            sent = await message.reply_text(visible)
+            shown, last_edit = visible, now
+        elif now - last_edit >= edit_interval and len(visible) - len(shown) >= min_chars:
+            shown, last_edit = await _safe_edit(sent, visible, shown), now
+
+    final = (head + text.strip()).strip()
+    if not text.strip():
+        if prefix and sent is None:
+            await message.reply_text(prefix[:TELEGRAM_MAX_CHARS])
+        return prefix.strip()
+    if sent is None:
+        await message.reply_text(final[:TELEGRAM_MAX_CHARS])
+    elif final[:TELEGRAM_MAX_CHARS] != shown:
+        await _safe_edit(sent, final[:TELEGRAM_MAX_CHARS], shown)
+    # Respostas maiores que o limite do Telegram seguem em mensagens adicionais
+    for i in range(TELEGRAM_MAX_CHARS, len(final), TELEGRAM_MAX_CHARS):
+        await message.reply_text(final[i:i + TELEGRAM_MAX_CHARS])
+    return final
+
+
+async def _safe_edit(sent, text: str, shown: str) -> str:
+    try:
+        await sent.edit_text(text)
+        return text
+    except Exception as e:
+        # "Message is not modified" / flood control — mantém o que já está na tela
+        logger.debug(f"[LLMGateway] Edição ignorada: {e}")
+        return shown
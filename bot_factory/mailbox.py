@@ -0,0 +1,113 @@
+"""
+mailbox.py — Caixa de entrada por usuário: serializa o processamento de cada chat e
+agrupa mensagens enviadas em rajada num único turno do LLM.
+
+- Cada chave (user_id) tem no máximo UM worker ativo → turnos do mesmo usuário nunca
+  correm em paralelo nem intercalam o histórico.
+- A primeira mensagem de um chat ocioso vai direto para o handler (sem debounce: não soma
+  nada ao tempo até o primeiro token). As que chegam enquanto um turno roda esperam a
+  janela de debounce (DEBOUNCE_MS desde a última) e são entregues juntas no turno
+  seguinte; MAX_WAIT_MS limita a espera total de uma rajada.
+- Usuários diferentes continuam 100% em paralelo.
+
+Políticas de agrupamento (MAILBOX_POLICY):
+  merge  → todas as mensagens pendentes viram um único turno (padrão)
+  serial → uma mensagem por turno, apenas serializado (sem economia de chamadas)
+"""
+import os
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEBOUNCE_MS = int(os.getenv("MAILBOX_DEBOUNCE_MS", "400"))
+MAX_WAIT_MS = int(os.getenv("MAILBOX_MAX_WAIT_MS", "4000"))
+MAX_MERGE   = int(os.getenv("MAILBOX_MAX_MERGE", "10"))
+POLICY      = os.getenv("MAILBOX_POLICY", "merge")
+
+POLICIES = ("merge", "serial")
+
+
+class UserMailbox:
+    """Fila por usuário com debounce; `handler(key, itens)` é chamado uma vez por turno."""
+
+    def __init__(self, handler: Callable[[str, List[Any]], Awaitable[None]],
+                 debounce_ms: int = DEBOUNCE_MS, max_wait_ms: int = MAX_WAIT_MS,
+                 max_merge: int = MAX_MERGE, policy: str = POLICY):
+        if policy not in POLICIES:
+            raise ValueError(f"Política de mailbox inválida: {policy!r} (use {POLICIES})")
+        self.handler = handler
+        self.debounce = debounce_ms / 1000
+        self.max_wait = max_wait_ms / 1000
+        self.max_merge = max_merge if policy == "merge" else 1
+        self.policy = policy
+        self._pending: Dict[str, List[Any]] = {}
+        self._arrived: Dict[str, asyncio.Event] = {}
+        self._workers: Dict[str, asyncio.Task] = {}
+        self._stats = {"recebidas": 0, "turnos": 0, "agrupadas": 0,
+                       "chamadas_llm_economizadas": 0, "erros": 0}
+
+    async def submit(self, key: str, item: Any):
+        """Entrega uma mensagem; retorna imediatamente (o turno roda no worker do usuário)."""
+        self._stats["recebidas"] += 1
+        self._pending.setdefault(key, []).append(item)
+        self._arrived.setdefault(key, asyncio.Event()).set()
+        if key not in self._workers:
+            self._workers[key] = asyncio.create_task(self._worker(key), name=f"mailbox-{key}")
+
+    def stats(self) -> dict:
+        s = dict(self._stats)
+        s["pendentes"] = sum(len(items) for items in self._pending.values())
+        s["usuarios_ativos"] = len(self._workers)
+        s["politica"] = self.policy
+        s["debounce_ms"] = int(self.debounce * 1000)
+        return s
+
+    async def drain(self, timeout: Optional[float] = None):
+        """Aguarda os turnos em andamento/pendentes terminarem (shutdown)."""
+        tasks = list(self._workers.values())
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+
+    # ── Internos ─────────────────────────────────────────────────
+    async def _wait_quiet(self, key: str):
+        """Espera até DEBOUNCE sem mensagens novas (ou MAX_WAIT no total)."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        event = self._arrived[key]
+        while len(self._pending.get(key, ())) < self.max_merge:
+            event.clear()
+            timeout = min(self.debounce, deadline - loop.time())
+            if timeout <= 0:
+                return
+            try:
+                await asyncio.wait_for(event.wait(), timeout)
+            except asyncio.TimeoutError:
+                return
+
+    async def _worker(self, key: str):
+        first = True
+        try:
+            while self._pending.get(key):
+                # Chat ocioso com uma mensagem só: responde já; rajadas esperam a janela
+                burst = not first or len(self._pending[key]) > 1
+                if self.policy == "merge" and self.debounce > 0 and burst:
+                    await self._wait_quiet(key)
+                first = False
+                items = self._pending[key][:self.max_merge]
+                del self._pending[key][:len(items)]
+                self._stats["turnos"] += 1
+                if len(items) > 1:
+                    self._stats["agrupadas"] += len(items)
+                    self._stats["chamadas_llm_economizadas"] += len(items) - 1
+                try:
+                    await self.handler(key, items)
+                except Exception as e:
+                    self._stats["erros"] += 1
+                    logger.error(f"[Mailbox] Erro no turno de {key}: {e}", exc_info=True)
+        finally:
+            # Sem await entre o último `while` e aqui: nenhuma mensagem nova pode ter chegado
+            self._workers.pop(key, None)
+            self._pending.pop(key, None)
+            self._arrived.pop(key, None)
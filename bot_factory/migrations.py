@@ -0,0 +1,393 @@
+"""
+migrations.py — Migrações versionadas do schema compartilhado (índices e ajustes).
+
+As tabelas continuam sendo criadas por main._setup_db() e db_factory.setup_factory_tables();
+este módulo aplica, em ordem e uma única vez, as migrações registradas em MIGRATIONS.
+A versão aplicada fica em `schema_migrations`.
+
+Cada migração declara as tabelas de que depende — e, como "tabela.coluna", as colunas que
+seus triggers e preenchimentos usam: se alguma ainda não existir no banco (ex.: o watcher
+subiu antes do main.py, ou um banco de bench com só parte das colunas), ela é adiada e
+aplicada na próxima chamada.
+
+check_query_plans() roda EXPLAIN QUERY PLAN nas queries quentes e aponta as que
+caíram em SCAN (full table scan) — ver scripts/check_query_plans.py.
+"""
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from typing import List, Optional
+
+from bot_factory import db_pool
+
+logger = logging.getLogger(__name__)
+
+# (versão, nome, tabelas/colunas requeridas ("tabela" ou "tabela.coluna"), SQL)
+MIGRATIONS = [
+    (1, "historico_user_timestamp", ["historico"], """
+        CREATE INDEX IF NOT EXISTS idx_historico_user_ts ON historico (user_id, timestamp);
+    """),
+    (2, "historico_timestamp", ["historico"], """
+        CREATE INDEX IF NOT EXISTS idx_historico_ts ON historico (timestamp);
+    """),
+    (3, "assinaturas_status", ["assinaturas"], """
+        CREATE INDEX IF NOT EXISTS idx_assinaturas_status ON assinaturas (status);
+    """),
+    (4, "bots_gerados_status_deploy", ["bots_gerados"], """
+        CREATE INDEX IF NOT EXISTS idx_bots_status_deploy ON bots_gerados (status, data_deploy);
+    """),
+    (5, "feedback_bots_data", ["feedback_bots"], """
+        CREATE INDEX IF NOT EXISTS idx_feedback_data ON feedback_bots (data, bot_user_id, tipo);
+    """),
+    # Estado de qualificação (bot_factory/lead_state.py) em tabela própria, fora de
+    # assinaturas: conversar não cria linha 'lead' no funil nem infla a contagem por status.
+    (6, "lead_states", [], """
+        CREATE TABLE IF NOT EXISTS lead_states (
+            user_id       TEXT PRIMARY KEY,
+            estado        TEXT NOT NULL,
+            atualizado_em TEXT
+        ) WITHOUT ROWID;
+    """),
+    # Outbox de eventos do factory (ver bot_factory/events.py): qualquer processo que mude
+    # assinaturas.status — main.py, dashboard, SQL manual — gera um evento.
+    (7, "factory_events_outbox", ["assinaturas.status"], """
+        CREATE TABLE IF NOT EXISTS factory_events (
+            id              INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id         TEXT NOT NULL,
+            tipo            TEXT NOT NULL,
+            status_anterior TEXT,
+            status_novo     TEXT,
+            criado_em       TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')),
+            processado_em   TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_factory_events_pendentes ON factory_events (processado_em, id);
+        CREATE TRIGGER IF NOT EXISTS trg_assinaturas_status_update
+        AFTER UPDATE OF status ON assinaturas
+        WHEN OLD.status IS NOT NEW.status
+        BEGIN
+            INSERT INTO factory_events (user_id, tipo, status_anterior, status_novo)
+            VALUES (NEW.user_id, 'assinatura_status', OLD.status, NEW.status);
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_assinaturas_status_insert
+        AFTER INSERT ON assinaturas
+        WHEN NEW.status IS NOT NULL AND NEW.status != 'lead'
+        BEGIN
+            INSERT INTO factory_events (user_id, tipo, status_anterior, status_novo)
+            VALUES (NEW.user_id, 'assinatura_status', NULL, NEW.status);
+        END;
+    """),
+    # Correções do onboarding (FAQ, horários...) de bots já no ar → prompt.json novo a quente.
+    (8, "factory_events_onboarding",
+     ["onboarding_data.dados_json", "onboarding_data.status", "factory_events"], """
+        CREATE TRIGGER IF NOT EXISTS trg_onboarding_dados_update
+        AFTER UPDATE OF dados_json ON onboarding_data
+        WHEN OLD.dados_json IS NOT NEW.dados_json
+        BEGIN
+            INSERT INTO factory_events (user_id, tipo, status_anterior, status_novo)
+            VALUES (NEW.user_id, 'onboarding_atualizado', OLD.status, NEW.status);
+        END;
+    """),
+    # Aprendizado incremental (bot_factory/learning.py): feedback resumido por bot/dia e a
+    # marca (último id) até onde feedback_bots já foi somado.
+    (9, "learning_incremental", ["feedback_bots"], """
+        CREATE TABLE IF NOT EXISTS feedback_bots_diario (
+            bot_user_id TEXT NOT NULL,
+            dia         TEXT NOT NULL,
+            total       INTEGER NOT NULL DEFAULT 0,
+            escalacoes  INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (bot_user_id, dia)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_feedback_bots_diario_dia ON feedback_bots_diario (dia);
+        CREATE TABLE IF NOT EXISTS marcas_processamento (
+            nome          TEXT PRIMARY KEY,
+            ultimo_id     INTEGER NOT NULL DEFAULT 0,
+            atualizado_em TEXT
+        );
+    """),
+    # Rollups do dashboard (bot_factory/rollups.py). Mensagens: somadas a partir da marca
+    # (último id de historico) por rollups.refresh_messages — nada a mais no INSERT das mensagens.
+    (10, "metricas_mensagens", ["historico"], """
+        CREATE TABLE IF NOT EXISTS metricas_mensagens_hora (
+            hora      TEXT PRIMARY KEY,          -- 'YYYY-MM-DD HH'
+            mensagens INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS metricas_mensagens_usuario (
+            user_id         TEXT PRIMARY KEY,
+            mensagens       INTEGER NOT NULL DEFAULT 0,
+            ultima_mensagem TEXT
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS marcas_processamento (
+            nome          TEXT PRIMARY KEY,
+            ultimo_id     INTEGER NOT NULL DEFAULT 0,
+            atualizado_em TEXT
+        );
+    """),
+    # Contagens por status e MRR por plano: mantidas por triggers na escrita (linhas mudam de
+    # status no lugar, o que uma marca de id não enxerga). O preenchimento inicial vem antes
+    # dos triggers, na mesma transação.
+    (11, "metricas_assinaturas",
+     ["assinaturas.status", "assinaturas.plano", "assinaturas.valor_mensal"], """
+        CREATE TABLE IF NOT EXISTS metricas_contagem (
+            metrica TEXT NOT NULL,
+            chave   TEXT NOT NULL,
+            total   INTEGER NOT NULL DEFAULT 0,
+            valor   REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (metrica, chave)
+        ) WITHOUT ROWID;
+        DELETE FROM metricas_contagem WHERE metrica = 'assinaturas_status';
+        INSERT INTO metricas_contagem (metrica, chave, total)
+            SELECT 'assinaturas_status', COALESCE(status, 'indefinido'), COUNT(*) FROM assinaturas GROUP BY 2;
+        CREATE TRIGGER IF NOT EXISTS trg_metricas_assinaturas_insert
+        AFTER INSERT ON assinaturas
+        BEGIN
+            INSERT INTO metricas_contagem (metrica, chave, total) VALUES ('assinaturas_status', COALESCE(NEW.status, 'indefinido'), 1)
+            ON CONFLICT(metrica, chave) DO UPDATE SET total = total + 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_metricas_assinaturas_update
+        AFTER UPDATE OF status ON assinaturas
+        WHEN OLD.status IS NOT NEW.status
+        BEGIN
+            UPDATE metricas_contagem SET total = total - 1
+            WHERE metrica = 'assinaturas_status' AND chave = COALESCE(OLD.status, 'indefinido');
+            INSERT INTO metricas_contagem (metrica, chave, total) VALUES ('assinaturas_status', COALESCE(NEW.status, 'indefinido'), 1)
+            ON CONFLICT(metrica, chave) DO UPDATE SET total = total + 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_metricas_assinaturas_delete
+        AFTER DELETE ON assinaturas
+        BEGIN
+            UPDATE metricas_contagem SET total = total - 1
+            WHERE metrica = 'assinaturas_status' AND chave = COALESCE(OLD.status, 'indefinido');
+        END;
+        DELETE FROM metricas_contagem WHERE metrica = 'mrr_plano';
+        INSERT INTO metricas_contagem (metrica, chave, total, valor)
+            SELECT 'mrr_plano', COALESCE(plano, 'sem plano'), COUNT(*), COALESCE(SUM(valor_mensal), 0)
+            FROM assinaturas WHERE status = 'ativo' GROUP BY 2;
+        CREATE TRIGGER IF NOT EXISTS trg_metricas_mrr_insert
+        AFTER INSERT ON assinaturas
+        WHEN NEW.status = 'ativo'
+        BEGIN
+            INSERT INTO metricas_contagem (metrica, chave, total, valor)
+            VALUES ('mrr_plano', COALESCE(NEW.plano, 'sem plano'), 1, COALESCE(NEW.valor_mensal, 0))
+            ON CONFLICT(metrica, chave) DO UPDATE SET total = total + 1, valor = valor + excluded.valor;
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_metricas_mrr_update
+        AFTER UPDATE OF status, plano, valor_mensal ON assinaturas
+        WHEN OLD.status = 'ativo' OR NEW.status = 'ativo'
+        BEGIN
+            UPDATE metricas_contagem SET total = total - 1, valor = valor - COALESCE(OLD.valor_mensal, 0)
+            WHERE OLD.status = 'ativo' AND metrica = 'mrr_plano' AND chave = COALESCE(OLD.plano, 'sem plano');
+            INSERT INTO metricas_contagem (metrica, chave, total, valor)
+            SELECT 'mrr_plano', COALESCE(NEW.plano, 'sem plano'), 1, COALESCE(NEW.valor_mensal, 0)
+            WHERE NEW.status = 'ativo'
+            ON CONFLICT(metrica, chave) DO UPDATE SET total = total + 1, valor = valor + excluded.valor;
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_metricas_mrr_delete
+        AFTER DELETE ON assinaturas
+        WHEN OLD.status = 'ativo'
+        BEGIN
+            UPDATE metricas_contagem SET total = total - 1, valor = valor - COALESCE(OLD.valor_mensal, 0)
+            WHERE metrica = 'mrr_plano' AND chave = COALESCE(OLD.plano, 'sem plano');
+        END;
+    """),
+    (12, "metricas_onboarding", ["onboarding_data.status"], """
+        CREATE TABLE IF NOT EXISTS metricas_contagem (
+            metrica TEXT NOT NULL,
+            chave   TEXT NOT NULL,
+            total   INTEGER NOT NULL DEFAULT 0,
+            valor   REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (metrica, chave)
+        ) WITHOUT ROWID;
+        DELETE FROM metricas_contagem WHERE metrica = 'onboarding_status';
+        INSERT INTO metricas_contagem (metrica, chave, total)
+            SELECT 'onboarding_status', COALESCE(status, 'em_progresso'), COUNT(*) FROM onboarding_data GROUP BY 2;
+        CREATE TRIGGER IF NOT EXISTS trg_metricas_onboarding_insert
+        AFTER INSERT ON onboarding_data
+        BEGIN
+            INSERT INTO metricas_contagem (metrica, chave, total) VALUES ('onboarding_status', COALESCE(NEW.status, 'em_progresso'), 1)
+            ON CONFLICT(metrica, chave) DO UPDATE SET total = total + 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_metricas_onboarding_update
+        AFTER UPDATE OF status ON onboarding_data
+        WHEN OLD.status IS NOT NEW.status
+        BEGIN
+            UPDATE metricas_contagem SET total = total - 1
+            WHERE metrica = 'onboarding_status' AND chave = COALESCE(OLD.status, 'em_progresso');
+            INSERT INTO metricas_contagem (metrica, chave, total) VALUES ('onboarding_status', COALESCE(NEW.status, 'em_progresso'), 1)
+            ON CONFLICT(metrica, chave) DO UPDATE SET total = total + 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_metricas_onboarding_delete
+        AFTER DELETE ON onboarding_data
+        BEGIN
+            UPDATE metricas_contagem SET total = total - 1
+            WHERE metrica = 'onboarding_status' AND chave = COALESCE(OLD.status, 'em_progresso');
+        END;
+    """),
+    (13, "metricas_bots", ["bots_gerados.status"], """
+        CREATE TABLE IF NOT EXISTS metricas_contagem (
+            metrica TEXT NOT NULL,
+            chave   TEXT NOT NULL,
+            total   INTEGER NOT NULL DEFAULT 0,
+            valor   REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (metrica, chave)
+        ) WITHOUT ROWID;
+        DELETE FROM metricas_contagem WHERE metrica = 'bots_status';
+        INSERT INTO metricas_contagem (metrica, chave, total)
+            SELECT 'bots_status', COALESCE(status, 'desconhecido'), COUNT(*) FROM bots_gerados GROUP BY 2;
+        CREATE TRIGGER IF NOT EXISTS trg_metricas_bots_insert
+        AFTER INSERT ON bots_gerados
+        BEGIN
+            INSERT INTO metricas_contagem (metrica, chave, total) VALUES ('bots_status', COALESCE(NEW.status, 'desconhecido'), 1)
+            ON CONFLICT(metrica, chave) DO UPDATE SET total = total + 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_metricas_bots_update
+        AFTER UPDATE OF status ON bots_gerados
+        WHEN OLD.status IS NOT NEW.status
+        BEGIN
+            UPDATE metricas_contagem SET total = total - 1
+            WHERE metrica = 'bots_status' AND chave = COALESCE(OLD.status, 'desconhecido');
+            INSERT INTO metricas_contagem (metrica, chave, total) VALUES ('bots_status', COALESCE(NEW.status, 'desconhecido'), 1)
+            ON CONFLICT(metrica, chave) DO UPDATE SET total = total + 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_metricas_bots_delete
+        AFTER DELETE ON bots_gerados
+        BEGIN
+            UPDATE metricas_contagem SET total = total - 1
+            WHERE metrica = 'bots_status' AND chave = COALESCE(OLD.status, 'desconhecido');
+        END;
+    """),
+]
+
+# Queries executadas a cada mensagem / ciclo do watcher — nenhuma pode virar SCAN.
+HOT_QUERIES = [
+    ("historico por usuário (memória longo prazo)",
+     "SELECT role, content FROM historico WHERE user_id=? ORDER BY timestamp DESC LIMIT 40", ("x",)),
+    ("página de conversa (dashboard, history_browser)",
+     "SELECT id, user_id, role, content, timestamp FROM historico "
+     "WHERE user_id = ? AND (timestamp, id) < (?, ?) ORDER BY timestamp DESC, id DESC LIMIT 51", ("x", "9", 0)),
+    ("feedback novo desde a marca (learning)",
+     "SELECT bot_user_id, substr(data, 1, 10), COUNT(*), SUM(tipo = 'escalacao') FROM feedback_bots "
+     "WHERE id > ? AND id <= ? AND bot_user_id IS NOT NULL AND data IS NOT NULL GROUP BY 1, 2", (0, 1)),
+    ("bots antigos ativos (learning)",
+     "SELECT user_id, nicho, skills_usadas FROM bots_gerados "
+     "WHERE status = 'active' AND data_deploy <= date('now', '-30 days')", ()),
+    ("bots ativos (health check)",
+     "SELECT user_id, bot_path, pid FROM bots_gerados WHERE status = 'active'", ()),
+    ("bot por user_id",
+     "SELECT * FROM bots_gerados WHERE user_id = ?", ("x",)),
+    ("estado do lead (lead_state)",
+     "SELECT estado FROM lead_states WHERE user_id=?", ("x",)),
+    ("clientes ativos",
+     "SELECT user_id FROM assinaturas WHERE status = 'ativo'", ()),
+    ("clientes pendentes (watcher)",
+     "SELECT a.* FROM assinaturas a LEFT JOIN bots_gerados b ON a.user_id = b.user_id "
+     "WHERE a.status = 'ativo' AND (b.user_id IS NULL OR b.status = 'error') "
+     "AND (b.status IS NULL OR b.status != 'aguardando_token')", ()),
+    ("eventos pendentes (watcher)",
+     "SELECT id, user_id, tipo, status_anterior, status_novo, criado_em FROM factory_events "
+     "WHERE processado_em IS NULL ORDER BY id LIMIT 500", ()),
+    ("cliente pendente por user_id (watcher, evento)",
+     "SELECT a.* FROM assinaturas a LEFT JOIN bots_gerados b ON a.user_id = b.user_id "
+     "WHERE a.user_id = ? AND a.status = 'ativo' AND (b.user_id IS NULL OR b.status = 'error') "
+     "AND (b.status IS NULL OR b.status != 'aguardando_token')", ("x",)),
+    ("score de skill",
+     "SELECT media_satisfacao, taxa_retencao, taxa_escalacao FROM skills_performance "
+     "WHERE nicho=? AND skill_name=?", ("x", "y")),
+    ("scores do nicho (skill_ranking)",
+     "SELECT skill_name, media_satisfacao, taxa_retencao, taxa_escalacao FROM skills_performance "
+     "WHERE nicho=?", ("x",)),
+]
+
+_lock = threading.Lock()
+
+
+def _statements(sql: str) -> List[str]:
+    """Divide o script em comandos completos (triggers têm ';' dentro de BEGIN ... END)."""
+    out, buf = [], ""
+    for piece in sql.split(";"):
+        buf += piece + ";"
+        if sqlite3.complete_statement(buf):
+            if buf.strip(" \n;"):
+                out.append(buf.strip())
+            buf = ""
+    return out
+
+
+def _existing_tables(conn) -> set:
+    return {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+
+
+def _missing(conn, requires: List[str], tables: set) -> List[str]:
+    """Requisitos ("tabela" ou "tabela.coluna") que ainda não existem no banco."""
+    missing = []
+    for req in requires:
+        table, _, column = req.partition(".")
+        if table not in tables:
+            missing.append(req)
+        elif column and column not in {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}:
+            missing.append(req)
+    return missing
+
+
+def current_version(path: Optional[str] = None) -> int:
+    conn = db_pool.get_conn(path)
+    if "schema_migrations" not in _existing_tables(conn):
+        return 0
+    row = conn.execute("SELECT MAX(version) FROM schema_migrations").fetchone()
+    return row[0] or 0
+
+
+def run_migrations(path: Optional[str] = None) -> List[int]:
+    """Aplica as migrações pendentes cujos requisitos já existem. Retorna as versões aplicadas."""
+    applied = []
+    with _lock:
+        conn = db_pool.get_conn(path)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version    INTEGER PRIMARY KEY,
+                nome       TEXT,
+                aplicado_em TEXT
+            )
+        """)
+        conn.commit()
+        done = {r[0] for r in conn.execute("SELECT version FROM schema_migrations")}
+        tables = _existing_tables(conn)
+
+        for version, nome, requires, sql in MIGRATIONS:
+            if version in done:
+                continue
+            missing = _missing(conn, requires, tables)
+            if missing:
+                logger.debug(f"[Migrations] v{version} ({nome}) adiada — faltam: {missing}")
+                continue
+            with db_pool.transaction(path) as cur:
+                cur.execute("BEGIN")  # o sqlite3 só abre transação antes de DML — sem isso cada DDL commita sozinho
+                for stmt in _statements(sql):
+                    cur.execute(stmt)
+                cur.execute(
+                    "INSERT OR IGNORE INTO schema_migrations (version, nome, aplicado_em) VALUES (?, ?, ?)",
+                    (version, nome, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+                )
+            applied.append(version)
+            logger.info(f"[Migrations] v{version} aplicada: {nome}")
+            tables = _existing_tables(conn)  # a migração pode ter criado tabelas das próximas
+    return applied
+
+
+def explain(sql: str, params: tuple = (), path: Optional[str] = None) -> List[str]:
+    """Retorna as linhas de detalhe do EXPLAIN QUERY PLAN da query."""
+    rows = db_pool.get_conn(path).execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    return [r[-1] for r in rows]
+
+
+def check_query_plans(path: Optional[str] = None) -> List[tuple]:
+    """
+    Retorna [(descrição, sql, plano)] das queries quentes que fazem SCAN de tabela.
+    Lista vazia = todas usam índice.
+    """
+    regressions = []
+    for desc, sql, params in HOT_QUERIES:
+        plan = explain(sql, params, path)
+        if any(line.startswith("SCAN") for line in plan):
+            regressions.append((desc, sql, plan))
+    return regressions
@@ -1,26 +1,237 @@
 """
 pipeline.py — Orquestrador do fluxo completo de criação de bots.
 Dados DB → Perfil → Plano → Skills → Prompt → Geração → Deploy → Notificação.
+
+O fluxo é dividido em etapas (STAGES). `run_pipeline(uid)` roda as etapas em sequência;
+`PipelineExecutor` (usado pelo watcher) roda pipelines de vários clientes ao mesmo tempo:
+
+- Um pool de threads limitado por etapa (perfil, prompt, geração, deploy, notificação):
+  um deploy ou notificação lenta ocupa só uma vaga da própria etapa, não a fila inteira.
+- Erros transitórios (banco travado, rede) são retentados com backoff exponencial; o
+  cliente libera a vaga da etapa enquanto espera.
+- O mesmo user_id nunca é construído duas vezes em paralelo (submit devolve None).
+
+Geração e deploy passam pelo cache de build (bot_factory/build_cache.py): sem mudança, o
+bot não é gerado nem reiniciado; com só o prompt diferente, recebe reload em vez de restart.
 """
-import logging
+import os
 import json
+import time
+import random
+import sqlite3
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import requests
 
+from bot_factory                  import build_cache
 from bot_factory.db_factory       import upsert_bot_record, setup_factory_tables
 from bot_factory.profile_loader   import load_client_profile
 from bot_factory.plan_resolver    import resolve as resolve_plan
 from bot_factory.skill_selector   import select_skills
 from bot_factory.prompt_builder   import build_system_prompt
-from bot_factory.generator        import generate_bot
-from bot_factory.deployer         import deploy_bot, is_running
+from bot_factory.generator        import generate_bot, build_fingerprint, prompt_hash, publish_prompt
+from bot_factory.deployer         import deploy_bot, is_running, reload_bot, running_pid
 from bot_factory.notifier         import notify_client, notify_owner
 
 logger = logging.getLogger(__name__)
 
+MAX_RETRIES = int(os.getenv("PIPELINE_MAX_RETRIES", "3"))
+BACKOFF_MS  = int(os.getenv("PIPELINE_BACKOFF_MS", "500"))   # 1ª espera; dobra a cada tentativa
+BACKOFF_MAX_MS = 30_000
+
+# Erros que valem nova tentativa: falhas de rede e, do SQLite, só banco ocupado/travado por
+# outro escritor (is_transient) — "no such table", disco cheio etc. falham de imediato
+TRANSIENT_ERRORS = (requests.RequestException, ConnectionError, TimeoutError)
+_SQLITE_BUSY, _SQLITE_LOCKED = 5, 6  # códigos primários (os estendidos trazem o primário no byte baixo)
+
+
+def is_transient(e: BaseException) -> bool:
+    """True se o erro vale nova tentativa (ver TRANSIENT_ERRORS)."""
+    if isinstance(e, sqlite3.OperationalError):
+        code = getattr(e, "sqlite_errorcode", None)
+        if code is not None:
+            return code & 0xFF in (_SQLITE_BUSY, _SQLITE_LOCKED)
+        msg = str(e).lower()
+        return "locked" in msg or "busy" in msg
+    return isinstance(e, TRANSIENT_ERRORS)
+
+
+@dataclass
+class Stage:
+    """`fn(ctx)` executa a etapa; retornar False encerra o pipeline sem erro (ex.: sem token)."""
+    name: str
+    fn: Callable[[dict], Optional[bool]]
+    workers: int
+
+
+# ── Etapas ───────────────────────────────────────────────────────
+def _stage_profile(ctx: dict) -> Optional[bool]:
+    """ETAPA 0/1 — Marca como em construção e carrega o perfil (valida credenciais)."""
+    user_id, result = ctx["user_id"], ctx["result"]
+    if "building" not in ctx:
+        upsert_bot_record(user_id, status="building", data_deploy=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        ctx["building"] = True
+
+    profile = load_client_profile(user_id)
+    ctx["profile"] = profile
+    result["steps"]["profile"] = "ok"
+    logger.info(f"[Pipeline] Perfil carregado: nicho={profile.get('nicho')}, plano={profile.get('plano')}, "
+                f"plataforma={profile.get('plataforma')}, empresa={profile.get('empresa_nome')}")
+
+    # Validação mínima: bot do cliente precisa de token de plataforma
+    plataforma = profile.get("plataforma", "telegram").lower()
+    ctx["plataforma"] = plataforma
+    if plataforma == "telegram" and not profile.get("telegram_bot_token"):
+        # Marca como aguardando_token — watcher não retentará até o token ser adicionado
+        upsert_bot_record(user_id, status="aguardando_token",
+                          erro_msg="Token do BotFather não informado pelo cliente.")
+        notify_owner(f"Cliente {user_id} está ativo mas sem token do Telegram. "
+                     f"Solicite o token do BotFather para prosseguir.")
+        result["steps"]["error"] = "aguardando_token"
+        return False
+    if plataforma == "whatsapp" and not profile.get("meta_phone_number_id"):
+        upsert_bot_record(user_id, status="aguardando_token",
+                          erro_msg="Credenciais do WhatsApp não informadas.")
+        notify_owner(f"Cliente {user_id} sem credenciais WhatsApp (Meta). Configure Phone Number ID e Token.")
+        result["steps"]["error"] = "aguardando_token"
+        return False
+
+
+def _stage_prompt(ctx: dict):
+    """ETAPA 2/3 — Resolve plano, seleciona skills e monta o system prompt."""
+    profile, result = ctx["profile"], ctx["result"]
+    ctx["features"] = resolve_plan(profile.get("plano", "flash"))
+    skills = select_skills(profile.get("nicho", "servicos"), profile.get("plano", "flash"))
+    ctx["skills"] = skills
+    result["steps"]["skills"] = skills
+    logger.info(f"[Pipeline] Skills selecionadas: {skills}")
+
+    ctx["system_prompt"] = build_system_prompt(profile, skills)
+    result["steps"]["prompt"] = "ok"
+
+
+def _stage_generation(ctx: dict):
+    """ETAPA 4 — Gera o código do bot (ou reaproveita o build em disco, se nada mudou)."""
+    user_id, profile, skills = ctx["user_id"], ctx["profile"], ctx["skills"]
+    mode = build_cache.decide(user_id, build_fingerprint(profile), prompt_hash(ctx["system_prompt"], skills))
+    ctx["build"] = mode
+    ctx["result"]["steps"]["build"] = mode
+    if mode == build_cache.SKIP:
+        gen = build_cache.cached_build(user_id)
+        build_cache.record("rebuild_evitado")
+        logger.info(f"[Pipeline] Build de {user_id} inalterado — geração pulada.")
+    elif mode == build_cache.RELOAD:
+        gen = publish_prompt(user_id, skills, ctx["system_prompt"])
+        build_cache.record("rebuild_evitado")
+        logger.info(f"[Pipeline] Só prompt/skills de {user_id} mudaram — prompt.json {gen['prompt_hash']} publicado.")
+    else:
+        gen = generate_bot(profile, skills, ctx["system_prompt"])
+        build_cache.record("build")
+        logger.info(f"[Pipeline] Bot gerado em: {gen['bot_path']} ({mode})")
+    ctx["gen"] = gen
+    ctx["result"]["steps"]["generation"] = gen["bot_path"]
+
+
+def _stage_deploy(ctx: dict):
+    """ETAPA 5/6 — Deploy (inicia o processo, só se necessário) e salva no DB."""
+    user_id, profile, gen = ctx["user_id"], ctx["profile"], ctx["gen"]
+    mode = ctx.get("build", build_cache.REBUILD)
+    pid = None
+    if mode != build_cache.REBUILD and is_running(user_id):
+        if mode == build_cache.SKIP:
+            pid = running_pid(user_id)
+            how = "já no ar"
+        elif reload_bot(user_id, gen["bot_path"]):
+            pid = running_pid(user_id)
+            how = "reload"
+            build_cache.record("reload")
+        if pid:
+            build_cache.record("reinicio_evitado")
+    if not pid:
+        pid = deploy_bot(gen["bot_path"], user_id)
+        if not pid:
+            raise RuntimeError("Deploy falhou — subprocess não iniciou.")
+        how = "deploy"
+        build_cache.record("reinicio")
+
+    ctx["pid"], ctx["restarted"] = pid, how == "deploy"
+    ctx["result"]["steps"]["deploy"] = f"PID {pid}" if how == "deploy" else f"PID {pid} ({how})"
+    logger.info(f"[Pipeline] Deploy OK — PID {pid} ({how})")
+
+    upsert_bot_record(
+        user_id,
+        plano         = profile.get("plano"),
+        nicho         = profile.get("nicho"),
+        plataforma    = ctx["plataforma"],
+        skills_usadas = json.dumps(ctx["skills"]),
+        prompt_hash   = gen["prompt_hash"],
+        bot_path      = gen["bot_path"],
+        config_path   = gen["config_path"],
+        pid           = pid,
+        status        = "active",
+        erro_msg      = None,
+        data_ultimo_start = datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    )
+
+
+def _stage_notify(ctx: dict):
+    """ETAPA 7 — Notifica cliente e dono (não em atualização de bot que seguiu no ar)."""
+    profile = ctx["profile"]
+    if not ctx.get("restarted", True):
+        ctx["result"]["success"] = True
+        logger.info(f"[Pipeline] ✅ Bot de {ctx['user_id']} atualizado sem reinício ({ctx['build']}).")
+        return
+    bot_username = profile.get("telegram_bot_username") or ""
+    notify_client(ctx["user_id"], profile, bot_username=bot_username)
+    notify_owner(
+        f"✅ Bot ativado para *{profile.get('empresa_nome')}*\n"
+        f"Plano: {profile.get('plano')} | Nicho: {profile.get('nicho')} | Skills: {len(ctx['skills'])}\n"
+        f"PID: {ctx['pid']}"
+    )
+    ctx["result"]["success"] = True
+    logger.info(f"[Pipeline] ✅ Pipeline concluído com sucesso para {ctx['user_id']}")
+
 
-def run_pipeline(user_id: str) -> dict:
+STAGES: List[Stage] = [
+    Stage("profile",    _stage_profile,    int(os.getenv("PIPELINE_PROFILE_WORKERS", "8"))),
+    Stage("prompt",     _stage_prompt,     int(os.getenv("PIPELINE_PROMPT_WORKERS", "4"))),
+    Stage("generation", _stage_generation, int(os.getenv("PIPELINE_GENERATION_WORKERS", "4"))),
+    Stage("deploy",     _stage_deploy,     int(os.getenv("PIPELINE_DEPLOY_WORKERS", "2"))),
+    Stage("notify",     _stage_notify,     int(os.getenv("PIPELINE_NOTIFY_WORKERS", "8"))),
+]
+
+
+def _new_context(user_id: str) -> dict:
+    logger.info(f"[Pipeline] ▶ Iniciando pipeline para {user_id}")
+    return {"user_id": user_id, "result": {"user_id": user_id, "steps": {}, "success": False}}
+
+
+def _fail(ctx: dict, e: Exception):
+    user_id, err_msg = ctx["user_id"], str(e)
+    logger.error(f"[Pipeline] ❌ Erro no pipeline de {user_id}: {err_msg}", exc_info=e)
+    try:
+        upsert_bot_record(user_id, status="error", erro_msg=err_msg)
+        notify_client(user_id, ctx.get("profile") or load_client_profile(user_id), error=err_msg)
+        notify_owner(f"❌ Erro no pipeline de `{user_id}`:\n{err_msg}")
+    except Exception as notify_err:
+        logger.error(f"[Pipeline] Falha ao registrar erro de {user_id}: {notify_err}")
+    ctx["result"]["steps"]["error"] = err_msg
+
+
+def _backoff(attempt: int, backoff_ms: int) -> float:
+    """Espera antes da tentativa `attempt` (1, 2, ...): exponencial com jitter."""
+    delay = min(backoff_ms * 2 ** (attempt - 1), BACKOFF_MAX_MS) / 1000
+    return delay * (0.5 + random.random() / 2)
+
+
+def run_pipeline(user_id: str, stages: Optional[List[Stage]] = None) -> dict:
     """
-    Executa o pipeline completo para um cliente:
+    Executa o pipeline completo para um cliente, em sequência:
     1. Carrega perfil do DB
     2. Resolve plano e seleciona skills
     3. Monta system prompt personalizado
@@ -30,93 +241,142 @@ def run_pipeline(user_id: str) -> dict:
 
     Retorna status dict com resultado de cada etapa.
     """
-    result = {"user_id": user_id, "steps": {}, "success": False}
-    logger.info(f"[Pipeline] ▶ Iniciando pipeline para {user_id}")
+    ctx = _new_context(user_id)
+    try:
+        for stage in stages or STAGES:
+            for attempt in range(MAX_RETRIES + 1):
+                try:
+                    outcome = stage.fn(ctx)
+                    break
+                except Exception as e:
+                    if attempt == MAX_RETRIES or not is_transient(e):
+                        raise
+                    logger.warning(f"[Pipeline] Etapa {stage.name} de {user_id} falhou ({e}) — nova tentativa")
+                    time.sleep(_backoff(attempt + 1, BACKOFF_MS))
+            if outcome is False:
+                break
+    except Exception as e:
+        _fail(ctx, e)
+    return ctx["result"]
 
-    # ── ETAPA 0 — Marca como em construção ───────────────────────
-    upsert_bot_record(user_id, status="building", data_deploy=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
 
-    try:
-        # ── ETAPA 1 — Carrega perfil ──────────────────────────────
-        profile = load_client_profile(user_id)
-        result["steps"]["profile"] = "ok"
-        logger.info(f"[Pipeline] Perfil carregado: nicho={profile.get('nicho')}, plano={profile.get('plano')}, "
-                    f"plataforma={profile.get('plataforma')}, empresa={profile.get('empresa_nome')}")
-
-        # Validação mínima: bot do cliente precisa de token de plataforma
-        plataforma = profile.get("plataforma", "telegram").lower()
-        if plataforma == "telegram" and not profile.get("telegram_bot_token"):
-            # Marca como aguardando_token — watcher não retentará até o token ser adicionado
-            upsert_bot_record(user_id, status="aguardando_token",
-                              erro_msg="Token do BotFather não informado pelo cliente.")
-            notify_owner(f"Cliente {user_id} está ativo mas sem token do Telegram. "
-                         f"Solicite o token do BotFather para prosseguir.")
-            result["steps"]["error"] = "aguardando_token"
-            return result
-        if plataforma == "whatsapp" and not profile.get("meta_phone_number_id"):
-            upsert_bot_record(user_id, status="aguardando_token",
-                              erro_msg="Credenciais do WhatsApp não informadas.")
-            notify_owner(f"Cliente {user_id} sem credenciais WhatsApp (Meta). Configure Phone Number ID e Token.")
-            result["steps"]["error"] = "aguardando_token"
-            return result
-
-        # ── ETAPA 2 — Resolve plano + seleciona skills ────────────
-        features = resolve_plan(profile.get("plano", "flash"))
-        skills   = select_skills(profile.get("nicho", "servicos"), profile.get("plano", "flash"))
-        result["steps"]["skills"] = skills
-        logger.info(f"[Pipeline] Skills selecionadas: {skills}")
-
-        # ── ETAPA 3 — Monta system prompt ─────────────────────────
-        system_prompt = build_system_prompt(profile, skills)
-        result["steps"]["prompt"] = "ok"
-
-        # ── ETAPA 4 — Gera código do bot ──────────────────────────
-        gen = generate_bot(profile, skills, system_prompt)
-        result["steps"]["generation"] = gen["bot_path"]
-        logger.info(f"[Pipeline] Bot gerado em: {gen['bot_path']}")
-
-        # ── ETAPA 5 — Deploy (inicia o processo) ──────────────────
-        pid = deploy_bot(gen["bot_path"], user_id)
-        if not pid:
-            raise RuntimeError("Deploy falhou — subprocess não iniciou.")
+class PipelineExecutor:
+    """Pipelines de vários clientes em paralelo, com um pool limitado por etapa."""
 
-        result["steps"]["deploy"] = f"PID {pid}"
-        logger.info(f"[Pipeline] Deploy OK — PID {pid}")
-
-        # ── ETAPA 6 — Salva no DB ─────────────────────────────────
-        upsert_bot_record(
-            user_id,
-            plano         = profile.get("plano"),
-            nicho         = profile.get("nicho"),
-            plataforma    = plataforma,
-            skills_usadas = json.dumps(skills),
-            prompt_hash   = gen["prompt_hash"],
-            bot_path      = gen["bot_path"],
-            config_path   = gen["config_path"],
-            pid           = pid,
-            status        = "active",
-            erro_msg      = None,
-            data_ultimo_start = datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        )
-
-        # ── ETAPA 7 — Notifica cliente e dono ─────────────────────
-        bot_username = profile.get("telegram_bot_username") or ""
-        notify_client(user_id, profile, bot_username=bot_username)
-        notify_owner(
-            f"✅ Bot ativado para *{profile.get('empresa_nome')}*\n"
-            f"Plano: {profile.get('plano')} | Nicho: {profile.get('nicho')} | Skills: {len(skills)}\n"
-            f"PID: {pid}"
-        )
-
-        result["success"] = True
-        logger.info(f"[Pipeline] ✅ Pipeline concluído com sucesso para {user_id}")
+    def __init__(self, stages: Optional[List[Stage]] = None,
+                 max_retries: int = MAX_RETRIES, backoff_ms: int = BACKOFF_MS):
+        self.stages = list(stages or STAGES)
+        self.max_retries = max_retries
+        self.backoff_ms = backoff_ms
+        self._workers = {s.name: max(1, s.workers) for s in self.stages}
+        self._pools = {name: ThreadPoolExecutor(max_workers=n, thread_name_prefix=f"pipeline-{name}")
+                       for name, n in self._workers.items()}
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        self._stats = {"enviados": 0, "duplicados": 0, "sucesso": 0, "falhas": 0, "encerrados": 0}
+        self._stage_stats = {s.name: {"execucoes": 0, "retentativas": 0, "erros": 0, "ativos": 0, "total_ms": 0.0}
+                             for s in self.stages}
 
-    except Exception as e:
-        err_msg = str(e)
-        logger.error(f"[Pipeline] ❌ Erro no pipeline de {user_id}: {err_msg}", exc_info=True)
-        upsert_bot_record(user_id, status="error", erro_msg=err_msg)
-        notify_client(user_id, load_client_profile(user_id) if True else {}, error=err_msg)
-        notify_owner(f"❌ Erro no pipeline de `{user_id}`:\n{err_msg}")
-        result["steps"]["error"] = err_msg
+    def submit(self, user_id: str) -> Optional[Future]:
+        """Enfileira o pipeline do cliente. None se ele já estiver em construção."""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("PipelineExecutor encerrado")
+            if user_id in self._inflight:
+                self._stats["duplicados"] += 1
+                return None
+            future = Future()
+            self._inflight[user_id] = future
+            self._stats["enviados"] += 1
+        self._schedule(_new_context(user_id), 0, 0)
+        return future
+
+    def in_flight(self, user_id: str) -> bool:
+        return user_id in self._inflight
+
+    def shutdown(self, timeout: Optional[float] = None):
+        """Para de aceitar clientes, espera os pipelines em andamento e fecha os pools."""
+        with self._lock:
+            self._closed = True
+            pending = list(self._inflight.values())
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for future in pending:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                future.result(remaining)
+            except Exception:
+                break  # estourou o prazo: os pools encerram sem esperar
+        for pool in self._pools.values():
+            pool.shutdown(wait=deadline is None, cancel_futures=deadline is not None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stages = {}
+            for name, s in self._stage_stats.items():
+                n = s["execucoes"]
+                stages[name] = {"vagas": self._workers[name], "ativos": s["ativos"],
+                                "execucoes": n, "retentativas": s["retentativas"], "erros": s["erros"],
+                                "medio_ms": round(s["total_ms"] / n, 1) if n else None}
+            return {**self._stats, "em_andamento": len(self._inflight), "etapas": stages,
+                    "cache_build": build_cache.stats()}
+
+    # ── Internos ─────────────────────────────────────────────────
+    def _schedule(self, ctx: dict, index: int, attempt: int):
+        stage = self.stages[index]
+        try:
+            self._pools[stage.name].submit(self._run_stage, ctx, index, attempt)
+        except RuntimeError as e:  # pool já encerrado
+            self._finish(ctx, error=e)
+
+    def _run_stage(self, ctx: dict, index: int, attempt: int):
+        stage = self.stages[index]
+        stats = self._stage_stats[stage.name]
+        with self._lock:
+            stats["ativos"] += 1
+        t0 = time.perf_counter()
+        try:
+            outcome = stage.fn(ctx)
+        except Exception as e:
+            if is_transient(e) and attempt < self.max_retries:
+                delay = _backoff(attempt + 1, self.backoff_ms)
+                with self._lock:
+                    stats["retentativas"] += 1
+                logger.warning(f"[Pipeline] Etapa {stage.name} de {ctx['user_id']} falhou ({e}) — "
+                               f"nova tentativa em {delay:.1f}s")
+                timer = threading.Timer(delay, self._schedule, (ctx, index, attempt + 1))
+                timer.daemon = True
+                timer.start()
+                return
+            self._stage_failed(stats)
+            self._finish(ctx, error=e)
+            return
+        finally:
+            with self._lock:
+                stats["ativos"] -= 1
+                stats["execucoes"] += 1
+                stats["total_ms"] += (time.perf_counter() - t0) * 1000
+
+        if outcome is False or index + 1 == len(self.stages):
+            self._finish(ctx)
+        else:
+            self._schedule(ctx, index + 1, 0)
+
+    def _stage_failed(self, stats: dict):
+        with self._lock:
+            stats["erros"] += 1
 
-    return result
+    def _finish(self, ctx: dict, error: Optional[Exception] = None):
+        if error is not None:
+            _fail(ctx, error)
+        result = ctx["result"]
+        with self._lock:
+            future = self._inflight.pop(ctx["user_id"], None)
+            if result["success"]:
+                self._stats["sucesso"] += 1
+            elif error is not None:
+                self._stats["falhas"] += 1
+            else:
+                self._stats["encerrados"] += 1
+        if future is not None:
+            future.set_result(result)
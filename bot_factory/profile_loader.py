@@ -1,18 +1,17 @@
 """
 profile_loader.py — Lê todos os dados do cliente no DB e monta um perfil rico.
 """
-import sqlite3
 import json
 import os
 from typing import Optional
 
+from bot_factory import db_pool
+
 DB_PATH = os.getenv("DB_NAME", "agencia_autovenda.db")
 
 
 def _conn():
-    c = sqlite3.connect(DB_PATH)
-    c.row_factory = sqlite3.Row
-    return c
+    return db_pool.get_conn(DB_PATH)
 
 
 def load_client_profile(user_id: str) -> dict:
@@ -118,7 +117,7 @@ def load_client_profile(user_id: str) -> dict:
     if not profile["plano"]:
         profile["plano"] = "flash"
 
-    conn.close()
+    cur.close()
     return profile
 
 
@@ -0,0 +1,107 @@
+"""
+prompt_artifact.py — Prompt e skills dos bots de clientes num artefato versionado
+(clients/{user_id}/prompt.json), trocado a quente sem reiniciar o processo.
+
+O SYSTEM_PROMPT ficava embutido no bot.py: qualquer correção do onboarding (FAQ nova,
+horário novo) exigia gerar o arquivo de novo e matar o processo — perdendo `history` e
+`sessions` em memória no meio das conversas.
+
+- Factory: write_artifact() grava prompt.json de forma atômica (arquivo temporário +
+  os.replace). `version` é o prompt_hash, o mesmo de config.json e bots_gerados.
+- Bot gerado: `PromptArtifact(...)` lê o arquivo no import e, a cada mensagem, `snapshot()`
+  confere o mtime (no máximo uma vez por PROMPT_CHECK_SECONDS, só um os.stat). Se mudou,
+  carrega e troca a referência de uma vez: a mensagem em andamento termina com o prompt
+  antigo, a próxima já usa o novo. Estado em memória não é tocado.
+- Arquivo ausente ou inválido: mantém a última versão boa (ou o fallback do template).
+
+Sem inotify (dependência nativa e indisponível no Windows): o "watch" é o stat no caminho
+da mensagem, que custa microssegundos e não precisa de thread.
+"""
+import os
+import json
+import time
+import logging
+from datetime import datetime
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_FILE = "prompt.json"
+CHECK_SECONDS = float(os.getenv("PROMPT_CHECK_SECONDS", "1"))
+
+
+def artifact_path(client_dir: str) -> str:
+    return os.path.join(client_dir, ARTIFACT_FILE)
+
+
+def write_artifact(client_dir: str, version: str, system_prompt: str, skills: List[str]):
+    """Publica prompt + skills para o bot em execução (`version` = prompt_hash)."""
+    data = {"version": version, "system_prompt": system_prompt, "skills": list(skills),
+            "publicado_em": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+    path = artifact_path(client_dir)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def read_version(client_dir: str) -> Optional[str]:
+    try:
+        with open(artifact_path(client_dir), encoding="utf-8") as f:
+            return json.load(f).get("version")
+    except (OSError, ValueError):
+        return None
+
+
+class PromptArtifact:
+    """Prompt/skills atuais do bot, recarregados quando prompt.json muda."""
+
+    def __init__(self, path: str, fallback: str = "", check_seconds: float = CHECK_SECONDS):
+        self.path = path
+        self.check_seconds = check_seconds
+        self._data = {"version": None, "system_prompt": fallback, "skills": []}
+        self._mtime: Optional[int] = None
+        self._checked = 0.0
+        self.reloads = 0
+        self._load()
+
+    @property
+    def version(self) -> Optional[str]:
+        return self._data["version"]
+
+    def snapshot(self) -> dict:
+        """Versão vigente para UMA mensagem (não muda durante o processamento dela)."""
+        now = time.monotonic()
+        if now - self._checked >= self.check_seconds:
+            self._checked = now
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError:
+                mtime = None
+            if mtime is not None and mtime != self._mtime:
+                self._load()
+        return self._data
+
+    def system_prompt(self) -> str:
+        return self.snapshot()["system_prompt"]
+
+    def _load(self):
+        mtime = None
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            if not data.get("system_prompt"):
+                raise ValueError("system_prompt vazio")
+        except (OSError, ValueError) as e:
+            if mtime is not None:
+                self._mtime = mtime  # não insiste no mesmo arquivo ruim
+                logger.warning(f"[Prompt] {self.path} inválido ({e}) — mantendo versão {self.version}")
+            return
+        previous = self.version
+        self._data = {"version": data.get("version"), "system_prompt": data["system_prompt"],
+                      "skills": data.get("skills", [])}  # troca atômica da referência
+        self._mtime = mtime
+        if previous is not None and previous != self.version:
+            self.reloads += 1
+            logger.info(f"[Prompt] Prompt atualizado a quente: {previous} → {self.version}")
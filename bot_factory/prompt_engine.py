@@ -0,0 +1,142 @@
+"""
+prompt_engine.py — Montagem do prompt com prefixo estável (cacheável) e orçamento por seção.
+
+- O system prompt é quebrado em seções (blocos ═══ TÍTULO ═══ e sub-blocos ▸ FASE ...),
+  cada uma medida em tokens uma única vez.
+- Por fase da conversa, seções irrelevantes são omitidas (ex.: tutoriais de onboarding
+  enquanto o lead ainda está em qualificação). O texto de cada fase é montado e cacheado,
+  então o prefixo enviado é byte-a-byte idêntico entre turnos e entre usuários da mesma fase.
+- O contexto das skills (que muda a cada turno) vai DEPOIS do histórico, numa mensagem
+  system própria — assim system + histórico formam um prefixo que o cache do provedor reaproveita.
+- `stats()` informa tokens enviados por turno e quanto o corte por fase economizou.
+
+Contagem de tokens: usa `tiktoken` se instalado; senão uma estimativa por palavras/pontuação.
+"""
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:  # pacote ausente ou sem acesso ao arquivo de vocabulário
+    _ENCODING = None
+
+_WORD_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+_HEADER_RE = re.compile(r"^═{3,}\n(.+?)\n═{3,}\n", re.MULTILINE)
+_SUB_RE = re.compile(r"^▸ ", re.MULTILINE)
+
+CONTEXT_HEADER = "CONTEXTO ATUAL DA SKILL"
+
+
+def count_tokens(text: str) -> int:
+    """Tokens do texto (tiktoken cl100k quando disponível; senão estimativa ~1.3 token/palavra)."""
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return int(len(_WORD_RE.findall(text)) * 1.3) + 1
+
+
+def split_sections(prompt: str) -> List[Tuple[str, str]]:
+    """
+    Divide o prompt em [(nome, texto)] preservando a ordem e o conteúdo exato
+    (''.join dos textos == prompt). O trecho antes do primeiro cabeçalho é "PREAMBULO";
+    blocos "▸ ..." dentro de uma seção viram sub-seções "SEÇÃO / ▸ ...".
+    """
+    sections: List[Tuple[str, str]] = []
+    headers = list(_HEADER_RE.finditer(prompt))
+    start = headers[0].start() if headers else len(prompt)
+    if start:
+        sections.append(("PREAMBULO", prompt[:start]))
+    for i, m in enumerate(headers):
+        end = headers[i + 1].start() if i + 1 < len(headers) else len(prompt)
+        title = m.group(1).strip()
+        body_start = m.end()
+        subs = list(_SUB_RE.finditer(prompt, body_start, end))
+        if not subs:
+            sections.append((title, prompt[m.start():end]))
+            continue
+        sections.append((title, prompt[m.start():subs[0].start()]))
+        for j, s in enumerate(subs):
+            s_end = subs[j + 1].start() if j + 1 < len(subs) else end
+            text = prompt[s.start():s_end]
+            first_line = text.split("\n", 1)[0].strip()
+            sections.append((f"{title} / {first_line}", text))
+    return sections
+
+
+class PromptEngine:
+    """
+    Monta as mensagens do LLM a partir de um system prompt seccionado.
+
+    `phase_drops` mapeia fase → prefixos de nomes de seção a omitir nessa fase
+    (ex.: {"qualificacao": ["FLUXO DE CONVERSA — SIGA ESTA ORDEM / ▸ FASE 3"]}).
+    """
+
+    def __init__(self, system_prompt: str, phase_drops: Optional[Dict[str, Iterable[str]]] = None):
+        self.sections = split_sections(system_prompt)
+        self.section_tokens = {name: count_tokens(text) for name, text in self.sections}
+        self.full_tokens = count_tokens(system_prompt)
+        self.phase_drops = {k: tuple(v) for k, v in (phase_drops or {}).items()}
+        self._phase_cache: Dict[Optional[str], Tuple[str, int]] = {None: (system_prompt, self.full_tokens)}
+        self._lock = threading.Lock()
+        self._stats = {"turnos": 0, "tokens_enviados": 0, "tokens_prefixo": 0,
+                       "tokens_historico": 0, "tokens_contexto": 0, "tokens_economizados_fase": 0,
+                       "ultimo_turno": None}
+
+    def system_for(self, phase: Optional[str] = None) -> Tuple[str, int]:
+        """(texto, tokens) do system prompt para a fase — idêntico entre chamadas."""
+        cached = self._phase_cache.get(phase)
+        if cached is not None:
+            return cached
+        drops = self.phase_drops.get(phase, ())
+        text = "".join(t for name, t in self.sections if not (drops and name.startswith(drops)))
+        cached = self._phase_cache[phase] = (text, count_tokens(text))
+        return cached
+
+    def build(self, history: List[dict], user_text: str, extra_context: str = "",
+              phase: Optional[str] = None) -> List[dict]:
+        """system (prefixo estável) + histórico + contexto da skill + mensagem do usuário."""
+        system, sys_tokens = self.system_for(phase)
+        messages = [{"role": "system", "content": system}]
+        messages.extend(history)
+        context_tokens = 0
+        if extra_context:
+            context = f"{CONTEXT_HEADER}\n{extra_context}"
+            context_tokens = count_tokens(context)
+            messages.append({"role": "system", "content": context})
+        messages.append({"role": "user", "content": user_text})
+
+        hist_tokens = sum(count_tokens(m.get("content") or "") for m in history)
+        turn = {
+            "fase": phase,
+            "prefixo": sys_tokens,
+            "historico": hist_tokens,
+            "contexto": context_tokens,
+            "usuario": count_tokens(user_text),
+        }
+        turn["total"] = sum(v for k, v in turn.items() if k != "fase")
+        with self._lock:
+            s = self._stats
+            s["turnos"] += 1
+            s["tokens_enviados"] += turn["total"]
+            s["tokens_prefixo"] += sys_tokens
+            s["tokens_historico"] += hist_tokens
+            s["tokens_contexto"] += context_tokens
+            s["tokens_economizados_fase"] += self.full_tokens - sys_tokens
+            s["ultimo_turno"] = turn
+        return messages
+
+    def report(self) -> List[Tuple[str, int]]:
+        """[(seção, tokens)] em ordem decrescente de tamanho."""
+        return sorted(self.section_tokens.items(), key=lambda kv: kv[1], reverse=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            s = dict(self._stats)
+        n = s["turnos"]
+        s["tokens_medio_turno"] = round(s["tokens_enviados"] / n, 1) if n else None
+        s["tokens_system_completo"] = self.full_tokens
+        s["tokenizer"] = "tiktoken" if _ENCODING is not None else "estimativa"
+        return s
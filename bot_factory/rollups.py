@@ -0,0 +1,128 @@
+"""
+rollups.py — Tabelas de métricas do dashboard, mantidas de forma incremental.
+
+O dashboard lia `SELECT * FROM historico` inteiro a cada atualização só para contar
+mensagens e montar os histogramas por hora/dia — com os bots de todos os clientes no mesmo
+banco, cada refresh relia a tabela toda. Agora ele lê só tabelas pequenas (migrações v10–v13):
+
+- metricas_mensagens_hora / metricas_mensagens_usuario: mensagens por hora ('YYYY-MM-DD HH')
+  e por usuário. refresh_messages() soma só as linhas de historico acima da marca
+  (marcas_processamento), em lotes de ROLLUP_BATCH ids por transação — o INSERT das
+  mensagens não ganha custo extra. Chamado pelo watcher a cada varredura e pelo dashboard.
+- metricas_contagem: contagens por status (assinaturas, onboarding, bots) e MRR por plano,
+  mantidas por triggers na escrita (as linhas mudam de status no lugar). Use UPDATE ou
+  INSERT ... ON CONFLICT DO UPDATE nessas tabelas: o INSERT OR REPLACE apaga a linha antiga
+  sem disparar o trigger de DELETE (recursive_triggers desligado) e a contagem diverge.
+
+Leitura: message_totals(), messages_by_hour(), messages_by_day(), messages_by_user(),
+counts(metrica) e funnel().
+"""
+import os
+import logging
+import sqlite3
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from bot_factory import db_pool
+
+logger = logging.getLogger(__name__)
+
+MESSAGES_MARK = "metricas_historico"
+ROLLUP_BATCH  = int(os.getenv("ROLLUP_BATCH", "50000"))  # ids de historico por transação
+
+
+def refresh_messages(path: Optional[str] = None, max_rows: Optional[int] = None) -> int:
+    """
+    Soma nas tabelas de métricas as mensagens acima da marca. `max_rows` limita o avanço
+    numa chamada (o dashboard não fica preso num atraso grande). Retorna quantos ids avançou.
+    """
+    try:
+        row = db_pool.fetchone("SELECT ultimo_id FROM marcas_processamento WHERE nome = ?",
+                               (MESSAGES_MARK,), path=path)
+        high = db_pool.fetchone("SELECT COALESCE(MAX(id), 0) FROM historico", path=path)[0]
+    except sqlite3.OperationalError:
+        return 0  # historico ou migração v10 ainda não existem neste banco
+    start = low = row[0] if row else 0
+    if max_rows is not None:
+        high = min(high, low + max_rows)
+    while low < high:
+        upper = min(low + ROLLUP_BATCH, high)
+        with db_pool.transaction(path) as cur:
+            cur.execute("""
+                INSERT INTO metricas_mensagens_hora (hora, mensagens)
+                SELECT replace(substr(timestamp, 1, 13), 'T', ' '), COUNT(*)
+                FROM historico WHERE id > ? AND id <= ?
+                GROUP BY 1
+                ON CONFLICT(hora) DO UPDATE SET mensagens = mensagens + excluded.mensagens
+            """, (low, upper))
+            cur.execute("""
+                INSERT INTO metricas_mensagens_usuario (user_id, mensagens, ultima_mensagem)
+                SELECT user_id, COUNT(*), MAX(timestamp)
+                FROM historico WHERE id > ? AND id <= ?
+                GROUP BY user_id
+                ON CONFLICT(user_id) DO UPDATE SET
+                    mensagens = mensagens + excluded.mensagens,
+                    ultima_mensagem = MAX(COALESCE(ultima_mensagem, ''), excluded.ultima_mensagem)
+            """, (low, upper))
+            cur.execute("""
+                INSERT INTO marcas_processamento (nome, ultimo_id, atualizado_em) VALUES (?, ?, ?)
+                ON CONFLICT(nome) DO UPDATE SET ultimo_id = excluded.ultimo_id,
+                                                atualizado_em = excluded.atualizado_em
+            """, (MESSAGES_MARK, upper, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+        low = upper
+    if high > start:
+        logger.debug(f"[Rollups] historico somado até id {high} (+{high - start})")
+    return high - start
+
+
+# ── leitura ───────────────────────────────────────────────────────
+
+def message_totals(path: Optional[str] = None) -> Tuple[int, int]:
+    """(total de mensagens, usuários com mensagens)."""
+    row = db_pool.fetchone("SELECT COALESCE(SUM(mensagens), 0), COUNT(*) FROM metricas_mensagens_usuario",
+                           path=path)
+    return row[0], row[1]
+
+
+def messages_by_hour(path: Optional[str] = None) -> List[Tuple[str, int]]:
+    """Mensagens por hora do dia ('HH:00'), somando todos os dias."""
+    rows = db_pool.fetchall("""
+        SELECT substr(hora, 12, 2) || ':00' AS hora, SUM(mensagens) AS mensagens
+        FROM metricas_mensagens_hora GROUP BY 1 ORDER BY 1
+    """, path=path)
+    return [(r[0], r[1]) for r in rows]
+
+
+def messages_by_day(path: Optional[str] = None) -> List[Tuple[str, int]]:
+    rows = db_pool.fetchall("""
+        SELECT substr(hora, 1, 10) AS dia, SUM(mensagens) AS mensagens
+        FROM metricas_mensagens_hora GROUP BY 1 ORDER BY 1
+    """, path=path)
+    return [(r[0], r[1]) for r in rows]
+
+
+def messages_by_user(path: Optional[str] = None) -> Dict[str, int]:
+    rows = db_pool.fetchall("SELECT user_id, mensagens FROM metricas_mensagens_usuario", path=path)
+    return {r[0]: r[1] for r in rows}
+
+
+def counts(metrica: str, path: Optional[str] = None) -> Dict[str, Tuple[int, float]]:
+    """chave → (total, valor) de uma métrica de metricas_contagem (ex.: 'bots_status', 'mrr_plano')."""
+    rows = db_pool.fetchall("SELECT chave, total, valor FROM metricas_contagem WHERE metrica = ? AND total > 0",
+                            (metrica,), path=path)
+    return {r[0]: (r[1], r[2]) for r in rows}
+
+
+def funnel(path: Optional[str] = None) -> List[Tuple[str, int]]:
+    """Funil lead → onboarding → cliente ativo → bot no ar, a partir das contagens."""
+    def total(metrica, *keys):
+        values = counts(metrica, path)
+        return sum(v[0] for k, v in values.items() if not keys or k in keys)
+    return [
+        ("Leads", total("assinaturas_status")),
+        ("Onboarding iniciado", total("onboarding_status")),
+        ("Onboarding completo", total("onboarding_status", "completo")),
+        ("Clientes ativos", total("assinaturas_status", "ativo")),
+        ("Bots no ar", total("bots_status", "active")),
+    ]
+
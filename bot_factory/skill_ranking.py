@@ -0,0 +1,89 @@
+"""
+skill_ranking.py — Ranking de skills por nicho para o skill_selector, sem N+1 no SQLite.
+
+select_skills chamava get_skill_score uma vez por skill candidata (uma consulta cada) e
+record_skill_usage uma vez por skill escolhida (um commit cada). Agora:
+
+- scores(nicho) busca os scores de TODAS as skills do nicho numa consulta
+  (db_factory.get_skill_scores) e guarda em memória; skills sem histórico ficam com o
+  score neutro. O custo da seleção não cresce com o tamanho da biblioteca.
+- O cache é invalidado pelo ciclo de aprendizado (learning.run_learning_cycle chama
+  invalidate() ao terminar) e expira em SKILL_SCORES_TTL como rede de segurança, para
+  ciclos rodados por outro processo.
+- record_usage() grava o uso das skills escolhidas numa única transação (executemany).
+  total_usos não entra no score, então registrar uso não invalida o cache.
+"""
+import os
+import time
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from bot_factory.db_factory import NEUTRAL_SKILL_SCORE, get_skill_scores, record_skills_usage
+
+logger = logging.getLogger(__name__)
+
+SCORES_TTL = float(os.getenv("SKILL_SCORES_TTL", "3600"))
+
+
+class SkillRanking:
+    """Scores por nicho em cache, carregados com uma consulta por nicho."""
+
+    def __init__(self, ttl: float = SCORES_TTL):
+        self.ttl = ttl
+        self._cache: Dict[str, Tuple[float, Dict[str, float]]] = {}  # nicho → (carregado_em, scores)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "consultas": 0, "invalidacoes": 0}
+
+    def scores(self, nicho: str) -> Dict[str, float]:
+        entry = self._cache.get(nicho)
+        if entry and time.monotonic() - entry[0] < self.ttl:
+            with self._lock:
+                self._stats["hits"] += 1
+            return entry[1]
+        scores = get_skill_scores(nicho)
+        with self._lock:
+            self._cache[nicho] = (time.monotonic(), scores)
+            self._stats["consultas"] += 1
+        return scores
+
+    def rank(self, nicho: str, candidates: Iterable[str]) -> List[Tuple[str, float]]:
+        """Candidatas ordenadas por score (maior primeiro; empate mantém a ordem da lista)."""
+        scores = self.scores(nicho)
+        scored = [(s, scores.get(s, NEUTRAL_SKILL_SCORE)) for s in candidates]
+        scored.sort(key=lambda x: x[1], reverse=True)
+        return scored
+
+    def record_usage(self, nicho: str, skills: Iterable[str]):
+        record_skills_usage(nicho, list(skills))
+
+    def invalidate(self, nicho: Optional[str] = None):
+        """Descarta os scores de um nicho (ou de todos) — chamado após o aprendizado."""
+        with self._lock:
+            if nicho is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(nicho, None)
+            self._stats["invalidacoes"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "nichos_em_cache": len(self._cache)}
+
+
+_ranking: Optional[SkillRanking] = None
+_ranking_lock = threading.Lock()
+
+
+def get_ranking() -> SkillRanking:
+    """Ranking compartilhado do processo."""
+    global _ranking
+    if _ranking is None:
+        with _ranking_lock:
+            if _ranking is None:
+                _ranking = SkillRanking()
+    return _ranking
+
+
+def invalidate(nicho: Optional[str] = None):
+    get_ranking().invalidate(nicho)
@@ -1,11 +1,10 @@
 """
 skill_selector.py — Seleciona as skills certas da biblioteca com base em nicho + plano + aprendizado.
 """
-import os
-import json
 from typing import List
 from bot_factory.plan_resolver import resolve
-from bot_factory.db_factory import get_skill_score, record_skill_usage
+from bot_factory.skills_registry import get_registry
+from bot_factory.skill_ranking import get_ranking
 
 # Mapeamento nicho → skills disponíveis (name = pasta dentro de skills_library/)
 NICHE_SKILLS = {
@@ -95,52 +94,28 @@ def select_skills(nicho: str, plano: str) -> List[str]:
     if not has_agenda:
         candidates = [s for s in candidates if "agendamento" not in s]
 
-    # Ordena por score de aprendizado (maior = melhor)
-    scored = [(s, get_skill_score(nicho_key, s)) for s in candidates]
-    scored.sort(key=lambda x: x[1], reverse=True)
+    # Ordena por score de aprendizado (maior = melhor) — uma consulta por nicho, em cache
+    ranking = get_ranking()
+    scored = ranking.rank(nicho_key, candidates)
 
     # Aplica limite do plano
     top_skills = [s for s, _ in scored[:max_nicho]]
     selected.extend(top_skills)
 
-    # Registra uso no learning
-    for skill in top_skills:
-        record_skill_usage(nicho_key, skill)
+    # Registra uso no learning (uma transação para todas)
+    ranking.record_usage(nicho_key, top_skills)
 
     return selected
 
 
 def get_skill_meta(skill_name: str) -> dict:
-    """Lê o meta.json de uma skill da biblioteca."""
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    # Tenta na pasta base primeiro, depois nas subpastas de nicho
-    paths_to_try = [
-        os.path.join(base_dir, "skills_library", "_base", skill_name, "meta.json"),
-    ]
-    for nicho_folder in NICHE_SKILLS:
-        paths_to_try.append(
-            os.path.join(base_dir, "skills_library", nicho_folder, skill_name, "meta.json")
-        )
-
-    for path in paths_to_try:
-        if os.path.exists(path):
-            with open(path, "r", encoding="utf-8") as f:
-                return json.load(f)
-    return {"name": skill_name, "title": skill_name, "description": ""}
+    """Meta.json de uma skill da biblioteca (índice em memória — ver skills_registry)."""
+    return get_registry().meta(skill_name)
 
 
 def load_skill_instructions(skill_name: str) -> str:
     """
-    Carrega as instruções de prompt de uma skill (arquivo instructions.txt ou do meta.json).
+    Instruções de prompt de uma skill (instructions.txt ou, na falta, do meta.json).
     Usado pelo prompt_builder para injetar comportamentos no system prompt.
     """
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    all_folders = ["_base"] + list(NICHE_SKILLS.keys())
-    for folder in all_folders:
-        instr_path = os.path.join(base_dir, "skills_library", folder, skill_name, "instructions.txt")
-        if os.path.exists(instr_path):
-            with open(instr_path, "r", encoding="utf-8") as f:
-                return f.read().strip()
-    # Fallback: usa description do meta.json
-    meta = get_skill_meta(skill_name)
-    return meta.get("prompt_instruction", meta.get("description", ""))
+    return get_registry().instructions(skill_name)
@@ -0,0 +1,212 @@
+"""
+skills_registry.py — Índice em memória da biblioteca de skills (bot_factory/skills_library).
+
+skill_selector.get_skill_meta / load_skill_instructions testavam até dez caminhos com
+os.path.exists por skill e reliam + reparseavam os arquivos a cada chamada — e o
+prompt_builder chama isso para cada skill selecionada em todo build.
+
+- A biblioteca é varrida uma vez: nome → Skill(meta, instruções), lookup O(1) num dict.
+  Pastas: `_base` primeiro, depois os nichos em ordem alfabética; nome repetido → vale o
+  primeiro (e um aviso no log).
+- Cada meta.json é validado contra META_SCHEMA (campos obrigatórios e tipos). Inválido →
+  a skill entra com o meta padrão e o erro fica em `errors`, como antes quando o arquivo
+  não existia.
+- Instruções já resolvidas no carregamento: instructions.txt, senão prompt_instruction,
+  senão description do meta.
+- Recarga por mtime: no máximo uma vez a cada SKILLS_REFRESH_SECONDS o registro confere
+  o mtime de pastas e arquivos (um scandir por pasta); se algo mudou, reconstrói o índice
+  inteiro e troca a referência de uma vez.
+"""
+import os
+import json
+import time
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SKILLS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "skills_library")
+BASE_FOLDER = "_base"
+REFRESH_SECONDS = float(os.getenv("SKILLS_REFRESH_SECONDS", "2"))
+
+# campo → (tipo, obrigatório)
+META_SCHEMA = {
+    "name":               (str, True),
+    "title":              (str, True),
+    "description":        (str, True),
+    "triggers":           (list, False),
+    "priority":           (int, False),
+    "prompt_instruction": (str, False),
+}
+
+
+@dataclass(frozen=True)
+class Skill:
+    name: str
+    folder: str
+    meta: dict
+    instructions: str
+
+
+def default_meta(skill_name: str) -> dict:
+    return {"name": skill_name, "title": skill_name, "description": ""}
+
+
+def validate_meta(meta, skill_name: str) -> List[str]:
+    """Erros do meta.json em relação a META_SCHEMA (lista vazia = válido)."""
+    if not isinstance(meta, dict):
+        return ["meta.json não é um objeto"]
+    errors = []
+    for field, (kind, required) in META_SCHEMA.items():
+        if field not in meta:
+            if required:
+                errors.append(f"campo obrigatório ausente: {field}")
+            continue
+        value = meta[field]
+        if not isinstance(value, kind) or (kind is int and isinstance(value, bool)):
+            errors.append(f"{field} deveria ser {kind.__name__}, veio {type(value).__name__}")
+    if isinstance(meta.get("triggers"), list) and not all(isinstance(t, str) for t in meta["triggers"]):
+        errors.append("triggers deveria conter apenas strings")
+    if isinstance(meta.get("name"), str) and meta["name"] != skill_name:
+        errors.append(f"name '{meta['name']}' difere da pasta '{skill_name}'")
+    return errors
+
+
+def _read_text(path: str) -> Optional[str]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+class SkillsRegistry:
+    """Biblioteca de skills indexada por nome, recarregada quando os arquivos mudam."""
+
+    def __init__(self, root: str = SKILLS_DIR, refresh_seconds: float = REFRESH_SECONDS):
+        self.root = root
+        self.refresh_seconds = refresh_seconds
+        self._index: Dict[str, Skill] = {}
+        self._errors: Dict[str, List[str]] = {}
+        self._signature: Optional[Tuple] = None
+        self._checked = float("-inf")
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    # ── lookups ───────────────────────────────────────────────────
+    def get(self, skill_name: str) -> Optional[Skill]:
+        self._maybe_refresh()
+        return self._index.get(skill_name)
+
+    def meta(self, skill_name: str) -> dict:
+        skill = self.get(skill_name)
+        return dict(skill.meta) if skill else default_meta(skill_name)
+
+    def instructions(self, skill_name: str) -> str:
+        skill = self.get(skill_name)
+        return skill.instructions if skill else ""
+
+    def names(self) -> List[str]:
+        self._maybe_refresh()
+        return list(self._index)
+
+    @property
+    def errors(self) -> Dict[str, List[str]]:
+        self._maybe_refresh()
+        return dict(self._errors)
+
+    # ── carga ─────────────────────────────────────────────────────
+    def _folders(self) -> List[str]:
+        try:
+            folders = sorted(e.name for e in os.scandir(self.root) if e.is_dir() and not e.name.startswith("."))
+        except FileNotFoundError:
+            return []
+        if BASE_FOLDER in folders:
+            folders.remove(BASE_FOLDER)
+            folders.insert(0, BASE_FOLDER)
+        return folders
+
+    def _scan_signature(self) -> Tuple:
+        """(caminho, mtime) de pastas e arquivos: muda com skill nova, removida ou editada."""
+        entries = []
+        for folder in self._folders():
+            folder_path = os.path.join(self.root, folder)
+            entries.append((folder_path, os.stat(folder_path).st_mtime_ns))
+            for skill_dir in os.scandir(folder_path):
+                if not skill_dir.is_dir():
+                    continue
+                entries.append((skill_dir.path, skill_dir.stat().st_mtime_ns))
+                for f in os.scandir(skill_dir.path):
+                    if f.is_file():
+                        entries.append((f.path, f.stat().st_mtime_ns))
+        return tuple(sorted(entries))
+
+    def _maybe_refresh(self):
+        now = time.monotonic()
+        if now - self._checked < self.refresh_seconds:
+            return
+        with self._lock:
+            if now - self._checked < self.refresh_seconds:
+                return
+            self._checked = now
+            try:
+                signature = self._scan_signature()
+                if signature != self._signature:
+                    self._load()
+                    self._signature = signature
+            except OSError as e:  # arquivo sumindo no meio da varredura: tenta na próxima
+                logger.warning(f"[Skills] Falha ao varrer {self.root}: {e} — mantendo índice atual")
+
+    def refresh(self):
+        """Força a próxima consulta a conferir os arquivos."""
+        self._checked = float("-inf")
+        self._maybe_refresh()
+
+    def _load(self):
+        index: Dict[str, Skill] = {}
+        errors: Dict[str, List[str]] = {}
+        for folder in self._folders():
+            folder_path = os.path.join(self.root, folder)
+            for skill_name in sorted(os.listdir(folder_path)):
+                skill_path = os.path.join(folder_path, skill_name)
+                if not os.path.isdir(skill_path):
+                    continue
+                if skill_name in index:
+                    logger.warning(f"[Skills] '{skill_name}' repetida em {folder} — usando a de {index[skill_name].folder}")
+                    continue
+                meta = default_meta(skill_name)
+                raw = _read_text(os.path.join(skill_path, "meta.json"))
+                if raw is not None:
+                    try:
+                        parsed = json.loads(raw)
+                        problems = validate_meta(parsed, skill_name)
+                    except ValueError as e:
+                        problems = [f"JSON inválido: {e}"]
+                    if problems:
+                        errors[skill_name] = problems
+                        logger.warning(f"[Skills] {folder}/{skill_name}/meta.json inválido: {'; '.join(problems)}")
+                    else:
+                        meta = parsed
+                instructions = _read_text(os.path.join(skill_path, "instructions.txt"))
+                if instructions is None:
+                    instructions = meta.get("prompt_instruction", meta.get("description", ""))
+                index[skill_name] = Skill(skill_name, folder, meta, instructions.strip())
+        self._index, self._errors = index, errors  # troca atômica das referências
+        self.loads += 1
+        logger.info(f"[Skills] Biblioteca carregada: {len(index)} skills, {len(errors)} meta.json inválidos")
+
+
+_registry: Optional[SkillsRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> SkillsRegistry:
+    """Registro compartilhado do processo (skills_library do pacote)."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = SkillsRegistry()
+    return _registry
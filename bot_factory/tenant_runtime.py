@@ -0,0 +1,552 @@
+"""
+tenant_runtime.py — Runtime multi-tenant: os bots dos clientes rodam juntos em poucos
+processos, em vez de um `python bot.py` por cliente.
+
+Cada subprocesso do deployer carregava telegram, groq, httpx e dotenv e tinha o próprio
+event loop (~60–100 MB e alguns segundos de startup por cliente). Aqui:
+
+- Tenant = clients/{user_id}/config.json + o bot.py gerado (que traz o token; prompt e
+  skills ficam em prompt.json e são trocados a quente sem reiniciar o tenant).
+  O bot.py é importado como módulo isolado e o runtime usa `build_application()`,
+  `startup()` e `shutdown()` do template. Bibliotecas, pool HTTP do Groq (`get_gateway`)
+  e event loop são compartilhados; o estado de cada bot continua no próprio módulo.
+- Várias `telegram.ext.Application` no mesmo asyncio loop (polling ou webhook, ver abaixo).
+- Sharding: RUNTIME_WORKERS processos; o tenant fica no worker crc32(user_id) % workers.
+  O supervisor reinicia o worker que morrer.
+- Hot add/remove: o deployer (BOT_RUNTIME=multitenant) grava/remove
+  clients/{user_id}/tenant.json. Cada worker reconcilia a cada RUNTIME_RECONCILE_SECONDS:
+  tenant novo sobe, marcador removido derruba, bot.py/marcador alterado reinicia só
+  aquele tenant — os demais seguem atendendo.
+- Cada worker publica clients/_runtime/shard-{n}.json (PID, tenants, falhas, RSS), lido por
+  `is_tenant_running` (watcher) e `enable_tenant` (deployer).
+- Com TELEGRAM_MODE=webhook (bot_factory/webhook.py) os tenants não fazem polling: o endpoint
+  único de main.py recebe os updates e `RuntimeInbox` os encaminha, por uma conexão TCP local,
+  ao worker dono do segredo (porta e segredos publicados no shard-{n}.json).
+
+Uso: python -m bot_factory.tenant_runtime [--workers N]
+"""
+import os
+import re
+import sys
+import json
+import time
+import zlib
+import signal
+import asyncio
+import logging
+import argparse
+import importlib.util
+import multiprocessing
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot_factory import webhook
+
+logger = logging.getLogger("tenant_runtime")
+
+FACTORY_DIR = os.path.dirname(os.path.abspath(__file__))
+CLIENTS_DIR = os.path.join(os.path.dirname(FACTORY_DIR), "clients")
+STATUS_DIR  = "_runtime"        # dentro de CLIENTS_DIR
+MARKER_FILE = "tenant.json"     # clients/{user_id}/tenant.json → tenant habilitado
+
+WORKERS           = int(os.getenv("RUNTIME_WORKERS", "2"))
+RECONCILE_SECONDS = float(os.getenv("RUNTIME_RECONCILE_SECONDS", "5"))
+RETRY_SECONDS     = float(os.getenv("RUNTIME_RETRY_SECONDS", "60"))    # nova tentativa de tenant com erro
+START_CONCURRENCY = int(os.getenv("RUNTIME_START_CONCURRENCY", "20"))  # getMe/initialize simultâneos
+TELEGRAM_POOL     = int(os.getenv("RUNTIME_TELEGRAM_POOL", "4"))       # conexões HTTP por tenant (PTB: 256)
+TELEGRAM_API_URL  = os.getenv("TELEGRAM_API_URL", "")
+STOP_TIMEOUT      = 30
+INBOX_HOST        = "127.0.0.1"
+
+Version = Tuple[float, float]
+
+
+def shard_of(user_id: str, workers: int) -> int:
+    """Worker responsável pelo tenant — estável entre reinícios (não usa hash() do Python)."""
+    return zlib.crc32(str(user_id).encode()) % max(workers, 1)
+
+
+def rss_mb(pid: Optional[int] = None) -> Optional[float]:
+    """Memória residente do processo em MB (Linux via /proc; None se indisponível)."""
+    try:
+        with open(f"/proc/{pid or 'self'}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+# ── Controle (usado pelo deployer / watcher) ──────────────────────
+def _status_path(name: str, clients_dir: str = CLIENTS_DIR) -> str:
+    return os.path.join(clients_dir, STATUS_DIR, name)
+
+
+def _write_json(path: str, data: dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def _read_json(path: str) -> Optional[dict]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _shard_status(user_id: str, clients_dir: str = CLIENTS_DIR) -> Optional[dict]:
+    """Status do worker responsável pelo tenant, se o runtime estiver no ar."""
+    supervisor = _read_json(_status_path("supervisor.json", clients_dir))
+    if not supervisor:
+        return None
+    shard = shard_of(user_id, supervisor.get("workers", 1))
+    status = _read_json(_status_path(f"shard-{shard}.json", clients_dir))
+    if not status or time.time() - status.get("atualizado_em", 0) > max(3 * RECONCILE_SECONDS, 30):
+        return None
+    return status
+
+
+def enable_tenant(user_id: str, bot_path: str, clients_dir: str = CLIENTS_DIR) -> Optional[int]:
+    """
+    Habilita (ou reinicia) o tenant. Retorna o PID do worker que vai hospedá-lo,
+    ou None se o runtime não estiver rodando — o marcador fica gravado e o tenant
+    sobe assim que o runtime iniciar.
+    """
+    _write_json(os.path.join(clients_dir, user_id, MARKER_FILE),
+                {"user_id": user_id, "bot_path": bot_path, "solicitado_em": time.time()})
+    status = _shard_status(user_id, clients_dir)
+    if status is None:
+        logger.error(f"[Runtime] Runtime multi-tenant fora do ar — {user_id} sobe quando iniciar "
+                     f"(python -m bot_factory.tenant_runtime).")
+        return None
+    logger.info(f"[Runtime] Tenant {user_id} habilitado no worker {status['shard']} (PID {status['pid']}).")
+    return status["pid"]
+
+
+def disable_tenant(user_id: str, clients_dir: str = CLIENTS_DIR) -> bool:
+    """Desabilita o tenant; o worker o derruba na próxima reconciliação."""
+    try:
+        os.remove(os.path.join(clients_dir, user_id, MARKER_FILE))
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def is_tenant_running(user_id: str, clients_dir: str = CLIENTS_DIR) -> bool:
+    """True se o tenant está no ar — ou habilitado há pouco e aguardando a reconciliação."""
+    status = _shard_status(user_id, clients_dir)
+    if status is None:
+        return False
+    if user_id in status.get("tenants", {}):
+        return True
+    try:
+        marker_mtime = os.path.getmtime(os.path.join(clients_dir, user_id, MARKER_FILE))
+    except OSError:
+        return False
+    return marker_mtime > status.get("atualizado_em", 0) and user_id not in status.get("falhas", {})
+
+
+def worker_pid(user_id: str, clients_dir: str = CLIENTS_DIR) -> Optional[int]:
+    """PID do worker que hospeda o tenant, se ele estiver no ar."""
+    if not is_tenant_running(user_id, clients_dir):
+        return None
+    status = _shard_status(user_id, clients_dir)
+    return status["pid"] if status else None
+
+
+# ── Tenant ────────────────────────────────────────────────────────
+def _load_module(user_id: str, bot_path: str):
+    """Importa o bot.py gerado como módulo próprio (estado isolado por tenant)."""
+    name = "sofia_tenant_" + re.sub(r"\W", "_", user_id)
+    spec = importlib.util.spec_from_file_location(name, bot_path)
+    module = importlib.util.module_from_spec(spec)
+    saved_path = list(sys.path)  # o template insere a raiz do projeto no sys.path a cada import
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        sys.path[:] = saved_path
+    return module
+
+
+def _builder(token: str):
+    from telegram.ext import Application
+    builder = Application.builder().token(token).connection_pool_size(TELEGRAM_POOL)
+    if TELEGRAM_API_URL:
+        builder = builder.base_url(TELEGRAM_API_URL)
+    return builder
+
+
+class Tenant:
+    """Um bot de cliente rodando dentro do runtime."""
+
+    def __init__(self, user_id: str, bot_path: str, version: Version):
+        self.user_id = user_id
+        self.bot_path = bot_path
+        self.version = version
+        self.config = _read_json(os.path.join(os.path.dirname(bot_path), "config.json")) or {}
+        self.module = None
+        self.app = None
+        self.token = ""
+        self.secret: Optional[str] = None  # modo webhook
+        self.started_at: Optional[str] = None
+
+    async def start(self, router: Optional[webhook.WebhookRouter] = None):
+        module = _load_module(self.user_id, self.bot_path)
+        token = getattr(module, "BOT_TOKEN", "")
+        if not token:
+            raise RuntimeError("BOT_TOKEN vazio")
+        if not hasattr(module, "build_application"):
+            raise RuntimeError("bot.py gerado antes do runtime multi-tenant — gere o bot novamente")
+        self.module, self.token = module, token
+        self.app = module.build_application(_builder(token))
+        try:
+            await module.startup()
+            await self.app.initialize()
+            await self.app.start()
+            if router is not None and webhook.webhook_enabled():
+                self.secret = router.register(token, self.app)
+                await webhook.set_webhook(self.app, token, drop_pending=True)
+            else:
+                await self.app.updater.start_polling(drop_pending_updates=True)
+        except Exception:
+            await self.stop(router)
+            raise
+        self.started_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    async def stop(self, router: Optional[webhook.WebhookRouter] = None, delete_webhook: bool = False):
+        """Derruba o tenant. `delete_webhook`: o bot saiu do runtime (não só reiniciou)."""
+        app, module = self.app, self.module
+        steps = []
+        if self.secret and router is not None:
+            router.unregister(self.token)
+            if delete_webhook and app is not None:
+                steps.append(app.bot.delete_webhook)
+            self.secret = None
+        if app is not None:
+            if app.updater and app.updater.running:
+                steps.append(app.updater.stop)
+            if app.running:
+                steps.append(app.stop)
+            steps.append(app.shutdown)
+        if module is not None:
+            steps.append(module.shutdown)
+        for step in steps:
+            try:
+                await asyncio.wait_for(step(), STOP_TIMEOUT)
+            except Exception as e:
+                logger.warning(f"[Runtime] {self.user_id}: erro ao encerrar ({step.__qualname__}): {e}")
+        self.app = self.module = None
+
+    def info(self) -> dict:
+        return {"desde": self.started_at, "plano": self.config.get("plano"),
+                "empresa": self.config.get("empresa"), "prompt_hash": self.config.get("prompt_hash")}
+
+
+# ── Worker (um shard) ─────────────────────────────────────────────
+class TenantHost:
+    """Hospeda os tenants de um shard num único event loop."""
+
+    def __init__(self, shard: int = 0, workers: int = 1, clients_dir: str = CLIENTS_DIR):
+        self.shard = shard
+        self.workers = workers
+        self.clients_dir = clients_dir
+        self.tenants: Dict[str, Tenant] = {}
+        self.failures: Dict[str, Tuple[Version, float, str]] = {}  # uid → (versão, quando, erro)
+        self._sem = asyncio.Semaphore(START_CONCURRENCY)
+        self._stats = {"iniciados": 0, "removidos": 0, "reinicios": 0, "falhas": 0}
+        self.router = webhook.WebhookRouter()
+        self.inbox_port: Optional[int] = None
+        self._inbox = None
+
+    def desired(self) -> Dict[str, Tuple[str, Version]]:
+        """Tenants habilitados deste shard → (bot_path, versão por mtime)."""
+        out = {}
+        try:
+            entries = list(os.scandir(self.clients_dir))
+        except OSError:
+            return out
+        for entry in entries:
+            marker = os.path.join(entry.path, MARKER_FILE)
+            if not entry.is_dir() or not os.path.exists(marker):
+                continue
+            data = _read_json(marker) or {}
+            user_id = data.get("user_id") or entry.name
+            if shard_of(user_id, self.workers) != self.shard:
+                continue
+            bot_path = data.get("bot_path") or os.path.join(entry.path, "bot.py")
+            try:
+                version = (os.path.getmtime(marker), os.path.getmtime(bot_path))
+            except OSError:
+                continue  # bot.py ainda não existe
+            out[user_id] = (bot_path, version)
+        return out
+
+    async def reconcile(self):
+        desired = self.desired()
+        stale = [uid for uid, t in self.tenants.items()
+                 if uid not in desired or desired[uid][1] != t.version]
+        for uid in stale:
+            if uid in desired:
+                self._stats["reinicios"] += 1
+        await asyncio.gather(*(self.remove(uid, delete_webhook=uid not in desired) for uid in stale))
+
+        now = time.time()
+        pending = []
+        for uid, (bot_path, version) in desired.items():
+            if uid in self.tenants:
+                continue
+            failed = self.failures.get(uid)
+            if failed and failed[0] == version and now - failed[1] < RETRY_SECONDS:
+                continue
+            pending.append(self.add(uid, bot_path, version))
+        await asyncio.gather(*pending)
+        for uid in list(self.failures):
+            if uid not in desired:
+                del self.failures[uid]
+        self.write_status()
+
+    async def add(self, user_id: str, bot_path: str, version: Version) -> bool:
+        tenant = Tenant(user_id, bot_path, version)
+        async with self._sem:
+            try:
+                await tenant.start(self.router)
+            except Exception as e:
+                self.failures[user_id] = (version, time.time(), str(e)[:300])
+                self._stats["falhas"] += 1
+                logger.error(f"[Runtime] Tenant {user_id} não iniciou: {e}")
+                return False
+        self.tenants[user_id] = tenant
+        self.failures.pop(user_id, None)
+        self._stats["iniciados"] += 1
+        logger.info(f"[Runtime] Tenant {user_id} no ar (shard {self.shard}, {len(self.tenants)} tenants).")
+        return True
+
+    async def remove(self, user_id: str, delete_webhook: bool = False):
+        tenant = self.tenants.pop(user_id, None)
+        if tenant is None:
+            return
+        await tenant.stop(self.router, delete_webhook)
+        self._stats["removidos"] += 1
+        logger.info(f"[Runtime] Tenant {user_id} removido (shard {self.shard}).")
+
+    async def start_inbox(self):
+        """Servidor local que recebe os updates encaminhados por main.py (modo webhook)."""
+        if self._inbox is not None or not webhook.webhook_enabled():
+            return
+        self._inbox = await asyncio.start_server(self._on_inbox, INBOX_HOST, 0)
+        self.inbox_port = self._inbox.sockets[0].getsockname()[1]
+        logger.info(f"[Runtime] Worker {self.shard}: inbox de webhooks em {INBOX_HOST}:{self.inbox_port}")
+
+    async def _on_inbox(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                secret, body = _unpack(await reader.readexactly(int.from_bytes(await reader.readexactly(4), "big")))
+                if await self.router.dispatch(secret, secret, body) == 404:
+                    logger.debug(f"[Runtime] Update para segredo desconhecido no shard {self.shard}")
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def run(self, stop: asyncio.Event):
+        logger.info(f"[Runtime] Worker {self.shard}/{self.workers} iniciado (PID {os.getpid()}).")
+        await self.start_inbox()
+        while not stop.is_set():
+            try:
+                await self.reconcile()
+            except Exception as e:
+                logger.error(f"[Runtime] Erro na reconciliação do shard {self.shard}: {e}")
+            try:
+                await asyncio.wait_for(stop.wait(), RECONCILE_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+        await asyncio.gather(*(self.remove(uid) for uid in list(self.tenants)))
+        if self._inbox is not None:
+            self._inbox.close()
+        try:
+            os.remove(_status_path(f"shard-{self.shard}.json", self.clients_dir))
+        except OSError:
+            pass
+        logger.info(f"[Runtime] Worker {self.shard} encerrado.")
+
+    def stats(self) -> dict:
+        return {**self._stats, "shard": self.shard, "tenants": len(self.tenants),
+                "com_falha": len(self.failures), "rss_mb": rss_mb(), "webhook": self.router.stats()}
+
+    def write_status(self):
+        _write_json(_status_path(f"shard-{self.shard}.json", self.clients_dir), {
+            "pid": os.getpid(),
+            "shard": self.shard,
+            "workers": self.workers,
+            "atualizado_em": time.time(),
+            "stats": self.stats(),
+            "tenants": {uid: t.info() for uid, t in self.tenants.items()},
+            "falhas": {uid: err for uid, (_, _, err) in self.failures.items()},
+            "inbox": self.inbox_port,
+            "webhooks": {t.secret: uid for uid, t in self.tenants.items() if t.secret},
+        })
+
+
+# ── Encaminhamento de webhooks (roda no processo do endpoint, main.py) ──
+def _pack(secret: str, body: bytes) -> bytes:
+    frame = secret.encode() + b"\n" + body
+    return len(frame).to_bytes(4, "big") + frame
+
+
+def _unpack(frame: bytes) -> Tuple[str, bytes]:
+    secret, _, body = frame.partition(b"\n")
+    return secret.decode(), body
+
+
+class RuntimeInbox:
+    """
+    Fallback do WebhookRouter: entrega o update ao worker do runtime que hospeda o bot.
+    A rota segredo → worker vem dos shard-{n}.json (relidos quando um segredo não é achado);
+    uma conexão TCP local por worker, só escrita — o ack ao Telegram não espera o handler.
+    """
+
+    def __init__(self, clients_dir: str = CLIENTS_DIR, refresh_seconds: float = 1.0):
+        self.clients_dir = clients_dir
+        self.refresh_seconds = refresh_seconds
+        self._routes: Dict[str, Tuple[int, int]] = {}  # segredo → (shard, porta)
+        self._writers: Dict[int, Tuple[int, asyncio.StreamWriter]] = {}
+        self._loaded_at = 0.0
+
+    def _refresh(self, force: bool = False):
+        if not force and time.monotonic() - self._loaded_at < self.refresh_seconds:
+            return
+        self._loaded_at = time.monotonic()
+        routes = {}
+        try:
+            names = [n for n in os.listdir(os.path.join(self.clients_dir, STATUS_DIR)) if n.startswith("shard-")]
+        except OSError:
+            names = []
+        for name in names:
+            status = _read_json(os.path.join(self.clients_dir, STATUS_DIR, name)) or {}
+            if status.get("inbox"):
+                for secret in status.get("webhooks", {}):
+                    routes[secret] = (status["shard"], status["inbox"])
+        self._routes = routes
+
+    async def _writer(self, shard: int, port: int) -> asyncio.StreamWriter:
+        cached = self._writers.get(shard)
+        if cached and cached[0] == port and not cached[1].is_closing():
+            return cached[1]
+        _, writer = await asyncio.open_connection(INBOX_HOST, port)
+        self._writers[shard] = (port, writer)
+        return writer
+
+    async def __call__(self, secret: str, body: bytes) -> int:
+        if secret not in self._routes:
+            self._refresh()
+            if secret not in self._routes:
+                return 404
+        for attempt in (1, 2):
+            shard, port = self._routes[secret]
+            try:
+                writer = await self._writer(shard, port)
+                writer.write(_pack(secret, body))
+                if writer.transport.get_write_buffer_size() > 1 << 20:
+                    await writer.drain()  # worker lento: aplica backpressure
+                return 200
+            except (OSError, ConnectionError) as e:
+                self._writers.pop(shard, None)
+                self._refresh(force=True)  # worker reiniciado → porta nova
+                if attempt == 2 or secret not in self._routes:
+                    logger.warning(f"[Runtime] Worker {shard} inacessível para webhook: {e}")
+                    return 503  # o Telegram reenvia depois
+        return 503
+
+    def stats(self) -> dict:
+        return {"rotas": len(self._routes), "conexoes": len(self._writers)}
+
+
+def _setup_logging():
+    from dotenv import load_dotenv
+    load_dotenv()
+    logging.basicConfig(
+        format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+        level=logging.INFO,
+    )
+    logging.getLogger("httpx").setLevel(logging.WARNING)  # 1 linha por long-poll de cada tenant
+
+
+async def _serve(shard: int, workers: int, clients_dir: str):
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            signal.signal(sig, lambda *_: loop.call_soon_threadsafe(stop.set))
+    await TenantHost(shard, workers, clients_dir).run(stop)
+
+
+def _worker_main(shard: int, workers: int, clients_dir: str):
+    _setup_logging()
+    asyncio.run(_serve(shard, workers, clients_dir))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runtime multi-tenant dos bots de clientes")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="processos (shards)")
+    parser.add_argument("--clients-dir", default=CLIENTS_DIR)
+    args = parser.parse_args()
+    _setup_logging()
+    workers = max(args.workers, 1)
+    supervisor_file = _status_path("supervisor.json", args.clients_dir)
+    _write_json(supervisor_file, {"pid": os.getpid(), "workers": workers,
+                                  "iniciado_em": datetime.now().strftime("%Y-%m-%d %H:%M:%S")})
+    logger.info(f"[Runtime] Iniciando {workers} worker(s) em {args.clients_dir}")
+    try:
+        if workers == 1:
+            asyncio.run(_serve(0, 1, args.clients_dir))
+            return
+        _supervise(workers, args.clients_dir)
+    finally:
+        try:
+            os.remove(supervisor_file)
+        except OSError:
+            pass
+
+
+def _supervise(workers: int, clients_dir: str):
+    """Mantém um processo por shard; reinicia o que morrer."""
+    running = True
+
+    def _stop(sig, frame):
+        nonlocal running
+        running = False
+
+    signal.signal(signal.SIGINT, _stop)
+    signal.signal(signal.SIGTERM, _stop)
+
+    def _spawn(shard: int) -> multiprocessing.Process:
+        proc = multiprocessing.Process(target=_worker_main, args=(shard, workers, clients_dir),
+                                       name=f"tenant-shard-{shard}")
+        proc.start()
+        return proc
+
+    procs = {shard: _spawn(shard) for shard in range(workers)}
+    while running:
+        time.sleep(1)
+        for shard, proc in procs.items():
+            if running and not proc.is_alive():
+                logger.warning(f"[Runtime] Worker {shard} saiu (código {proc.exitcode}) — reiniciando...")
+                procs[shard] = _spawn(shard)
+    for proc in procs.values():
+        proc.terminate()  # SIGTERM → cada worker derruba seus tenants com flush do histórico
+    for proc in procs.values():
+        proc.join(STOP_TIMEOUT)
+    logger.info("[Runtime] Encerrado.")
+
+
+if __name__ == "__main__":
+    main()
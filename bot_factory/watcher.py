@@ -1,7 +1,15 @@
 """
 watcher.py — Monitor principal do Bot Factory.
 Roda em loop contínuo, verifica novos clientes ativos no DB e dispara o pipeline.
-Também executa o ciclo de aprendizado a cada 24h e verifica saúde dos bots.
+Também dispara o ciclo de aprendizado a cada 24h (em segundo plano) e verifica saúde dos bots.
+
+Orientado a eventos (bot_factory/events.py): acorda assim que `assinaturas.status` muda
+(notificação local ou commit detectado) e processa só os clientes do outbox. A varredura
+completa de pendentes (FACTORY_POLL_INTERVAL) fica como rede de segurança e o health check
+roda no próprio intervalo (FACTORY_HEALTH_INTERVAL).
+
+Os builds rodam no PipelineExecutor (bot_factory/pipeline.py): vários clientes em paralelo,
+com vagas por etapa — o loop só enfileira e volta a ouvir eventos.
 
 Uso: python -m bot_factory.watcher
   ou: python bot_factory/watcher.py
@@ -19,10 +27,13 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from dotenv import load_dotenv
 load_dotenv()
 
+from bot_factory             import db_pool
 from bot_factory.db_factory  import setup_factory_tables, get_pending_clients, get_bot_record, upsert_bot_record
-from bot_factory.pipeline    import run_pipeline
+from bot_factory.pipeline    import PipelineExecutor
 from bot_factory.deployer    import is_running, deploy_bot
-from bot_factory.learning    import run_learning_cycle
+from bot_factory              import learning
+from bot_factory.migrations  import run_migrations
+from bot_factory             import events, build_cache, rollups
 
 logging.basicConfig(
     format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
@@ -30,10 +41,14 @@ logging.basicConfig(
 )
 logger = logging.getLogger("watcher")
 
-POLL_INTERVAL    = int(os.getenv("FACTORY_POLL_INTERVAL", "60"))   # segundos entre verificações
+POLL_INTERVAL    = int(os.getenv("FACTORY_POLL_INTERVAL", "300"))  # varredura completa (rede de segurança)
+HEALTH_INTERVAL  = int(os.getenv("FACTORY_HEALTH_INTERVAL", "60"))  # health check dos bots ativos
 LEARNING_INTERVAL = 24 * 3600                                        # ciclo de aprendizado a cada 24h
+DB_PATH          = os.getenv("DB_NAME", "agencia_autovenda.db")
+SHUTDOWN_TIMEOUT = int(os.getenv("FACTORY_SHUTDOWN_TIMEOUT", "120"))  # espera builds em andamento ao encerrar
 
 _running = True
+_executor: PipelineExecutor = None
 _last_learning = datetime.now() - timedelta(hours=25)  # garante ciclo na primeira execução
 
 
@@ -45,14 +60,10 @@ def _handle_signal(sig, frame):
 
 def _health_check():
     """Verifica se bots marcados como 'active' ainda estão rodando. Reinicia se necessário."""
-    import sqlite3
-    db = os.getenv("DB_NAME", "agencia_autovenda.db")
-    conn = sqlite3.connect(db)
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-    cur.execute("SELECT user_id, bot_path, pid FROM bots_gerados WHERE status = 'active'")
-    active_bots = cur.fetchall()
-    conn.close()
+    active_bots = db_pool.fetchall(
+        "SELECT user_id, bot_path, pid FROM bots_gerados WHERE status = 'active'",
+        path=DB_PATH,
+    )
 
     for bot in active_bots:
         uid      = bot["user_id"]
@@ -67,61 +78,144 @@ def _health_check():
                 upsert_bot_record(uid, status="error", erro_msg="Falha ao reiniciar — verifique bot.log")
 
 
-def main():
+def _get_executor() -> PipelineExecutor:
+    global _executor
+    if _executor is None:
+        _executor = PipelineExecutor()
+    return _executor
+
+
+def _log_result(future):
+    result = future.result()
+    uid = result["user_id"]
+    if result["success"]:
+        steps = result["steps"]
+        logger.info(f"[Watcher] ✅ Bot de {uid} criado e ativo "
+                    f"(build={steps.get('build')}, deploy={steps.get('deploy')}).")
+        logger.info(f"[Watcher] Cache de build: {build_cache.stats()}")
+    else:
+        logger.error(f"[Watcher] ❌ Falha no pipeline de {uid}: "
+                     f"{result['steps'].get('error', 'erro desconhecido')}")
+
+
+def _build(client: dict, origem: str):
+    uid = client["user_id"]
+    future = _get_executor().submit(uid)
+    if future is None:
+        logger.debug(f"[Watcher] {uid} já está em construção — ignorado ({origem}).")
+        return
+    logger.info(f"[Watcher] ▶ Disparando pipeline para {uid} "
+                f"(plano={client.get('plano')}, nicho={client.get('nicho')}, origem={origem})")
+    future.add_done_callback(_log_result)
+
+
+def _scan_pending():
+    """Varredura completa — rede de segurança para eventos perdidos."""
+    pending = get_pending_clients()
+    if pending:
+        logger.info(f"[Watcher] {len(pending)} cliente(s) pendente(s) detectado(s).")
+        for client in pending:
+            _build(client, "varredura")
+    else:
+        logger.debug("[Watcher] Nenhum cliente novo pendente.")
+
+
+def _process_events():
+    """
+    Consome o outbox: clientes que acabaram de ficar 'ativo' vão direto para o pipeline;
+    onboarding alterado de bot já no ar passa pelo pipeline de novo (o cache de build
+    reduz a um prompt.json novo, trocado a quente).
+    """
+    pending = events.pending_events(DB_PATH)
+    if not pending:
+        return
+    activated, refreshed = [], []
+    for ev in pending:
+        uid = ev["user_id"]
+        if ev["tipo"] == "onboarding_atualizado":
+            if uid not in refreshed:
+                refreshed.append(uid)
+        elif ev["status_novo"] == "ativo" and uid not in activated:
+            activated.append(uid)
+    # Marca antes do build: um pipeline longo não reprocessa o mesmo evento
+    events.mark_processed([ev["id"] for ev in pending], DB_PATH)
+    for uid in activated:
+        for client in get_pending_clients(uid):
+            _build(client, "evento")
+    for uid in refreshed:
+        record = get_bot_record(uid)
+        if record and record["status"] == "active":
+            _build(record, "onboarding")
+
+
+def _log_learning(future):
+    try:
+        logger.info(f"[Watcher] Aprendizado: {future.result()}")
+    except Exception as e:
+        logger.error(f"[Watcher] Erro no ciclo de aprendizado: {e}", exc_info=True)
+
+
+def _loop(listener: events.EventListener):
     global _last_learning
+    last_scan = last_health = float("-inf")
+    while _running:
+        try:
+            _process_events()
+
+            now = time.monotonic()
+            if now - last_scan >= POLL_INTERVAL:
+                run_migrations(DB_PATH)  # aplica migrações adiadas (ex.: outbox antes de existir assinaturas)
+                _scan_pending()
+                events.purge_processed(DB_PATH)
+                rollups.refresh_messages(DB_PATH)  # métricas do dashboard em dia mesmo sem ele aberto
+                last_scan = time.monotonic()
+
+            if now - last_health >= HEALTH_INTERVAL:
+                _health_check()
+                last_health = time.monotonic()
+
+            # ── Ciclo de aprendizado (a cada 24h, em segundo plano) ───────
+            if (datetime.now() - _last_learning).total_seconds() >= LEARNING_INTERVAL:
+                future = learning.start_learning_cycle()
+                if future is not None:
+                    logger.info("[Watcher] Ciclo de aprendizado iniciado em segundo plano...")
+                    future.add_done_callback(_log_learning)
+                _last_learning = datetime.now()
 
+        except Exception as e:
+            logger.error(f"[Watcher] Erro no loop principal: {e}", exc_info=True)
+
+        # Dorme até o próximo evento (ou no máximo 1s, para checar o sinal de parada)
+        listener.wait(timeout=1.0)
+
+
+def main():
     # Intercepta Ctrl+C e SIGTERM
     signal.signal(signal.SIGINT,  _handle_signal)
     signal.signal(signal.SIGTERM, _handle_signal)
 
     logger.info("=" * 60)
     logger.info("  🏭 BOT FACTORY — WATCHER INICIADO")
-    logger.info(f"  Intervalo de poll: {POLL_INTERVAL}s")
+    logger.info(f"  Eventos: notificação em 127.0.0.1:{events.EVENTS_PORT} + data_version a cada "
+                f"{events.CHECK_MS}ms | varredura: {POLL_INTERVAL}s | health: {HEALTH_INTERVAL}s")
     logger.info("=" * 60)
 
     # Garante tabelas do factory no DB
     setup_factory_tables()
     logger.info("[Watcher] Tabelas do factory verificadas/criadas.")
 
-    while _running:
-        try:
-            # ── Verifica novos clientes para criar bot ──
-            pending = get_pending_clients()
-            if pending:
-                logger.info(f"[Watcher] {len(pending)} cliente(s) pendente(s) detectado(s).")
-                for client in pending:
-                    uid = client["user_id"]
-                    logger.info(f"[Watcher] ▶ Disparando pipeline para {uid} "
-                                f"(plano={client.get('plano')}, nicho={client.get('nicho')})")
-                    result = run_pipeline(uid)
-                    if result["success"]:
-                        logger.info(f"[Watcher] ✅ Bot de {uid} criado e ativo.")
-                    else:
-                        logger.error(f"[Watcher] ❌ Falha no pipeline de {uid}: "
-                                     f"{result['steps'].get('error', 'erro desconhecido')}")
-            else:
-                logger.debug("[Watcher] Nenhum cliente novo pendente.")
-
-            # ── Health check dos bots ativos ────────────
-            _health_check()
-
-            # ── Ciclo de aprendizado (a cada 24h) ───────
-            now = datetime.now()
-            if (now - _last_learning).total_seconds() >= LEARNING_INTERVAL:
-                logger.info("[Watcher] Executando ciclo de aprendizado...")
-                summary = run_learning_cycle()
-                logger.info(f"[Watcher] Aprendizado: {summary}")
-                _last_learning = now
-
-        except Exception as e:
-            logger.error(f"[Watcher] Erro no loop principal: {e}", exc_info=True)
-
-        # Aguarda antes do próximo poll
-        for _ in range(POLL_INTERVAL):
-            if not _running:
-                break
-            time.sleep(1)
-
+    listener = events.EventListener(DB_PATH)
+    listener.open()
+    try:
+        _loop(listener)
+    finally:
+        listener.close()
+        if _executor is not None:
+            logger.info("[Watcher] Aguardando pipelines em andamento...")
+            _executor.shutdown(timeout=SHUTDOWN_TIMEOUT)
+        learning.shutdown(wait=True)
+
+    db_pool.close_all()
     logger.info("[Watcher] 🛑 Watcher encerrado.")
 
 
@@ -0,0 +1,122 @@
+"""
+webhook.py — Recebimento de updates do Telegram por webhook (TELEGRAM_MODE=webhook) em vez
+de long polling, para a Sofia e para os bots de clientes.
+
+- Um único endpoint FastAPI (POST /tg/{segredo}, em main.py) recebe os updates de TODOS os
+  bots. O segredo é um HMAC do token do bot (WEBHOOK_SECRET_KEY): vai no caminho e no header
+  X-Telegram-Bot-Api-Secret-Token, conferido a cada requisição.
+- O update entra na `update_queue` da Application dona do segredo e o Telegram recebe 200
+  na hora; o processamento segue assíncrono no loop da Application.
+- Segredos que não pertencem a este processo vão para o `fallback` — em main.py, o
+  encaminhador do runtime multi-tenant (tenant_runtime.RuntimeInbox).
+
+Sem WEBHOOK_BASE_URL (URL pública https atrás do nginx) o modo volta para polling.
+"""
+import os
+import hmac
+import json
+import time
+import hashlib
+import logging
+from typing import Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+PATH_PREFIX     = "/tg"
+SECRET_HEADER   = "X-Telegram-Bot-Api-Secret-Token"
+MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))  # conexões simultâneas do Telegram por bot
+
+Fallback = Callable[[str, bytes], Awaitable[int]]
+
+_warned = False
+
+
+def webhook_enabled() -> bool:
+    """Modo webhook ativo? Lido a cada chamada: o .env pode ser carregado depois do import."""
+    global _warned
+    if os.getenv("TELEGRAM_MODE", "polling").strip().lower() != "webhook":
+        return False
+    if not os.getenv("WEBHOOK_BASE_URL"):
+        if not _warned:
+            logger.warning("[Webhook] TELEGRAM_MODE=webhook sem WEBHOOK_BASE_URL — usando polling.")
+            _warned = True
+        return False
+    return True
+
+
+def secret_for(token: str) -> str:
+    """Segredo estável por bot (caminho + header). Não expõe o token."""
+    key = os.getenv("WEBHOOK_SECRET_KEY", "") or "sofia-webhook"
+    return hmac.new(key.encode(), token.encode(), hashlib.sha256).hexdigest()[:48]
+
+
+def url_for(token: str) -> str:
+    return f"{os.getenv('WEBHOOK_BASE_URL', '').rstrip('/')}{PATH_PREFIX}/{secret_for(token)}"
+
+
+async def set_webhook(app, token: str, drop_pending: bool = False) -> str:
+    """Aponta o bot para o endpoint compartilhado. Retorna o segredo."""
+    secret = secret_for(token)
+    await app.bot.set_webhook(url_for(token), secret_token=secret,
+                              drop_pending_updates=drop_pending, max_connections=MAX_CONNECTIONS)
+    return secret
+
+
+class WebhookRouter:
+    """Segredo → Application deste processo; o resto vai para o fallback."""
+
+    def __init__(self, fallback: Optional[Fallback] = None):
+        self.fallback = fallback
+        self._apps: Dict[str, object] = {}
+        self._stats = {"recebidos": 0, "locais": 0, "encaminhados": 0,
+                       "desconhecidos": 0, "negados": 0, "invalidos": 0}
+        self._ack_total = 0.0
+
+    def register(self, token: str, app) -> str:
+        secret = secret_for(token)
+        self._apps[secret] = app
+        return secret
+
+    def unregister(self, token: str):
+        self._apps.pop(secret_for(token), None)
+
+    def secrets(self):
+        return list(self._apps)
+
+    async def dispatch(self, secret: str, header: str, body: bytes) -> int:
+        """Entrega o update e devolve o status HTTP da resposta ao Telegram."""
+        t0 = time.perf_counter()
+        self._stats["recebidos"] += 1
+        try:
+            if not hmac.compare_digest(header or "", secret):
+                self._stats["negados"] += 1
+                return 403
+            app = self._apps.get(secret)
+            if app is None:
+                if self.fallback is None:
+                    self._stats["desconhecidos"] += 1
+                    return 404
+                status = await self.fallback(secret, body)
+                self._stats["encaminhados" if status == 200 else "desconhecidos"] += 1
+                return status
+            return self.deliver(app, body)
+        finally:
+            self._ack_total += time.perf_counter() - t0
+
+    def deliver(self, app, body: bytes) -> int:
+        """Enfileira o update na Application (sem esperar o handler)."""
+        from telegram import Update
+        try:
+            update = Update.de_json(json.loads(body), app.bot)
+        except (ValueError, TypeError) as e:
+            self._stats["invalidos"] += 1
+            logger.warning(f"[Webhook] Update inválido descartado: {e}")
+            return 400
+        app.update_queue.put_nowait(update)
+        self._stats["locais"] += 1
+        return 200
+
+    def stats(self) -> dict:
+        n = self._stats["recebidos"]
+        return {**self._stats, "bots": len(self._apps), "modo": "webhook" if webhook_enabled() else "polling",
+                "ack_medio_ms": round(self._ack_total / n * 1000, 3) if n else None}
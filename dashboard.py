@@ -2,43 +2,112 @@ import streamlit as st
 import sqlite3
 import pandas as pd
 import plotly.express as px
+import html
 import json
 import os
+import sys
+import threading
+
+from bot_factory import history_browser, rollups
 
 # ─── Configuração da Página ───────────────────────────────────────────────────
 st.set_page_config(page_title="Sofia — Painel Auto-Venda", layout="wide", page_icon="🤖")
 
 DB_PATH = os.getenv('DB_NAME', os.getenv('DB_PATH', 'agencia_autovenda.db'))
+CHAT_PAGE = 50                # mensagens por página na aba Conversas
+ONB_PAGE = 100                # onboardings mais recentes detalhados na aba Onboarding
+ROLLUP_MAX_ROWS = 200_000     # linhas novas de historico somadas por atualização do painel
+CACHE_TTL = int(os.getenv('DASHBOARD_CACHE_TTL', '300'))  # s — teto de validade de uma consulta em cache
 
 # ─── Helper de leitura ───────────────────────────────────────────────────────
+# Cada rerun do Streamlit reexecuta o script inteiro. As leituras passam por st.cache_data com
+# a chave (query, params, data_version): PRAGMA data_version numa conexão só de sonda muda a
+# cada commit de qualquer outra conexão (bots, watcher, o próprio refresh de métricas), então
+# um rerun sem escrita no banco não vai ao SQLite. CACHE_TTL limita o tempo de vida das entradas.
+
+@st.cache_resource
+def _version_probe():
+    """Conexão compartilhada do processo usada só para ler PRAGMA data_version."""
+    return {"conn": None, "lock": threading.Lock()}
+
+
+def _data_version() -> int:
+    """Contador de mudanças do banco (0 se ainda não existir)."""
+    if not os.path.exists(DB_PATH):
+        return 0
+    probe = _version_probe()
+    with probe["lock"]:
+        try:
+            if probe["conn"] is None:
+                probe["conn"] = sqlite3.connect(DB_PATH, check_same_thread=False)
+            return probe["conn"].execute("PRAGMA data_version").fetchone()[0]
+        except sqlite3.Error:
+            probe["conn"] = None
+            return 0
+
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=256, show_spinner=False)
+def _cached_query(query: str, params: tuple, version: int) -> pd.DataFrame:
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        return pd.read_sql_query(query, conn, params=params)
+    finally:
+        conn.close()
+
 
 def _q(query: str, params: tuple = ()) -> pd.DataFrame:
-    """Executa query e retorna DataFrame (vazio se banco não existir)."""
+    """Executa query (via cache) e retorna DataFrame (vazio se banco não existir)."""
     if not os.path.exists(DB_PATH):
         return pd.DataFrame()
     try:
-        conn = sqlite3.connect(DB_PATH)
-        df = pd.read_sql_query(query, conn, params=params)
-        conn.close()
-        return df
+        return _cached_query(query, tuple(params), _data_version())
     except Exception as e:
         st.sidebar.warning(f"Erro DB: {e}")
         return pd.DataFrame()
 
 
+@st.cache_resource
+def _schema() -> dict:
+    """tabela → colunas, preenchido uma vez por processo (tabelas ainda inexistentes não entram)."""
+    return {}
+
+
 def _has_column(table: str, column: str) -> bool:
     """Verifica se a tabela contém a coluna (evita ORDER BY em colunas ausentes)."""
-    try:
-        if not os.path.exists(DB_PATH):
+    schema = _schema()
+    if table not in schema:
+        try:
+            if not os.path.exists(DB_PATH):
+                return False
+            conn = sqlite3.connect(DB_PATH)
+            cols = frozenset(r[1] for r in conn.execute("PRAGMA table_info(%s)" % table).fetchall())
+            conn.close()
+        except Exception:
             return False
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.cursor()
-        cur.execute("PRAGMA table_info(%s)" % table)
-        cols = [r[1] for r in cur.fetchall()]
-        conn.close()
-        return column in cols
-    except Exception:
-        return False
+        if not cols:
+            return False
+        schema[table] = cols
+    return column in schema[table]
+
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=256, show_spinner=False)
+def _cached_call(module: str, name: str, args: tuple, version: int):
+    return getattr(sys.modules[module], name)(*args, path=DB_PATH)
+
+
+def _rollup(fn, *args, default=None, **kwargs):
+    """Lê/atualiza as tabelas de métricas (bot_factory/rollups.py); default se ainda não existirem.
+    Leituras (sem kwargs) passam pelo mesmo cache por data_version das consultas — também
+    usado para as páginas de bot_factory/history_browser.py."""
+    if not os.path.exists(DB_PATH):
+        return default
+    try:
+        if kwargs:
+            return fn(*args, path=DB_PATH, **kwargs)
+        return _cached_call(fn.__module__, fn.__name__, args, _data_version())
+    except Exception as e:
+        st.sidebar.warning(f"Erro métricas: {e}")
+        return default
 
 
 def _sanitize_df_for_display(df: pd.DataFrame, string_fill: str = "-") -> pd.DataFrame:
@@ -66,285 +135,345 @@ st.sidebar.caption("Atualiza automático a cada 30s")
 st.sidebar.markdown("---")
 
 # ─── DADOS PRINCIPAIS ────────────────────────────────────────────────────────
-df_leads = _q("SELECT * FROM assinaturas ORDER BY data_inicio DESC")
-df_hist  = _q("SELECT * FROM historico ORDER BY timestamp DESC")
-df_onb   = _q("SELECT * FROM onboarding_data ORDER BY data_coleta DESC")
+# Só as métricas do cabeçalho; as tabelas de cada aba são lidas quando a aba está aberta.
 
-# ─── MÉTRICAS ────────────────────────────────────────────────────────────────
-col1, col2, col3, col4 = st.columns(4)
+# Métricas incrementais: o historico não é relido — só as mensagens novas entram nas somas
+_rollup(rollups.refresh_messages, max_rows=ROLLUP_MAX_ROWS)
+status_counts = _rollup(rollups.counts, "assinaturas_status", default={})
+mrr_plano     = _rollup(rollups.counts, "mrr_plano", default={})
+onb_counts    = _rollup(rollups.counts, "onboarding_status", default={})
+total_msg, _  = _rollup(rollups.message_totals, default=(0, 0))
 
-df_ativos_global = df_leads[df_leads["status"] == "ativo"] if not df_leads.empty else pd.DataFrame()
 
-ativos = len(df_ativos_global)
-mrr    = 0.0
-if not df_ativos_global.empty and "valor_mensal" in df_ativos_global.columns:
-    mrr = df_ativos_global["valor_mensal"].fillna(0).sum()
+def _ativos() -> pd.DataFrame:
+    """Clientes com plano ativo (usa o índice de status de assinaturas)."""
+    order = " ORDER BY data_inicio DESC" if _has_column("assinaturas", "data_inicio") else ""
+    return _q("SELECT * FROM assinaturas WHERE status = 'ativo'" + order)
 
-# Mensagens totais no histórico
-total_msg = len(df_hist) if not df_hist.empty else 0
+
+# ─── MÉTRICAS ────────────────────────────────────────────────────────────────
+col1, col2, col3, col4 = st.columns(4)
+
+ativos = status_counts.get("ativo", (0, 0.0))[0]
+mrr    = sum(valor for _, valor in mrr_plano.values())
 
 col1.metric("💳 Clientes Ativos", ativos)
 col2.metric("💰 MRR", f"R$ {mrr:,.2f}")
 col3.metric("💬 Mensagens Trocadas", total_msg)
-col4.metric("📄 Onboardings", len(df_onb) if not df_onb.empty else 0)
+col4.metric("📄 Onboardings", sum(total for total, _ in onb_counts.values()))
 
 st.markdown("---")
 
 # ─── ABAS ────────────────────────────────────────────────────────────────────
+# on_change="rerun" faz as abas guardarem estado: .open diz qual está visível e só ela consulta o banco
 tab_leads, tab_onb, tab_chat, tab_stats, tab_factory = st.tabs(
-    ["👥 Leads", "📋 Onboarding", "💬 Conversas", "📈 Estatísticas", "🏭 Bot Factory"]
+    ["👥 Leads", "📋 Onboarding", "💬 Conversas", "📈 Estatísticas", "🏭 Bot Factory"],
+    key="aba", on_change="rerun"
 )
 
 # ═══════════════════════════════════════════════════════════
 # TAB 1 — LEADS
 # ═══════════════════════════════════════════════════════════
 with tab_leads:
-    st.subheader("Lista de Leads / Clientes")
-
-    # Apenas clientes que efetivaram pagamento
-    df_ativos = df_leads[df_leads["status"] == "ativo"] if not df_leads.empty else pd.DataFrame()
-
-    if df_ativos.empty:
-        st.info("Nenhum cliente ativo ainda. Esta lista é preenchida após confirmação de pagamento.")
-    else:
-        df_view = df_ativos
-
-        # Colunas a exibir (só as que existem)
-        all_cols = ["user_id", "nome", "whatsapp_id", "plano",
-                    "status", "valor_mensal", "data_inicio"]
-        show_cols = [c for c in all_cols if c in df_view.columns]
-        st.dataframe(df_view[show_cols].fillna("-"), width='stretch')
-
-        # Distribuição por plano (apenas ativos)
-        if "plano" in df_ativos.columns:
-            plano_counts = df_ativos["plano"].fillna("sem plano").value_counts().reset_index()
-            plano_counts.columns = ["plano", "count"]
-            fig_plano = px.pie(plano_counts, names="plano", values="count",
-                               title="Clientes Ativos por Plano", hole=0.4,
-                               color_discrete_sequence=px.colors.sequential.Teal)
-            st.plotly_chart(fig_plano, width='stretch')
-
-        # Distribuição por plataforma (apenas ativos)
-        if "plataforma" in df_ativos.columns:
-            plat_counts = df_ativos["plataforma"].fillna("indefinida").value_counts().reset_index()
-            plat_counts.columns = ["plataforma", "count"]
-            fig_plat = px.bar(plat_counts, x="plataforma", y="count",
-                              title="Clientes Ativos por Plataforma", color="plataforma",
-                              color_discrete_sequence=px.colors.qualitative.Set2)
-            st.plotly_chart(fig_plat, width='stretch')
+    if tab_leads.open:
+        st.subheader("Lista de Leads / Clientes")
+
+        # Apenas clientes que efetivaram pagamento
+        df_ativos = _ativos()
+
+        if df_ativos.empty:
+            st.info("Nenhum cliente ativo ainda. Esta lista é preenchida após confirmação de pagamento.")
+        else:
+            df_view = df_ativos
+
+            # Colunas a exibir (só as que existem)
+            all_cols = ["user_id", "nome", "whatsapp_id", "plano",
+                        "status", "valor_mensal", "data_inicio"]
+            show_cols = [c for c in all_cols if c in df_view.columns]
+            st.dataframe(df_view[show_cols].fillna("-"), width='stretch')
+
+            # Distribuição e MRR por plano (apenas ativos)
+            if mrr_plano:
+                plano_counts = pd.DataFrame([(plano, total, valor) for plano, (total, valor) in mrr_plano.items()],
+                                            columns=["plano", "count", "mrr"])
+                fig_plano = px.pie(plano_counts, names="plano", values="count",
+                                   title="Clientes Ativos por Plano", hole=0.4,
+                                   color_discrete_sequence=px.colors.sequential.Teal)
+                st.plotly_chart(fig_plano, width='stretch')
+                fig_mrr = px.bar(plano_counts, x="plano", y="mrr", title="MRR por Plano (R$)", color="plano",
+                                 color_discrete_sequence=px.colors.sequential.Teal)
+                st.plotly_chart(fig_mrr, width='stretch')
+
+            # Distribuição por plataforma (apenas ativos)
+            if "plataforma" in df_ativos.columns:
+                plat_counts = df_ativos["plataforma"].fillna("indefinida").value_counts().reset_index()
+                plat_counts.columns = ["plataforma", "count"]
+                fig_plat = px.bar(plat_counts, x="plataforma", y="count",
+                                  title="Clientes Ativos por Plataforma", color="plataforma",
+                                  color_discrete_sequence=px.colors.qualitative.Set2)
+                st.plotly_chart(fig_plat, width='stretch')
 
 # ═══════════════════════════════════════════════════════════
 # TAB 2 — ONBOARDING
 # ═══════════════════════════════════════════════════════════
 with tab_onb:
-    st.subheader("Progresso de Onboarding dos Clientes")
-
-    if df_onb.empty:
-        st.info("Nenhum onboarding iniciado ainda.")
-    else:
-        # Status geral
-        status_col = "status_configuracao" if "status_configuracao" in df_onb.columns else ("status" if "status" in df_onb.columns else None)
-        if status_col:
-            s_counts = df_onb[status_col].fillna("em_progresso").value_counts().reset_index()
-            s_counts.columns = ["status", "count"]
-            fig_s = px.bar(s_counts, x="status", y="count", title="Status do Onboarding",
-                           color="status", color_discrete_sequence=px.colors.qualitative.Pastel)
-            st.plotly_chart(fig_s, width='stretch')
-
-        # Detalhe por lead
-        for _, row in df_onb.iterrows():
-            uid    = row.get("user_id", "?")
-            status = row.get("status_configuracao", "em_progresso")
-            coleta = row.get("data_coleta", "-")
-            contato = row.get("whatsapp_contato", "—")
-            website = row.get("website_cliente", "—")
-            objetivos = row.get("objetivos_ia", "—")
-
-            with st.expander(f"👤 {uid}  |  {status}  |  Data: {coleta}"):
-                colA, colB = st.columns(2)
-                with colA:
-                    st.markdown("**📱 WhatsApp:**")
-                    st.write(contato)
-                    st.markdown("**🌐 Website:**")
-                    st.write(website)
-                with colB:
-                    st.markdown("**🎯 Objetivos IA:**")
-                    st.write(objetivos)
+    if tab_onb.open:
+        st.subheader("Progresso de Onboarding dos Clientes")
+
+        order_col = next((c for c in ("data_coleta", "data_inicio") if _has_column("onboarding_data", c)), None)
+        df_onb = _q("SELECT * FROM onboarding_data" + (f" ORDER BY {order_col} DESC" if order_col else "") +
+                    " LIMIT ?", (ONB_PAGE,))
+
+        if df_onb.empty:
+            st.info("Nenhum onboarding iniciado ainda.")
+        else:
+            # Status geral
+            if onb_counts:
+                s_counts = pd.DataFrame([(status, total) for status, (total, _) in onb_counts.items()],
+                                        columns=["status", "count"])
+                fig_s = px.bar(s_counts, x="status", y="count", title="Status do Onboarding",
+                               color="status", color_discrete_sequence=px.colors.qualitative.Pastel)
+                st.plotly_chart(fig_s, width='stretch')
+
+            # Funil lead → bot no ar
+            funil = _rollup(rollups.funnel, default=[])
+            if funil:
+                df_funil = pd.DataFrame(funil, columns=["etapa", "count"])
+                fig_funil = px.funnel(df_funil, x="count", y="etapa", title="Funil de Conversão")
+                st.plotly_chart(fig_funil, width='stretch')
+
+            # Detalhe por lead (só os mais recentes)
+            total_onb = sum(total for total, _ in onb_counts.values())
+            if total_onb > len(df_onb):
+                st.caption(f"Mostrando os {len(df_onb)} onboardings mais recentes de {total_onb}.")
+            for _, row in df_onb.iterrows():
+                uid    = row.get("user_id", "?")
+                status = row.get("status_configuracao", "em_progresso")
+                coleta = row.get("data_coleta", "-")
+                contato = row.get("whatsapp_contato", "—")
+                website = row.get("website_cliente", "—")
+                objetivos = row.get("objetivos_ia", "—")
+
+                with st.expander(f"👤 {uid}  |  {status}  |  Data: {coleta}"):
+                    colA, colB = st.columns(2)
+                    with colA:
+                        st.markdown("**📱 WhatsApp:**")
+                        st.write(contato)
+                        st.markdown("**🌐 Website:**")
+                        st.write(website)
+                    with colB:
+                        st.markdown("**🎯 Objetivos IA:**")
+                        st.write(objetivos)
 
 # ═══════════════════════════════════════════════════════════
 # TAB 3 — CONVERSAS (apenas clientes ativos)
 # ═══════════════════════════════════════════════════════════
 with tab_chat:
-    st.subheader("💬 Conversas — Clientes com Plano Ativo")
-
-    # Filtra apenas clientes com status "ativo"
-    df_ativos_chat = df_leads[df_leads["status"] == "ativo"] if not df_leads.empty else pd.DataFrame()
-
-    if df_ativos_chat.empty:
-        st.info("Nenhum cliente ativo encontrado. As conversas serão exibidas após a confirmação do plano.")
-    elif df_hist.empty:
-        st.info("Nenhuma mensagem registrada ainda.")
-    else:
-        # Monta mapa user_id → nome de exibição
-        nomes = {}
-        if "nome" in df_ativos_chat.columns:
-            nomes = {
-                row["user_id"]: (row["nome"] or "").strip() or row["user_id"]
-                for _, row in df_ativos_chat.iterrows()
-            }
-
-        # IDs ativos que têm histórico
-        ids_ativos = set(df_ativos_chat["user_id"].tolist())
-        ids_com_hist = set(df_hist["user_id"].unique().tolist())
-        ids_validos = sorted(ids_ativos & ids_com_hist)
-
-        if not ids_validos:
-            st.info("Clientes ativos ainda não possuem mensagens registradas.")
-        else:
-            # Métricas gerais
-            hist_ativos = df_hist[df_hist["user_id"].isin(ids_validos)]
-            c1, c2 = st.columns(2)
-            c1.metric("Total de Mensagens (ativos)", len(hist_ativos))
-            c2.metric("Clientes com Conversa", len(ids_validos))
-
-            st.markdown("---")
-
-            # Sub-abas — uma por cliente ativo
-            tab_labels = [f"👤 {nomes.get(uid, uid)}" for uid in ids_validos]
-            sub_tabs = st.tabs(tab_labels)
+    if tab_chat.open:
+        st.subheader("💬 Conversas — Clientes com Plano Ativo")
 
-            for sub_tab, uid in zip(sub_tabs, ids_validos):
-                with sub_tab:
-                    nome_exib = nomes.get(uid, uid)
-                    plano_row = df_ativos_chat[df_ativos_chat["user_id"] == uid]
-                    plano_val = plano_row["plano"].values[0] if "plano" in plano_row.columns and len(plano_row) > 0 else "—"
-                    dt_val    = plano_row["data_inicio"].values[0] if "data_inicio" in plano_row.columns and len(plano_row) > 0 else "—"
+        # Filtra apenas clientes com status "ativo"
+        df_ativos_chat = _ativos()
 
-                    st.caption(f"Plano: **{plano_val}** · Desde: **{dt_val}**")
-
-                    chat_df = _q(
-                        "SELECT role, content, timestamp FROM historico WHERE user_id = ? ORDER BY timestamp ASC",
-                        (uid,)
+        if df_ativos_chat.empty:
+            st.info("Nenhum cliente ativo encontrado. As conversas serão exibidas após a confirmação do plano.")
+        elif not total_msg:
+            st.info("Nenhuma mensagem registrada ainda.")
+        else:
+            # Monta mapa user_id → nome de exibição
+            nomes = {}
+            if "nome" in df_ativos_chat.columns:
+                nomes = {
+                    row["user_id"]: (row["nome"] if isinstance(row["nome"], str) else "").strip() or row["user_id"]
+                    for _, row in df_ativos_chat.iterrows()
+                }
+
+            # IDs ativos que têm histórico
+            ids_ativos = set(df_ativos_chat["user_id"].tolist())
+            msgs_usuario = _rollup(rollups.messages_by_user, default={})
+            ids_com_hist = set(msgs_usuario)
+            ids_validos = sorted(ids_ativos & ids_com_hist)
+
+            if not ids_validos:
+                st.info("Clientes ativos ainda não possuem mensagens registradas.")
+            else:
+                # Métricas gerais
+                c1, c2 = st.columns(2)
+                c1.metric("Total de Mensagens (ativos)", sum(msgs_usuario[uid] for uid in ids_validos))
+                c2.metric("Clientes com Conversa", len(ids_validos))
+
+                st.markdown("---")
+
+                # Um cliente por vez (selectbox pesquisável, não uma sub-aba por cliente) e só uma
+                # página da conversa: keyset por (timestamp, id) em history_browser.page
+                uid = st.selectbox("Cliente", ids_validos, key="chat_cliente",
+                                   format_func=lambda u: f"👤 {nomes.get(u, u)} ({msgs_usuario.get(u, 0)} msgs)")
+                nome_exib = nomes.get(uid, uid)
+                plano_row = df_ativos_chat[df_ativos_chat["user_id"] == uid]
+                plano_val = plano_row["plano"].values[0] if "plano" in plano_row.columns and len(plano_row) > 0 else "—"
+                dt_val    = plano_row["data_inicio"].values[0] if "data_inicio" in plano_row.columns and len(plano_row) > 0 else "—"
+
+                st.caption(f"Plano: **{plano_val}** · Desde: **{dt_val}**")
+
+                def _bubble(msg: dict, sender: str):
+                    is_user = msg["role"] == "user"
+                    bg      = "#dcf8c6" if is_user else "#f0f0f0"
+                    align   = "right" if is_user else "left"
+                    st.markdown(
+                        f"""<div style="background:{bg}; padding:10px 14px; border-radius:12px;
+                            margin:4px 0; max-width:75%; float:{align}; clear:both;
+                            border:1px solid #ccc; font-size:0.95em">
+                            <b>{html.escape(sender)}</b><br>{html.escape(msg['content'] or '')}
+                            <br><small style="color:#888">{html.escape(str(msg['timestamp']))}</small>
+                        </div>""",
+                        unsafe_allow_html=True,
                     )
 
-                    if chat_df.empty:
+                busca = st.text_input("🔎 Buscar nas mensagens", key=f"chat_busca_{uid}").strip()
+                if busca:
+                    # Busca: FTS5 em todo o historico se historico_fts existir, senão LIKE nesta conversa
+                    if _rollup(history_browser.search_available, default=False):
+                        so_cliente = st.checkbox("Só neste cliente", value=True, key=f"chat_busca_so_{uid}")
+                    else:
+                        so_cliente = True
+                        st.caption("Busca nesta conversa (LIKE). Para buscar em todos os clientes, ligue HISTORICO_FTS=1.")
+                    cursores = st.session_state.setdefault(f"chat_busca_cursores_{uid}_{busca}", [])
+                    achadas, proximo = _rollup(history_browser.search, busca, uid if so_cliente else None,
+                                               cursores[-1] if cursores else None, CHAT_PAGE, default=([], None))
+                    if not achadas:
+                        st.info("Nenhuma mensagem encontrada.")
+                    for msg in achadas:
+                        st.caption(f"👤 {nomes.get(msg['user_id'], msg['user_id'])} · {msg['timestamp']}")
+                        _bubble(msg, nome_exib if msg["role"] == "user" else "Sofia 🤖")
+                    st.markdown('<div style="clear:both"></div>', unsafe_allow_html=True)
+                    b1, b2 = st.columns(2)
+                    if cursores and b1.button("⬅️ Resultados anteriores", key=f"chat_busca_volta_{uid}"):
+                        cursores.pop()
+                        st.rerun()
+                    if proximo is not None and b2.button("Mais resultados ➡️", key=f"chat_busca_mais_{uid}"):
+                        cursores.append(proximo)
+                        st.rerun()
+                else:
+                    # Pilha de cursores: vazio = página mais recente; cada "anteriores" empilha um
+                    cursores = st.session_state.setdefault(f"chat_cursores_{uid}", [])
+                    mensagens, anterior = _rollup(history_browser.page, uid, cursores[-1] if cursores else None,
+                                                  CHAT_PAGE, default=([], None))
+                    b1, b2 = st.columns(2)
+                    if anterior is not None and b1.button("⬆️ Mensagens anteriores", key=f"chat_antes_{uid}"):
+                        cursores.append(anterior)
+                        st.rerun()
+                    if cursores and b2.button("⬇️ Mais recentes", key=f"chat_depois_{uid}"):
+                        cursores.pop()
+                        st.rerun()
+
+                    if not mensagens:
                         st.info("Sem mensagens para este cliente.")
                     else:
-                        for _, row in chat_df.iterrows():
-                            is_user = row["role"] == "user"
-                            bg      = "#dcf8c6" if is_user else "#f0f0f0"
-                            align   = "right" if is_user else "left"
-                            sender  = nome_exib if is_user else "Sofia 🤖"
-                            st.markdown(
-                                f"""<div style="background:{bg}; padding:10px 14px; border-radius:12px;
-                                    margin:4px 0; max-width:75%; float:{align}; clear:both;
-                                    border:1px solid #ccc; font-size:0.95em">
-                                    <b>{sender}</b><br>{row['content']}
-                                    <br><small style="color:#888">{row['timestamp']}</small>
-                                </div>""",
-                                unsafe_allow_html=True,
-                            )
+                        st.caption(f"Página {len(cursores) + 1} · {len(mensagens)} de {msgs_usuario.get(uid, 0)} mensagens")
+                        for msg in mensagens:
+                            _bubble(msg, nome_exib if msg["role"] == "user" else "Sofia 🤖")
                         st.markdown('<div style="clear:both"></div>', unsafe_allow_html=True)
 
 # ═══════════════════════════════════════════════════════════
 # TAB 4 — ESTATÍSTICAS
 # ═══════════════════════════════════════════════════════════
 with tab_stats:
-    st.subheader("Análise de Atividade")
-
-    if df_hist.empty:
-        st.info("Sem dados de mensagens para análise.")
-    else:
-        df_hist_copy = df_hist.copy()
-        df_hist_copy["timestamp"] = pd.to_datetime(df_hist_copy["timestamp"], errors="coerce")
-        df_hist_copy = df_hist_copy.dropna(subset=["timestamp"])
-
-        # Volume por hora
-        df_hist_copy["hora"] = df_hist_copy["timestamp"].dt.strftime("%H:00")
-        msg_hora = df_hist_copy.groupby("hora").size().reset_index(name="mensagens")
-        fig_hora = px.area(msg_hora, x="hora", y="mensagens",
-                           title="Volume de Mensagens por Hora",
-                           color_discrete_sequence=["#00CC96"])
-        st.plotly_chart(fig_hora, width='stretch')
-
-        # Volume por dia
-        df_hist_copy["dia"] = df_hist_copy["timestamp"].dt.date
-        msg_dia = df_hist_copy.groupby("dia").size().reset_index(name="mensagens")
-        fig_dia = px.bar(msg_dia, x="dia", y="mensagens",
-                         title="Mensagens por Dia",
-                         color_discrete_sequence=["#636EFA"])
-        st.plotly_chart(fig_dia, width='stretch')
-
-    # Nichosde mais frequentes entre os leads qualificados
-    if not df_ativos_global.empty and "nicho" in df_ativos_global.columns:
-        nicho_c = df_ativos_global["nicho"].dropna().value_counts().head(10).reset_index()
-        nicho_c.columns = ["nicho", "count"]
-        fig_nicho = px.bar(nicho_c, x="count", y="nicho", orientation="h",
-                           title="Top Nichos (Clientes Ativos)",
-                           color="count", color_continuous_scale="Tealgrn")
-        st.plotly_chart(fig_nicho, width='stretch')
+    if tab_stats.open:
+        st.subheader("Análise de Atividade")
+
+        if not total_msg:
+            st.info("Sem dados de mensagens para análise.")
+        else:
+            # Volume por hora (metricas_mensagens_hora — algumas centenas de linhas, não o historico)
+            msg_hora = pd.DataFrame(_rollup(rollups.messages_by_hour, default=[]), columns=["hora", "mensagens"])
+            fig_hora = px.area(msg_hora, x="hora", y="mensagens",
+                               title="Volume de Mensagens por Hora",
+                               color_discrete_sequence=["#00CC96"])
+            st.plotly_chart(fig_hora, width='stretch')
+
+            # Volume por dia
+            msg_dia = pd.DataFrame(_rollup(rollups.messages_by_day, default=[]), columns=["dia", "mensagens"])
+            fig_dia = px.bar(msg_dia, x="dia", y="mensagens",
+                             title="Mensagens por Dia",
+                             color_discrete_sequence=["#636EFA"])
+            st.plotly_chart(fig_dia, width='stretch')
+
+        # Nichosde mais frequentes entre os leads qualificados
+        nicho_c = pd.DataFrame()
+        if _has_column("assinaturas", "nicho"):
+            nicho_c = _q("SELECT nicho, COUNT(*) AS count FROM assinaturas "
+                         "WHERE status = 'ativo' AND nicho IS NOT NULL "
+                         "GROUP BY nicho ORDER BY count DESC LIMIT 10")
+        if not nicho_c.empty:
+            fig_nicho = px.bar(nicho_c, x="count", y="nicho", orientation="h",
+                               title="Top Nichos (Clientes Ativos)",
+                               color="count", color_continuous_scale="Tealgrn")
+            st.plotly_chart(fig_nicho, width='stretch')
 
 # ═══════════════════════════════════════════════════════════
 # TAB 5 — BOT FACTORY
 # ═══════════════════════════════════════════════════════════
 with tab_factory:
-    st.subheader("🏭 Bot Factory — Bots Gerados Automaticamente")
-
-    if _has_column('bots_gerados', 'criado_em'):
-        df_bots = _q("SELECT * FROM bots_gerados ORDER BY criado_em DESC")
-    else:
-        df_bots = _q("SELECT * FROM bots_gerados")
-
-    if _has_column('skills_performance', 'score'):
-        df_skills = _q("SELECT * FROM skills_performance ORDER BY score DESC")
-    else:
-        df_skills = _q("SELECT * FROM skills_performance")
-
-    if df_bots.empty:
-        st.info("Nenhum bot gerado ainda. O Factory cria bots automaticamente quando um cliente fica ativo.")
-    else:
-        # Métricas
-        total_bots  = len(df_bots)
-        ativos_bots = len(df_bots[df_bots["status"] == "ativo"]) if "status" in df_bots.columns else 0
-        erros_bots  = len(df_bots[df_bots["status"] == "erro"]) if "status" in df_bots.columns else 0
-
-        c1, c2, c3 = st.columns(3)
-        c1.metric("Total de Bots", total_bots)
-        c2.metric("✅ Ativos", ativos_bots)
-        c3.metric("❌ Com Erro", erros_bots)
+    if tab_factory.open:
+        st.subheader("🏭 Bot Factory — Bots Gerados Automaticamente")
 
-        st.markdown("---")
+        if _has_column('bots_gerados', 'criado_em'):
+            df_bots = _q("SELECT * FROM bots_gerados ORDER BY criado_em DESC")
+        else:
+            df_bots = _q("SELECT * FROM bots_gerados")
+
+        if _has_column('skills_performance', 'score'):
+            df_skills = _q("SELECT * FROM skills_performance ORDER BY score DESC")
+        else:
+            df_skills = _q("SELECT * FROM skills_performance")
+
+        bots_counts = _rollup(rollups.counts, "bots_status", default={})
 
-        # Tabela de bots
-        show_cols = [c for c in ["user_id", "plano", "nicho", "status", "bot_username",
-                                  "skills_ativas", "criado_em", "ultimo_restart"] if c in df_bots.columns]
-        st.dataframe(df_bots[show_cols].fillna("-"), width='stretch')
-
-        # Gráfico status dos bots
-        if "status" in df_bots.columns:
-            st.markdown("#### Status dos Bots")
-            s_bots = df_bots["status"].fillna("desconhecido").value_counts().reset_index()
-            s_bots.columns = ["status", "count"]
-            fig_bots = px.pie(s_bots, names="status", values="count", hole=0.4,
-                              color_discrete_sequence=px.colors.qualitative.Bold)
-            st.plotly_chart(fig_bots, width='stretch')
-
-    # Skills Performance
-    st.markdown("---")
-    st.subheader("🧠 Performance das Skills (Learning Engine)")
-    if df_skills.empty:
-        st.info("Dados de performance ainda não disponíveis. O Learning Engine roda após 24h de operação.")
-    else:
-        show_sk = [c for c in ["skill_name", "nicho", "score", "usos", "taxa_retencao",
-                                "taxa_escalacao", "ultima_atualizacao"] if c in df_skills.columns]
-        st.dataframe(df_skills[show_sk].fillna("-"), width='stretch')
-
-        if "score" in df_skills.columns and "skill_name" in df_skills.columns:
-            top_skills = df_skills.head(15)
-            fig_sk = px.bar(top_skills, x="score", y="skill_name", orientation="h",
-                            title="Top 15 Skills por Score", color="score",
-                            color_continuous_scale="Tealgrn")
-            st.plotly_chart(fig_sk, width='stretch')
+        if df_bots.empty:
+            st.info("Nenhum bot gerado ainda. O Factory cria bots automaticamente quando um cliente fica ativo.")
+        else:
+            # Métricas (contagens por status mantidas por trigger)
+            total_bots  = sum(total for total, _ in bots_counts.values()) or len(df_bots)
+            ativos_bots = bots_counts.get("active", (0, 0.0))[0]
+            erros_bots  = bots_counts.get("error", (0, 0.0))[0]
+
+            c1, c2, c3 = st.columns(3)
+            c1.metric("Total de Bots", total_bots)
+            c2.metric("✅ Ativos", ativos_bots)
+            c3.metric("❌ Com Erro", erros_bots)
+
+            st.markdown("---")
+
+            # Tabela de bots
+            show_cols = [c for c in ["user_id", "plano", "nicho", "status", "bot_username",
+                                      "skills_ativas", "criado_em", "ultimo_restart"] if c in df_bots.columns]
+            st.dataframe(df_bots[show_cols].fillna("-"), width='stretch')
+
+            # Gráfico status dos bots
+            if bots_counts:
+                st.markdown("#### Status dos Bots")
+                s_bots = pd.DataFrame([(status, total) for status, (total, _) in bots_counts.items()],
+                                      columns=["status", "count"])
+                fig_bots = px.pie(s_bots, names="status", values="count", hole=0.4,
+                                  color_discrete_sequence=px.colors.qualitative.Bold)
+                st.plotly_chart(fig_bots, width='stretch')
+
+        # Skills Performance
+        st.markdown("---")
+        st.subheader("🧠 Performance das Skills (Learning Engine)")
+        if df_skills.empty:
+            st.info("Dados de performance ainda não disponíveis. O Learning Engine roda após 24h de operação.")
+        else:
+            show_sk = [c for c in ["skill_name", "nicho", "score", "usos", "taxa_retencao",
+                                    "taxa_escalacao", "ultima_atualizacao"] if c in df_skills.columns]
+            st.dataframe(df_skills[show_sk].fillna("-"), width='stretch')
+
+            if "score" in df_skills.columns and "skill_name" in df_skills.columns:
+                top_skills = df_skills.head(15)
+                fig_sk = px.bar(top_skills, x="score", y="skill_name", orientation="h",
+                                title="Top 15 Skills por Score", color="score",
+                                color_continuous_scale="Tealgrn")
+                st.plotly_chart(fig_sk, width='stretch')
 
 # ─── Auto-refresh ────────────────────────────────────────────────────────────
 st.markdown("---")
@@ -2,20 +2,30 @@ import os
 import sys
 import logging
 import asyncio
-import sqlite3
 from datetime import datetime
-from groq import Groq
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from telegram import Update
 from telegram.constants import ChatAction
 from telegram.ext import Application, CommandHandler, MessageHandler, filters
-from collections import defaultdict
 
 # Adiciona a raiz do projeto ao path para importar skills
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+from bot_factory import db_pool, events, history_browser
+from bot_factory.history_writer import HistoryWriter
+from bot_factory.storage import database_url, get_storage
+from bot_factory.conversation_store import ConversationStore, load_recent
+from bot_factory.migrations import run_migrations
+from bot_factory.llm_gateway import get_gateway, stream_reply
+from bot_factory.mailbox import UserMailbox
+from bot_factory.prompt_engine import PromptEngine
+from bot_factory.hook_runner import Hook, HookRunner
+from bot_factory.lead_state import lead_states
+from bot_factory.webhook import WebhookRouter, PATH_PREFIX as WEBHOOK_PATH, SECRET_HEADER, set_webhook, webhook_enabled
+from bot_factory.tenant_runtime import RuntimeInbox
+
 # Importa hooks determinísticos das skills
 try:
     from skills.brand_identity.run import run as brand_hook
@@ -28,9 +38,9 @@ except Exception:
     lead_hook = None
 
 try:
-    from skills.proposals.run import run as proposals_hook
+    from skills.proposals.run import run as proposals_hook, CHECKOUT_CACHE
 except Exception:
-    proposals_hook = None
+    proposals_hook = CHECKOUT_CACHE = None
 
 # Configuração de Logs
 logging.basicConfig(
@@ -47,15 +57,28 @@ GROQ_KEY = os.getenv('GROQ_API_KEY')
 GROQ_MODEL = 'llama-3.3-70b-versatile'
 DB_PATH = os.getenv('DB_NAME', 'agencia_autovenda.db')
 
-# Histórico de conversa por usuário (em memória)
-conversation_history: dict[str, list] = defaultdict(list)
+# Banco do histórico de conversa (bot_factory/storage.py): DATABASE_URL, ou o SQLite de DB_PATH
+storage = get_storage(database_url(DB_PATH))
+
+# Histórico de conversa por usuário (em memória, limitado — LRU/TTL com reidratação do DB)
 MAX_HISTORY = 20
+conversation_history = ConversationStore(
+    max_turns=MAX_HISTORY,
+    aloader=lambda uid, limit: load_recent(storage, uid, limit),
+)
 
-# Configuração do Cliente Groq
+# Persistência do histórico em lote (write-behind) — não bloqueia o event loop.
+history_writer = HistoryWriter(DB_PATH, storage=storage)
+
+# Webhook único (TELEGRAM_MODE=webhook): Sofia local, bots de clientes via runtime multi-tenant
+webhook_runtime = RuntimeInbox()
+webhook_router = WebhookRouter(fallback=webhook_runtime)
+
+# Configuração do Cliente Groq (assíncrono, pool HTTP compartilhado + streaming)
 client = None
 if GROQ_KEY:
     try:
-        client = Groq(api_key=GROQ_KEY)
+        client = get_gateway(GROQ_KEY, GROQ_MODEL)
         logger.info(f"IA Groq: cliente configurado com modelo {GROQ_MODEL}.")
     except Exception as e:
         logger.error(f"Erro ao configurar Groq: {e}")
@@ -68,9 +91,8 @@ else:
 
 def _setup_db():
     """Garante que todas as tabelas necessárias existem."""
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.executescript("""
+    conn = db_pool.get_conn(DB_PATH)
+    conn.executescript("""
         CREATE TABLE IF NOT EXISTS historico (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             user_id TEXT NOT NULL,
@@ -104,20 +126,15 @@ def _setup_db():
         );
     """)
     conn.commit()
-    conn.close()
+    run_migrations(DB_PATH)
+    if history_browser.SEARCH_ENABLED:
+        history_browser.ensure_search_index(DB_PATH)
 
 
-def _save_message(user_id: str, role: str, content: str):
-    """Persiste uma mensagem no histórico do banco."""
+async def _save_message(user_id: str, role: str, content: str):
+    """Enfileira uma mensagem para persistência em lote no histórico do banco."""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.cursor()
-        cur.execute(
-            "INSERT INTO historico (user_id, role, content, timestamp) VALUES (?, ?, ?, ?)",
-            (user_id, role, content, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-        )
-        conn.commit()
-        conn.close()
+        await history_writer.write(user_id, role, content)
     except Exception as e:
         logger.error(f"Erro ao salvar mensagem no histórico: {e}")
 
@@ -129,34 +146,33 @@ def _upsert_lead(user_id: str, nome: str = None, username: str = None,
     """Cria ou atualiza registro do lead/assinante."""
     try:
         now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.cursor()
-        cur.execute("SELECT user_id FROM assinaturas WHERE user_id = ?", (user_id,))
-        exists = cur.fetchone()
-        if not exists:
-            cur.execute("""
-                INSERT INTO assinaturas
-                    (user_id, nome, username, status, plano, plataforma, nicho,
-                     volume_dia, dor_principal, valor_mensal, data_cadastro, data_atualizacao)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (user_id, nome, username,
-                  status or 'lead', plano, plataforma, nicho,
-                  volume, dor, valor_mensal or 0.0, now, now))
-        else:
-            fields, values = [], []
-            for col, val in [("nome", nome), ("username", username), ("nicho", nicho),
-                              ("volume_dia", volume), ("dor_principal", dor),
-                              ("plano", plano), ("plataforma", plataforma),
-                              ("status", status), ("valor_mensal", valor_mensal),
-                              ("data_atualizacao", now)]:
-                if val is not None:
-                    fields.append(f"{col}=?")
-                    values.append(val)
-            if fields:
-                values.append(user_id)
-                cur.execute(f"UPDATE assinaturas SET {', '.join(fields)} WHERE user_id=?", values)
-        conn.commit()
-        conn.close()
+        with db_pool.transaction(DB_PATH) as cur:
+            cur.execute("SELECT user_id FROM assinaturas WHERE user_id = ?", (user_id,))
+            exists = cur.fetchone()
+            if not exists:
+                cur.execute("""
+                    INSERT INTO assinaturas
+                        (user_id, nome, username, status, plano, plataforma, nicho,
+                         volume_dia, dor_principal, valor_mensal, data_cadastro, data_atualizacao)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (user_id, nome, username,
+                      status or 'lead', plano, plataforma, nicho,
+                      volume, dor, valor_mensal or 0.0, now, now))
+            else:
+                fields, values = [], []
+                for col, val in [("nome", nome), ("username", username), ("nicho", nicho),
+                                  ("volume_dia", volume), ("dor_principal", dor),
+                                  ("plano", plano), ("plataforma", plataforma),
+                                  ("status", status), ("valor_mensal", valor_mensal),
+                                  ("data_atualizacao", now)]:
+                    if val is not None:
+                        fields.append(f"{col}=?")
+                        values.append(val)
+                if fields:
+                    values.append(user_id)
+                    cur.execute(f"UPDATE assinaturas SET {', '.join(fields)} WHERE user_id=?", values)
+        if status is not None:
+            events.notify(user_id)  # já commitado: o watcher acorda agora e lê o outbox
     except Exception as e:
         logger.error(f"Erro ao upsert lead {user_id}: {e}")
 
@@ -342,25 +358,41 @@ REGRAS INVIOLÁVEIS
 - NUNCA revele ser IA, Groq, GPT ou LLM. Você é a Sofia, ponto."""
 
 
-def _build_messages(user_id: str, user_text: str, extra_context: str = "") -> list:
-    """Monta a lista de mensagens para o Groq incluindo histórico."""
-    history = conversation_history[user_id]
+# Seções do SYSTEM_PROMPT omitidas por fase da conversa (prefixo de nome da seção)
+PHASE_DROPS = {
+    # Lead ainda não pagou: os tutoriais de credenciais e a coleta técnica não se aplicam
+    "qualificacao": ["FLUXO DE CONVERSA — SIGA ESTA ORDEM / ▸ FASE 3"],
+    # Cliente já pagou: a qualificação e as técnicas de fechamento já foram usadas
+    "onboarding": ["FLUXO DE CONVERSA — SIGA ESTA ORDEM / ▸ FASE 1", "PSICOLOGIA DE VENDAS"],
+}
+prompt_engine = PromptEngine(SYSTEM_PROMPT, PHASE_DROPS)
+
+
+def _conversation_phase(user_id: str):
+    """Fase da conversa pelo status em assinaturas ('ativo' = pagou → onboarding). Síncrona (db_pool)."""
+    try:
+        row = db_pool.fetchone("SELECT status FROM assinaturas WHERE user_id=?", (user_id,), path=DB_PATH)
+    except Exception:
+        return None  # sem DB → prompt completo
+    return "onboarding" if row and row[0] == "ativo" else "qualificacao"
 
-    # Injeta contexto extra no system prompt se houver
-    system = SYSTEM_PROMPT
-    if extra_context:
-        system += f"\n\n═══════════════════════════════════════\nCONTEXTO ATUAL DA SKILL\n═══════════════════════════════════════\n{extra_context}"
 
-    messages = [{"role": "system", "content": system}]
-    messages.extend(history[-MAX_HISTORY:])
-    messages.append({"role": "user", "content": user_text})
-    return messages
+async def _build_messages(user_id: str, user_text: str, extra_context: str = "") -> list:
+    """
+    Monta a lista de mensagens para o Groq: system da fase (prefixo estável, cacheável pelo
+    provedor) + histórico + contexto da skill + mensagem do usuário. As leituras do DB
+    (fase, reidratação do histórico) rodam fora do event loop.
+    """
+    history = await conversation_history.aget(user_id)
+    phase = await asyncio.to_thread(_conversation_phase, user_id)
+    return prompt_engine.build(history[-MAX_HISTORY:], user_text, extra_context, phase=phase)
 
 
 async def start(update: Update, context):
-    """Responde ao comando /start e limpa o histórico."""
+    """Responde ao comando /start e limpa o histórico e o estado de qualificação."""
     user_id = str(update.effective_user.id)
-    conversation_history[user_id].clear()
+    conversation_history.clear(user_id)
+    await asyncio.to_thread(lead_states.clear, user_id)
     await update.message.reply_text(
         "Olá! 👋 Sou a *Sofia*, consultora de automação da *Agência Auto-Venda*.\n\n"
         "Ajudo empresas a automatizar seu atendimento no WhatsApp, capturar leads e fechar mais vendas — "
@@ -370,9 +402,114 @@ async def start(update: Update, context):
     )
 
 
+# ─────────────────────────────────────────────
+# SKILL HOOKS — executados em paralelo pelo HookRunner
+# ─────────────────────────────────────────────
+
+def _brand_skill(ctx: dict, deps: dict):
+    """Brand Identity (determinístico) — nota de correção ou None."""
+    return brand_hook(ctx["user_id"], ctx["user_text"], ctx["history"])
+
+
+def _lead_skill(ctx: dict, deps: dict) -> dict:
+    """Lead Qualify — contexto para o LLM e plano qualificado (usado por proposals)."""
+    lead_result = lead_hook(ctx["user_id"], ctx["user_text"], ctx["history"])
+    status = lead_result.get("status")
+    out = {"context": "", "qualified_plan": None}
+    if status == "ok":
+        d = lead_result["data"]
+        qualified_plan = d.get("plan", "").lower().replace(" ", "_").replace("ã", "a").replace("á", "a")
+        if qualified_plan in ("flash", "secretaria", "ecossistema"):
+            out["qualified_plan"] = qualified_plan
+        out["context"] = lead_result.get("instruction", "")
+        # Salva no banco APENAS quando lead é qualificado com plano
+        # (necessário para o webhook Stripe encontrar o registro e atualizar para 'ativo')
+        _upsert_lead(
+            ctx["user_id"],
+            nome=ctx["nome"],
+            username=ctx["username"],
+            nicho=d.get("niche"),
+            volume=d.get("volume"),
+            dor=d.get("pain"),
+            plano=d.get("plan"),
+            plataforma=d.get("platform_preference"),
+            valor_mensal=d.get("price"),
+            status="qualificado",
+        )
+    elif status in ("objection", "missing"):
+        out["context"] = lead_result.get("instruction", "")
+    return out
+
+
+def _proposals_skill(ctx: dict, deps: dict) -> dict:
+    """Proposals — detecta intenção de compra e gera checkout (Stripe em segundo plano, com cache)."""
+    qualified_plan = (deps.get("lead") or {}).get("qualified_plan")
+    prop_result = proposals_hook(ctx["user_id"], ctx["user_text"], ctx["history"], qualified_plan=qualified_plan)
+    if prop_result.get("status") != "ok":
+        return {"context": "", "checkout_pending": None}
+    proposal_context = prop_result.get("instruction", "")
+    checkout_url = prop_result.get("checkout_url")
+    if checkout_url:
+        proposal_context += f"\nURL_PAGAMENTO: {checkout_url}"
+    return {"context": proposal_context, "checkout_pending": prop_result.get("checkout_pending")}
+
+
+CHECKOUT_FOLLOWUP_TIMEOUT = 60
+_background_tasks: set = set()
+
+
+async def _send_checkout_when_ready(user_id: str, message, pending):
+    """Envia o link de pagamento assim que o Stripe responder (a resposta da Sofia já saiu)."""
+    try:
+        url = await asyncio.wait_for(asyncio.wrap_future(pending), CHECKOUT_FOLLOWUP_TIMEOUT)
+    except Exception as e:
+        logger.error(f"Checkout não ficou pronto: {e}")
+        url = None
+    if url:
+        text = f"Aqui está o seu link de pagamento 👇\n{url}"
+        await message.reply_text(text)
+        await conversation_history.aappend(user_id, "assistant", text)
+        await _save_message(user_id, "assistant", text)
+    else:
+        await message.reply_text("Tive um problema para gerar o link de pagamento agora — "
+                                 "a equipe vai te enviar em instantes. 🙏")
+
+
+def _build_skill_hooks() -> HookRunner:
+    # lead + proposals rodam em sequência: a soma dos timeouts cabe no SKILL_HOOK_BUDGET_MS (4000)
+    hooks = []
+    if brand_hook:
+        hooks.append(Hook("brand", _brand_skill, timeout_ms=int(os.getenv("SKILL_TIMEOUT_BRAND_MS", "500"))))
+    if lead_hook:
+        hooks.append(Hook("lead", _lead_skill, timeout_ms=int(os.getenv("SKILL_TIMEOUT_LEAD_MS", "1500"))))
+    if proposals_hook:
+        hooks.append(Hook("proposals", _proposals_skill,
+                          requires=("lead",) if lead_hook else (),
+                          timeout_ms=int(os.getenv("SKILL_TIMEOUT_PROPOSALS_MS", "2500"))))
+    return HookRunner(hooks)
+
+
+skill_hooks = _build_skill_hooks()
+
+
 async def handle_message(update: Update, context):
+    """Entrega a mensagem na caixa do usuário — o turno roda serializado por chat."""
+    await mailbox.submit(str(update.effective_user.id), (update, context))
+
+
+async def _process_turn(user_id: str, items: list):
+    """Um turno do LLM para as mensagens agrupadas do usuário (responde à última)."""
+    update, context = items[-1]
+    user_text = "\n".join(u.message.text for u, _ in items if u.message and u.message.text)
+    await _respond(update, context, user_text)
+
+
+# Serializa o processamento por usuário e agrupa mensagens em rajada num único turno
+mailbox = UserMailbox(_process_turn)
+
+
+async def _respond(update: Update, context, user_text: str):
     """Processa mensagens integrando todas as skills com histórico por usuário."""
-    user_text = update.message.text
     user_id = str(update.effective_user.id)
     chat_id = update.effective_chat.id
 
@@ -386,100 +523,51 @@ async def handle_message(update: Update, context):
         # Histórico para os hooks (formato tuple)
         history_tuples = [
             (m["role"], m["content"])
-            for m in conversation_history[user_id][-6:]
+            for m in (await conversation_history.aget(user_id))[-6:]
         ]
 
-        # ─── SKILL: Brand Identity (hook determinístico) ───
-        brand_note = None
-        if brand_hook:
-            try:
-                brand_note = brand_hook(user_id, user_text, history_tuples)
-            except Exception:
-                pass
-
-        # ─── SKILL: Lead Qualify (hook determinístico) ───
-        lead_context = ""
-        qualified_plan = None
-        if lead_hook:
-            try:
-                lead_result = lead_hook(user_id, user_text, history_tuples)
-                status = lead_result.get("status")
-                if status == "ok":
-                    d = lead_result["data"]
-                    qualified_plan = d.get("plan", "").lower().replace(" ", "_").replace("ã", "a").replace("á", "a")
-                    if qualified_plan not in ("flash", "secretaria", "ecossistema"):
-                        qualified_plan = None
-                    lead_context = lead_result.get("instruction", "")
-                    # Salva no banco APENAS quando lead é qualificado com plano
-                    # (necessário para o webhook Stripe encontrar o registro e atualizar para 'ativo')
-                    nome = update.effective_user.full_name or ""
-                    username = update.effective_user.username or ""
-                    _upsert_lead(
-                        user_id,
-                        nome=nome,
-                        username=username,
-                        nicho=d.get("niche"),
-                        volume=d.get("volume"),
-                        dor=d.get("pain"),
-                        plano=d.get("plan"),
-                        plataforma=d.get("platform_preference"),
-                        valor_mensal=d.get("price"),
-                        status="qualificado",
-                    )
-                elif status == "objection":
-                    lead_context = lead_result.get("instruction", "")
-                elif status == "missing":
-                    lead_context = lead_result.get("instruction", "")
-            except Exception:
-                pass
-
-        # ─── SKILL: Proposals (detecta intenção de compra e gera checkout) ───
-        proposal_context = ""
-        if proposals_hook:
-            try:
-                prop_result = await asyncio.to_thread(
-                    lambda: proposals_hook(user_id, user_text, history_tuples, qualified_plan=qualified_plan)
-                )
-                if prop_result.get("status") == "ok":
-                    proposal_context = prop_result.get("instruction", "")
-                    checkout_url = prop_result.get("checkout_url")
-                    if checkout_url:
-                        proposal_context += f"\nURL_PAGAMENTO: {checkout_url}"
-            except Exception:
-                pass
+        # ─── SKILLS: brand, lead e proposals em paralelo (proposals espera o lead) ───
+        hook_results = await skill_hooks.run({
+            "user_id": user_id,
+            "user_text": user_text,
+            "history": history_tuples,
+            "nome": update.effective_user.full_name or "",
+            "username": update.effective_user.username or "",
+        })
+        brand_note = hook_results.get("brand")
+        lead_context = (hook_results.get("lead") or {}).get("context", "")
+        proposals_out = hook_results.get("proposals") or {}
+        proposal_context = proposals_out.get("context", "")
+        checkout_pending = proposals_out.get("checkout_pending")
 
         # Combina contextos das skills
         extra_context = "\n\n".join(filter(None, [lead_context, proposal_context]))
 
         # Monta mensagens com histórico + contexto das skills
-        messages = _build_messages(user_id, user_text, extra_context)
-
-        # Chamada ao Groq em thread
-        def call_groq():
-            return client.chat.completions.create(
-                model=GROQ_MODEL,
-                messages=messages,
-                temperature=0.65,
-                max_tokens=1024,
-            )
-
-        resp = await asyncio.to_thread(call_groq)
-        text_out = resp.choices[0].message.content.strip()
-
-        # Aplica correção de brand identity se necessário
-        if brand_note:
-            text_out = f"{brand_note}\n\n{text_out}" if text_out else brand_note
+        messages = await _build_messages(user_id, user_text, extra_context)
+
+        # Chamada ao Groq em streaming — a resposta aparece e vai sendo editada
+        # conforme os tokens chegam (correção de brand identity vai como prefixo)
+        text_out = await stream_reply(
+            update.message,
+            client.stream(messages, model=GROQ_MODEL, temperature=0.65, max_tokens=1024),
+            prefix=brand_note or "",
+        )
 
         if text_out:
             # Persiste no histórico em memória e no banco
-            conversation_history[user_id].append({"role": "user", "content": user_text})
-            conversation_history[user_id].append({"role": "assistant", "content": text_out})
-            _save_message(user_id, "user", user_text)
-            _save_message(user_id, "assistant", text_out)
-            await update.message.reply_text(text_out)
+            await conversation_history.aappend(user_id, "user", user_text)
+            await conversation_history.aappend(user_id, "assistant", text_out)
+            await _save_message(user_id, "user", user_text)
+            await _save_message(user_id, "assistant", text_out)
         else:
             await update.message.reply_text("Não consegui formular uma resposta. Pode reformular a pergunta?")
 
+        if checkout_pending is not None:
+            task = asyncio.create_task(_send_checkout_when_ready(user_id, update.message, checkout_pending))
+            _background_tasks.add(task)
+            task.add_done_callback(_background_tasks.discard)
+
     except Exception as e:
         err_str = str(e)
         logger.error(f'ERRO CRÍTICO NA CONSULTA IA: {err_str}', exc_info=True)
@@ -495,13 +583,19 @@ async def lifespan(app: FastAPI):
     # Inicializa banco de dados
     try:
         _setup_db()
+        await storage.ensure_schema()  # historico no banco do DATABASE_URL (no SQLite já existe)
         logger.info("Banco de dados inicializado com sucesso.")
     except Exception as e:
         logger.error(f"Erro ao inicializar banco: {e}")
 
+    await history_writer.start()
+
     if not TOKEN:
         logger.error("TELEGRAM_BOT_TOKEN ausente!")
         yield
+        await history_writer.stop()
+        await storage.close()
+        db_pool.close_all()
         return
 
     telegram_app = Application.builder().token(TOKEN).build()
@@ -510,18 +604,36 @@ async def lifespan(app: FastAPI):
 
     await telegram_app.initialize()
     await telegram_app.start()
-    await telegram_app.updater.start_polling()
-    logger.info(">>> SOFIA ONLINE <<<")
+    if webhook_enabled():
+        webhook_router.register(TOKEN, telegram_app)
+        await set_webhook(telegram_app, TOKEN)
+        logger.info(">>> SOFIA ONLINE (webhook) <<<")
+    else:
+        await telegram_app.updater.start_polling()
+        logger.info(">>> SOFIA ONLINE <<<")
 
     yield
 
-    # Shutdown sequence
+    # Shutdown: 1) para de receber updates; 2) stop() processa os que já estão na fila (entram
+    # no mailbox); 3) conclui os turnos com o bot ainda utilizável; 4) só então shutdown()
     try:
-        await telegram_app.updater.stop()
+        if telegram_app.updater.running:
+            await telegram_app.updater.stop()
+        webhook_router.unregister(TOKEN)
         await telegram_app.stop()
+    except Exception:
+        pass
+    await mailbox.drain(timeout=30)
+    try:
         await telegram_app.shutdown()
     except Exception:
         pass
+    # Garante que nenhuma mensagem pendente na fila seja perdida
+    await history_writer.stop()
+    await storage.close()
+    if client:
+        await client.aclose()
+    db_pool.close_all()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -533,10 +645,25 @@ def health_check():
         "status": "active",
         "engine": f"groq/{GROQ_MODEL}",
         "groq_ready": client is not None,
-        "skills": ["brand_identity", "lead_qualify", "proposals", "onboarding"]
+        "skills": ["brand_identity", "lead_qualify", "proposals", "onboarding"],
+        "memory": conversation_history.stats(),
+        "llm": client.stats() if client else None,
+        "mailbox": mailbox.stats(),
+        "prompt": prompt_engine.stats(),
+        "skill_hooks": skill_hooks.stats(),
+        "lead_state": lead_states.stats(),
+        "checkout": CHECKOUT_CACHE.stats() if CHECKOUT_CACHE else None,
+        "webhook": {**webhook_router.stats(), "runtime": webhook_runtime.stats()},
     }
 
 
+@app.post(WEBHOOK_PATH + "/{secret}")
+async def telegram_webhook(secret: str, request: Request):
+    """Updates de todos os bots (Sofia e clientes): ack imediato, processamento assíncrono."""
+    status = await webhook_router.dispatch(secret, request.headers.get(SECRET_HEADER, ""), await request.body())
+    return Response(status_code=status)
+
+
 def _free_port(port: int):
     """Mata qualquer processo que esteja ocupando a porta informada."""
     import subprocess, signal
@@ -0,0 +1,208 @@
+"""
+bench_conversation_browser.py — Aba Conversas num historico sintético de 5M de mensagens
+(20k clientes + um cliente com 50k mensagens): carga antiga × bot_factory/history_browser.py.
+
+Cada cenário roda num processo filho para medir o pico de memória (ru_maxrss) isolado:
+  - antigo: historico inteiro num DataFrame e filtro em pandas
+  - antigo: conversa inteira do cliente grande num DataFrame
+  - LIMIT/OFFSET na página 900 do cliente grande (o que keyset evita)
+  - keyset: primeira página e página 900 (cursor)
+  - busca: LIKE na conversa do cliente grande; FTS5 em todo o historico
+e confere que a paginação percorre a conversa inteira sem repetir/pular e que a busca
+FTS acha as mesmas mensagens que um LIKE por palavra.
+
+Uso: python scripts/bench_conversation_browser.py [n_mensagens] [--sem-legado]
+     (padrão 5_000_000; exit 1 se alguma conferência falhar)
+"""
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import resource
+import tempfile
+import subprocess
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BIG_USER = "cliente_grande"
+BIG_MESSAGES = 50_000
+DEEP_PAGE = 900
+WORDS = ("agenda horario consulta valor pix boleto entrega pedido cardapio reserva promocao desconto "
+         "endereco whatsapp atendimento cancelamento troca garantia prazo frete tamanho cor estoque").split()
+NEEDLE = "orcamentoxyz"  # palavra rara para conferir a busca
+
+
+def _populate(path: str, n: int):
+    rng = random.Random(3)
+    start = datetime(2025, 1, 1)
+    n_users = 20_000
+    conn = sqlite3.connect(path)
+
+    def rows():
+        for i in range(n):
+            uid = BIG_USER if i % (n // BIG_MESSAGES) == 0 else f"u{rng.randrange(n_users):05d}"
+            words = rng.choices(WORDS, k=rng.randint(4, 14))
+            if rng.random() < 0.001:
+                words.insert(rng.randrange(len(words)), NEEDLE)
+            ts = (start + timedelta(seconds=i * 6)).strftime("%Y-%m-%d %H:%M:%S")
+            yield uid, "user" if i % 2 else "assistant", " ".join(words), ts
+
+    conn.executemany("INSERT INTO historico (user_id, role, content, timestamp) VALUES (?, ?, ?, ?)", rows())
+    conn.commit()
+    conn.close()
+
+
+# ── cenários (executados no processo filho) ───────────────────────
+
+def _scenario(name: str, path: str) -> dict:
+    from bot_factory import history_browser as hb
+    result = {}
+    t0 = time.perf_counter()
+    if name == "antigo_tudo":
+        import pandas as pd
+        conn = sqlite3.connect(path)
+        df = pd.read_sql_query("SELECT * FROM historico ORDER BY timestamp DESC", conn)
+        result["linhas"] = len(df[df["user_id"] == BIG_USER])
+    elif name == "antigo_cliente":
+        import pandas as pd
+        conn = sqlite3.connect(path)
+        df = pd.read_sql_query("SELECT role, content, timestamp FROM historico WHERE user_id = ? "
+                               "ORDER BY timestamp ASC", conn, params=(BIG_USER,))
+        result["linhas"] = len(df)
+    elif name == "offset_profunda":
+        conn = sqlite3.connect(path)
+        rows = conn.execute("SELECT id, role, content, timestamp FROM historico WHERE user_id = ? "
+                            "ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?",
+                            (BIG_USER, hb.PAGE_SIZE, DEEP_PAGE * hb.PAGE_SIZE)).fetchall()
+        result["linhas"] = len(rows)
+    elif name == "keyset_primeira":
+        msgs, _ = hb.page(BIG_USER, path=path)
+        result["linhas"] = len(msgs)
+    elif name == "keyset_profunda":
+        conn = sqlite3.connect(path)
+        ts, rid = conn.execute("SELECT timestamp, id FROM historico WHERE user_id = ? "
+                               "ORDER BY timestamp DESC, id DESC LIMIT 1 OFFSET ?",
+                               (BIG_USER, DEEP_PAGE * hb.PAGE_SIZE - 1)).fetchone()
+        t0 = time.perf_counter()  # só a consulta da página, com o cursor que a página anterior devolveu
+        msgs, _ = hb.page(BIG_USER, (ts, rid), path=path)
+        result["linhas"] = len(msgs)
+    elif name == "busca_like_cliente":
+        msgs, _ = hb.search(NEEDLE, BIG_USER, path=path)
+        result["linhas"] = len(msgs)
+    elif name == "busca_fts_tudo":
+        msgs, _ = hb.search(NEEDLE, path=path)
+        result["linhas"] = len(msgs)
+    result["ms"] = (time.perf_counter() - t0) * 1000
+    result["rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return result
+
+
+def _run_child(name: str, path: str) -> dict:
+    out = subprocess.check_output([sys.executable, __file__, "--cenario", name, path], text=True)
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def _checks(path: str) -> list:
+    from bot_factory import db_pool, history_browser as hb
+    conn = sqlite3.connect(path)
+    expected = [r[0] for r in conn.execute("SELECT id FROM historico WHERE user_id = ? ORDER BY timestamp, id",
+                                           (BIG_USER,))]
+    walked, cursor, pages = [], None, 0
+    while True:
+        msgs, cursor = hb.page(BIG_USER, cursor, path=path)
+        walked = [m["id"] for m in msgs] + walked
+        pages += 1
+        if cursor is None:
+            break
+
+    def all_results(user_id):
+        found, more = [], None
+        while True:
+            msgs, more = hb.search(NEEDLE, user_id, more, path=path)
+            found += [m["id"] for m in msgs]
+            if more is None:
+                return found
+
+    like_all = [r[0] for r in conn.execute(
+        "SELECT id FROM historico WHERE ' ' || content || ' ' LIKE ? ORDER BY id DESC", (f"% {NEEDLE} %",))]
+    like_big = [r[0] for r in conn.execute(
+        "SELECT id FROM historico WHERE user_id = ? AND ' ' || content || ' ' LIKE ? ORDER BY id DESC",
+        (BIG_USER, f"% {NEEDLE} %"))]
+    conn.close()
+    fallback = all_results(BIG_USER)
+    db_pool.close_all()
+    return [
+        (f"keyset percorre a conversa inteira ({pages} páginas, sem repetir/pular)", walked == expected),
+        ("busca sem FTS (LIKE no cliente) == LIKE por palavra", fallback == like_big),
+        ("__fts__", like_all),
+    ]
+
+
+def main() -> int:
+    if len(sys.argv) > 1 and sys.argv[1] == "--cenario":
+        import logging
+        logging.basicConfig(level=logging.CRITICAL)
+        print(json.dumps(_scenario(sys.argv[2], sys.argv[3])))
+        return 0
+
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    n = int(args[0]) if args else 5_000_000
+    legacy = "--sem-legado" not in sys.argv
+    tmp = tempfile.TemporaryDirectory()
+    db_path = os.path.join(tmp.name, "historico.db")
+    os.environ["DB_NAME"] = db_path
+    import logging
+    logging.basicConfig(level=logging.CRITICAL)
+
+    from main import _setup_db
+    from bot_factory import db_pool, history_browser as hb
+
+    _setup_db()
+    db_pool.close_all()
+    t0 = time.perf_counter()
+    _populate(db_path, n)
+    print(f"{n} mensagens geradas em {time.perf_counter() - t0:.0f}s "
+          f"({os.path.getsize(db_path) / 2**20:.0f} MB)\n")
+
+    scenarios = (["antigo_tudo", "antigo_cliente"] if legacy else []) + [
+        "offset_profunda", "keyset_primeira", "keyset_profunda", "busca_like_cliente"]
+    results = {name: _run_child(name, db_path) for name in scenarios}
+    checks = _checks(db_path)
+    like_all = checks.pop()[1]
+
+    t0 = time.perf_counter()
+    indexed = hb.ensure_search_index(db_path)
+    index_s = time.perf_counter() - t0
+    db_pool.close_all()
+    size_fts = os.path.getsize(db_path) / 2**20
+    if indexed:
+        results["busca_fts_tudo"] = _run_child("busca_fts_tudo", db_path)
+        found, more = [], None
+        while True:
+            msgs, more = hb.search(NEEDLE, None, more, path=db_path)
+            found += [m["id"] for m in msgs]
+            if more is None:
+                break
+        checks.append(("busca FTS5 em todo o historico == LIKE por palavra", found == like_all))
+    db_pool.close_all()
+    tmp.cleanup()
+
+    print(f"{'cenário':22s} | {'tempo':>10s} | {'pico RSS':>9s} | linhas")
+    for name, r in results.items():
+        print(f"{name:22s} | {r['ms']:8.1f}ms | {r['rss_mb']:7.0f}MB | {r['linhas']}")
+    if indexed:
+        print(f"\níndice FTS5: criado em {index_s:.0f}s, banco com índice {size_fts:.0f} MB")
+    print()
+    ok = True
+    for desc, passed in checks:
+        print(f"{'OK   ' if passed else 'FALHA'} {desc}")
+        ok = ok and passed
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""
+bench_dashboard.py — Custo de um rerun do dashboard.py (Streamlit AppTest, sem navegador):
+versão anterior (todas as abas consultam o banco a cada rerun) × cache por data_version +
+abas preguiçosas, num banco sintético.
+
+Para cada aba mede o rerun frio, o rerun sem escrita no banco (deve sair do cache) e o rerun
+logo após uma escrita (data_version mudou → consulta de novo), e confere que as métricas do
+cabeçalho batem com contagens diretas e que a escrita aparece no painel.
+
+Uso: python scripts/bench_dashboard.py [n_clientes] [versao_git_anterior]
+     (padrão: 5000 clientes, HEAD~1; exit 1 se alguma conferência falhar)
+"""
+import os
+import sys
+import time
+import random
+import sqlite3
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TABS = ["👥 Leads", "📋 Onboarding", "💬 Conversas", "📈 Estatísticas", "🏭 Bot Factory"]
+
+
+def _populate(path: str, n: int):
+    rng = random.Random(5)
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO assinaturas (user_id, nome, status, plano, plataforma, nicho, valor_mensal) VALUES (?,?,?,?,?,?,?)",
+        [(f"u{i:05d}", f"Cliente {i}", rng.choice(("ativo", "lead", "cancelado")), rng.choice(("flash", "secretaria")),
+          "telegram", rng.choice(("varejo", "restaurante", "educacao")), 97.0) for i in range(n)])
+    conn.executemany("INSERT INTO onboarding_data (user_id, status, dados_json) VALUES (?,?,?)",
+                     [(f"u{i:05d}", rng.choice(("em_progresso", "completo")), "{}") for i in range(0, n, 2)])
+    conn.executemany("INSERT INTO bots_gerados (user_id, nicho, status) VALUES (?,?,?)",
+                     [(f"u{i:05d}", "varejo", rng.choice(("active", "error"))) for i in range(0, n, 3)])
+    conn.executemany("INSERT INTO skills_performance (nicho, skill_name, total_usos) VALUES (?,?,?)",
+                     [(f"nicho_{i % 20}", f"skill_{i}", i) for i in range(400)])
+    conn.executemany("INSERT INTO historico (user_id, role, content, timestamp) VALUES (?,?,?,?)",
+                     [(f"u{rng.randrange(n):05d}", "user", "oi", f"2026-10-{rng.randint(1, 28):02d} 1{rng.randint(0, 9)}:00:00")
+                      for _ in range(n * 20)])
+    conn.commit()
+    conn.close()
+
+
+def _rerun(at, tab):
+    at.session_state["aba"] = tab
+    t0 = time.perf_counter()
+    at.run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    return (time.perf_counter() - t0) * 1000
+
+
+def _measure(script: str, db_path: str, writer):
+    from streamlit.testing.v1 import AppTest
+    rows = {}
+    for tab in TABS:
+        at = AppTest.from_file(script, default_timeout=120)
+        at.run()  # sobe o script (imports, cache_resource) antes de medir
+        cold = _rerun(at, tab)
+        warm = min(_rerun(at, tab) for _ in range(3))
+        writer()
+        after_write = _rerun(at, tab)
+        rows[tab] = (cold, warm, after_write)
+    return rows, [m.value for m in at.metric]
+
+
+def main() -> int:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rev = sys.argv[2] if len(sys.argv) > 2 else "HEAD~1"
+    tmp = tempfile.TemporaryDirectory()
+    db_path = os.path.join(tmp.name, "dash.db")
+    os.environ["DB_NAME"] = db_path
+    import logging
+    logging.basicConfig(level=logging.CRITICAL)
+
+    from main import _setup_db
+    from bot_factory import db_pool
+    from bot_factory.db_factory import setup_factory_tables
+
+    _setup_db()
+    setup_factory_tables()
+    db_pool.close_all()
+    _populate(db_path, n)
+
+    legacy_script = os.path.join(tmp.name, "dashboard_anterior.py")
+    with open(legacy_script, "w", encoding="utf-8") as f:
+        f.write(subprocess.check_output(["git", "show", f"{rev}:dashboard.py"], cwd=ROOT, text=True))
+
+    counter = iter(range(10**6))
+
+    def writer():
+        """Um lead vira cliente ativo — tem que aparecer no rerun seguinte."""
+        conn = sqlite3.connect(db_path)
+        conn.execute("INSERT INTO assinaturas (user_id, status, plano, valor_mensal) VALUES (?, 'ativo', 'flash', 1.0)",
+                     (f"novo_{next(counter)}",))
+        conn.commit()
+        conn.close()
+
+    legacy, _ = _measure(legacy_script, db_path, writer)
+    cached, cached_metrics = _measure(os.path.join(ROOT, "dashboard.py"), db_path, writer)
+    conn = sqlite3.connect(db_path)
+    expected = [str(conn.execute(sql).fetchone()[0]) for sql in (
+        "SELECT COUNT(*) FROM assinaturas WHERE status = 'ativo'",
+        "SELECT COUNT(*) FROM historico",
+        "SELECT COUNT(*) FROM onboarding_data")]
+    conn.close()
+    db_pool.close_all()
+    tmp.cleanup()
+
+    print(f"{n} clientes, {n * 20} mensagens — ms por rerun\n")
+    print(f"{'aba':18s} | {'anterior: frio':>14s} {'sem escrita':>11s} {'pós-escrita':>11s} | "
+          f"{'cache: frio':>11s} {'sem escrita':>11s} {'pós-escrita':>11s}")
+    for tab in TABS:
+        (l_cold, l_warm, l_write), (c_cold, c_warm, c_write) = legacy[tab], cached[tab]
+        print(f"{tab:18s} | {l_cold:14.0f} {l_warm:11.0f} {l_write:11.0f} | {c_cold:11.0f} {c_warm:11.0f} {c_write:11.0f}")
+    print()
+    checks = [
+        ("escrita aparece no rerun seguinte (clientes ativos)", cached_metrics[0] == expected[0]),
+        ("mensagens e onboardings == contagem direta", [cached_metrics[2], cached_metrics[3]] == expected[1:]),
+    ]
+    ok = True
+    for desc, passed in checks:
+        print(f"{'OK   ' if passed else 'FALHA'} {desc}")
+        ok = ok and passed
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
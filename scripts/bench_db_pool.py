@@ -0,0 +1,88 @@
+"""
+bench_db_pool.py — Mede mensagens persistidas por segundo em `historico`:
+  antes  → sqlite3.connect() + INSERT + commit + close por mensagem (modo rollback-journal)
+  depois → bot_factory.db_pool (conexão por thread, WAL, synchronous=NORMAL)
+
+Uso: python scripts/bench_db_pool.py [n_mensagens] [n_threads]
+"""
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot_factory import db_pool
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS historico (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    timestamp TEXT NOT NULL
+);
+"""
+INSERT = "INSERT INTO historico (user_id, role, content, timestamp) VALUES (?, ?, ?, ?)"
+
+
+def _row(i: int):
+    return (f"user_{i % 50}", "user" if i % 2 else "assistant",
+            "mensagem de teste " * 8, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+
+
+def save_legacy(path: str, i: int):
+    conn = sqlite3.connect(path)
+    cur = conn.cursor()
+    cur.execute(INSERT, _row(i))
+    conn.commit()
+    conn.close()
+
+
+def save_pooled(path: str, i: int):
+    db_pool.execute(INSERT, _row(i), path=path)
+
+
+def _run(save, path: str, n: int, threads: int) -> float:
+    per_thread = n // threads
+
+    def worker(offset):
+        for i in range(per_thread):
+            save(path, offset + i)
+
+    ts = [threading.Thread(target=worker, args=(t * per_thread,)) for t in range(threads)]
+    t0 = time.perf_counter()
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    return (per_thread * threads) / (time.perf_counter() - t0)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_db = os.path.join(tmp, "legacy.db")
+        pooled_db = os.path.join(tmp, "pooled.db")
+        for p in (legacy_db, pooled_db):
+            c = sqlite3.connect(p)
+            c.executescript(SCHEMA)
+            c.close()
+
+        before = _run(save_legacy, legacy_db, n, threads)
+        after = _run(save_pooled, pooled_db, n, threads)
+        db_pool.close_all()
+
+    print(f"Mensagens: {n} | Threads: {threads}")
+    print(f"  antes  (connect por mensagem): {before:10.0f} msg/s")
+    print(f"  depois (db_pool WAL)         : {after:10.0f} msg/s")
+    print(f"  ganho: {after / max(before, 1e-9):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+bench_learning_cycle.py — Ciclo de aprendizado antigo (laço Python por bot × skill, um
+INSERT ... ON CONFLICT por vez, uma transação de escrita do começo ao fim) × o ciclo por
+conjunto de bot_factory/learning.py, num banco sintético com 10k bots e 1M de feedbacks.
+
+Mede, para o primeiro ciclo e para o seguinte (depois de mais 10k feedbacks):
+  - duração do ciclo
+  - maior espera de um escritor concorrente (uma thread gravando a cada 5 ms, como o
+    main.py/bots gravando histórico) — o quanto o ciclo trava o resto do sistema
+e confere que skills_performance termina igual nos dois bancos.
+
+Uso: python scripts/bench_learning_cycle.py [n_bots] [n_feedbacks]
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+NICHOS = ["clinica_estetica", "restaurante", "ecommerce", "imobiliaria", "educacao", "varejo", None, ""]
+TIPOS = ["escalacao", "sem_resposta", "satisfacao", "erro"]
+
+
+def _populate(path: str, n_bots: int, n_feedback: int):
+    from bot_factory.skill_selector import BASE_SKILLS, NICHE_SKILLS
+    rng = random.Random(42)
+    conn = sqlite3.connect(path)
+    now = datetime.now()
+    uids = [f"bot_{i:05d}" for i in range(n_bots)]
+    conn.executemany("INSERT INTO assinaturas (user_id, status) VALUES (?, ?)",
+                     [(u, "ativo" if rng.random() < 0.8 else "cancelado") for u in uids])
+    bots = []
+    for uid in uids:
+        nicho = rng.choice(NICHOS)
+        niche_skills = NICHE_SKILLS.get(nicho or "servicos", NICHE_SKILLS["servicos"])
+        skills = json.dumps(BASE_SKILLS + rng.sample(niche_skills, rng.randint(1, 3)))
+        if rng.random() < 0.01:
+            skills = "{quebrado"
+        deploy = (now - timedelta(days=rng.randint(0, 120))).strftime("%Y-%m-%d %H:%M:%S")
+        bots.append((uid, nicho, skills, "active" if rng.random() < 0.9 else "stopped", deploy))
+    conn.executemany("INSERT INTO bots_gerados (user_id, nicho, skills_usadas, status, data_deploy) "
+                     "VALUES (?, ?, ?, ?, ?)", bots)
+    _add_feedback(conn, uids, n_feedback, rng, days=60)
+    conn.commit()
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+    return uids
+
+
+def _add_feedback(conn, uids, n, rng, days):
+    now = datetime.now()
+    minutes = sorted((rng.randint(0, days * 1440) for _ in range(n)), reverse=True)  # ids em ordem cronológica
+    rows = ((rng.choice(uids), rng.choice(TIPOS), "", (now - timedelta(minutes=m)).strftime("%Y-%m-%d %H:%M:%S"))
+            for m in minutes)
+    conn.executemany("INSERT INTO feedback_bots (bot_user_id, tipo, conteudo, data) VALUES (?, ?, ?, ?)", rows)
+
+
+def legacy_cycle(path: str):
+    """run_learning_cycle como era antes (mesmas queries, mesmo laço)."""
+    from bot_factory.learning import _seed_new_niche
+    conn = sqlite3.connect(path, timeout=60)
+    conn.row_factory = sqlite3.Row
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT bot_user_id, COUNT(*) as total,
+               SUM(CASE WHEN tipo = 'escalacao' THEN 1 ELSE 0 END) as escalacoes
+        FROM feedback_bots WHERE data >= date('now', '-30 days') GROUP BY bot_user_id
+    """)
+    escal_data = {r["bot_user_id"]: (r["escalacoes"] / max(r["total"], 1)) for r in cur.fetchall()}
+    cur.execute("SELECT user_id, nicho, skills_usadas FROM bots_gerados "
+                "WHERE status = 'active' AND data_deploy <= date('now', '-30 days')")
+    active_old = cur.fetchall()
+    cur.execute("SELECT user_id FROM assinaturas WHERE status = 'ativo'")
+    active_clients = {r["user_id"] for r in cur.fetchall()}
+    for bot in active_old:
+        try:
+            skills = json.loads(bot["skills_usadas"] or "[]")
+        except Exception:
+            skills = []
+        retencao = 1.0 if bot["user_id"] in active_clients else 0.0
+        escalacao = escal_data.get(bot["user_id"], 0.2)
+        for skill in skills:
+            cur.execute("""
+                INSERT INTO skills_performance
+                    (nicho, skill_name, total_usos, taxa_retencao, taxa_escalacao, ultima_atualizacao)
+                VALUES (?, ?, 1, ?, ?, ?)
+                ON CONFLICT(nicho, skill_name) DO UPDATE SET
+                    taxa_retencao = (taxa_retencao * total_usos + excluded.taxa_retencao) / (total_usos + 1),
+                    taxa_escalacao = (taxa_escalacao * total_usos + excluded.taxa_escalacao) / (total_usos + 1),
+                    total_usos = total_usos + 1,
+                    ultima_atualizacao = excluded.ultima_atualizacao
+            """, (bot["nicho"] or "servicos", skill, retencao, escalacao,
+                  datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+    cur.execute("SELECT DISTINCT nicho FROM bots_gerados WHERE nicho NOT IN "
+                "(SELECT DISTINCT nicho FROM skills_performance) AND nicho IS NOT NULL")
+    for r in cur.fetchall():
+        _seed_new_niche(r["nicho"], cur)
+    conn.commit()
+    conn.close()
+
+
+class WriterProbe:
+    """Grava numa tabela à parte a cada 5 ms e registra a maior espera pelo lock de escrita."""
+
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path, timeout=120, check_same_thread=False)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS sonda (t REAL)")
+        self.conn.commit()
+        self.max_wait = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            t0 = time.perf_counter()
+            self.conn.execute("INSERT INTO sonda VALUES (?)", (t0,))
+            self.conn.commit()
+            self.max_wait = max(self.max_wait, time.perf_counter() - t0)
+            time.sleep(0.005)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.conn.close()
+
+
+def _timed_cycle(fn, path):
+    with WriterProbe(path) as probe:
+        t0 = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - t0
+    return elapsed, probe.max_wait
+
+
+def _scores(path):
+    conn = sqlite3.connect(path)
+    rows = conn.execute("SELECT nicho, skill_name, total_usos, taxa_retencao, taxa_escalacao "
+                        "FROM skills_performance ORDER BY 1, 2").fetchall()
+    conn.close()
+    return rows
+
+
+def _same(a, b):
+    return len(a) == len(b) and all(
+        x[:3] == y[:3] and abs(x[3] - y[3]) < 1e-9 and abs(x[4] - y[4]) < 1e-9 for x, y in zip(a, b))
+
+
+def main():
+    n_bots = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    n_feedback = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000_000
+    tmp = tempfile.TemporaryDirectory()
+    legacy_db = os.path.join(tmp.name, "legado.db")
+    batch_db = os.path.join(tmp.name, "lote.db")
+    os.environ["DB_NAME"] = batch_db
+    import logging
+    logging.basicConfig(level=logging.CRITICAL)
+
+    from bot_factory import db_pool, learning
+    from bot_factory.db_factory import setup_factory_tables
+
+    db_pool.get_conn(batch_db).execute("CREATE TABLE IF NOT EXISTS assinaturas (user_id TEXT, status TEXT)")
+    setup_factory_tables()
+    db_pool.close_all()
+    t0 = time.perf_counter()
+    uids = _populate(batch_db, n_bots, n_feedback)
+    print(f"{n_bots} bots, {n_feedback} feedbacks gerados em {time.perf_counter() - t0:.1f}s\n")
+    shutil.copy(batch_db, legacy_db)
+
+    results = []
+    for stage in ("1º ciclo", "ciclo seguinte (+10k feedbacks)"):
+        if results:
+            for path in (legacy_db, batch_db):
+                conn = sqlite3.connect(path)
+                _add_feedback(conn, uids, 10_000, random.Random(7), days=1)
+                conn.commit()
+                conn.close()
+        legacy = _timed_cycle(lambda: legacy_cycle(legacy_db), legacy_db)
+        batch = _timed_cycle(learning.run_learning_cycle, batch_db)
+        results.append((stage, legacy, batch, _same(_scores(legacy_db), _scores(batch_db))))
+    learning.shutdown()
+    db_pool.close_all()
+    tmp.cleanup()
+
+    print(f"{'':32s} | {'antigo: ciclo':>13s} {'espera máx.':>12s} | {'por conjunto: ciclo':>19s} {'espera máx.':>12s} | scores")
+    for stage, (l_s, l_wait), (b_s, b_wait), same in results:
+        print(f"{stage:32s} | {l_s:12.2f}s {l_wait * 1000:10.0f}ms | {b_s:18.2f}s {b_wait * 1000:10.0f}ms | "
+              f"{'iguais' if same else 'DIFERENTES'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+bench_pipeline_executor.py — Vazão do pipeline de criação de bots: um cliente por vez
+(watcher antigo, run_pipeline em sequência) × PipelineExecutor (pools por etapa).
+
+Clientes sintéticos: as etapas reais são trocadas por esperas com a latência típica de cada
+uma (perfil/DB, prompt, geração, deploy do subprocesso, notificação no Telegram). Para
+exercitar as retentativas, ~5% das notificações falham uma vez com erro de rede, e um
+deploy em cada 100 é lento (3s) — no modo sequencial ele trava todos que vêm atrás.
+
+Também confere a deduplicação: cada cliente é enviado duas vezes e só pode ser construído
+uma vez.
+
+Uso: python scripts/bench_pipeline_executor.py [n_clientes] [n_amostra_sequencial]
+"""
+import os
+import sys
+import time
+import random
+import statistics
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Latências simuladas por etapa (s)
+LATENCY = {"profile": 0.005, "prompt": 0.015, "generation": 0.025, "deploy": 0.150, "notify": 0.120}
+SLOW_DEPLOY = 3.0
+FLAKY_NOTIFY = 0.05
+
+
+def _synthetic_stages(builds: dict, lock: threading.Lock):
+    import requests
+    from bot_factory.pipeline import STAGES, Stage
+    flaky = set()
+
+    def make(name):
+        def fn(ctx):
+            uid = ctx["user_id"]
+            n = int(uid.split("_")[1])
+            if name == "profile":
+                with lock:
+                    builds[uid] = builds.get(uid, 0) + 1
+            delay = SLOW_DEPLOY if name == "deploy" and n % 100 == 0 else LATENCY[name]
+            time.sleep(delay)
+            if name == "notify":
+                if random.Random(n).random() < FLAKY_NOTIFY and uid not in flaky:
+                    flaky.add(uid)
+                    raise requests.ConnectionError("Telegram indisponível (simulado)")
+                ctx["result"]["success"] = True
+        return fn
+
+    return [Stage(s.name, make(s.name), s.workers) for s in STAGES]
+
+
+def bench_sequential(uids):
+    from bot_factory import pipeline
+    builds, lock = {}, threading.Lock()
+    stages = _synthetic_stages(builds, lock)
+    done_at = []
+    t0 = time.perf_counter()
+    for uid in uids:
+        pipeline.run_pipeline(uid, stages)
+        done_at.append(time.perf_counter() - t0)
+    return time.perf_counter() - t0, done_at
+
+
+def bench_executor(uids):
+    from bot_factory.pipeline import PipelineExecutor
+    builds, lock = {}, threading.Lock()
+    executor = PipelineExecutor(_synthetic_stages(builds, lock), backoff_ms=100)
+    done_at, futures, duplicates = [], [], 0
+    t0 = time.perf_counter()
+    for uid in uids:
+        future = executor.submit(uid)
+        future.add_done_callback(lambda f: done_at.append(time.perf_counter() - t0))
+        futures.append(future)
+        if executor.submit(uid) is None:  # mesmo cliente de novo (evento + varredura)
+            duplicates += 1
+    results = [f.result() for f in futures]
+    elapsed = time.perf_counter() - t0
+    stats = executor.stats()
+    executor.shutdown()
+    return {"elapsed": elapsed, "done_at": sorted(done_at), "ok": sum(r["success"] for r in results),
+            "duplicates": duplicates, "max_builds": max(builds.values()), "stats": stats}
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    sample = min(n, int(sys.argv[2]) if len(sys.argv) > 2 else 50)
+    import logging
+    logging.basicConfig(level=logging.CRITICAL)
+
+    uids = [f"bench_{i:04d}" for i in range(n)]
+    seq_elapsed, seq_done = bench_sequential(uids[:sample])
+    seq_total = seq_elapsed / sample * n
+    ex = bench_executor(uids)
+
+    print(f"{n} clientes sintéticos | latências por etapa (ms): "
+          + ", ".join(f"{k}={v * 1000:.0f}" for k, v in LATENCY.items())
+          + f" | 1% deploys de {SLOW_DEPLOY:.0f}s | {FLAKY_NOTIFY:.0%} notificações com falha\n")
+    print(f"sequencial      : {seq_total:7.1f} s (estimado por {sample} clientes: {seq_elapsed:.1f}s) | "
+          f"{n / seq_total:6.1f} clientes/s | p50 até pronto {statistics.median(seq_done) / sample * n:7.1f} s")
+    print(f"PipelineExecutor: {ex['elapsed']:5.1f} s | {n / ex['elapsed']:6.1f} clientes/s | "
+          f"p50 até pronto {statistics.median(ex['done_at']):7.1f} s | sucesso {ex['ok']}/{n}")
+    print(f"  ganho         : {seq_total / ex['elapsed']:.1f}x")
+    print(f"  deduplicação  : {ex['duplicates']}/{n} reenvios ignorados | máx. builds por cliente = {ex['max_builds']}")
+    for name, s in ex["stats"]["etapas"].items():
+        print(f"  {name:11s}: {s['vagas']:2d} vagas | {s['execucoes']:4d} execuções | "
+              f"{s['retentativas']:3d} retentativas | médio {s['medio_ms']} ms")
+
+
+if __name__ == "__main__":
+    main()
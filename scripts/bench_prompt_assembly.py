@@ -0,0 +1,128 @@
+"""
+bench_prompt_assembly.py — Compara a montagem de prompt antiga com o PromptEngine:
+  antes  → SYSTEM_PROMPT completo + bloco "CONTEXTO ATUAL DA SKILL" anexado ao system
+  depois → bot_factory.prompt_engine (system por fase + histórico + contexto após o histórico)
+
+Mede, em conversas sintéticas:
+  - tokens enviados por turno (média)
+  - tokens de prefixo idêntico ao turno anterior do mesmo usuário (o que o cache do provedor reaproveita)
+  - tempo de montagem por turno
+
+Com --live (e GROQ_API_KEY definida) também envia alguns turnos reais ao Groq e compara
+prompt_tokens reportados pela API e latência total.
+
+Uso: python scripts/bench_prompt_assembly.py [n_usuarios] [turnos] [--live]
+"""
+import os
+import sys
+import time
+import asyncio
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault("DB_NAME", os.path.join(tempfile.mkdtemp(), "bench_prompt.db"))
+
+from main import SYSTEM_PROMPT, PHASE_DROPS, GROQ_MODEL  # noqa: E402
+from bot_factory.prompt_engine import PromptEngine, count_tokens  # noqa: E402
+
+CONTEXTS = [
+    "",
+    "LEAD QUALIFY: falta o volume diário de mensagens. Pergunte de forma natural.",
+    "LEAD QUALIFY: nicho=clinica, volume=40. Recomende o plano Secretária Virtual.",
+    "PROPOSALS: cliente quer fechar. Peça nome completo e e-mail.\nURL_PAGAMENTO: https://checkout.example/abc",
+]
+USER_MSGS = ["oi, tudo bem?", "tenho uma clínica odontológica", "umas 40 mensagens por dia",
+             "quanto custa?", "quero fechar, como faço?", "meu email é ana@exemplo.com"]
+ASSISTANT_MSG = "Perfeito! Me conta um pouco mais sobre o seu atendimento hoje — quem responde os clientes? " * 2
+
+
+def legacy_build(history, user_text, extra_context):
+    system = SYSTEM_PROMPT
+    if extra_context:
+        system += ("\n\n═══════════════════════════════════════\nCONTEXTO ATUAL DA SKILL\n"
+                   "═══════════════════════════════════════\n" + extra_context)
+    return [{"role": "system", "content": system}] + history + [{"role": "user", "content": user_text}]
+
+
+def _tokens(messages):
+    return sum(count_tokens(m["content"]) for m in messages)
+
+
+def _shared_prefix_tokens(prev, cur):
+    shared = 0
+    for a, b in zip(prev, cur):
+        if a != b:
+            break
+        shared += count_tokens(a["content"])
+    return shared
+
+
+def simulate(build, n_users: int, turns: int):
+    sent = reused = 0
+    elapsed = 0.0
+    n = 0
+    for u in range(n_users):
+        history, prev = [], None
+        for t in range(turns):
+            user_text = USER_MSGS[t % len(USER_MSGS)]
+            ctx = CONTEXTS[(t + u) % len(CONTEXTS)]
+            phase = "qualificacao" if t < turns - 2 else "onboarding"
+            t0 = time.perf_counter()
+            msgs = build(history[-20:], user_text, ctx, phase)
+            elapsed += time.perf_counter() - t0
+            sent += _tokens(msgs)
+            if prev is not None:
+                reused += _shared_prefix_tokens(prev, msgs)
+            prev = msgs
+            n += 1
+            history += [{"role": "user", "content": user_text}, {"role": "assistant", "content": ASSISTANT_MSG}]
+    return {"tokens_turno": sent / n, "prefixo_reaproveitado": reused / max(sent, 1),
+            "us_turno": elapsed / n * 1e6}
+
+
+async def live(engine: PromptEngine, n: int = 3):
+    from groq import AsyncGroq
+    client = AsyncGroq(api_key=os.environ["GROQ_API_KEY"])
+    history = [{"role": "user", "content": USER_MSGS[1]}, {"role": "assistant", "content": ASSISTANT_MSG}]
+    for label, build in (("antes", lambda: legacy_build(history, USER_MSGS[3], CONTEXTS[2])),
+                         ("depois", lambda: engine.build(history, USER_MSGS[3], CONTEXTS[2], "qualificacao"))):
+        lat, toks = [], []
+        for _ in range(n):
+            t0 = time.perf_counter()
+            resp = await client.chat.completions.create(model=GROQ_MODEL, messages=build(), max_tokens=200)
+            lat.append(time.perf_counter() - t0)
+            toks.append(resp.usage.prompt_tokens)
+        print(f"  {label:<7} prompt_tokens={sum(toks) / n:.0f}  latência média={sum(lat) / n * 1000:.0f} ms")
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    n_users = int(args[0]) if args else 200
+    turns = int(args[1]) if len(args) > 1 else 12
+    engine = PromptEngine(SYSTEM_PROMPT, PHASE_DROPS)
+
+    print(f"Seções do SYSTEM_PROMPT ({engine.full_tokens} tokens, tokenizer={engine.stats()['tokenizer']}):")
+    for name, tokens in engine.report():
+        print(f"  {tokens:>6}  {name}")
+
+    before = simulate(lambda h, u, c, p: legacy_build(h, u, c), n_users, turns)
+    after = simulate(lambda h, u, c, p: engine.build(h, u, c, phase=p), n_users, turns)
+    print(f"\n{n_users} usuários × {turns} turnos")
+    for label, r in (("antes", before), ("depois", after)):
+        print(f"  {label:<7} tokens/turno={r['tokens_turno']:8.0f}  "
+              f"prefixo reaproveitável={r['prefixo_reaproveitado']:6.1%}  "
+              f"montagem={r['us_turno']:7.1f} µs/turno")
+    print(f"  redução de tokens enviados: {1 - after['tokens_turno'] / before['tokens_turno']:.1%}")
+
+    if "--live" in sys.argv:
+        if not os.getenv("GROQ_API_KEY"):
+            print("\n--live ignorado: GROQ_API_KEY não definida.")
+        else:
+            print("\nGroq (real):")
+            asyncio.run(live(engine))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+bench_prompt_build.py — Custo de prompt_builder.build_system_prompt com a busca antiga de
+skills (os.path.exists em até dez pastas + releitura/parse a cada chamada) × o índice em
+memória de bot_factory/skills_registry.py.
+
+Também confere o registro numa cópia temporária da biblioteca:
+  1. Mesmas instruções e meta.json que a busca antiga, para todas as skills
+  2. meta.json fora do schema → meta padrão + erro registrado
+  3. instructions.txt editado → recarregado pelo mtime
+  4. Skill nova → aparece sem reiniciar
+
+Uso: python scripts/bench_prompt_build.py [n_builds]   (exit 1 se algum cenário falhar)
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PROFILE = {"empresa_nome": "Clínica Bella", "plano": "ecossistema", "nicho": "clinica_estetica",
+           "tom_de_voz": "acolhedor", "horario_funcionamento": "Seg a Sex, 9h às 18h",
+           "servicos_produtos": "Limpeza de pele, botox, preenchimento", "agenda_servicos": "botox"}
+
+
+def _legacy(library: str):
+    """get_skill_meta / load_skill_instructions como eram antes do registro."""
+    from bot_factory.skill_selector import NICHE_SKILLS
+
+    def get_skill_meta(skill_name):
+        paths = [os.path.join(library, "_base", skill_name, "meta.json")]
+        paths += [os.path.join(library, folder, skill_name, "meta.json") for folder in NICHE_SKILLS]
+        for path in paths:
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    return json.load(f)
+        return {"name": skill_name, "title": skill_name, "description": ""}
+
+    def load_skill_instructions(skill_name):
+        for folder in ["_base"] + list(NICHE_SKILLS):
+            path = os.path.join(library, folder, skill_name, "instructions.txt")
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    return f.read().strip()
+        meta = get_skill_meta(skill_name)
+        return meta.get("prompt_instruction", meta.get("description", ""))
+
+    return get_skill_meta, load_skill_instructions
+
+
+def _timed(fn, n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+def main() -> int:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    import logging
+    logging.basicConfig(level=logging.CRITICAL)
+
+    from bot_factory import prompt_builder
+    from bot_factory.skill_selector import BASE_SKILLS, NICHE_SKILLS
+    from bot_factory.skills_registry import SKILLS_DIR, SkillsRegistry
+
+    tmp = tempfile.TemporaryDirectory()
+    library = os.path.join(tmp.name, "skills_library")
+    shutil.copytree(SKILLS_DIR, library)
+    legacy_meta, legacy_instructions = _legacy(library)
+    registry = SkillsRegistry(library, refresh_seconds=0)
+
+    # Pior caso da busca antiga: skills de nicho do fim da lista de pastas
+    skills = BASE_SKILLS + NICHE_SKILLS["varejo"] + NICHE_SKILLS["servicos"][:2]
+
+    def build(load):
+        prompt_builder.load_skill_instructions = load
+        return prompt_builder.build_system_prompt(PROFILE, skills)
+
+    legacy_prompt = build(legacy_instructions)
+    registry_prompt = build(registry.instructions)
+    legacy_us = _timed(lambda: build(legacy_instructions), n)
+    registry.refresh_seconds = 2.0  # padrão (SKILLS_REFRESH_SECONDS)
+    registry_us = _timed(lambda: build(registry.instructions), n)
+    lookup_us = _timed(lambda: registry.get("promocoes"), n * 50)
+    rescan_us = _timed(registry._scan_signature, 200)
+    registry.refresh_seconds = 0
+
+    all_skills = [s for group in [BASE_SKILLS] + list(NICHE_SKILLS.values()) for s in group]
+    same = all(registry.instructions(s) == legacy_instructions(s) and registry.meta(s) == legacy_meta(s)
+               for s in all_skills)
+
+    with open(os.path.join(library, "varejo", "promocoes", "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"name": "promocoes", "title": 123, "triggers": "promoção"}, f)
+    bad_meta = registry.meta("promocoes") == {"name": "promocoes", "title": "promocoes", "description": ""}
+    bad_logged = len(registry.errors.get("promocoes", [])) == 3  # title, description, triggers
+
+    time.sleep(0.01)
+    with open(os.path.join(library, "_base", "faq_responder", "instructions.txt"), "w", encoding="utf-8") as f:
+        f.write("Responda a FAQ nova.\n")
+    edited = registry.instructions("faq_responder") == "Responda a FAQ nova."
+
+    new_skill = os.path.join(library, "varejo", "troca_presente")
+    os.makedirs(new_skill)
+    with open(os.path.join(new_skill, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"name": "troca_presente", "title": "Troca de Presente", "description": "Trocas.",
+                   "prompt_instruction": "Explique a troca de presentes."}, f)
+    added = registry.instructions("troca_presente") == "Explique a troca de presentes."
+    tmp.cleanup()
+
+    checks = [
+        ("mesmo prompt que a busca antiga", legacy_prompt == registry_prompt),
+        ("mesmas instruções e meta para todas as skills", same),
+        ("meta.json fora do schema → meta padrão", bad_meta),
+        ("erros do schema registrados", bad_logged),
+        ("instructions.txt editado → recarregado", edited),
+        ("skill nova → aparece sem reiniciar", added),
+    ]
+    print(f"build_system_prompt com {len(skills)} skills, {n} builds\n")
+    print(f"busca antiga (exists + leitura) : {legacy_us:8.1f} µs/prompt")
+    print(f"skills_registry                 : {registry_us:8.1f} µs/prompt ({legacy_us / registry_us:.1f}x)")
+    print(f"  lookup por nome               : {lookup_us:8.2f} µs")
+    print(f"  conferência de mtime          : {rescan_us:8.1f} µs (no máximo a cada SKILLS_REFRESH_SECONDS)\n")
+    ok = True
+    for desc, passed in checks:
+        print(f"{'OK   ' if passed else 'FALHA'} {desc}")
+        ok = ok and passed
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""
+bench_skill_matching.py — Custo por mensagem da detecção de palavras-chave das skills:
+  antes  → 5 re.sub aninhados (acentos) + laços de `kw in texto` sobre o histórico re-concatenado
+  depois → bot_factory.keyword_matcher (str.translate + regex única + cache por mensagem)
+
+Roda brand_identity, lead_qualify e proposals (só detecção, sem Stripe) sobre conversas
+sintéticas com histórico e confere se as duas versões concordam.
+
+Uso: python scripts/bench_skill_matching.py [n_mensagens]
+"""
+import os
+import re
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from skills.brand_identity import run as brand  # noqa: E402
+from skills.lead_qualify import run as lead  # noqa: E402
+from skills.proposals import run as proposals  # noqa: E402
+
+
+# ── Implementação anterior (cópia fiel, para comparação) ─────────
+def _strip(t):
+    return re.sub(r'[áàãâä]', 'a', re.sub(r'[éèê]', 'e', re.sub(r'[íì]', 'i',
+        re.sub(r'[óòõô]', 'o', re.sub(r'[úù]', 'u', t)))))
+
+
+def legacy_detect(text, history):
+    out = {}
+    t = text.lower()
+    out["brand"] = next((k for k, words in (("vehicle", brand.VEHICLE_WORDS), ("competitor", brand.COMPETITORS))
+                         if any(w in t for w in words)), None)
+
+    combined8 = _strip((text + " " + " ".join(m for _, m in history[-8:])).lower())
+    out["niche"] = next((n for n, keys in lead.NICHES if any(k in combined8 for k in keys)), None)
+    combined6 = (text + " " + " ".join(m for _, m in history[-6:])).lower()
+    out["pain"] = next((p for p, words in lead.PAIN_SIGNALS.items() if any(w in combined6 for w in words)), None)
+    out["volume"] = next((v for v, words in lead.VOLUME_WORDS.items() if any(w in combined6 for w in words)), None)
+    out["platform"] = next((p for p, sigs in lead.PLATFORM_SIGNALS.items() if any(s in combined6 for s in sigs)), None)
+    ts = _strip(t)
+    out["objection"] = next((o for o, kws in lead.OBJECTIONS.items() if any(k in ts for k in kws)), None)
+
+    combined10 = _strip((text + " " + " ".join(m for _, m in history[-10:])).lower())
+    out["plan"] = next((p for p, kws in proposals.PLAN_SIGNALS.items() if any(k in combined10 for k in kws)), None)
+    out["closing"] = any(s in ts for s in proposals.CLOSING_SIGNALS)
+    out["interest"] = any(s in t for s in proposals.INTEREST_SIGNALS)
+    return out
+
+
+def _window(text, history, n):
+    return lead.MATCHER.scan_many([text] + [m for _, m in history[-n:]])
+
+
+def new_detect(text, history):
+    hits6 = _window(text, history, 6)
+    return {
+        "brand": brand.MATCHER.first(brand.MATCHER.scan(text), "brand"),
+        "niche": lead.MATCHER.first(_window(text, history, 8), "niche"),
+        "pain": lead.MATCHER.first(hits6, "pain"),
+        "volume": lead.MATCHER.first(hits6, "volume"),
+        "platform": lead.MATCHER.first(hits6, "platform"),
+        "objection": lead._detect_objection(text),
+        "plan": proposals.MATCHER.first(proposals.MATCHER.scan_many([text] + [m for _, m in history[-10:]]), "plan"),
+        "closing": proposals._detect_closing(text),
+        "interest": proposals._detect_interest(text),
+    }
+
+
+MESSAGES = [
+    "Oi, tudo bem? Vi o anúncio de vocês",
+    "Tenho uma clínica de estética aqui em Curitiba",
+    "A gente recebe umas 40 mensagens por dia no whatsapp",
+    "O problema é a demora pra responder, perdemos cliente direto",
+    "Achei meio caro, vou pensar",
+    "Qual a diferença pro plano secretária? Preciso de agendamento",
+    "Já uso o manychat mas não gostei",
+    "Quero fechar! Como pago?",
+    "Meu email é ana.souza@exemplo.com",
+    "Não tenho tempo agora, semana que vem a gente vê",
+    "Prefiro telegram, é gratuito né?",
+    "Vocês vendem carro seminovo?",
+]
+
+
+def conversations(n, seed=42):
+    rnd = random.Random(seed)
+    history = []
+    for _ in range(n):
+        text = rnd.choice(MESSAGES)
+        yield text, list(history[-10:])
+        history += [("user", text), ("assistant", "Entendi! Me conta mais sobre o seu atendimento hoje.")]
+        if len(history) > 40:
+            history = []
+
+
+def bench(fn, cases):
+    t0 = time.perf_counter()
+    for text, hist in cases:
+        fn(text, hist)
+    return (time.perf_counter() - t0) / len(cases) * 1e6
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    cases = list(conversations(n))
+
+    diffs = [(t, legacy_detect(t, h), new_detect(t, h)) for t, h in cases[:500]
+             if legacy_detect(t, h) != new_detect(t, h)]
+
+    before = bench(legacy_detect, cases)
+    after = bench(new_detect, cases)
+    print(f"{n} mensagens (histórico de até 10 mensagens)")
+    print(f"  antes : {before:7.1f} µs/mensagem")
+    print(f"  depois: {after:7.1f} µs/mensagem  ({before / after:.1f}x)")
+    print(f"  cache : {lead.MATCHER.cache_info()}")
+    if diffs:
+        print(f"\n{len(diffs)} divergências nas primeiras 500 (normalização de acentos agora cobre ç/ü e "
+              f"vale para todas as listas):")
+        for text, old, new in diffs[:5]:
+            changed = {k: (old[k], new[k]) for k in old if old[k] != new[k]}
+            print(f"  {text!r}: {changed}")
+    else:
+        print("  resultados idênticos à implementação anterior.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+bench_skill_selection.py — Custo de skill_selector.select_skills: N+1 antigo (get_skill_score
+por candidata + record_skill_usage por escolhida, cada um com sua consulta/commit) × ranking
+em lote (bot_factory/skill_ranking.py), para bibliotecas de 4, 40 e 400 skills no nicho.
+
+Conta os statements SQL por seleção (trace callback na conexão do pool) e confere:
+  1. Mesmas skills escolhidas que o caminho antigo
+  2. Uso registrado igual (total_usos)
+  3. run_learning_cycle() invalida o cache → scores novos no build seguinte
+
+Uso: python scripts/bench_skill_selection.py [n_selecoes]   (exit 1 se algum cenário falhar)
+"""
+import os
+import sys
+import time
+import random
+import sqlite3
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PLANO = "secretaria"  # max_skills_nicho = 3
+
+
+def main() -> int:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    tmp = tempfile.TemporaryDirectory()
+    os.environ["DB_NAME"] = os.path.join(tmp.name, "skills.db")
+    import logging
+    logging.basicConfig(level=logging.CRITICAL)
+
+    from bot_factory import db_pool, skill_selector
+    from bot_factory.db_factory import DB_PATH, get_skill_score, record_skill_usage, setup_factory_tables
+    from bot_factory.learning import run_learning_cycle
+    from bot_factory.plan_resolver import resolve
+    from bot_factory.skill_ranking import get_ranking
+
+    db_pool.get_conn(DB_PATH).execute("CREATE TABLE IF NOT EXISTS assinaturas (user_id TEXT, status TEXT)")
+    setup_factory_tables()
+    conn = db_pool.get_conn(DB_PATH)
+    statements = []
+    conn.set_trace_callback(statements.append)
+
+    def legacy_select(nicho, plano):
+        """select_skills como era: uma consulta por candidata, um commit por escolhida."""
+        max_nicho = resolve(plano).get("max_skills_nicho", 1)
+        candidates = skill_selector.NICHE_SKILLS[nicho]
+        scored = sorted(((s, get_skill_score(nicho, s)) for s in candidates), key=lambda x: x[1], reverse=True)
+        top = [s for s, _ in scored[:max_nicho]]
+        for skill in top:
+            record_skill_usage(nicho, skill)
+        return skill_selector.BASE_SKILLS + top
+
+    def usage(nicho):
+        return dict(db_pool.fetchall("SELECT skill_name, total_usos FROM skills_performance WHERE nicho=?",
+                                     (nicho,), path=DB_PATH))
+
+    def measure(fn, nicho):
+        del statements[:]
+        t0 = time.perf_counter()
+        for _ in range(n):
+            chosen = fn(nicho, PLANO)
+        return (time.perf_counter() - t0) / n * 1000, len(statements) / n, chosen
+
+    rng = random.Random(7)
+    rows, checks = [], []
+    for size in (4, 40, 400):
+        skills = [f"skill_{size}_{i:03d}" for i in range(size)]
+        legacy_nicho, batch_nicho = f"legado_{size}", f"lote_{size}"
+        for nicho in (legacy_nicho, batch_nicho):
+            skill_selector.NICHE_SKILLS[nicho] = skills
+        metrics = [(s, rng.uniform(3, 9), rng.random(), rng.random() * 0.5) for s in skills[: size * 3 // 4]]
+        db_pool.executemany(
+            "INSERT INTO skills_performance (nicho, skill_name, media_satisfacao, taxa_retencao, taxa_escalacao) "
+            "VALUES (?,?,?,?,?)", [(nicho, *m) for nicho in (legacy_nicho, batch_nicho) for m in metrics], path=DB_PATH)
+
+        legacy_ms, legacy_stmts, legacy_choice = measure(legacy_select, legacy_nicho)
+        batch_ms, batch_stmts, batch_choice = measure(skill_selector.select_skills, batch_nicho)
+        rows.append((size, legacy_ms, legacy_stmts, batch_ms, batch_stmts))
+        checks.append((f"{size} skills: mesma seleção", legacy_choice == batch_choice))
+        checks.append((f"{size} skills: mesmo uso registrado",
+                       sorted(usage(legacy_nicho).values()) == sorted(usage(batch_nicho).values())))
+
+    ranking = get_ranking()
+    nicho = "lote_40"
+    best = skill_selector.select_skills(nicho, PLANO)[-3]
+    db_pool.execute("UPDATE skills_performance SET media_satisfacao = 0, taxa_retencao = 0 "
+                    "WHERE nicho = ? AND skill_name = ?", (nicho, best), path=DB_PATH)
+    stale = skill_selector.select_skills(nicho, PLANO)[-3] == best  # cache ainda vale até o aprendizado
+    run_learning_cycle()
+    fresh = best not in skill_selector.select_skills(nicho, PLANO)
+    checks.append(("sem aprendizado → scores do cache", stale))
+    checks.append(("run_learning_cycle invalida o cache", fresh))
+    stats = ranking.stats()
+    conn.set_trace_callback(None)
+    db_pool.close_all()
+    tmp.cleanup()
+
+    print(f"{n} seleções por cenário, plano {PLANO} (3 skills de nicho)\n")
+    print("skills no nicho |  N+1 antigo: ms/seleção  SQL/seleção |  ranking em lote: ms/seleção  SQL/seleção")
+    for size, l_ms, l_st, b_ms, b_st in rows:
+        print(f"{size:15d} | {l_ms:22.3f}  {l_st:11.1f} | {b_ms:27.3f}  {b_st:11.1f}")
+    print(f"\nranking: {stats}\n")
+    ok = True
+    for desc, passed in checks:
+        print(f"{'OK   ' if passed else 'FALHA'} {desc}")
+        ok = ok and passed
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
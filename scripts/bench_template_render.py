@@ -0,0 +1,97 @@
+"""
+bench_template_render.py — Renderizações de bot.py por segundo: Environment novo a cada
+cliente (generator antigo) × Environment compartilhado com templates compilados
+(generator.render_bot), e o modo em lote generator.regenerate_bots() sobre N clientes já
+gerados num diretório temporário.
+
+Também mede o primeiro render num processo novo, com e sem o bytecode em JINJA_CACHE_DIR,
+e confere que a correção de um template chega a todos os clientes do plano numa passada.
+
+Uso: python scripts/bench_template_render.py [n_clientes]
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PLANS = ["flash", "secretaria", "ecossistema"]
+COLD_RENDER = (
+    "import time; t0 = time.perf_counter(); from bot_factory import generator; "
+    "generator.render_bot({'user_id': 'frio', 'plano': 'ecossistema', 'telegram_bot_token': '1:F'}); "
+    "print((time.perf_counter() - t0) * 1000)"
+)
+
+
+def _cold_ms(cache_dir: str) -> float:
+    env = {**os.environ, "PYTHONPATH": ROOT, "JINJA_CACHE_DIR": cache_dir}
+    out = subprocess.run([sys.executable, "-c", COLD_RENDER], env=env, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip())
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    tmp = tempfile.TemporaryDirectory()
+    os.environ["DB_NAME"] = os.path.join(tmp.name, "render.db")
+    import logging
+    logging.basicConfig(level=logging.CRITICAL)
+
+    from jinja2 import Environment, FileSystemLoader
+    from bot_factory import generator
+    generator.CLIENTS_DIR = os.path.join(tmp.name, "clients")
+    templates = os.path.join(tmp.name, "templates")
+    shutil.copytree(generator.TEMPLATES_DIR, templates)
+    generator.TEMPLATES_DIR = templates  # a correção de template abaixo não toca o repositório
+
+    profiles = [{"user_id": f"render_{i:04d}", "plano": PLANS[i % 3], "empresa_nome": f"Empresa {i}",
+                 "telegram_bot_token": f"{800000 + i}:FAKE"} for i in range(n)]
+
+    def render_fresh(profile):
+        context = generator._render_context(profile)
+        env = Environment(loader=FileSystemLoader(templates), autoescape=False, keep_trailing_newline=True)
+        return env.get_template(generator._get_template_name(context["plano"])).render(**context)
+
+    t0 = time.perf_counter()
+    fresh = [render_fresh(p) for p in profiles]
+    fresh_s = time.perf_counter() - t0
+
+    generator.render_bot(profiles[0])  # compila uma vez, como o primeiro cliente do processo
+    t0 = time.perf_counter()
+    cached = [generator.render_bot(p) for p in profiles]
+    cached_s = time.perf_counter() - t0
+
+    for p in profiles:
+        generator.generate_bot(p, ["faq"], "Você é a assistente virtual da empresa.")
+    noop = generator.regenerate_bots(profiles)
+
+    target = os.path.join(templates, generator._get_template_name("secretaria"))
+    with open(target, "a", encoding="utf-8") as f:
+        f.write("\n# correção de template\n")
+    fixed = generator.regenerate_bots(profiles)
+    expected = {p["user_id"] for p in profiles if p["plano"] == "secretaria"}
+    propagated = all(open(os.path.join(generator.CLIENTS_DIR, uid, "bot.py"), encoding="utf-8").read()
+                     .endswith("# correção de template\n") for uid in expected)
+
+    cache_dir = os.path.join(tmp.name, "jinja")
+    cold_miss = _cold_ms(cache_dir)  # parse + compila e grava o bytecode
+    cold_hit = _cold_ms(cache_dir)   # só carrega o bytecode
+    tmp.cleanup()
+
+    print(f"{n} clientes ({', '.join(PLANS)})\n")
+    print(f"Environment novo por cliente : {n / fresh_s:8.0f} renders/s ({fresh_s * 1000 / n:.2f} ms/bot)")
+    print(f"render_bot (compilado 1x)    : {n / cached_s:8.0f} renders/s ({cached_s * 1000 / n:.3f} ms/bot) "
+          f"— {fresh_s / cached_s:.0f}x")
+    print(f"  mesma saída                : {'sim' if fresh == cached else 'NÃO'}")
+    print(f"regenerate_bots sem mudança  : {noop['segundos']:.2f} s | {len(noop['alterados'])} alterados | "
+          f"{n / noop['segundos']:.0f} clientes/s")
+    print(f"regenerate_bots após correção: {fixed['segundos']:.2f} s | {len(fixed['alterados'])} alterados "
+          f"(esperado {len(expected)}) | propagada: {'sim' if propagated else 'NÃO'}")
+    print(f"processo novo, 1º render     : {cold_miss:.0f} ms sem bytecode | {cold_hit:.0f} ms com bytecode")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+bench_tenant_memory.py — Memória por cliente: um `python bot.py` por cliente (deployer
+clássico) × runtime multi-tenant (bot_factory/tenant_runtime.py).
+
+Gera N bots reais com bot_factory.generator (planos flash/secretaria/ecossistema, tokens
+falsos) num diretório temporário e aponta todos para um servidor Telegram FALSO local
+(getMe / deleteWebhook / getUpdates com long-poll), em outro processo — nada sai da máquina.
+
+  subprocessos → sobe K bots como processos independentes e mede o RSS de cada um
+  multi-tenant → hospeda os N bots neste processo (um TenantHost) e mede o RSS incremental
+
+Também confere o hot remove/add: tirar e recolocar um tenant não reinicia os outros.
+
+Uso: python scripts/bench_tenant_memory.py [n_tenants] [k_subprocessos]
+"""
+import os
+import sys
+import time
+import queue
+import asyncio
+import tempfile
+import subprocess
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PLANS = ["flash", "secretaria", "ecossistema"]
+PROMPT = ("Você é a assistente virtual da empresa. Responda com simpatia e objetividade.\n" * 80)
+
+
+# ── Telegram falso (processo separado: suas threads não entram na medição) ──
+def _fake_telegram(port_q, seen_q):
+    import json
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qs
+
+    polling = set()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            _, token, method = self.path.rsplit("/", 2)
+            raw = self.rfile.read(int(self.headers.get("Content-Length", 0)) or 0).decode()
+            try:
+                params = json.loads(raw) if raw.startswith("{") else {k: v[0] for k, v in parse_qs(raw).items()}
+            except ValueError:
+                params = {}
+            if method == "getMe":
+                bot_id = int(token.split(":")[0].replace("bot", ""))
+                result = {"id": bot_id, "is_bot": True, "first_name": "Bench", "username": f"bench_{bot_id}_bot"}
+            elif method == "getUpdates":
+                if token not in polling:
+                    polling.add(token)
+                    seen_q.put(token)
+                time.sleep(min(float(params.get("timeout", 0) or 0), 5))
+                result = []
+            else:
+                result = True
+            data = json.dumps({"ok": True, "result": result}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        do_GET = do_POST
+
+        def log_message(self, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+        request_queue_size = 1024  # todos os tenants conectam ao mesmo tempo
+
+        def handle_error(self, request, client_address):
+            pass  # long-polls cortados ao encerrar os bots
+
+    server = Server(("127.0.0.1", 0), Handler)
+    port_q.put(server.server_address[1])
+    server.serve_forever()
+
+
+def _generate(n, clients_dir):
+    from bot_factory import generator
+    generator.CLIENTS_DIR = clients_dir
+    bots = []
+    for i in range(n):
+        profile = {"user_id": f"bench_{i:04d}", "plano": PLANS[i % len(PLANS)],
+                   "empresa_nome": f"Empresa {i}", "telegram_bot_token": f"{700000 + i}:FAKE-TOKEN-{i}"}
+        bots.append(generator.generate_bot(profile, ["faq"], PROMPT)["bot_path"])
+    return bots
+
+
+def _wait_polling(seen_q, expected, timeout=90):
+    seen = set()
+    deadline = time.time() + timeout
+    while len(seen) < expected and time.time() < deadline:
+        try:
+            seen.add(seen_q.get(timeout=0.5))
+        except queue.Empty:
+            pass
+    return len(seen)
+
+
+def bench_subprocess(bot_paths, seen_q):
+    from bot_factory.tenant_runtime import rss_mb
+    t0 = time.perf_counter()
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {**os.environ, "PYTHONPATH": root}  # fora de clients/ o bot.py não acha a raiz sozinho
+    procs = [subprocess.Popen([sys.executable, p], cwd=os.path.dirname(p), env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL) for p in bot_paths]
+    ready = _wait_polling(seen_q, len(procs))
+    startup = time.perf_counter() - t0
+    time.sleep(1)
+    rss = [rss_mb(p.pid) for p in procs]
+    for p in procs:
+        p.terminate()
+    for p in procs:
+        p.wait(30)
+    rss = [r for r in rss if r]
+    return ready, startup, (sum(rss) / len(rss) if rss else None)
+
+
+async def bench_multitenant(n, clients_dir, seen_q):
+    import gc
+    import telegram.ext  # noqa: F401 — custo fixo compartilhado, entra na linha de base
+    import groq  # noqa: F401
+    from bot_factory import tenant_runtime as rt
+
+    host = rt.TenantHost(0, 1, clients_dir)
+    host.write_status()
+    rt._write_json(rt._status_path("supervisor.json", clients_dir), {"pid": os.getpid(), "workers": 1})
+    gc.collect()
+    base = rt.rss_mb()
+
+    users = sorted(d for d in os.listdir(clients_dir) if d.startswith("bench_"))
+    steps = sorted({max(1, n // 4), max(1, n // 2), n})
+    curve, enabled = [], 0
+    t0 = time.perf_counter()
+    for step in steps:
+        for uid in users[enabled:step]:
+            rt.enable_tenant(uid, os.path.join(clients_dir, uid, "bot.py"), clients_dir)
+        enabled = step
+        await host.reconcile()
+        gc.collect()
+        curve.append((len(host.tenants), rt.rss_mb()))
+    startup = time.perf_counter() - t0
+    polling = await asyncio.to_thread(_wait_polling, seen_q, n)  # não bloqueia o polling dos tenants
+
+    # Hot remove/add: só o tenant alvo é reiniciado
+    others = {uid: t for uid, t in host.tenants.items() if uid != users[0]}
+    rt.disable_tenant(users[0], clients_dir)
+    await host.reconcile()
+    removed_ok = users[0] not in host.tenants and len(host.tenants) == n - 1
+    rt.enable_tenant(users[0], os.path.join(clients_dir, users[0], "bot.py"), clients_dir)
+    await host.reconcile()
+    added_ok = users[0] in host.tenants
+    untouched = all(host.tenants.get(uid) is t for uid, t in others.items())
+
+    await asyncio.gather(*(host.remove(uid) for uid in list(host.tenants)))
+    return {"base": base, "curve": curve, "startup": startup, "polling": polling,
+            "failures": dict(host.failures), "hot": (removed_ok, added_ok, untouched)}
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    k = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    port_q, seen_q = multiprocessing.Queue(), multiprocessing.Queue()
+    server = multiprocessing.Process(target=_fake_telegram, args=(port_q, seen_q), daemon=True)
+    server.start()
+    port = port_q.get(timeout=10)
+
+    tmp = tempfile.TemporaryDirectory()
+    clients_dir = os.path.join(tmp.name, "clients")
+    os.environ.update({
+        "TELEGRAM_API_URL": f"http://127.0.0.1:{port}/bot",
+        "DB_NAME": os.path.join(tmp.name, "bench.db"),
+        "GROQ_API_KEY": "gsk_fake_bench",
+    })
+    import logging
+    logging.basicConfig(level=logging.CRITICAL)
+
+    bots = _generate(max(n, k) + k, clients_dir)
+    ready, sub_startup, sub_rss = bench_subprocess(bots[-k:], seen_q)
+    for path in bots[-k:]:
+        os.remove(path)  # só os N primeiros entram no runtime
+
+    mt = asyncio.run(bench_multitenant(n, clients_dir, seen_q))
+    server.terminate()
+    tmp.cleanup()
+
+    final_tenants, final_rss = mt["curve"][-1]
+    per_tenant = (final_rss - mt["base"]) / max(final_tenants, 1) if final_rss and mt["base"] else None
+
+    print(f"Subprocesso por cliente ({ready}/{k} bots em polling, {sub_startup:.1f}s até todos no ar)")
+    print(f"  RSS médio por bot  : {sub_rss:7.1f} MB" if sub_rss else "  RSS indisponível (sem /proc)")
+    print(f"\nRuntime multi-tenant ({mt['polling']}/{n} tenants em polling, {mt['startup']:.1f}s até todos no ar)")
+    print(f"  linha de base      : {mt['base']:7.1f} MB  (telegram + groq + runtime, pago uma vez por worker)")
+    for count, rss in mt["curve"]:
+        print(f"  {count:4d} tenants      : {rss:7.1f} MB")
+    if per_tenant is not None:
+        print(f"  por tenant         : {per_tenant:7.2f} MB")
+    if mt["failures"]:
+        print(f"  falhas             : {mt['failures']}")
+    removed_ok, added_ok, untouched = mt["hot"]
+    print(f"\nHot remove/add: removido={removed_ok} readicionado={added_ok} demais intactos={untouched}")
+
+    if sub_rss and per_tenant:
+        for clients in (100, 300, 1000):
+            workers = 2
+            print(f"  {clients:5d} clientes: subprocessos ≈ {clients * sub_rss / 1024:5.1f} GB | "
+                  f"multi-tenant ({workers} workers) ≈ {(workers * mt['base'] + clients * per_tenant) / 1024:5.2f} GB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+bench_webhook_latency.py — Latência update → resposta dos bots de clientes com long polling
+× webhook (bot_factory/webhook.py + runtime multi-tenant), contra um Telegram FALSO local.
+
+O Telegram falso (FastAPI/uvicorn em outro processo) implementa getMe, getUpdates com
+long-poll, setWebhook/deleteWebhook e sendMessage. Cada update injetado é um /start num chat
+próprio; a latência vai do momento da injeção até o sendMessage de resposta daquele chat.
+RTT simula a distância até o Telegram real: metade na ida, metade na volta de cada chamada
+(e na entrega do webhook).
+
+  polling → cada tenant mantém um getUpdates aberto; o Telegram falso responde o long-poll
+  webhook → o Telegram falso faz POST no endpoint único (mesma rota de main.py, em outro
+            processo), que encaminha ao worker pelo RuntimeInbox e responde 200 na hora
+
+Uso: python scripts/bench_webhook_latency.py [n_tenants] [n_updates] [rtt_ms]
+"""
+import os
+import sys
+import time
+import socket
+import random
+import asyncio
+import tempfile
+import statistics
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PROMPT = "Você é a assistente virtual da empresa. Responda com simpatia e objetividade.\n" * 20
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# ── Telegram falso ───────────────────────────────────────────────
+def _fake_telegram(port, rtt_ms):
+    import json
+    import httpx
+    import uvicorn
+    from fastapi import FastAPI, Request
+
+    app = FastAPI()
+    state = {"seq": 0, "injected": {}, "replies": {}, "polls": 0, "max_polls": 0, "api_calls": 0}
+    queues, events, webhooks = {}, {}, {}
+    client = httpx.AsyncClient(timeout=10)
+    half = rtt_ms / 2000
+
+    async def params(request):
+        raw = await request.body()
+        if raw.startswith(b"{"):
+            return json.loads(raw)
+        form = await request.form()
+        return dict(form)
+
+    @app.post("/bot{token}/{method}")
+    async def api(token: str, method: str, request: Request):
+        p = await params(request)
+        state["api_calls"] += 1
+        await asyncio.sleep(half)  # ida
+        if method == "getMe":
+            bot_id = int(token.split(":")[0])
+            return {"ok": True, "result": {"id": bot_id, "is_bot": True, "first_name": "Bench",
+                                           "username": f"bench_{bot_id}_bot"}}
+        if method == "setWebhook":
+            webhooks[token] = (p["url"], p.get("secret_token", ""))
+        elif method == "deleteWebhook":
+            webhooks.pop(token, None)
+        elif method == "sendMessage":
+            state["replies"].setdefault(int(p["chat_id"]), time.time())
+        elif method == "getUpdates":
+            offset = int(p.get("offset") or 0)
+            queue = queues.setdefault(token, [])
+            queue[:] = [u for u in queue if u["update_id"] >= offset]
+            if not queue:
+                event = events.setdefault(token, asyncio.Event())
+                event.clear()
+                state["polls"] += 1
+                state["max_polls"] = max(state["max_polls"], state["polls"])
+                try:
+                    await asyncio.wait_for(event.wait(), float(p.get("timeout") or 0))
+                except asyncio.TimeoutError:
+                    pass
+                finally:
+                    state["polls"] -= 1
+            delivered = list(queue)
+            await asyncio.sleep(half)  # volta
+            return {"ok": True, "result": delivered}
+        await asyncio.sleep(half)
+        return {"ok": True, "result": True}
+
+    async def _push(url, secret, update):
+        await asyncio.sleep(half)
+        try:
+            await client.post(url, json=update, headers={"X-Telegram-Bot-Api-Secret-Token": secret})
+        except httpx.HTTPError:
+            pass
+
+    @app.post("/_inject")
+    async def inject(request: Request):
+        token = (await request.json())["token"]
+        state["seq"] += 1
+        seq = state["seq"]
+        update = {"update_id": seq, "message": {
+            "message_id": seq, "date": int(time.time()), "text": "/start",
+            "chat": {"id": seq, "type": "private"}, "from": {"id": seq, "is_bot": False, "first_name": "U"},
+            "entities": [{"type": "bot_command", "offset": 0, "length": 6}]}}
+        state["injected"][seq] = time.time()
+        if token in webhooks:
+            url, secret = webhooks[token]
+            asyncio.create_task(_push(url, secret, update))
+        else:
+            queues.setdefault(token, []).append(update)
+            events.setdefault(token, asyncio.Event()).set()
+        return {"seq": seq}
+
+    @app.get("/_results")
+    async def results():
+        lat = {s: (state["replies"][s] - t) * 1000 for s, t in state["injected"].items() if s in state["replies"]}
+        out = {"latencies": list(lat.values()), "pending": len(state["injected"]) - len(lat),
+               "max_polls": state["max_polls"], "api_calls": state["api_calls"]}
+        for s in lat:  # os ainda sem resposta ficam para a próxima leitura
+            del state["injected"][s]
+            del state["replies"][s]
+        state["max_polls"] = state["polls"]
+        state["api_calls"] = 0
+        return out
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+# ── Endpoint único (mesma rota de main.py) ───────────────────────
+def _ingress(port, clients_dir):
+    import uvicorn
+    from fastapi import FastAPI, Request, Response
+    from bot_factory.webhook import WebhookRouter, PATH_PREFIX, SECRET_HEADER
+    from bot_factory.tenant_runtime import RuntimeInbox
+
+    app = FastAPI()
+    router = WebhookRouter(fallback=RuntimeInbox(clients_dir))
+
+    @app.post(PATH_PREFIX + "/{secret}")
+    async def telegram_webhook(secret: str, request: Request):
+        status = await router.dispatch(secret, request.headers.get(SECRET_HEADER, ""), await request.body())
+        return Response(status_code=status)
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+async def run_mode(mode, users, clients_dir, fake_url, n_updates, rate):
+    import httpx
+    from bot_factory import tenant_runtime as rt
+
+    os.environ["TELEGRAM_MODE"] = mode
+    host = rt.TenantHost(0, 1, clients_dir)
+    await host.start_inbox()
+    await host.reconcile()
+    ready = len(host.tenants)
+
+    async with httpx.AsyncClient(base_url=fake_url, timeout=30) as http:
+        await asyncio.sleep(2)  # polls abertos / webhooks registrados
+        await http.get("/_results")  # zera contadores do startup
+        t_idle = time.perf_counter()
+        await asyncio.sleep(3)
+        idle = await http.get("/_results")
+        idle_calls = idle.json()["api_calls"] / (time.perf_counter() - t_idle)
+
+        rnd = random.Random(7)
+        for _ in range(n_updates):
+            token = f"{800000 + rnd.randrange(len(users))}:FAKE-TOKEN"
+            await http.post("/_inject", json={"token": token})
+            await asyncio.sleep(1 / rate)
+        deadline = time.time() + 30
+        collected, pending, max_polls = [], n_updates, 0
+        while pending and time.time() < deadline:
+            await asyncio.sleep(0.5)
+            data = (await http.get("/_results")).json()
+            collected += data["latencies"]
+            pending -= len(data["latencies"])
+            max_polls = data["max_polls"]
+
+    await asyncio.gather(*(host.remove(uid, delete_webhook=True) for uid in list(host.tenants)))
+    if host._inbox is not None:
+        host._inbox.close()
+    return {"ready": ready, "lat": collected, "perdidos": pending, "idle_calls": idle_calls, "max_polls": max_polls}
+
+
+def _report(mode, r):
+    lat = sorted(r["lat"])
+    if not lat:
+        print(f"{mode:8s}: nenhuma resposta")
+        return
+    p95 = lat[int(len(lat) * 0.95) - 1]
+    print(f"{mode:8s}: {r['ready']} tenants | p50 {statistics.median(lat):6.1f} ms | p95 {p95:6.1f} ms | "
+          f"máx {lat[-1]:6.1f} ms | sem resposta {r['perdidos']} | "
+          f"long-polls abertos {r['max_polls']} | chamadas ociosas {r['idle_calls']:.1f}/s")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    m = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    rtt = float(sys.argv[3]) if len(sys.argv) > 3 else 40
+    rate = 50  # updates/s
+
+    fake_port, ingress_port = _free_port(), _free_port()
+    tmp = tempfile.TemporaryDirectory()
+    clients_dir = os.path.join(tmp.name, "clients")
+    os.environ.update({
+        "TELEGRAM_API_URL": f"http://127.0.0.1:{fake_port}/bot",
+        "WEBHOOK_BASE_URL": f"http://127.0.0.1:{ingress_port}",
+        "DB_NAME": os.path.join(tmp.name, "bench.db"),
+        "GROQ_API_KEY": "gsk_fake_bench",
+        "TELEGRAM_MODE": "webhook",  # o endpoint só encaminha no modo webhook
+    })
+    import logging
+    logging.basicConfig(level=logging.CRITICAL)
+
+    from bot_factory import generator
+    from bot_factory import tenant_runtime as rt
+    generator.CLIENTS_DIR = clients_dir
+    users = []
+    for i in range(n):
+        uid = f"bench_{i:04d}"
+        gen = generator.generate_bot({"user_id": uid, "plano": "flash", "empresa_nome": f"Empresa {i}",
+                                      "telegram_bot_token": f"{800000 + i}:FAKE-TOKEN"}, ["faq"], PROMPT)
+        rt.enable_tenant(uid, gen["bot_path"], clients_dir)
+        users.append(uid)
+
+    procs = [multiprocessing.Process(target=_fake_telegram, args=(fake_port, rtt), daemon=True),
+             multiprocessing.Process(target=_ingress, args=(ingress_port, clients_dir), daemon=True)]
+    for p in procs:
+        p.start()
+    time.sleep(3)
+
+    print(f"{n} bots, {m} updates a {rate}/s, RTT {rtt:.0f} ms (/start → resposta fixa, sem LLM)\n")
+    results = {mode: asyncio.run(run_mode(mode, users, clients_dir, f"http://127.0.0.1:{fake_port}", m, rate))
+               for mode in ("webhook", "polling")}  # webhook antes: long-polls cortados não contam
+    for mode, r in results.items():
+        _report(mode, r)
+
+    for p in procs:
+        p.terminate()
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
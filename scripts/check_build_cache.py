@@ -0,0 +1,91 @@
+"""
+check_build_cache.py — Verifica o cache de build (bot_factory/build_cache.py) com bots reais
+gerados por bot_factory.generator num diretório temporário.
+
+Cenários, para N clientes já gerados uma vez:
+  1. Pipeline de novo sem mudança           → "skip"    (nem gera, nem reinicia)
+  2. Só o prompt mudou (correção de FAQ)     → "reload"
+  3. Skills diferentes                       → "reload" (vão no prompt.json)
+  4. Token do Telegram trocado               → "rebuild"
+  5. Template alterado (mtime + conteúdo)    → "rebuild" para todos do plano
+  6. bot.py regravado depois do config.json  → "rebuild" (build interrompido)
+
+Também compara o custo de decidir (hash + leitura do config.json) com o de gerar de novo.
+
+Uso: python scripts/check_build_cache.py [n_clientes]   (exit 1 se algum cenário falhar)
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PLANS = ["flash", "secretaria", "ecossistema"]
+PROMPT = "Você é a assistente virtual da empresa. Responda com simpatia e objetividade.\n" * 40
+
+
+def main() -> int:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    tmp = tempfile.TemporaryDirectory()
+    os.environ["DB_NAME"] = os.path.join(tmp.name, "cache.db")
+
+    from bot_factory import build_cache, generator
+    generator.CLIENTS_DIR = os.path.join(tmp.name, "clients")
+    templates = os.path.join(tmp.name, "templates")
+    shutil.copytree(generator.TEMPLATES_DIR, templates)
+    generator.TEMPLATES_DIR = templates  # o cenário 5 altera um template
+
+    profiles = [{"user_id": f"cache_{i:04d}", "plano": PLANS[i % 3], "empresa_nome": f"Empresa {i}",
+                 "telegram_bot_token": f"{900000 + i}:FAKE"} for i in range(n)]
+    skills = ["faq", "agendamento"]
+
+    t0 = time.perf_counter()
+    for p in profiles:
+        generator.generate_bot(p, skills, PROMPT)
+    gen_ms = (time.perf_counter() - t0) * 1000 / n
+
+    def decide(p, sk=skills, prompt=PROMPT):
+        return build_cache.decide(p["user_id"], generator.build_fingerprint(p), generator.prompt_hash(prompt, sk))
+
+    t0 = time.perf_counter()
+    unchanged = [decide(p) for p in profiles]
+    decide_ms = (time.perf_counter() - t0) * 1000 / n
+
+    first = profiles[0]
+    plan_template = os.path.join(templates, generator._get_template_name(first["plano"]))
+    with open(plan_template, "a", encoding="utf-8") as f:
+        f.write("\n# template v2\n")
+    template_changed = {decide(p) for p in profiles if p["plano"] == first["plano"]}
+    other_plan = {decide(p) for p in profiles if p["plano"] != first["plano"]}
+
+    generator.generate_bot(profiles[1], skills, PROMPT)
+    bot_py = os.path.join(generator.CLIENTS_DIR, profiles[1]["user_id"], "bot.py")
+    time.sleep(0.01)
+    with open(bot_py, "a", encoding="utf-8") as f:
+        f.write("\n")
+
+    checks = [
+        ("sem mudança → skip", set(unchanged) == {build_cache.SKIP}),
+        ("só o prompt → reload", decide(profiles[2], prompt=PROMPT + "Novo horário: 8h às 18h.\n") == build_cache.RELOAD),
+        ("skills diferentes → reload", decide(profiles[5], sk=["faq"]) == build_cache.RELOAD),
+        ("token trocado → rebuild",
+         decide({**profiles[4], "telegram_bot_token": "1:OUTRO"}) == build_cache.REBUILD),
+        ("template alterado → rebuild do plano", template_changed == {build_cache.REBUILD}),
+        ("template de outro plano → skip", other_plan <= {build_cache.SKIP}),
+        ("build interrompido → rebuild", decide(profiles[1]) == build_cache.REBUILD),
+    ]
+    tmp.cleanup()
+
+    print(f"{n} bots | gerar: {gen_ms:.2f} ms/bot | decidir pelo cache: {decide_ms:.3f} ms/bot "
+          f"({gen_ms / decide_ms:.0f}x mais barato), sem contar o restart evitado\n")
+    ok = True
+    for desc, passed in checks:
+        print(f"{'OK   ' if passed else 'FALHA'} {desc}")
+        ok = ok and passed
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+"""
+check_checkout_cache.py — Verifica o cache de checkout de skills/proposals contra um
+servidor Stripe FALSO local (http.server), sem tocar na API real.
+
+O servidor fake responde POST /v1/checkout/sessions com latência configurável e trata o
+header Idempotency-Key como o Stripe: a mesma chave REPETE a primeira resposta (sessão ou
+erro) e, com parâmetros diferentes, devolve erro de idempotência. Conta as requisições.
+
+Cenários:
+  1. "ok" / "sim" / "manda o link" seguidos → UMA sessão; o 1º turno não espera o Stripe
+  2. 10 pedidos simultâneos para a mesma chave → UMA requisição
+  3. Outro e-mail → nova sessão
+  4. Cache novo (restart/outro processo) → chave nova, sessão nova (sem replay)
+  5. Sessão expirada (TTL) → nova sessão
+  6. Falha do Stripe não fica em cache → o próximo pedido tenta de novo
+  7. Falha passageira → a nova tentativa usa outra chave e recebe a sessão (não o erro repetido)
+  8. Sessão que o Stripe expira antes do TTL → sessão nova, não a vencida repetida
+  9. Nome diferente numa nova tentativa → nenhum erro de parâmetros da idempotency key
+
+Uso: python scripts/check_checkout_cache.py   (exit 1 se algum cenário falhar)
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LATENCY = 1.2  # segundos — acima do CHECKOUT_WAIT_MS padrão, força o caminho assíncrono
+
+
+class FakeStripe(BaseHTTPRequestHandler):
+    requests = 0
+    replies = {}        # idempotency key → (parâmetros, status, resposta) da 1ª requisição
+    attempts = {}       # e-mail → requisições novas (não repetidas)
+    idempotency_errors = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        raw = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode()
+        body = parse_qs(raw)
+        idem = self.headers.get("Idempotency-Key")
+        with FakeStripe.lock:
+            FakeStripe.requests += 1
+            n = FakeStripe.requests
+            saved = FakeStripe.replies.get(idem) if idem else None
+        time.sleep(LATENCY)
+        if saved is not None:
+            params, status, payload = saved
+            if params != raw:
+                with FakeStripe.lock:
+                    FakeStripe.idempotency_errors += 1
+                return self._reply(400, {"error": {"type": "idempotency_error",
+                                                   "message": "Keys for idempotent requests can only be used "
+                                                              "with the same parameters they were first used with."}})
+            return self._reply(status, payload)
+
+        email = body.get("customer_email", [""])[0]
+        with FakeStripe.lock:
+            FakeStripe.attempts[email] = FakeStripe.attempts.get(email, 0) + 1
+            attempt = FakeStripe.attempts[email]
+        if email.startswith("falha") or (email.startswith("instavel") and attempt == 1):
+            status, payload = 500, {"error": {"type": "api_error", "message": "fake outage"}}
+        else:
+            lifetime = 2 if email.startswith("curta") else 24 * 3600
+            status, payload = 200, {"id": f"cs_test_{n}", "object": "checkout.session",
+                                    "url": f"https://checkout.fake/c/pay/cs_test_{n}",
+                                    "expires_at": int(time.time()) + lifetime}
+        if idem:
+            with FakeStripe.lock:
+                FakeStripe.replies[idem] = (raw, status, payload)
+        self._reply(status, payload)
+
+    def _reply(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def main() -> int:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeStripe)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    os.environ.setdefault("STRIPE_PRICE_FLASH", "price_fake_flash")
+    os.environ.setdefault("STRIPE_PRICE_SECRETARIA", "price_fake_secretaria")
+    import stripe
+    from bot_factory.checkout_cache import CheckoutCache
+    from skills.proposals import run as proposals
+
+    stripe.api_key = "sk_test_fake"
+    stripe.api_base = f"http://127.0.0.1:{server.server_address[1]}"
+    stripe.max_network_retries = 0
+    tmp = tempfile.TemporaryDirectory()
+    proposals.lead_states.db_path = os.path.join(tmp.name, "checkout.db")  # não toca no DB real
+
+    failures = []
+
+    def check(name, cond, detail=""):
+        print(f"  [{'OK' if cond else 'FALHA'}] {name}{' — ' + detail if detail else ''}")
+        if not cond:
+            failures.append(name)
+
+    # 1. Mensagens de fechamento seguidas
+    history = [("assistant", "O plano Secretária Virtual é o ideal pra você!")]
+    t0 = time.perf_counter()
+    r1 = proposals.run("u1", "quero fechar, meu email é ana@exemplo.com", history)
+    first_turn = time.perf_counter() - t0
+    check("1º turno não bloqueia no Stripe", "checkout_pending" in r1 and first_turn < LATENCY,
+          f"{first_turn * 1000:.0f} ms")
+    r1["checkout_pending"].result(timeout=10)
+    r2 = proposals.run("u1", "sim", history)
+    r3 = proposals.run("u1", "manda o link", history)
+    check("turnos seguintes usam o link em cache", r2["checkout_url"] and r2["checkout_url"] == r3["checkout_url"])
+    check("uma única sessão criada", FakeStripe.requests == 1, f"{FakeStripe.requests} requisições")
+
+    # 2. Concorrência
+    before = FakeStripe.requests
+    cache = CheckoutCache(proposals._create_session)
+    futures = [None] * 10
+    threads = [threading.Thread(target=lambda i=i: futures.__setitem__(i, cache.get("u2", "flash", "b@x.com")))
+               for i in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    urls = {f.result(timeout=10) for f in futures}
+    check("pedidos simultâneos → 1 requisição", FakeStripe.requests - before == 1 and len(urls) == 1)
+
+    # 3. Outro e-mail
+    before = FakeStripe.requests
+    other = cache.url("u2", "flash", "c@x.com", wait=10)
+    check("e-mail diferente → nova sessão", FakeStripe.requests - before == 1 and other not in urls)
+
+    # 4. Outro processo / restart: chave própria, sessão própria
+    restarted = CheckoutCache(proposals._create_session)
+    again = restarted.url("u2", "flash", "b@x.com", wait=10)
+    check("cache novo → sessão nova, sem replay de outra tentativa", again is not None and again not in urls,
+          again or "")
+
+    # 5. Expiração
+    short = CheckoutCache(proposals._create_session, ttl=2, margin=0)
+    s1 = short.url("u3", "flash", "d@x.com", wait=10)
+    time.sleep(2.1)
+    s2 = short.url("u3", "flash", "d@x.com", wait=10)
+    check("sessão expirada → nova sessão", s1 and s2 and s1 != s2)
+
+    # 6. Falha não fica em cache
+    before = FakeStripe.requests
+    f1 = cache.url("u4", "flash", "falha@x.com", wait=10)
+    f2 = cache.url("u4", "flash", "falha@x.com", wait=10)
+    check("falha do Stripe não é cacheada", f1 is None and f2 is None and FakeStripe.requests - before == 2)
+
+    # 7. Falha passageira: a retentativa não pode receber o erro repetido pelo Stripe
+    i1 = cache.url("u5", "flash", "instavel@x.com", wait=10)
+    i2 = cache.url("u5", "flash", "instavel@x.com", wait=10)
+    check("retentativa após falha → sessão criada (chave nova)", i1 is None and bool(i2), i2 or "")
+
+    # 8. Stripe expira a sessão antes do TTL do cache
+    c1 = cache.url("u6", "flash", "curta@x.com", wait=10)
+    time.sleep(2.1)
+    c2 = cache.url("u6", "flash", "curta@x.com", wait=10)
+    check("sessão vencida no Stripe → sessão nova, não a vencida repetida", c1 and c2 and c1 != c2)
+
+    # 9. Nova tentativa com outro nome (os parâmetros mudam)
+    cache.url("u7", "flash", "falha_nome@x.com", "Ana", wait=10)
+    cache.url("u7", "flash", "falha_nome@x.com", "Ana Souza", wait=10)
+    check("nenhuma chave reaproveitada com parâmetros diferentes", FakeStripe.idempotency_errors == 0,
+          f"{FakeStripe.idempotency_errors} erros de idempotência")
+
+    print(f"\nstats: {cache.stats()}")
+    server.shutdown()
+    tmp.cleanup()
+    if failures:
+        print(f"\nFALHA em {len(failures)} cenário(s).")
+        return 1
+    print("\nOK — cache de checkout consistente.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""
+check_event_latency.py — Latência pagamento → início do build do watcher orientado a eventos
+(bot_factory/events.py) × a varredura fixa antiga (FACTORY_POLL_INTERVAL=60).
+
+Cria um banco temporário com o schema completo, sobe o loop do watcher numa thread com o
+pipeline trocado por uma sonda (só registra o instante em que o build começaria) e muda
+`assinaturas.status` para 'ativo' de outra conexão, como faz o webhook do Stripe:
+
+  com notify()  → UPDATE + events.notify(user_id) (acordar pelo datagrama UDP)
+  sem notify()  → só o UPDATE (acordar por PRAGMA data_version, a cada FACTORY_EVENTS_CHECK_MS)
+
+Falha (exit 1) se algum cliente não tiver o build iniciado ou o p50 passar de 1s.
+
+Uso: python scripts/check_event_latency.py [n_pagamentos]
+"""
+import os
+import sys
+import time
+import socket
+import sqlite3
+import tempfile
+import threading
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def _free_udp_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _pay(db_path, uid, notify):
+    from bot_factory import events
+    conn = sqlite3.connect(db_path)
+    t0 = time.perf_counter()
+    conn.execute("UPDATE assinaturas SET status = 'ativo' WHERE user_id = ?", (uid,))
+    conn.commit()
+    if notify:
+        events.notify(uid)
+    conn.close()
+    return t0
+
+
+def main() -> int:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    tmp = tempfile.TemporaryDirectory()
+    db_path = os.path.join(tmp.name, "events.db")
+    os.environ.update({"DB_NAME": db_path, "FACTORY_EVENTS_PORT": str(_free_udp_port()),
+                       "FACTORY_POLL_INTERVAL": "3600", "FACTORY_HEALTH_INTERVAL": "3600"})
+
+    import logging
+    logging.basicConfig(level=logging.CRITICAL)
+    from main import _setup_db
+    from bot_factory import events, watcher
+    from bot_factory.db_factory import setup_factory_tables
+    from bot_factory.pipeline import PipelineExecutor, Stage
+
+    _setup_db()
+    setup_factory_tables()
+    conn = sqlite3.connect(db_path)
+    conn.executemany("INSERT INTO assinaturas (user_id, nome, plano, status) VALUES (?, ?, 'flash', 'qualificado')",
+                     [(f"pay_{i:04d}", f"Cliente {i}") for i in range(2 * n)])
+    conn.commit()
+    conn.close()
+
+    started = {}
+
+    def probe(ctx):
+        started.setdefault(ctx["user_id"], time.perf_counter())
+        ctx["result"]["success"] = True
+
+    watcher._executor = PipelineExecutor([Stage("sonda", probe, 4)])
+    watcher._last_learning = watcher.datetime.now()  # sem ciclo de aprendizado no teste
+    listener = events.EventListener(db_path)
+    listener.open()
+    thread = threading.Thread(target=watcher._loop, args=(listener,), daemon=True)
+    thread.start()
+    time.sleep(1)  # primeira varredura já passou
+
+    results, ok = {}, True
+    for label, notify, offset in (("com notify()", True, 0), ("sem notify()", False, n)):
+        paid = {}
+        for i in range(offset, offset + n):
+            uid = f"pay_{i:04d}"
+            paid[uid] = _pay(db_path, uid, notify)
+            time.sleep(0.3)
+        time.sleep(1)
+        lat = sorted((started[u] - t) * 1000 for u, t in paid.items() if u in started)
+        results[label] = (lat, n - len(lat))
+
+    watcher._running = False
+    thread.join(5)
+    listener.close()
+    watcher._executor.shutdown()
+
+    print(f"{n} pagamentos por modo | data_version a cada {events.CHECK_MS} ms\n")
+    for label, (lat, missing) in results.items():
+        if not lat:
+            print(f"{label}: nenhum build iniciado")
+            ok = False
+            continue
+        p50 = statistics.median(lat)
+        print(f"{label}: p50 {p50:7.1f} ms | máx {lat[-1]:7.1f} ms | sem build {missing}")
+        ok = ok and not missing and p50 < 1000
+    print("varredura fixa de 60s (antes): média ≈ 30000 ms | máx ≈ 60000 ms")
+    print(f"listener: {listener.stats}")
+    tmp.cleanup()
+    print("\nOK" if ok else "\nFALHOU")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
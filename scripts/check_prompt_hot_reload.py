@@ -0,0 +1,79 @@
+"""
+check_prompt_hot_reload.py — Verifica a troca a quente de prompt/skills (prompt_artifact) num
+bot.py real gerado por bot_factory.generator, importado como o runtime multi-tenant faz.
+
+  1. O bot sobe com o prompt do prompt.json (não o fallback do template)
+  2. generator.publish_prompt() → a próxima mensagem já usa o prompt novo, sem reimport
+  3. `history` em memória é o mesmo objeto, com as conversas intactas
+  4. bot.py não é regravado (runtime multi-tenant não reinicia o tenant)
+  5. prompt.json inválido → mantém a última versão boa
+  6. Custo de snapshot() por mensagem
+
+Uso: python scripts/check_prompt_hot_reload.py   (exit 1 se algum cenário falhar)
+"""
+import os
+import sys
+import time
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main() -> int:
+    tmp = tempfile.TemporaryDirectory()
+    os.environ.update({"DB_NAME": os.path.join(tmp.name, "reload.db"), "GROQ_API_KEY": "gsk_fake_check",
+                       "PROMPT_CHECK_SECONDS": "0"})
+    import logging
+    logging.basicConfig(level=logging.CRITICAL)
+
+    from bot_factory import generator
+    from bot_factory.tenant_runtime import _load_module
+    generator.CLIENTS_DIR = os.path.join(tmp.name, "clients")
+
+    profile = {"user_id": "reload_0001", "plano": "secretaria", "empresa_nome": "Clínica Bella",
+               "telegram_bot_token": "123:FAKE"}
+    v1 = "Você atende a Clínica Bella. Horário: 9h às 17h."
+    v2 = "Você atende a Clínica Bella. Horário: 8h às 18h. FAQ: aceitamos Pix."
+    gen = generator.generate_bot(profile, ["faq"], v1)
+    bot_mtime = os.path.getmtime(gen["bot_path"])
+
+    bot = _load_module(profile["user_id"], gen["bot_path"])
+    history = bot.history
+    history["42"].append({"role": "user", "content": "oi"})
+    started_with_v1 = bot.PROMPT.system_prompt() == v1
+
+    time.sleep(0.01)
+    generator.publish_prompt(profile["user_id"], ["faq", "agendamento"], v2)
+    swapped = bot.PROMPT.system_prompt() == v2 and bot.PROMPT.snapshot()["skills"] == ["faq", "agendamento"]
+
+    with open(os.path.join(gen["client_dir"], "prompt.json"), "w", encoding="utf-8") as f:
+        f.write("{ quebrado")
+    kept = bot.PROMPT.system_prompt() == v2
+
+    bot.PROMPT.check_seconds = 1.0  # padrão (PROMPT_CHECK_SECONDS)
+    n = 100_000
+    t0 = time.perf_counter()
+    for _ in range(n):
+        bot.PROMPT.snapshot()
+    snapshot_us = (time.perf_counter() - t0) / n * 1e6
+
+    checks = [
+        ("sobe com o prompt do prompt.json", started_with_v1),
+        ("publish_prompt → próxima mensagem usa o novo", swapped),
+        ("history em memória preservado", bot.history is history and history["42"][0]["content"] == "oi"),
+        ("bot.py não regravado", os.path.getmtime(gen["bot_path"]) == bot_mtime),
+        ("prompt.json inválido → mantém o último bom", kept),
+        ("recargas contadas", bot.PROMPT.reloads == 1),
+    ]
+    tmp.cleanup()
+
+    print(f"snapshot() por mensagem: {snapshot_us:.2f} µs\n")
+    ok = True
+    for desc, passed in checks:
+        print(f"{'OK   ' if passed else 'FALHA'} {desc}")
+        ok = ok and passed
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
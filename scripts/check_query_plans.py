@@ -0,0 +1,55 @@
+"""
+check_query_plans.py — Regressão de plano de execução das queries quentes.
+
+Cria um banco temporário com o schema completo (main._setup_db + setup_factory_tables,
+que já aplicam as migrações) e falha (exit 1) se alguma query de
+bot_factory.migrations.HOT_QUERIES cair em SCAN de tabela.
+
+Uso: python scripts/check_query_plans.py [caminho_do_db]
+     (sem argumento usa um DB temporário; com argumento verifica o DB informado)
+"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def main() -> int:
+    tmp = None
+    if len(sys.argv) > 1:
+        db_path = os.path.abspath(sys.argv[1])
+    else:
+        tmp = tempfile.TemporaryDirectory()
+        db_path = os.path.join(tmp.name, "plans.db")
+    os.environ["DB_NAME"] = db_path
+
+    from main import _setup_db
+    from bot_factory import db_pool
+    from bot_factory.db_factory import setup_factory_tables
+    from bot_factory.migrations import HOT_QUERIES, check_query_plans, current_version, explain
+
+    _setup_db()
+    setup_factory_tables()
+    print(f"Schema na versão {current_version(db_path)}")
+
+    for desc, sql, params in HOT_QUERIES:
+        print(f"- {desc}: {' | '.join(explain(sql, params, db_path))}")
+
+    regressions = check_query_plans(db_path)
+    db_pool.close_all()
+    if tmp:
+        tmp.cleanup()
+
+    if regressions:
+        print("\nFALHA — queries quentes com SCAN de tabela:")
+        for desc, sql, plan in regressions:
+            print(f"  * {desc}\n    {sql}\n    plano: {plan}")
+        return 1
+    print("\nOK — nenhuma query quente faz SCAN.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""
+check_rollups.py — Confere as tabelas de métricas de bot_factory/rollups.py contra as
+agregações diretas e mede o refresh do dashboard antes/depois.
+
+Num banco temporário com o schema completo (migrações v10–v13):
+  1. Mensagens por hora/dia/usuário == GROUP BY no historico (inclusive após mais mensagens)
+  2. Contagens por status e MRR por plano == GROUP BY nas tabelas de origem, depois de
+     INSERT, UPDATE de status/plano/valor, UPSERT e DELETE
+  3. Tempo de um refresh: leitura completa do historico + agrupamentos em pandas (como o
+     dashboard fazia) × leitura das tabelas de métricas
+
+Uso: python scripts/check_rollups.py [n_mensagens]   (exit 1 se alguma conferência falhar)
+"""
+import os
+import sys
+import time
+import random
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+STATUS = ["lead", "ativo", "ativo", "cancelado", None]
+PLANOS = ["flash", "secretaria", "ecossistema", None]
+
+
+def _add_messages(conn, n, users, rng):
+    now = datetime.now()
+    rows = ((rng.choice(users), rng.choice(("user", "assistant")), "oi",
+             (now - timedelta(minutes=rng.randint(0, 90 * 1440))).strftime("%Y-%m-%d %H:%M:%S"))
+            for _ in range(n))
+    conn.executemany("INSERT INTO historico (user_id, role, content, timestamp) VALUES (?, ?, ?, ?)", rows)
+    conn.commit()
+
+
+def _direct(conn):
+    """Agregações diretas nas tabelas de origem, no formato das leituras de rollups."""
+    by_hour = conn.execute("SELECT substr(timestamp, 12, 2) || ':00', COUNT(*) FROM historico "
+                           "GROUP BY 1 ORDER BY 1").fetchall()
+    by_day = conn.execute("SELECT substr(timestamp, 1, 10), COUNT(*) FROM historico GROUP BY 1 ORDER BY 1").fetchall()
+    by_user = dict(conn.execute("SELECT user_id, COUNT(*) FROM historico GROUP BY 1").fetchall())
+    status = {k: v for k, v in conn.execute(
+        "SELECT COALESCE(status, 'indefinido'), COUNT(*) FROM assinaturas GROUP BY 1").fetchall()}
+    mrr = {k: (n, round(v, 6)) for k, n, v in conn.execute(
+        "SELECT COALESCE(plano, 'sem plano'), COUNT(*), COALESCE(SUM(valor_mensal), 0) FROM assinaturas "
+        "WHERE status = 'ativo' GROUP BY 1").fetchall()}
+    onb = dict(conn.execute("SELECT COALESCE(status, 'em_progresso'), COUNT(*) FROM onboarding_data GROUP BY 1"))
+    bots = dict(conn.execute("SELECT COALESCE(status, 'desconhecido'), COUNT(*) FROM bots_gerados GROUP BY 1"))
+    return by_hour, by_day, by_user, status, mrr, onb, bots
+
+
+def _rolled(path):
+    from bot_factory import rollups
+    totals = lambda m: {k: v[0] for k, v in rollups.counts(m, path).items()}
+    mrr = {k: (n, round(v, 6)) for k, (n, v) in rollups.counts("mrr_plano", path).items()}
+    return (rollups.messages_by_hour(path), rollups.messages_by_day(path), rollups.messages_by_user(path),
+            totals("assinaturas_status"), mrr, totals("onboarding_status"), totals("bots_status"))
+
+
+def _mutate(conn, users, rng):
+    """Mistura de escritas como as do main.py, onboarding e fábrica."""
+    for uid in users:
+        conn.execute("INSERT INTO assinaturas (user_id, status, plano, valor_mensal) VALUES (?, ?, ?, ?) "
+                     "ON CONFLICT(user_id) DO UPDATE SET status = excluded.status, plano = excluded.plano, "
+                     "valor_mensal = excluded.valor_mensal",
+                     (uid, rng.choice(STATUS), rng.choice(PLANOS), rng.choice((0, 97.0, 197.5, None))))
+        conn.execute("INSERT INTO onboarding_data (user_id, status) VALUES (?, ?) "
+                     "ON CONFLICT(user_id) DO UPDATE SET status = excluded.status",
+                     (uid, rng.choice(("em_progresso", "completo", None))))
+        conn.execute("INSERT INTO bots_gerados (user_id, status) VALUES (?, ?) "
+                     "ON CONFLICT(user_id) DO UPDATE SET status = excluded.status",
+                     (uid, rng.choice(("active", "error", "stopped"))))
+    for uid in rng.sample(users, len(users) // 2):
+        conn.execute("UPDATE assinaturas SET status = ?, plano = ?, valor_mensal = ? WHERE user_id = ?",
+                     (rng.choice(STATUS), rng.choice(PLANOS), rng.choice((0, 297.0, None)), uid))
+        conn.execute("UPDATE onboarding_data SET status = 'completo' WHERE user_id = ?", (uid,))
+        conn.execute("UPDATE bots_gerados SET status = ? WHERE user_id = ?", (rng.choice(("active", "error")), uid))
+    for uid in rng.sample(users, len(users) // 4):
+        conn.execute("INSERT INTO assinaturas (user_id, status, valor_mensal) VALUES (?, 'ativo', 49.9) "
+                     "ON CONFLICT(user_id) DO UPDATE SET status = excluded.status, valor_mensal = excluded.valor_mensal",
+                     (uid,))
+    for uid in rng.sample(users, len(users) // 10):
+        for table, col in (("assinaturas", "user_id"), ("onboarding_data", "user_id"), ("bots_gerados", "user_id")):
+            conn.execute(f"DELETE FROM {table} WHERE {col} = ?", (uid,))
+    conn.commit()
+
+
+def main() -> int:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    tmp = tempfile.TemporaryDirectory()
+    db_path = os.path.join(tmp.name, "rollups.db")
+    os.environ["DB_NAME"] = db_path
+    import logging
+    logging.basicConfig(level=logging.CRITICAL)
+
+    import pandas as pd
+    from main import _setup_db
+    from bot_factory import db_pool, rollups
+    from bot_factory.db_factory import setup_factory_tables
+
+    _setup_db()
+    setup_factory_tables()
+    rng = random.Random(11)
+    users = [f"user_{i:04d}" for i in range(2000)]
+    conn = sqlite3.connect(db_path)
+    checks = []
+
+    # Mensagens já existentes antes da migração entram pelo primeiro refresh
+    _add_messages(conn, n, users, rng)
+    _mutate(conn, users, rng)
+    t0 = time.perf_counter()
+    rollups.refresh_messages(db_path)
+    first_s = time.perf_counter() - t0
+    checks.append(("métricas == agregação direta", _rolled(db_path) == _direct(conn)))
+
+    _add_messages(conn, 5000, users, rng)
+    t0 = time.perf_counter()
+    added = rollups.refresh_messages(db_path)
+    incr_ms = (time.perf_counter() - t0) * 1000
+    _mutate(conn, [f"novo_{i:04d}" for i in range(500)] + users[:100], rng)
+    checks.append(("refresh incremental soma só as novas", added == 5000))
+    checks.append(("métricas == agregação direta após mais escritas", _rolled(db_path) == _direct(conn)))
+    capped = rollups.refresh_messages(db_path, max_rows=100)
+    checks.append(("sem mensagens novas → nada a somar", capped == 0))
+
+    # Refresh do dashboard: como era × como ficou
+    def legacy_refresh():
+        df = pd.read_sql_query("SELECT * FROM historico ORDER BY timestamp DESC", conn)
+        ts = pd.to_datetime(df["timestamp"], errors="coerce")
+        ts.dt.strftime("%H:00").value_counts()
+        ts.dt.date.value_counts()
+        set(df["user_id"].unique().tolist())
+        return len(df)
+
+    def rollup_refresh():
+        rollups.refresh_messages(db_path, max_rows=200_000)
+        rollups.messages_by_hour(db_path)
+        rollups.messages_by_day(db_path)
+        rollups.messages_by_user(db_path)
+        return rollups.message_totals(db_path)[0]
+
+    t0 = time.perf_counter()
+    legacy_total = legacy_refresh()
+    legacy_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for _ in range(20):
+        rolled_total = rollup_refresh()
+    rolled_s = (time.perf_counter() - t0) / 20
+    checks.append(("total de mensagens igual", legacy_total == rolled_total))
+
+    conn.close()
+    db_pool.close_all()
+    tmp.cleanup()
+
+    print(f"{legacy_total} mensagens, {len(users) + 500} usuários\n")
+    print(f"primeiro refresh (backfill)      : {first_s:8.2f} s")
+    print(f"refresh incremental (+5000)      : {incr_ms:8.1f} ms")
+    print(f"dashboard: historico inteiro     : {legacy_s * 1000:8.1f} ms")
+    print(f"dashboard: tabelas de métricas   : {rolled_s * 1000:8.1f} ms ({legacy_s / rolled_s:.0f}x)\n")
+    ok = True
+    for desc, passed in checks:
+        print(f"{'OK   ' if passed else 'FALHA'} {desc}")
+        ok = ok and passed
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
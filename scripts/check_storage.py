@@ -0,0 +1,203 @@
+"""
+check_storage.py — Mesma bateria de conferências e de vazão para cada backend de
+bot_factory/storage.py: SQLite (sempre, num arquivo temporário) e PostgreSQL (se houver URL).
+
+Conferências:
+  1. ensure_schema + insert_many → linhas e ids em ordem
+  2. placeholders `?` (inclusive com '?' literal no SQL) em fetchone/fetchall
+  3. execute devolve rowcount; erro dentro de transaction() (no Python ou num statement)
+     desfaz tudo
+  4. 32 tarefas gravando ao mesmo tempo pelo pool → nenhuma linha perdida
+  5. HistoryWriter com storage grava tudo até o stop()
+  6. ConversationStore com aloader (load_recent) reidrata do mesmo banco em que o writer gravou
+
+Vazão (mensagens/s no historico): um INSERT por mensagem × executemany em lotes de 200 ×
+insert_many em lotes de 200 (multi-VALUES / COPY) × 8 escritores concorrentes com insert_many.
+
+O PostgreSQL deve ser um banco descartável: a tabela historico é recriada. Sem URL, e com o
+pacote pgserver instalado, sobe um PostgreSQL temporário num diretório próprio.
+    createdb sofia_test && pip install asyncpg      (ou: pip install asyncpg pgserver)
+
+Uso: python scripts/check_storage.py [postgresql://localhost/sofia_test]
+     (ou TEST_DATABASE_URL; exit 1 se alguma conferência falhar)
+"""
+import os
+import sys
+import time
+import asyncio
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BATCH = 200
+COLUMNS = ("user_id", "role", "content", "timestamp")
+
+
+def _rows(n, prefix="u"):
+    return [(f"{prefix}{i % 50}", "user" if i % 2 else "assistant", f"mensagem {i} com ? no texto",
+             f"2026-10-18 12:{(i // 60) % 60:02d}:{i % 60:02d}") for i in range(n)]
+
+
+async def _reset(storage):
+    async with storage.transaction() as tx:
+        await tx.execute("DROP TABLE IF EXISTS historico")
+    await storage.ensure_schema()
+
+
+async def _count(storage) -> int:
+    return (await storage.fetchone("SELECT COUNT(*) FROM historico"))[0]
+
+
+async def _checks(storage) -> list:
+    from bot_factory.history_writer import HistoryWriter
+    checks = []
+    await _reset(storage)
+
+    inserted = await storage.insert_many("historico", COLUMNS, _rows(10_000))
+    ids = [r[0] for r in await storage.fetchall("SELECT id FROM historico ORDER BY id")]
+    checks.append(("insert_many grava todas as linhas", inserted == 10_000 and len(ids) == 10_000))
+    checks.append(("ids crescentes e únicos", ids == sorted(set(ids))))
+
+    row = await storage.fetchone("SELECT COUNT(*) FROM historico WHERE content <> '?' AND user_id = ?", ("u7",))
+    rows = await storage.fetchall("SELECT user_id, COUNT(*) FROM historico WHERE user_id IN (?, ?) "
+                                  "GROUP BY user_id ORDER BY user_id", ("u1", "u2"))
+    checks.append(("placeholders ? (com '?' literal)", row[0] == 200 and [tuple(r) for r in rows] == [("u1", 200), ("u2", 200)]))
+
+    updated = await storage.execute("UPDATE historico SET role = ? WHERE user_id = ?", ("system", "u3"))
+    checks.append(("execute devolve rowcount", updated == 200))
+
+    before = await _count(storage)
+    try:
+        async with storage.transaction() as tx:
+            await tx.insert_many("historico", COLUMNS, _rows(100, "rollback"))
+            raise RuntimeError("falha simulada")
+    except RuntimeError:
+        pass
+    checks.append(("erro na transação desfaz tudo", await _count(storage) == before))
+
+    try:
+        async with storage.transaction() as tx:
+            await tx.insert_many("historico", COLUMNS, _rows(100, "rollback"))
+            await tx.execute("INSERT INTO historico (user_id) VALUES (?)", ("sem_role",))  # NOT NULL
+    except Exception:
+        pass
+    checks.append(("statement com erro na transação desfaz o lote", await _count(storage) == before))
+
+    await asyncio.gather(*(storage.insert_many("historico", COLUMNS, _rows(250, f"t{i}_")) for i in range(32)))
+    checks.append(("32 escritores concorrentes sem perder linhas", await _count(storage) == before + 32 * 250))
+
+    writer = HistoryWriter(storage=storage, flush_interval_ms=20)
+    await writer.start()
+    for i in range(2000):
+        await writer.write(f"hw{i % 10}", "user", f"oi {i}")
+    await writer.stop()
+    written = (await storage.fetchone("SELECT COUNT(*) FROM historico WHERE user_id LIKE ?", ("hw%",)))[0]
+    checks.append(("HistoryWriter com storage grava tudo", written == 2000 and writer.stats["falhas"] == 0))
+
+    from bot_factory.conversation_store import ConversationStore, load_recent
+    memory = ConversationStore(max_turns=20, aloader=lambda uid, limit: load_recent(storage, uid, limit))
+    recent = await memory.aget("hw3")
+    checks.append(("ConversationStore reidrata pelo storage",
+                   [m["content"] for m in recent] == [f"oi {i}" for i in range(1803, 2000, 10)]))
+    return checks
+
+
+async def _throughput(storage, n: int) -> dict:
+    rows = _rows(n)
+    sql = "INSERT INTO historico (user_id, role, content, timestamp) VALUES (?, ?, ?, ?)"
+    results = {}
+
+    async def timed(name, coro_fn):
+        await _reset(storage)
+        t0 = time.perf_counter()
+        await coro_fn()
+        results[name] = n / (time.perf_counter() - t0)
+
+    async def single():
+        for row in rows[: n // 10]:  # um commit por linha: amostra de 10%
+            await storage.execute(sql, row)
+
+    async def batched():
+        for i in range(0, n, BATCH):
+            await storage.executemany(sql, rows[i:i + BATCH])
+
+    async def bulk():
+        for i in range(0, n, BATCH):
+            await storage.insert_many("historico", COLUMNS, rows[i:i + BATCH])
+
+    async def concurrent():
+        async def worker(part):
+            for i in range(0, len(part), BATCH):
+                await storage.insert_many("historico", COLUMNS, part[i:i + BATCH])
+        await asyncio.gather(*(worker(rows[k::8]) for k in range(8)))
+
+    await timed("1 INSERT por mensagem", single)
+    results["1 INSERT por mensagem"] /= 10
+    await timed(f"executemany (lotes de {BATCH})", batched)
+    await timed(f"insert_many (lotes de {BATCH})", bulk)
+    await timed("insert_many, 8 escritores", concurrent)
+    return results
+
+
+async def _suite(url: str, n: int):
+    from bot_factory.storage import open_storage
+    storage = open_storage(url)
+    try:
+        checks = await _checks(storage)
+        rates = await _throughput(storage, n)
+    finally:
+        await storage.close()
+    return storage.dialect, checks, rates
+
+
+def _local_postgres(tmp_dir: str):
+    """PostgreSQL descartável via pgserver (se instalado) → (url, server) ou ("", None)."""
+    try:
+        import pgserver
+    except ImportError:
+        return "", None
+    server = pgserver.get_server(os.path.join(tmp_dir, "pg"), cleanup_mode="stop")
+    return server.get_uri(), server
+
+
+def main() -> int:
+    import logging
+    logging.basicConfig(level=logging.CRITICAL)
+    pg_url = sys.argv[1] if len(sys.argv) > 1 else os.getenv("TEST_DATABASE_URL", "")
+    n = 20_000
+    tmp = tempfile.TemporaryDirectory()
+    pg_server = None
+    if not pg_url:
+        pg_url, pg_server = _local_postgres(tmp.name)
+        if pg_url:
+            print(f"[postgresql] servidor local temporário: {pg_url}")
+    urls = [f"sqlite:///{os.path.join(tmp.name, 'storage.db')}"] + ([pg_url] if pg_url else [])
+
+    results = []
+    for url in urls:
+        results.append(asyncio.run(_suite(url, n)))
+    from bot_factory import db_pool
+    db_pool.close_all()
+    if pg_server is not None:
+        pg_server.cleanup()
+    tmp.cleanup()
+
+    ok = True
+    for dialect, checks, _ in results:
+        print(f"[{dialect}]")
+        for desc, passed in checks:
+            print(f"  {'OK   ' if passed else 'FALHA'} {desc}")
+            ok = ok and passed
+    if not pg_url:
+        print("[postgresql] pulado — informe a URL de um banco de teste (ou TEST_DATABASE_URL, ou pip install pgserver)")
+
+    print(f"\nvazão no historico ({n} mensagens), mensagens/s")
+    names = list(results[0][2])
+    print(f"{'':32s}" + "".join(f" | {d:>12s}" for d, _, _ in results))
+    for name in names:
+        print(f"{name:32s}" + "".join(f" | {rates[name]:12,.0f}" for _, _, rates in results))
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
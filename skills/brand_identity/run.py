@@ -1,5 +1,5 @@
 # Brand Identity Skill
-import re
+from bot_factory.keyword_matcher import KeywordMatcher
 
 VEHICLE_WORDS = ['carro', 'veiculo', 'comprar carro', 'seminovo', 'concessionaria', 'automovel', 'moto', 'caminhao', 'pecas auto']
 COMPETITORS = ['manychat', 'chatfuel', 'botmaker', 'take blip', 'blip', 'zenvia', 'respond.io', 'wati', 'zappy', 'botconversa', 'leadster', 'octadesk']
@@ -9,12 +9,9 @@ CORRECTION_RESPONSES = {
     'competitor': ('Entendo que voce conhece outras opcoes! Nossa IA tem memoria de longo prazo e integracao financeira -- algo raro. O que o servico atual nao resolve pra voce?'),
 }
 
+# Ordem = prioridade: confusao com veiculos antes de concorrentes
+MATCHER = KeywordMatcher({'brand': {'vehicle': VEHICLE_WORDS, 'competitor': COMPETITORS}})
+
 def run(user_id, user_text, history):
-    t = user_text.lower()
-    for word in VEHICLE_WORDS:
-        if word in t:
-            return CORRECTION_RESPONSES['vehicle']
-    for comp in COMPETITORS:
-        if comp in t:
-            return CORRECTION_RESPONSES['competitor']
-    return None
+    hit = MATCHER.first(MATCHER.scan(user_text), 'brand')
+    return CORRECTION_RESPONSES[hit] if hit else None
@@ -4,6 +4,9 @@ Skill: Lead Qualify — Qualificacao inteligente com tratamento de objecoes.
 import re
 from typing import List, Tuple, Optional
 
+from bot_factory.keyword_matcher import KeywordMatcher
+from bot_factory.lead_state import LeadState, lead_states
+
 
 NICHES = [
     ("clinica_estetica", ["estetica", "clinica", "spa", "beleza", "botox", "depilacao"]),
@@ -32,68 +35,67 @@ PLATFORM_SIGNALS = {
     "telegram": ["telegram", "tg", "telgram"],
 }
 
+PAIN_SIGNALS = {
+    "demora_no_atendimento": ["demora", "lento", "tempo de resposta", "demorado", "esperando"],
+    "perda_de_vendas": ["perder", "perdemos", "nao respondo", "nao responde", "sem resposta", "mensagem perdida"],
+    "agendamento": ["agendar", "agendamento", "marcar", "agenda", "horario"],
+    "equipe_reduzida": ["equipe pequena", "so eu", "sozinho", "sem funcionario"],
+    "atendimento_fora_horario": ["fora do horario", "madrugada", "depois das", "fim de semana"],
+}
 
-def _detect_niche(text: str, history: List[Tuple[str, str]]) -> Optional[str]:
-    combined = (text + " " + " ".join([m for _, m in history[-8:]])).lower()
-    combined = re.sub(r'[áàãâä]','a', re.sub(r'[éèê]','e', re.sub(r'[íì]','i',
-        re.sub(r'[óòõô]','o', re.sub(r'[úù]','u', combined)))))
-    for name, keys in NICHES:
-        for k in keys:
-            if k in combined:
-                return name
-    return None
+# Estimativa de volume quando o cliente nao informa um numero (ordem = prioridade)
+VOLUME_WORDS = {
+    5: ["poucos", "pouco", "menos de 10", "menos de dez", "<10"],
+    100: ["muitos", "muito", "mais de 50", ">50", "centenas"],
+    30: ["10 a 50", "10-50", "entre 10 e 50", "dezenas"],
+}
+
+# Todos os grupos compilados num unico matcher (uma passada por mensagem, com cache)
+MATCHER = KeywordMatcher({
+    "niche": dict(NICHES),
+    "objection": OBJECTIONS,
+    "platform": PLATFORM_SIGNALS,
+    "pain": PAIN_SIGNALS,
+    "volume": VOLUME_WORDS,
+})
 
 
-def _extract_volume(text: str, history: List[Tuple[str, str]]) -> Optional[int]:
-    combined = text + " " + " ".join([m for _, m in history[-6:]])
-    nums = re.findall(r"\b(\d{1,4})\b", combined)
-    for n in nums:
+def _explicit_volume(text: str) -> Optional[int]:
+    for n in re.findall(r"\b(\d{1,4})\b", text):
         v = int(n)
         if 1 <= v <= 5000:
             return v
-    t = combined.lower()
-    if any(w in t for w in ["poucos", "pouco", "menos de 10", "menos de dez", "<10"]):
-        return 5
-    if any(w in t for w in ["muitos", "muito", "mais de 50", ">50", "centenas"]):
-        return 100
-    if any(w in t for w in ["10 a 50", "10-50", "entre 10 e 50", "dezenas"]):
-        return 30
     return None
 
 
-def _detect_pain(text: str, history: List[Tuple[str, str]]) -> Optional[str]:
-    combined = (text + " " + " ".join([m for _, m in history[-6:]])).lower()
-    if any(w in combined for w in ["demora", "lento", "tempo de resposta", "demorado", "esperando"]):
-        return "demora_no_atendimento"
-    if any(w in combined for w in ["perder", "perdemos", "nao respondo", "nao responde", "sem resposta", "mensagem perdida"]):
-        return "perda_de_vendas"
-    if any(w in combined for w in ["agendar", "agendamento", "marcar", "agenda", "horario"]):
-        return "agendamento"
-    if any(w in combined for w in ["equipe pequena", "so eu", "sozinho", "sem funcionario"]):
-        return "equipe_reduzida"
-    if any(w in combined for w in ["fora do horario", "madrugada", "depois das", "fim de semana"]):
-        return "atendimento_fora_horario"
-    return None
+def _observe(state: LeadState, text: str):
+    """Atualiza o estado do lead com UMA mensagem do cliente (a mais recente prevalece)."""
+    hits = MATCHER.scan(text)
+    state.set(
+        niche=MATCHER.first(hits, "niche"),
+        volume=_explicit_volume(text),
+        volume_estimado=MATCHER.first(hits, "volume"),
+        pain=MATCHER.first(hits, "pain"),
+        platform=MATCHER.first(hits, "platform"),
+    )
+
+
+def _update_state(user_id: str, user_text: str, history: List[Tuple[str, str]]) -> LeadState:
+    state = lead_states.get(user_id)
+    if state.needs_seed("lead_qualify"):
+        # Lead sem estado salvo: varre o historico recebido uma unica vez
+        for role, msg in history[-8:]:
+            if role == "user":
+                _observe(state, msg)
+        state.mark_seeded("lead_qualify")
+    _observe(state, user_text)
+    state.mensagens += 1
+    lead_states.checkpoint(state)
+    return state
 
 
 def _detect_objection(text: str) -> Optional[str]:
-    t = text.lower()
-    t = re.sub(r'[\u00e1\u00e0\u00e3\u00e2\u00e4]','a', re.sub(r'[\u00e9\u00e8\u00ea]','e', re.sub(r'[\u00ed\u00ec]','i',
-        re.sub(r'[\u00f3\u00f2\u00f5\u00f4]','o', re.sub(r'[\u00fa\u00f9]','u', t)))))
-    for obj_type, keywords in OBJECTIONS.items():
-        for kw in keywords:
-            if kw in t:
-                return obj_type
-    return None
-
-
-def _detect_platform_preference(text: str, history: List[Tuple[str, str]]) -> Optional[str]:
-    combined = (text + " " + " ".join([m for _, m in history[-6:]])).lower()
-    for platform, signals in PLATFORM_SIGNALS.items():
-        for sig in signals:
-            if sig in combined:
-                return platform
-    return None
+    return MATCHER.first(MATCHER.scan(text), "objection")
 
 
 def _plan_from_data(volume: Optional[int], pain: Optional[str], niche: Optional[str]) -> Tuple[str, str, float]:
@@ -149,11 +151,12 @@ OBJECTION_RESPONSES = {    "meta_taxa": (
 
 def run(user_id: str, user_text: str, history: List[Tuple[str, str]]) -> dict:
     try:
-        niche = _detect_niche(user_text, history)
-        volume = _extract_volume(user_text, history)
-        pain = _detect_pain(user_text, history)
+        state = _update_state(user_id, user_text, history)
+        niche = state.niche
+        volume = state.volume_atual
+        pain = state.pain
         objection = _detect_objection(user_text)
-        platform_pref = _detect_platform_preference(user_text, history)
+        platform_pref = state.platform
 
         if objection:
             return {
@@ -3,13 +3,15 @@ Skill: Onboarding - Coleta completa de dados tecnicos + plataforma + chaves de A
 Suporta WhatsApp (Meta API) e Telegram. Plataforma e coletada primeiro e determina
 quais credenciais de API serao solicitadas.
 """
-import sqlite3
 import json
 import os
 import re
 from datetime import datetime
 from typing import Optional, List, Tuple
 
+from bot_factory import db_pool
+from bot_factory.keyword_matcher import KeywordMatcher
+
 DB_NAME = os.getenv('DB_NAME', 'agencia_autovenda.db')
 
 # ── Campos de descoberta de plataforma ──────────────────────────────────────
@@ -247,27 +249,19 @@ FIELD_QUESTIONS = {
 
 
 def setup_tables():
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("""
+    db_pool.execute("""
         CREATE TABLE IF NOT EXISTS onboarding_data (
             user_id TEXT PRIMARY KEY, plano TEXT, dados_json TEXT,
             campos_coletados TEXT, campos_pendentes TEXT,
             status TEXT DEFAULT 'em_progresso',
             data_inicio TEXT, data_conclusao TEXT
         )
-    """)
-    conn.commit()
-    conn.close()
+    """, path=DB_NAME)
 
 
 def _get_subscription(user_id):
     try:
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
-        cur.execute("SELECT status, plano FROM assinaturas WHERE user_id = ?", (user_id,))
-        row = cur.fetchone()
-        conn.close()
+        row = db_pool.fetchone("SELECT status, plano FROM assinaturas WHERE user_id = ?", (user_id,), path=DB_NAME)
         return {"status": row[0], "plano": row[1] or "flash"} if row else None
     except Exception:
         return None
@@ -275,14 +269,10 @@ def _get_subscription(user_id):
 
 def _load_onboarding(user_id):
     try:
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
-        cur.execute(
+        row = db_pool.fetchone(
             "SELECT plano, dados_json, campos_coletados, campos_pendentes, status "
-            "FROM onboarding_data WHERE user_id = ?", (user_id,)
+            "FROM onboarding_data WHERE user_id = ?", (user_id,), path=DB_NAME
         )
-        row = cur.fetchone()
-        conn.close()
         if row:
             return {
                 "plano": row[0],
@@ -299,9 +289,7 @@ def _load_onboarding(user_id):
 def _save_onboarding(user_id, plano, dados, coletados, pendentes, status):
     setup_tables()
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("""
+    db_pool.execute("""
         INSERT INTO onboarding_data
             (user_id, plano, dados_json, campos_coletados, campos_pendentes, status, data_inicio, data_conclusao)
         VALUES (?, ?, ?, ?, ?, ?, ?, ?)
@@ -318,18 +306,17 @@ def _save_onboarding(user_id, plano, dados, coletados, pendentes, status):
         json.dumps(coletados),
         json.dumps(pendentes),
         status, now, now, now,
-    ))
-    conn.commit()
-    conn.close()
+    ), path=DB_NAME)
+
+
+PLATFORM_MATCHER = KeywordMatcher({"platform": {
+    "whatsapp": ["whatsapp", "wpp", "zap", "whats", "wts"],
+    "telegram": ["telegram", "tg", "telgram"],
+}})
 
 
 def _detect_platform(text: str) -> Optional[str]:
-    t = text.lower()
-    if any(w in t for w in ["whatsapp", "wpp", "zap", "whats", "wts"]):
-        return "whatsapp"
-    if any(w in t for w in ["telegram", "tg", "telgram"]):
-        return "telegram"
-    return None
+    return PLATFORM_MATCHER.first(PLATFORM_MATCHER.scan(text), "platform")
 
 
 def _extract_value(field: str, text: str) -> Optional[str]:
@@ -7,6 +7,10 @@ from typing import Optional, Tuple, List
 
 import stripe
 from dotenv import load_dotenv
+
+from bot_factory.checkout_cache import CheckoutCache
+from bot_factory.keyword_matcher import KeywordMatcher
+from bot_factory.lead_state import LeadState, lead_states
 load_dotenv()
 
 stripe.api_key = os.getenv("STRIPE_SECRET_KEY", "")
@@ -46,66 +50,99 @@ INTEREST_SIGNALS = ["qual o link", "como pago", "como contrato", "como assino",
                     "quero comecar", "como começa", "como funciona o pagamento"]
 
 
-def _detect_plan(text: str, history: List[Tuple[str, str]]) -> Optional[str]:
-    combined = (text + " " + " ".join([m for _, m in history[-10:]])).lower()
-    combined = re.sub(r'[áàãâä]','a', re.sub(r'[éèê]','e', re.sub(r'[íì]','i',
-        re.sub(r'[óòõô]','o', re.sub(r'[úù]','u', combined)))))
-    if any(k in combined for k in ["ecossistema", "completo", "premium", "crm", "multi", "avancado"]):
-        return "ecossistema"
-    if any(k in combined for k in ["secretaria", "agenda", "agendamento", "triagem", "intermediario"]):
-        return "secretaria"
-    if any(k in combined for k in ["flash", "basico", "simples", "starter", "faq", "inicial"]):
-        return "flash"
-    return None
+# Sinais de plano por prioridade (o primeiro presente vence)
+PLAN_SIGNALS = {
+    "ecossistema": ["ecossistema", "completo", "premium", "crm", "multi", "avancado"],
+    "secretaria": ["secretaria", "agenda", "agendamento", "triagem", "intermediario"],
+    "flash": ["flash", "basico", "simples", "starter", "faq", "inicial"],
+}
+
+MATCHER = KeywordMatcher({
+    "plan": PLAN_SIGNALS,
+    "closing": {"closing": CLOSING_SIGNALS},
+    "interest": {"interest": INTEREST_SIGNALS},
+})
+
+
+def _detect_plan(text: str) -> Optional[str]:
+    return MATCHER.first(MATCHER.scan(text), "plan")
 
 
 def _detect_closing(text: str) -> bool:
-    t = text.lower()
-    t = re.sub(r'[áàãâä]','a', re.sub(r'[éèê]','e', re.sub(r'[íì]','i',
-        re.sub(r'[óòõô]','o', re.sub(r'[úù]','u', t)))))
-    return any(sig in t for sig in CLOSING_SIGNALS)
+    return MATCHER.has(MATCHER.scan(text), "closing")
 
 
 def _detect_interest(text: str) -> bool:
-    t = text.lower()
-    return any(sig in t for sig in INTEREST_SIGNALS)
+    return MATCHER.has(MATCHER.scan(text), "interest")
 
 
-def _extract_email(text: str, history: List[Tuple[str, str]]) -> Optional[str]:
-    combined = text + " " + " ".join([m for _, m in history[-10:]])
-    m = re.search(r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+", combined)
+def _extract_email(text: str) -> Optional[str]:
+    m = re.search(r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+", text)
     return m.group(0) if m else None
 
 
-def _extract_name(text: str, history: List[Tuple[str, str]]) -> Optional[str]:
-    combined = text + " " + " ".join([m for _, m in history[-8:]])
+def _extract_name(text: str) -> Optional[str]:
     patterns = [
         r"(?:meu nome|me chamo|sou o|sou a)\s+([A-Z][a-z]+(?:\s[A-Z][a-z]+)?)",
         r"(?:nome[:\s]+)([A-Z][a-z]+(?:\s[A-Z][a-z]+)?)",
         r"^([A-Z][a-z]+(?:\s[A-Z][a-z]+){1,2})\b",
     ]
     for pat in patterns:
-        m = re.search(pat, combined)
+        m = re.search(pat, text)
         if m:
             return m.group(1).strip()
     return None
 
 
-def create_stripe_checkout(plan_slug: str, email: str, name: str) -> Optional[str]:
+def _observe(state: LeadState, text: str, role: str = "user"):
+    """Plano citado por qualquer lado; e-mail e nome so do cliente (o mais recente prevalece)."""
+    state.set(plan=_detect_plan(text))
+    if role == "user":
+        state.set(email=_extract_email(text), name=_extract_name(text))
+
+
+def _update_state(user_id: str, user_text: str, history: List[Tuple[str, str]]) -> LeadState:
+    state = lead_states.get(user_id)
+    if state.needs_seed("proposals"):
+        for role, msg in history[-10:]:
+            _observe(state, msg, role)
+        state.mark_seeded("proposals")
+    elif history and history[-1][0] == "assistant":
+        # Unico texto novo desde o turno anterior alem da mensagem atual: a resposta da Sofia
+        _observe(state, history[-1][1], "assistant")
+    _observe(state, user_text)
+    lead_states.checkpoint(state)
+    return state
+
+
+def _create_session(plan_slug: str, email: str, name: str, idempotency_key: str) -> Optional[Tuple[str, Optional[float]]]:
+    """Cria a sessao no Stripe; retorna (url, expires_at) ou None."""
+    plan = PLANS.get(plan_slug)
+    if not plan or not plan["price_id"]:
+        return None
+    session = stripe.checkout.Session.create(
+        payment_method_types=["card"],
+        line_items=[{"price": plan["price_id"], "quantity": 1}],
+        mode="subscription",
+        customer_email=email or None,
+        metadata={"client_name": name or "", "plan": plan_slug},
+        success_url=os.getenv("SUCCESS_URL", "https://agencia.com/sucesso"),
+        cancel_url=os.getenv("CANCEL_URL", "https://agencia.com/cancelado"),
+        idempotency_key=idempotency_key,
+    )
+    return session.url, getattr(session, "expires_at", None)
+
+
+# Uma sessao por (usuario, plano, e-mail) enquanto valida; criada em segundo plano
+CHECKOUT_CACHE = CheckoutCache(_create_session)
+CHECKOUT_WAIT = int(os.getenv("CHECKOUT_WAIT_MS", "800")) / 1000
+
+
+def create_stripe_checkout(plan_slug: str, email: str, name: str, user_id: str = "",
+                           wait: Optional[float] = None) -> Optional[str]:
+    """URL do checkout (do cache quando possivel). None se falhar ou nao ficar pronta em `wait`s."""
     try:
-        plan = PLANS.get(plan_slug)
-        if not plan or not plan["price_id"]:
-            return None
-        session = stripe.checkout.Session.create(
-            payment_method_types=["card"],
-            line_items=[{"price": plan["price_id"], "quantity": 1}],
-            mode="subscription",
-            customer_email=email or None,
-            metadata={"client_name": name or "", "plan": plan_slug},
-            success_url=os.getenv("SUCCESS_URL", "https://agencia.com/sucesso"),
-            cancel_url=os.getenv("CANCEL_URL", "https://agencia.com/cancelado"),
-        )
-        return session.url
+        return CHECKOUT_CACHE.url(user_id, plan_slug, email, name or "", wait=30 if wait is None else wait)
     except Exception as e:
         print(f"[proposals] Stripe error: {e}")
         return None
@@ -113,11 +150,12 @@ def create_stripe_checkout(plan_slug: str, email: str, name: str) -> Optional[st
 
 def run(user_id: str, user_text: str, history: List[Tuple[str, str]], qualified_plan: Optional[str] = None) -> dict:
     try:
-        plan_slug = qualified_plan or _detect_plan(user_text, history)
+        state = _update_state(user_id, user_text, history)
+        plan_slug = qualified_plan or state.plan
         is_closing = _detect_closing(user_text)
         is_interest = _detect_interest(user_text)
-        email = _extract_email(user_text, history)
-        name = _extract_name(user_text, history)
+        email = state.email
+        name = state.name
 
         if not plan_slug:
             return {"status": "no_plan"}
@@ -140,8 +178,18 @@ def run(user_id: str, user_text: str, history: List[Tuple[str, str]], qualified_
 
         if is_closing or is_interest:
             if email:
-                url = create_stripe_checkout(plan_slug, email, name or "")
-                if url:
+                pending = CHECKOUT_CACHE.get(user_id, plan_slug, email, name or "")
+                url = CHECKOUT_CACHE.result(pending, CHECKOUT_WAIT)
+                if not url and not pending.done():
+                    # Stripe ainda respondendo: a resposta segue sem esperar e o link vai numa mensagem a parte
+                    result["checkout_pending"] = pending
+                    result["instruction"] = (
+                        f"FECHAMENTO DETECTADO! Cliente quer o plano {plan['name']} (R$ {plan['price']:.2f}/mes).\n"
+                        f"O link de pagamento esta sendo gerado e sera enviado logo em seguida, em outra mensagem.\n"
+                        f"Instrucao: Parabenize a decisao, avise que o link chega em instantes e diga que a ativacao "
+                        f"ocorre em ate 24h apos o pagamento. NAO invente um link."
+                    )
+                elif url:
                     result["checkout_url"] = url
                     result["instruction"] = (
                         f"FECHAMENTO DETECTADO! Cliente quer o plano {plan['name']} (R$ {plan['price']:.2f}/mes).\n"
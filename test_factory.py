@@ -55,7 +55,7 @@ def inserir_cliente_teste():
     print(f"   Nicho: será detectado automaticamente como 'clinica_estetica'")
     print(f"   Status: {status}")
     print()
-    print("🔍 Aguarde até 60 segundos para o Factory detectar e criar o bot...")
+    print("🔍 O Factory detecta a ativação em menos de 1 segundo e começa o build...")
     print("💬 Você receberá uma notificação no Telegram quando o bot for criado!")
 
 def verificar_bot_criado():